@@ -1,16 +1,31 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, send_file
-import pandas as pd
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, send_file, Response, stream_with_context, abort, g
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 from flask_wtf.csrf import CSRFProtect
 import pathlib
 import re
 from dotenv import load_dotenv
 from config import Config
-from services.email_sender import init_mail, enviar_email_orcamento, enviar_email_orcamento_pdf
-from babel.numbers import format_currency
+from services.email_sender import init_mail, enviar_email_orcamento, enviar_email_orcamento_pdf, enviar_email_orcamento_pdf_buffer, credenciais_configuradas, obter_pool_smtp, configurar_pool_smtp
+from services.catalogo import CatalogoPrecos, REGRA_EXATA
+from services.catalogo_compilado import compilar_catalogo, NOME_ARQUIVO as NOME_CATALOGO_COMPILADO
+from services.numeracao import SequenciaOrcamentos
+from services.orcamentos import RepositorioOrcamentos
+from services.cache_pdf import CachePDF, GeracoesEmAndamento, LeitorBytes, chave_conteudo
+from services.pdf_orcamento import VERSAO_LAYOUT_PDF
+from services.pdf_executor import ExecutorPDF
+from services.outbox import CaixaSaida, TrabalhadorCaixaSaida, STATUS_ENVIADO, STATUS_FALHOU
+from services.envio_lote import EnvioLote, RegistroEnvioLote, ler_csv_destinatarios
+from services.exportacao_zip import ExportacaoZIP
+from services.perfil import PerfilRequisicoes, listar_perfis, listar_arquivos as listar_arquivos_perfil
+from services.memoria import MonitorMemoria, memoria_processo
+from services.metricas import metricas, etapa, DURACAO_REQUISICAO, REQUISICOES, ERROS_REQUISICAO, EM_ANDAMENTO
 import json
+import hashlib
+import secrets
 import logging
+import time
+import click
 from flask_session import Session  # Importar Flask-Session
 
 # Carrega as variáveis de ambiente do arquivo .env
@@ -33,6 +48,75 @@ def add_cors_headers(response):
     response.headers['Access-Control-Allow-Methods'] = 'GET,POST,PUT,DELETE,OPTIONS'
     return response
 
+# Métricas por rota (expostas em /metrics): duração, requisições em andamento e erros.
+# Os proxies request e g são resolvidos uma única vez por gancho, pois cada acesso
+# a eles custa mais que o próprio registro da métrica.
+@app.before_request
+def iniciar_metricas_requisicao():
+    requisicao = request._get_current_object()
+    # A regra da rota (ex.: /orcamento/<numero>), nunca o caminho, para limitar os rótulos
+    regra = requisicao.url_rule.rule if requisicao.url_rule is not None else '<nao_encontrada>'
+    rotulos = (('rota', regra), ('metodo', requisicao.method))
+    g.metricas_requisicao = [time.perf_counter(), rotulos, 500]
+    metricas.incrementar(EM_ANDAMENTO, rotulos[:1])
+
+@app.after_request
+def registrar_status_metricas(response):
+    dados = g.get('metricas_requisicao')
+    if dados is not None:
+        dados[2] = response.status_code
+    return response
+
+@app.teardown_request
+def concluir_metricas_requisicao(erro=None):
+    # Executado também quando a requisição termina com exceção (e, nas respostas em
+    # fluxo com stream_with_context, apenas ao final do envio)
+    dados = g.pop('metricas_requisicao', None)
+    if dados is None:
+        return
+    inicio, rotulos, status = dados
+    if erro is not None:
+        status = 500
+    metricas.observar(DURACAO_REQUISICAO, rotulos, time.perf_counter() - inicio)
+    metricas.incrementar(REQUISICOES, rotulos + (('status', str(status)),))
+    if status >= 500:
+        metricas.incrementar(ERROS_REQUISICAO, rotulos)
+    metricas.incrementar(EM_ANDAMENTO, rotulos[:1], -1)
+
+# Perfil de requisições sob demanda (só é instalado quando habilitado, sem custo quando desligado)
+if app.config['PERFIL_HABILITADO']:
+    app.wsgi_app = PerfilRequisicoes(
+        app.wsgi_app,
+        app.config['PERFIL_DIR'],
+        modo=app.config['PERFIL_MODO'],
+        amostragem=app.config['PERFIL_AMOSTRAGEM'],
+        max_arquivos=app.config['PERFIL_MAX_ARQUIVOS'],
+        token=app.config['ADMIN_TOKEN'],
+        rotas=app.config['PERFIL_ROTAS']
+    )
+    app.logger.info(f"Perfil de requisições habilitado ({app.config['PERFIL_MODO']}, amostragem de {app.config['PERFIL_AMOSTRAGEM']:.1%})")
+
+# Memória por rota com o tracemalloc (ganchos registrados apenas quando habilitado)
+monitor_memoria = None
+if app.config['MEMORIA_HABILITADA']:
+    monitor_memoria = MonitorMemoria(
+        frames=app.config['MEMORIA_FRAMES'],
+        intervalo_snapshot=app.config['MEMORIA_INTERVALO_SNAPSHOT'],
+        alerta_kb=app.config['MEMORIA_ALERTA_KB']
+    )
+    monitor_memoria.iniciar()
+
+    @app.before_request
+    def iniciar_medicao_memoria():
+        g.medicao_memoria = monitor_memoria.comecar()
+
+    @app.teardown_request
+    def concluir_medicao_memoria(erro=None):
+        inicio = g.pop('medicao_memoria', None)
+        if inicio is not None:
+            regra = request.url_rule.rule if request.url_rule is not None else '<nao_encontrada>'
+            monitor_memoria.concluir(inicio, f"{request.method} {regra}")
+
 # Criar diretório para sessões se não existir e se estiver usando filesystem
 if app.config['SESSION_TYPE'] == 'filesystem' and 'SESSION_FILE_DIR' in app.config:
     if not os.path.exists(app.config['SESSION_FILE_DIR']):
@@ -45,14 +129,79 @@ logging.basicConfig(filename='app.log', level=logging.INFO)
 BASE_DIR = pathlib.Path(__file__).parent
 EXCEL_PATH = BASE_DIR / 'dados_precificacao_teste.xlsx'
 
+# Diretório dos CSVs de preços (CATALOGO_DIR permite usar outro catálogo, como um sintético)
+CATALOGO_DIR = pathlib.Path(app.config['CATALOGO_DIR']) if app.config['CATALOGO_DIR'] else BASE_DIR
+
+# Catálogo compilado na construção (flask compilar-catalogo); ausente ou desatualizado, os CSVs são lidos
+CATALOGO_COMPILADO = app.config['CATALOGO_COMPILADO'] or CATALOGO_DIR / NOME_CATALOGO_COMPILADO
+
+# Catálogo de preços compartilhado pelo processo (relido apenas quando os arquivos mudam)
+catalogo = CatalogoPrecos(CATALOGO_DIR / 'Precos_PGR.csv', CATALOGO_DIR / 'Precos_Ambientais.csv', CATALOGO_COMPILADO)
+
+# Sequência de números e base de orçamentos compartilhadas por todos os workers
+ORCAMENTOS_DB = os.path.join(app.config['DATA_DIR'], 'orcamentos.db')
+if app.config['DATA_DIR_TEMPORARIO']:
+    app.logger.warning(f"DATA_DIR {app.config['DATA_DIR']} é local desta instância e apagado a cada partida a frio: "
+                       "orçamentos salvos, a caixa de saída e a numeração não são duráveis nem compartilhados entre "
+                       "instâncias (duas instâncias podem gerar o mesmo número de orçamento)")
+sequencia_orcamentos = SequenciaOrcamentos(ORCAMENTOS_DB)
+repositorio_orcamentos = RepositorioOrcamentos(ORCAMENTOS_DB)
+if 'SESSION_FILE_DIR' in app.config:
+    # Continuar a numeração do antigo contador em arquivo JSON
+    sequencia_orcamentos.importar_contador_json(os.path.join(app.config['SESSION_FILE_DIR'], 'contador_orcamento.json'))
+
+# Cache dos PDFs gerados, endereçado pelo conteúdo do orçamento
+cache_pdf = CachePDF(app.config['PDF_CACHE_MAX_BYTES'], app.config['PDF_CACHE_DIR'])
+
+# PDFs sendo gerados neste momento: pedidos simultâneos do mesmo PDF esperam a mesma geração
+geracoes_pdf = GeracoesEmAndamento()
+
+# Geração antecipada do PDF enquanto o usuário vê o resumo (desligada na Vercel,
+# onde o processo é congelado assim que a resposta é enviada)
+pre_renderizador_pdf = None
+if app.config['PDF_PRE_RENDERIZAR']:
+    from concurrent.futures import ThreadPoolExecutor
+    pre_renderizador_pdf = ThreadPoolExecutor(max_workers=app.config['PDF_WORKERS'], thread_name_prefix='pre-pdf')
+
+# Renderização dos PDFs (em processos separados, para não bloquear as demais requisições)
+executor_pdf = ExecutorPDF(
+    app.config['PDF_EXECUTOR'],
+    workers=app.config['PDF_WORKERS'],
+    timeout=app.config['PDF_TIMEOUT_SEGUNDOS'],
+    contexto=app.config['PDF_EXECUTOR_CONTEXTO']
+)
+
+def entregar_email_orcamento(destinatario, pdf, nome_arquivo, **metadados):
+    """Envia um e-mail da caixa de saída (chamado pelo worker, fora das requisições)"""
+    from io import BytesIO
+    return enviar_email_orcamento_pdf_buffer(destinatario, BytesIO(pdf), nome_arquivo, **metadados)
+
+# Caixa de saída de e-mails: as requisições apenas enfileiram, o envio é feito em segundo plano
+caixa_saida = CaixaSaida(
+    ORCAMENTOS_DB,
+    max_tentativas=app.config['OUTBOX_MAX_TENTATIVAS'],
+    backoff_segundos=app.config['OUTBOX_BACKOFF_SEGUNDOS']
+)
+trabalhador_caixa_saida = TrabalhadorCaixaSaida(caixa_saida, entregar_email_orcamento)
+
+def enviar_mensagem_caixa_saida(envio_id):
+    """Envia uma mensagem da caixa de saída nesta requisição (modo 'requisicao')"""
+    try:
+        trabalhador_caixa_saida.processar_mensagem(envio_id)
+    except Exception as e:
+        app.logger.error(f"Erro ao enviar o e-mail {envio_id} da caixa de saída: {str(e)}")
+
+# Situação dos envios em lote (permite retomar um lote interrompido)
+registro_envio_lote = RegistroEnvioLote(ORCAMENTOS_DB)
+
 # Inicializar Flask-Mail
 mail = init_mail(app)
 
 # Função para verificar a estrutura da planilha
 def verificar_planilha():
     """Verifica se os arquivos CSV existem"""
-    pgr_path = os.path.join(os.path.dirname(__file__), 'Precos_PGR.csv')
-    ambientais_path = os.path.join(os.path.dirname(__file__), 'Precos_Ambientais.csv')
+    pgr_path = os.path.join(CATALOGO_DIR, 'Precos_PGR.csv')
+    ambientais_path = os.path.join(CATALOGO_DIR, 'Precos_Ambientais.csv')
     
     if not os.path.exists(pgr_path):
         return False, f"Arquivo não encontrado: {pgr_path}"
@@ -63,304 +212,146 @@ def verificar_planilha():
     return True, "Arquivos CSV encontrados"
 
 def obter_servicos():
-    """Obtém a lista de serviços disponíveis a partir dos arquivos CSV"""
-    servicos = set()
-    
-    # Carregar serviços do arquivo PGR
-    pgr_path = os.path.join(os.path.dirname(__file__), 'Precos_PGR.csv')
-    if os.path.exists(pgr_path):
-        try:
-            df_pgr = pd.read_csv(pgr_path)
-            servicos.update(df_pgr['Serviço'].unique())
-        except Exception as e:
-            app.logger.error(f"Erro ao ler arquivo PGR: {str(e)}")
-    
-    # Carregar serviços do arquivo Ambientais
-    ambientais_path = os.path.join(os.path.dirname(__file__), 'Precos_Ambientais.csv')
-    if os.path.exists(ambientais_path):
-        try:
-            df_ambientais = pd.read_csv(ambientais_path)
-            servicos.update(df_ambientais['Serviço'].unique())
-        except Exception as e:
-            app.logger.error(f"Erro ao ler arquivo Ambientais: {str(e)}")
-    
-    return sorted(list(servicos))
+    """Obtém a lista de serviços disponíveis a partir do catálogo de preços"""
+    return list(catalogo.obter().servicos)
 
 def carregar_dados_excel():
-    """Carrega os dados dos arquivos CSV"""
-    dados = {}
-    
-    # Carregar dados do arquivo PGR
-    pgr_path = os.path.join(os.path.dirname(__file__), 'Precos_PGR.csv')
-    if os.path.exists(pgr_path):
-        try:
-            df_pgr = pd.read_csv(pgr_path)
-            dados['pgr'] = df_pgr
-        except Exception as e:
-            app.logger.error(f"Erro ao ler arquivo PGR: {str(e)}")
+    """Retorna as tabelas do catálogo de preços (somente leitura)"""
+    return catalogo.obter().como_dicionario()
+
+# Regras adicionais de resolução de preço (as demais estão em services.catalogo)
+REGRA_NAO_ENCONTRADO = 'nao_encontrado'  # nenhum preço encontrado (preço 0)
+REGRA_ERRO = 'erro'                      # erro na busca, usado o preço padrão
+
+# Nome do serviço de PGR no CSV (todos os serviços com "PGR" no nome usam os seus preços)
+SERVICO_PGR_CSV = "Elaboração e acompanhamento do PGR"
+
+# Mapeamento de valores do formulário para a coluna Faixa_Trab do CSV de PGR
+MAPEAMENTO_FAIXAS_TRAB = {
+    'ate19': 'Até 19 Trab.',
+    '20a50': '20 a 50 Trab.',
+    '51a100': '51 a 100 Trab.',
+    '101a160': '101 a 160 Trab.',
+    '161a250': '161 a 250 Trab.',
+    '251a300': '251 a 300 Trab.',
+    '301a350': '301 a 350 Trab.',
+    '351a400': '351 a 400 Trab.',
+    '401a450': '401 a 450 Trab.',
+    '451a500': '451 a 500 Trab.',
+    '501a550': '501 a 550 Trab.',
+    '551a600': '551 a 600 Trab.',
+    '601a650': '601 a 650 Trab.',
+    '651a700': '651 a 700 Trab.',
+    '701a750': '701 a 750 Trab.',
+    '751a800': '751 a 800 Trab.'
+}
+
+@etapa('busca_preco')
+def resolver_preco_servico(nome_servico, regiao=None, variavel=None, grau_risco=None, num_trabalhadores=None, num_ges_ghe=None, num_avaliacoes_adicionais=None, dados=None):
+    """
+    Obtém o preço de um serviço e a regra que o produziu.
     
-    # Carregar dados do arquivo Ambientais
-    ambientais_path = os.path.join(os.path.dirname(__file__), 'Precos_Ambientais.csv')
-    if os.path.exists(ambientais_path):
-        try:
-            df_ambientais = pd.read_csv(ambientais_path)
-            dados['ambientais'] = df_ambientais
-        except Exception as e:
-            app.logger.error(f"Erro ao ler arquivo Ambientais: {str(e)}")
+    As combinações de parâmetros são resolvidas pela tabela de resoluções do catálogo
+    (cada combinação passa pela cascata uma única vez), de modo que os fallbacks (região
+    Central, outra faixa, outra variável...) custam o mesmo que um acerto exato.
     
-    return dados
-
-def obter_preco_servico(nome_servico, regiao=None, variavel=None, grau_risco=None, num_trabalhadores=None, num_ges_ghe=None, num_avaliacoes_adicionais=None):
-    """Obtém o preço de um serviço com base nos parâmetros fornecidos"""
+    Args:
+        dados: Fotografia do catálogo a usar (opcional, padrão: a atual)
+        
+    Returns:
+        Tupla (preço, regra), onde regra é 'exato', o nome do fallback aplicado
+        (ver services.catalogo), 'nao_encontrado' ou 'erro'
+    """
     try:
         app.logger.info(f"Buscando preço para: {nome_servico}, {regiao}, {variavel}, {grau_risco}, {num_trabalhadores}")
         
+        if dados is None:
+            dados = catalogo.obter()
+        
         # Verificar qual arquivo CSV usar
         if "PGR" in nome_servico:
             # Lógica para serviços PGR
-            df = pd.read_csv('Precos_PGR.csv')
-            
-            # Filtrar por serviço, região e grau de risco
-            # Verificar se o nome do serviço contém "Elaboração e acompanhamento do PGR"
+            tabela = dados.pgr
+            if tabela is None:
+                raise FileNotFoundError("Arquivo Precos_PGR.csv não carregado")
             
             # Para serviços PGR, o nome no CSV é "Elaboração e acompanhamento do PGR"
-            nome_servico_csv = "Elaboração e acompanhamento do PGR"
+            nome_servico_csv = SERVICO_PGR_CSV
             
-            # Verificar se o dataframe está vazio
-            if df.empty:
+            # Verificar se a tabela está vazia
+            if tabela.vazia:
                 app.logger.error("Arquivo Precos_PGR.csv está vazio ou não foi carregado corretamente")
-                return 0
+                return 0, REGRA_NAO_ENCONTRADO
                 
             # Verificar se as colunas necessárias existem
             colunas_necessarias = ['Serviço', 'Região', 'Grau_Risco', 'Faixa_Trab', 'Preço']
             for coluna in colunas_necessarias:
-                if coluna not in df.columns:
+                if coluna not in tabela:
                     app.logger.error(f"Coluna {coluna} não encontrada no arquivo Precos_PGR.csv")
-                    return 0
+                    return 0, REGRA_NAO_ENCONTRADO
             
             # Verificar se o serviço existe no CSV
-            if nome_servico_csv not in df['Serviço'].values:
+            if nome_servico_csv not in dados.valores_pgr['Serviço']:
                 app.logger.error(f"Serviço '{nome_servico_csv}' não encontrado no arquivo Precos_PGR.csv")
-                return 0
-                
-            # Verificar se a região existe no CSV
-            if regiao and regiao not in df['Região'].values:
-                app.logger.warning(f"Região '{regiao}' não encontrada no arquivo Precos_PGR.csv, tentando região Central")
-                regiao = 'Central'
+                return 0, REGRA_NAO_ENCONTRADO
                 
             # Verificar se o grau de risco existe no CSV
-            if grau_risco and grau_risco not in df['Grau_Risco'].values:
-                app.logger.warning(f"Grau de risco '{grau_risco}' não encontrado no arquivo Precos_PGR.csv")
+            if grau_risco and grau_risco not in dados.valores_pgr['Grau_Risco']:
                 # Tentar converter o formato do grau de risco
                 if grau_risco == "1e2":
                     grau_risco = "1 e 2"
                 elif grau_risco == "3e4":
                     grau_risco = "3 e 4"
                 
-                if grau_risco not in df['Grau_Risco'].values:
+                if grau_risco not in dados.valores_pgr['Grau_Risco']:
                     app.logger.error(f"Grau de risco '{grau_risco}' não encontrado mesmo após conversão")
-                    return 0
-            
-            # Iniciar o filtro com o serviço
-            filtro = (df['Serviço'] == nome_servico_csv)
-            
-            # Adicionar filtro de região se fornecido
-            if regiao:
-                filtro = filtro & (df['Região'] == regiao)
-            
-            # Adicionar filtro de grau de risco se fornecido
-            if grau_risco:
-                # Converter o formato do grau de risco se necessário
-                if grau_risco == "1e2":
-                    grau_risco = "1 e 2"
-                elif grau_risco == "3e4":
-                    grau_risco = "3 e 4"
-                
-                filtro = filtro & (df['Grau_Risco'] == grau_risco)
+                    return 0, REGRA_NAO_ENCONTRADO
             
             # Converter num_trabalhadores para o formato da coluna Faixa_Trab
             faixa_trab = None
             if num_trabalhadores:
-                # Mapeamento de valores do formulário para valores do CSV
-                mapeamento = {
-                    'ate19': 'Até 19 Trab.',
-                    '20a50': '20 a 50 Trab.',
-                    '51a100': '51 a 100 Trab.',
-                    '101a160': '101 a 160 Trab.',
-                    '161a250': '161 a 250 Trab.',
-                    '251a300': '251 a 300 Trab.',
-                    '301a350': '301 a 350 Trab.',
-                    '351a400': '351 a 400 Trab.',
-                    '401a450': '401 a 450 Trab.',
-                    '451a500': '451 a 500 Trab.',
-                    '501a550': '501 a 550 Trab.',
-                    '551a600': '551 a 600 Trab.',
-                    '601a650': '601 a 650 Trab.',
-                    '651a700': '651 a 700 Trab.',
-                    '701a750': '701 a 750 Trab.',
-                    '751a800': '751 a 800 Trab.'
-                }
-                
-                faixa_trab = mapeamento.get(num_trabalhadores)
+                faixa_trab = MAPEAMENTO_FAIXAS_TRAB.get(num_trabalhadores)
                 if not faixa_trab:
                     app.logger.warning(f"Faixa de trabalhadores não mapeada: {num_trabalhadores}")
                     if num_trabalhadores.startswith('Acima'):
                         faixa_trab = 'Acima de 101 Trab.'
             
-            if faixa_trab:
-                app.logger.info(f"Faixa de trabalhadores mapeada: {num_trabalhadores} -> {faixa_trab}")
-                
-                # Verificar se a faixa de trabalhadores existe no CSV
-                if faixa_trab not in df['Faixa_Trab'].values:
-                    app.logger.warning(f"Faixa de trabalhadores '{faixa_trab}' não encontrada no arquivo Precos_PGR.csv")
-                    # Tentar encontrar uma faixa similar
-                    faixas_disponiveis = df['Faixa_Trab'].unique()
-                    app.logger.info(f"Faixas disponíveis: {faixas_disponiveis}")
-                    
-                    # Usar a primeira faixa disponível como fallback
-                    if len(faixas_disponiveis) > 0:
-                        faixa_trab = faixas_disponiveis[0]
-                        app.logger.info(f"Usando faixa de trabalhadores '{faixa_trab}' como fallback")
-                
-                filtro = filtro & (df['Faixa_Trab'] == faixa_trab)
-            
-            # Aplicar filtro
-            resultado = df[filtro]
-            
-            # Imprimir o resultado para debug
-            app.logger.info(f"Resultado da busca: {len(resultado)} registros encontrados")
-            if not resultado.empty:
-                app.logger.info(f"Primeiro resultado: {resultado.iloc[0].to_dict()}")
-            
-            if resultado.empty:
-                app.logger.warning(f"Nenhum resultado encontrado para PGR com filtros: {nome_servico_csv}, {regiao}, {grau_risco}, {faixa_trab}")
-                
-                # Tentar buscar na região Central como fallback
-                filtro_central = (df['Serviço'] == nome_servico_csv)
-                if regiao != 'Central':
-                    filtro_central = filtro_central & (df['Região'] == 'Central')
-                if grau_risco:
-                    filtro_central = filtro_central & (df['Grau_Risco'] == grau_risco)
-                if faixa_trab:
-                    filtro_central = filtro_central & (df['Faixa_Trab'] == faixa_trab)
-                
-                resultado_central = df[filtro_central]
-                if not resultado_central.empty:
-                    app.logger.info(f"Usando preço da região Central como fallback")
-                    resultado = resultado_central
-                else:
-                    # Se ainda não encontrar, tentar com qualquer faixa de trabalhadores
-                    app.logger.warning(f"Tentando encontrar preço com qualquer faixa de trabalhadores")
-                    filtro_qualquer_faixa = (df['Serviço'] == nome_servico_csv)
-                    if regiao != 'Central':
-                        filtro_qualquer_faixa = filtro_qualquer_faixa & (df['Região'] == regiao)
-                    if grau_risco:
-                        filtro_qualquer_faixa = filtro_qualquer_faixa & (df['Grau_Risco'] == grau_risco)
-                    
-                    resultado_qualquer_faixa = df[filtro_qualquer_faixa]
-                    if not resultado_qualquer_faixa.empty:
-                        app.logger.info(f"Usando primeira faixa de trabalhadores disponível")
-                        resultado = resultado_qualquer_faixa.iloc[[0]]
-                    else:
-                        # Tentar com qualquer região e qualquer faixa
-                        app.logger.warning(f"Tentando encontrar preço com qualquer região e qualquer faixa")
-                        filtro_qualquer = (df['Serviço'] == nome_servico_csv)
-                        if grau_risco:
-                            filtro_qualquer = filtro_qualquer & (df['Grau_Risco'] == grau_risco)
-                        
-                        resultado_qualquer = df[filtro_qualquer]
-                        if not resultado_qualquer.empty:
-                            app.logger.info(f"Usando primeiro preço disponível")
-                            resultado = resultado_qualquer.iloc[[0]]
-                        else:
-                            # Último recurso: usar qualquer preço disponível
-                            app.logger.warning("Tentando usar qualquer preço disponível como último recurso")
-                            if not df.empty:
-                                resultado = df.iloc[[0]]
+            resolucao = dados.resolver_pgr(nome_servico_csv, regiao, grau_risco, faixa_trab)
             
-            if resultado.empty:
+            if resolucao is None:
                 app.logger.error(f"Nenhum preço encontrado para PGR: {nome_servico_csv}, {regiao}, {grau_risco}, {faixa_trab}")
                 # Retornar um valor padrão para não quebrar a aplicação
-                return 700.0
+                return 700.0, REGRA_ERRO
             
-            # Obter o preço
-            preco = resultado['Preço'].iloc[0]
-            app.logger.info(f"Preço encontrado: {preco}")
+            preco = resolucao.preco
+            if resolucao.regra != REGRA_EXATA:
+                app.logger.warning(f"Preço de fallback ({resolucao.regra}) para PGR: {regiao}, {grau_risco}, {faixa_trab} -> {preco}")
+            app.logger.info(f"Preço encontrado: {preco} (regra: {resolucao.regra})")
             
-            return preco
+            return preco, resolucao.regra
         else:
             # Lógica para serviços ambientais
-            df = pd.read_csv('Precos_Ambientais.csv')
+            if dados.ambientais is None:
+                raise FileNotFoundError("Arquivo Precos_Ambientais.csv não carregado")
             
-            # Filtrar por serviço e região
-            filtro_regiao = (df['Serviço'] == nome_servico) & (df['Região'] == regiao)
+            resolucao = dados.resolver_ambientais(nome_servico, regiao, variavel)
             
-            # Verificar se há resultados para a região
-            if df[filtro_regiao].empty:
-                app.logger.warning(f"Nenhum resultado para {nome_servico} na região {regiao}")
-                
-                # Tentar região Central como fallback
-                filtro_regiao = (df['Serviço'] == nome_servico) & (df['Região'] == 'Central')
-                
-                if df[filtro_regiao].empty:
-                    app.logger.error(f"Nenhum resultado para {nome_servico} na região Central (fallback)")
-                    return 0
-            
-            # Filtrar por variável
-            resultado = pd.DataFrame()
-            if variavel:
-                filtro_completo = filtro_regiao & (df['Tipo_Avaliacao'] == variavel)
-                resultado = df[filtro_completo]
-                
-                # Se não encontrar com a variável específica, tentar outras variáveis
-                if resultado.empty:
-                    app.logger.warning(f"Nenhum resultado para variável {variavel}, tentando outras variáveis")
-                    
-                    # Listar todas as variáveis disponíveis para este serviço e região
-                    variaveis_disponiveis = df[filtro_regiao]['Tipo_Avaliacao'].unique()
-                    app.logger.info(f"Variáveis disponíveis: {variaveis_disponiveis}")
-                    
-                    # Tentar encontrar uma variável similar
-                    variavel_encontrada = None
-                    for var_disp in variaveis_disponiveis:
-                        if variavel in var_disp or var_disp in variavel:
-                            variavel_encontrada = var_disp
-                            break
-                    
-                    if variavel_encontrada:
-                        app.logger.info(f"Usando variável similar: {variavel_encontrada}")
-                        filtro_completo = filtro_regiao & (df['Tipo_Avaliacao'] == variavel_encontrada)
-                        resultado = df[filtro_completo]
-                    else:
-                        # Se não encontrar variável similar, usar a primeira disponível
-                        if len(variaveis_disponiveis) > 0:
-                            app.logger.info(f"Usando primeira variável disponível: {variaveis_disponiveis[0]}")
-                            filtro_completo = filtro_regiao & (df['Tipo_Avaliacao'] == variaveis_disponiveis[0])
-                            resultado = df[filtro_completo]
-            else:
-                # Se não especificar variável, usar a primeira disponível
-                variaveis_disponiveis = df[filtro_regiao]['Tipo_Avaliacao'].unique()
-                if len(variaveis_disponiveis) > 0:
-                    app.logger.info(f"Nenhuma variável especificada, usando primeira disponível: {variaveis_disponiveis[0]}")
-                    filtro_completo = filtro_regiao & (df['Tipo_Avaliacao'] == variaveis_disponiveis[0])
-                    resultado = df[filtro_completo]
-                else:
-                    resultado = pd.DataFrame()
-            
-            if resultado.empty:
-                app.logger.warning(f"Nenhum resultado encontrado após todas as tentativas")
-                return 0
+            if resolucao is None:
+                app.logger.warning(f"Nenhum resultado para {nome_servico} na região {regiao} nem na região Central")
+                return 0, REGRA_NAO_ENCONTRADO
             
             # Obter o preço base
-            preco = resultado['Preço'].iloc[0]
-            app.logger.info(f"Preço base encontrado: {preco}")
+            preco = resolucao.preco
+            valor_adicional = resolucao.adicional_ges_ghe
+            if resolucao.regra != REGRA_EXATA:
+                app.logger.warning(f"Preço de fallback ({resolucao.regra}) para {nome_servico}: {regiao}, {variavel} -> {resolucao.regiao}, {resolucao.variavel}")
+            app.logger.info(f"Preço base encontrado: {preco} (regra: {resolucao.regra})")
             
             # Verificar se há custo adicional por GES/GHE
             adicional_ges_ghe = 0
-            if 'Adicional_GES_GHE' in resultado.columns and num_ges_ghe and num_ges_ghe > 1:
+            if valor_adicional is not None and num_ges_ghe and num_ges_ghe > 1:
                 try:
-                    valor_adicional = resultado['Adicional_GES_GHE'].iloc[0]
-                    if pd.notna(valor_adicional) and valor_adicional > 0:
+                    if valor_adicional > 0:
                         adicional_ges_ghe = valor_adicional * (num_ges_ghe - 1)
                         app.logger.info(f"Adicional GES/GHE: {adicional_ges_ghe} para {num_ges_ghe} GES/GHE")
                 except:
@@ -369,20 +360,16 @@ def obter_preco_servico(nome_servico, regiao=None, variavel=None, grau_risco=Non
             # Verificar se há custo adicional por avaliações adicionais
             adicional_avaliacoes = 0
             if num_avaliacoes_adicionais and num_avaliacoes_adicionais > 0:
-                # Verificar se há preço para avaliação adicional
-                filtro_avaliacao_adicional = filtro_regiao & (df['Tipo_Avaliacao'] == 'Por Avaliação Adicional')
-                resultado_avaliacao_adicional = df[filtro_avaliacao_adicional]
-                
-                if not resultado_avaliacao_adicional.empty:
-                    preco_avaliacao_adicional = resultado_avaliacao_adicional['Preço'].iloc[0]
-                    adicional_avaliacoes = preco_avaliacao_adicional * num_avaliacoes_adicionais
+                # Verificar se há preço para avaliação adicional na região efetiva
+                if resolucao.preco_avaliacao_adicional is not None:
+                    adicional_avaliacoes = resolucao.preco_avaliacao_adicional * num_avaliacoes_adicionais
                     app.logger.info(f"Adicionando {num_avaliacoes_adicionais} avaliações adicionais ao pacote: R$ {adicional_avaliacoes}")
             
             # Calcular preço final
             preco_final = preco + adicional_ges_ghe + adicional_avaliacoes
             app.logger.info(f"Preço encontrado: {preco}, Adicional GES/GHE: {adicional_ges_ghe}, Preço Final: {preco_final}")
             
-            return preco_final
+            return preco_final, resolucao.regra
     
     except Exception as e:
         app.logger.error(f"Erro ao obter preço do serviço: {str(e)}")
@@ -390,12 +377,17 @@ def obter_preco_servico(nome_servico, regiao=None, variavel=None, grau_risco=Non
         traceback.print_exc()
         # Retornar um valor padrão para não quebrar a aplicação
         if "PGR" in nome_servico:
-            return 700.0
+            return 700.0, REGRA_ERRO
         else:
-            return 300.0
+            return 300.0, REGRA_ERRO
+
+def obter_preco_servico(nome_servico, regiao=None, variavel=None, grau_risco=None, num_trabalhadores=None, num_ges_ghe=None, num_avaliacoes_adicionais=None):
+    """Obtém o preço de um serviço com base nos parâmetros fornecidos"""
+    preco, _ = resolver_preco_servico(nome_servico, regiao=regiao, variavel=variavel, grau_risco=grau_risco, num_trabalhadores=num_trabalhadores, num_ges_ghe=num_ges_ghe, num_avaliacoes_adicionais=num_avaliacoes_adicionais)
+    return preco
 
-verificar_planilha()
 # A função verificar_precos_csv() será chamada apenas no bloco if __name__ == "__main__"
+# (e, no servidor, pelo aquecimento em segundo plano)
 
 @app.route('/', methods=['GET', 'POST'])
 def formulario():
@@ -405,9 +397,7 @@ def formulario():
             print("Formulário recebido:")
             print(f"Dados do formulário: {request.form}")
             
-            session.pop('servicos', None)
-            session.pop('total_orcamento', None)
-            session.pop('data_orcamento', None)
+            limpar_orcamento_sessao()
             
             cliente_email = request.form.get('cliente_email', '')
             empresa_cliente = request.form.get('empresa', '')
@@ -469,11 +459,20 @@ def formulario():
             print(f"Total do orçamento: {total_orcamento}")
             print(f"Serviços processados: {servicos}")
             
-            session['cliente_email'] = cliente_email
-            session['empresa_cliente'] = empresa_cliente
-            session['servicos'] = servicos
-            session['total_orcamento'] = total_orcamento
-            session['data_orcamento'] = datetime.now().strftime('%d/%m/%Y')
+            token = secrets.token_urlsafe(16)
+            orcamento_id = repositorio_orcamentos.salvar(
+                gerar_numero_orcamento(),
+                empresa_cliente,
+                cliente_email,
+                '',
+                servicos,
+                subtotal=0,
+                percentual_sesi=30,
+                valor_sesi=0,
+                total=total_orcamento,
+                token=token
+            )
+            guardar_orcamento_sessao(orcamento_id, token)
             
             return redirect(url_for('resumo_view'))
             
@@ -482,11 +481,11 @@ def formulario():
             flash(f"Erro ao processar o formulário: {e}")
             return redirect(url_for('formulario'))
     
-    # Carregar dados dos arquivos CSV
-    dados = carregar_dados_excel()
+    # Carregar o catálogo de preços
+    dados = catalogo.obter()
     
     # Verificar se os dados foram carregados corretamente
-    if not dados or not isinstance(dados, dict):
+    if dados.pgr is None and dados.ambientais is None:
         flash("Erro ao carregar dados dos arquivos CSV", "error")
         return render_template('formulario.html', servicos=[], variaveis_disponiveis={})
     
@@ -505,19 +504,9 @@ def formulario():
             variaveis_disponiveis[servico] = []
             continue
         
-        # Para serviços ambientais
-        df_ambientais = dados.get('ambientais')
-        if df_ambientais is not None and isinstance(df_ambientais, pd.DataFrame):
-            # Filtrar por serviço e região padrão
-            filtro = (df_ambientais['Serviço'] == servico) & (df_ambientais['Região'] == regiao_padrao)
-            resultado = df_ambientais[filtro]
-            
-            if not resultado.empty:
-                # Obter valores únicos da coluna Tipo_Avaliacao
-                variaveis = resultado['Tipo_Avaliacao'].unique().tolist()
-                variaveis_disponiveis[servico] = variaveis
-            else:
-                variaveis_disponiveis[servico] = []
+        # Para serviços ambientais: tipos de avaliação da região padrão, na ordem do CSV
+        if dados.ambientais is not None:
+            variaveis_disponiveis[servico] = list(dados.variaveis_ambientais.get((servico, regiao_padrao), []))
     
     return render_template('formulario.html', servicos=servicos, variaveis_disponiveis=variaveis_disponiveis)
 
@@ -525,109 +514,261 @@ def gerar_numero_orcamento():
     """
     Gera um número de orçamento baseado na data atual e um contador sequencial.
     Formato: DD-MM-AAAA-XXXX (onde XXXX é um número sequencial)
-    """
-    from datetime import datetime
-    import os
-    import json
-    
-    # Obter a data atual
-    data_atual = datetime.now()
-    data_formatada = data_atual.strftime("%d-%m-%Y")
     
-    # Caminho para o arquivo de contagem
-    contador_path = os.path.join(app.config['SESSION_FILE_DIR'], 'contador_orcamento.json')
-    
-    # Verificar se o arquivo existe e carregar o contador
-    contador = 1
-    data_anterior = ""
+    O contador é atômico entre threads e processos (ver services.numeracao).
+    """
+    return sequencia_orcamentos.proximo()
+
+def guardar_orcamento_sessao(orcamento_id, token):
+    """
+    Torna um orçamento gravado o orçamento em andamento da sessão. A sessão guarda o id
+    e o token do orçamento, conferido a cada leitura: um id de outra base (ex.: de outra
+    instância na Vercel) nunca devolve o orçamento de outro cliente. Com DATA_DIR
+    temporário, guarda também os dados do orçamento, usados quando a instância que
+    atende a requisição não o tem.
+    """
+    session['orcamento_id'] = orcamento_id
+    session['orcamento_token'] = token
+    if app.config['DATA_DIR_TEMPORARIO']:
+        session['orcamento'] = repositorio_orcamentos.obter(orcamento_id, token)
+    else:
+        session.pop('orcamento', None)
+
+def limpar_orcamento_sessao():
+    """Descarta o orçamento em andamento da sessão"""
+    for chave in ('orcamento_id', 'orcamento_token', 'orcamento'):
+        session.pop(chave, None)
+
+def obter_orcamento_sessao():
+    """Carrega da base o orçamento em andamento na sessão (None se não houver)"""
+    orcamento_id = session.get('orcamento_id')
+    token = session.get('orcamento_token')
+    if not orcamento_id or not token:
+        return None
+    orcamento = repositorio_orcamentos.obter(orcamento_id, token)
+    if orcamento is None and session.get('orcamento'):
+        # Gravado em outra instância (ou antes de uma partida a frio): usar a cópia da sessão
+        orcamento = dict(session['orcamento'], id=None)
+    return orcamento
+
+def renderizar_resumo(orcamento):
+    """Renderiza a página de resumo de um orçamento gravado"""
+    servicos = orcamento['servicos']
     
-    if os.path.exists(contador_path):
-        try:
-            with open(contador_path, 'r') as f:
-                dados = json.load(f)
-                data_anterior = dados.get('data', '')
-                contador = dados.get('contador', 1)
-                
-                # Se a data mudou, reiniciar o contador
-                if data_anterior != data_formatada:
-                    contador = 1
-                else:
-                    contador += 1
-        except:
-            # Em caso de erro, usar valores padrão
-            contador = 1
+    # Os dados já são os finais: gerar o PDF enquanto o usuário confere o resumo
+    pre_gerar_pdf_orcamento(orcamento)
     
-    # Salvar o novo contador
-    try:
-        with open(contador_path, 'w') as f:
-            json.dump({
-                'data': data_formatada,
-                'contador': contador
-            }, f)
-    except:
-        app.logger.error("Erro ao salvar contador de orçamento")
+    app.logger.info(f"Exibindo resumo do orçamento {orcamento['numero_orcamento']} para {orcamento['empresa_cliente']} com {len(servicos)} serviços")
     
-    # Formatar o número do orçamento: DD-MM-AAAA-XXXX
-    numero_orcamento = f"{data_formatada}-{contador:04d}"
+    # Formatar valores monetários
+    subtotal_formatado = f"R$ {orcamento['subtotal']:.2f}".replace('.', ',')
+    valor_sesi_formatado = f"R$ {orcamento['valor_sesi']:.2f}".replace('.', ',')
+    total_formatado = f"R$ {orcamento['total']:.2f}".replace('.', ',')
     
-    return numero_orcamento
+    return render_template(
+        'resumo.html',
+        servicos=servicos,
+        email=orcamento['email'],
+        telefone=orcamento['telefone'],
+        empresa_cliente=orcamento['empresa_cliente'],
+        subtotal=subtotal_formatado,
+        valor_sesi=valor_sesi_formatado,
+        total=total_formatado,
+        percentual_sesi=orcamento['percentual_sesi'],
+        numero_orcamento=orcamento['numero_orcamento']
+    )
 
 @app.route('/resumo')
 @app.route('/resumo_view')
 def resumo_view():
     try:
-        # Verificar se há dados na sessão
-        if 'servicos' not in session or not session['servicos']:
-            app.logger.error("Dados de serviços não encontrados na sessão")
+        # Verificar se há um orçamento em andamento na sessão
+        orcamento = obter_orcamento_sessao()
+        if not orcamento or not orcamento['servicos']:
+            app.logger.error("Orçamento não encontrado na sessão")
             flash("Não há dados de orçamento disponíveis. Por favor, preencha o formulário novamente.")
             return redirect(url_for('formulario'))
         
-        # Obter dados da sessão
-        servicos = session.get('servicos', [])
-        email = session.get('cliente_email', '')  # Consistentemente usando 'cliente_email'
-        telefone = session.get('telefone', '')
-        empresa_cliente = session.get('empresa_cliente', '')
-        subtotal_orcamento = session.get('subtotal_orcamento', 0)
-        valor_sesi = session.get('valor_sesi', 0)
-        total_orcamento = session.get('total_orcamento', 0)
-        percentual_sesi = session.get('percentual_sesi', 30)
-        
-        app.logger.info(f"Exibindo resumo para {empresa_cliente} com {len(servicos)} serviços")
+        return renderizar_resumo(orcamento)
+    except Exception as e:
+        app.logger.error(f"Erro ao exibir resumo: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        flash(f"Erro ao exibir resumo: {str(e)}")
+        return redirect(url_for('formulario'))
+
+@app.route('/orcamento/<numero>')
+def orcamento_por_numero(numero):
+    """
+    Exibe um orçamento gravado a partir do seu número.
+    
+    Os números são sequenciais e fáceis de adivinhar, por isso a rota exige o ADMIN_TOKEN.
+    """
+    if not app.config.get('ADMIN_TOKEN'):
+        abort(404)
+    if not token_admin_valido():
+        app.logger.warning(f"Tentativa de consulta do orçamento {numero} sem token válido ({request.remote_addr})")
+        return jsonify({'erro': 'Não autorizado'}), 401
+    
+    try:
+        orcamento = repositorio_orcamentos.obter_por_numero(numero)
+        if not orcamento:
+            app.logger.warning(f"Orçamento {numero} não encontrado")
+            flash(f"Orçamento {numero} não encontrado.")
+            return redirect(url_for('formulario'))
         
-        # Formatar valores monetários
-        subtotal_formatado = f"R$ {subtotal_orcamento:.2f}".replace('.', ',')
-        valor_sesi_formatado = f"R$ {valor_sesi:.2f}".replace('.', ',')
-        total_formatado = f"R$ {total_orcamento:.2f}".replace('.', ',')
+        # Tornar este o orçamento em andamento, para que possa ser gerado novamente
+        guardar_orcamento_sessao(orcamento['id'], repositorio_orcamentos.token(orcamento['id']))
+        return renderizar_resumo(orcamento)
+    except Exception as e:
+        app.logger.error(f"Erro ao carregar orçamento {numero}: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        flash(f"Erro ao carregar orçamento: {str(e)}")
+        return redirect(url_for('formulario'))
+
+@app.route('/orcamento/<numero>/pdf')
+def orcamento_pdf(numero):
+    """
+    Gera novamente o PDF de um orçamento gravado, sem enviar e-mail.
+    
+    Assim como a consulta pelo número, exige o ADMIN_TOKEN.
+    """
+    if not app.config.get('ADMIN_TOKEN'):
+        abort(404)
+    if not token_admin_valido():
+        app.logger.warning(f"Tentativa de download do PDF do orçamento {numero} sem token válido ({request.remote_addr})")
+        return jsonify({'erro': 'Não autorizado'}), 401
+    
+    try:
+        orcamento = repositorio_orcamentos.obter_por_numero(numero)
+        if not orcamento:
+            app.logger.warning(f"Orçamento {numero} não encontrado")
+            flash(f"Orçamento {numero} não encontrado.")
+            return redirect(url_for('formulario'))
         
-        # Gerar número do orçamento
-        numero_orcamento = gerar_numero_orcamento()
+        conteudo, filename, chave = obter_pdf_orcamento(orcamento)
+        if conteudo is None:
+            flash("Erro ao gerar o PDF do orçamento. Por favor, tente novamente.")
+            return redirect(url_for('formulario'))
         
-        # Armazenar número do orçamento na sessão
-        session['numero_orcamento'] = numero_orcamento
-        session.modified = True
-        
-        return render_template(
-            'resumo.html',
-            servicos=servicos,
-            email=email,
-            telefone=telefone,
-            empresa_cliente=empresa_cliente,
-            subtotal=subtotal_formatado,
-            valor_sesi=valor_sesi_formatado,
-            total=total_formatado,
-            percentual_sesi=percentual_sesi,
-            numero_orcamento=numero_orcamento
-        )
+        return resposta_pdf(conteudo, chave, filename)
     except Exception as e:
-        app.logger.error(f"Erro ao exibir resumo: {str(e)}")
+        app.logger.error(f"Erro ao gerar PDF do orçamento {numero}: {str(e)}")
         import traceback
         traceback.print_exc()
-        flash(f"Erro ao exibir resumo: {str(e)}")
+        flash(f"Erro ao gerar PDF do orçamento: {str(e)}")
         return redirect(url_for('formulario'))
 
 def gerar_pdf_orcamento(dados):
     """
-    Gera um PDF com os dados do orçamento.
+    Gera um PDF com os dados do orçamento, reaproveitando o cache quando um orçamento
+    idêntico já foi gerado com o mesmo layout e a mesma versão do catálogo.
+    
+    Args:
+        dados: Dicionário com os dados do orçamento
+        
+    Returns:
+        Tupla com (BytesIO contendo o PDF, nome do arquivo)
+    """
+    from io import BytesIO
+    
+    conteudo, filename, _ = obter_pdf_orcamento(dados)
+    if conteudo is None:
+        return None, None
+    # BytesIO criado a partir de bytes compartilha o conteúdo (não há cópia até uma escrita)
+    return BytesIO(conteudo), filename
+
+def obter_pdf_orcamento(dados, guardar=True):
+    """
+    Obtém os bytes do PDF de um orçamento, do cache ou gerando-o (uma única geração
+    por conteúdo, mesmo com pedidos simultâneos).
+    
+    Args:
+        dados: Dicionário com os dados do orçamento
+        guardar: Guardar no cache o PDF gerado (a exportação em massa não guarda, para
+            não expulsar do cache os PDFs em uso)
+        
+    Returns:
+        Tupla com (bytes do PDF ou None em caso de erro, nome do arquivo, chave no cache)
+    """
+    filename = f"orcamento_{dados['numero_orcamento']}.pdf"
+    chave = chave_pdf_orcamento(dados)
+    
+    conteudo = cache_pdf.obter(chave)
+    if conteudo is not None:
+        app.logger.info(f"PDF do orçamento {dados['numero_orcamento']} obtido do cache")
+        return conteudo, filename, chave
+    
+    if geracoes_pdf.em_andamento(chave):
+        app.logger.info(f"Aguardando a geração do PDF do orçamento {dados['numero_orcamento']} já em andamento")
+    
+    def renderizar():
+        # Outra thread pode ter concluído a geração entre a consulta ao cache e este ponto
+        conteudo = cache_pdf.obter(chave)
+        if conteudo is not None:
+            return conteudo
+        buffer, _ = renderizar_pdf_orcamento(dados)
+        if not buffer:
+            return None
+        conteudo = buffer.getvalue()
+        if guardar:
+            cache_pdf.guardar(chave, conteudo)
+        return conteudo
+    
+    return geracoes_pdf.executar(chave, renderizar), filename, chave
+
+def resposta_pdf(conteudo, chave, download_name):
+    """
+    Envia um PDF em blocos a partir dos bytes em cache, sem copiá-los, com
+    Content-Length, ETag (a chave do conteúdo) e suporte a requisições com Range.
+    
+    Args:
+        conteudo: Bytes do PDF
+        chave: Chave do PDF no cache
+        download_name: Nome do arquivo para download
+    """
+    response = send_file(
+        LeitorBytes(conteudo),
+        as_attachment=True,
+        download_name=download_name,
+        mimetype='application/pdf',
+        conditional=False,
+        etag=False
+    )
+    response.content_length = len(conteudo)
+    response.set_etag(chave[:32])
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response.make_conditional(request, accept_ranges=True, complete_length=len(conteudo))
+
+def chave_pdf_orcamento(dados):
+    """Chave do PDF no cache: conteúdo do orçamento (inclui o número), layout e versão do catálogo"""
+    return chave_conteudo(dados, VERSAO_LAYOUT_PDF, app.config['PDF_LAYOUT'], catalogo.obter().versao)
+
+def pre_gerar_pdf_orcamento(dados):
+    """
+    Inicia em segundo plano a geração do PDF de um orçamento (se ainda não estiver em
+    cache nem em andamento), para que gerar_orcamento encontre o PDF pronto.
+    """
+    if pre_renderizador_pdf is None:
+        return
+    chave = chave_pdf_orcamento(dados)
+    if cache_pdf.contem(chave) or geracoes_pdf.em_andamento(chave):
+        return
+    
+    def gerar():
+        try:
+            gerar_pdf_orcamento(dados)
+        except Exception as e:
+            app.logger.error(f"Erro na geração antecipada do PDF do orçamento {dados['numero_orcamento']}: {str(e)}")
+    
+    pre_renderizador_pdf.submit(gerar)
+    app.logger.info(f"Geração antecipada do PDF do orçamento {dados['numero_orcamento']} iniciada")
+
+def renderizar_pdf_orcamento(dados):
+    """
+    Renderiza o PDF com os dados do orçamento pelo executor de PDFs (em um processo
+    separado, no modo 'processo').
     
     Args:
         dados: Dicionário com os dados do orçamento
@@ -636,221 +777,13 @@ def gerar_pdf_orcamento(dados):
         Tupla com (BytesIO contendo o PDF, nome do arquivo)
     """
     try:
-        from reportlab.lib.pagesizes import letter
-        from reportlab.lib import colors
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image, HRFlowable
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.units import inch
-        import os
         from io import BytesIO
         
-        # Criar um buffer de memória para o PDF
-        buffer = BytesIO()
-        
         # Nome do arquivo para download
         filename = f"orcamento_{dados['numero_orcamento']}.pdf"
         
-        # Criar documento no buffer de memória
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        elements = []
-        
-        # Estilos
-        styles = getSampleStyleSheet()
-        # Em vez de adicionar um novo estilo 'Normal', vamos criar estilos com nomes diferentes
-        styles.add(ParagraphStyle(name='Titulo', fontSize=16, alignment=1, spaceAfter=12))
-        styles.add(ParagraphStyle(name='Subtitulo', fontSize=14, alignment=0, spaceAfter=10))
-        styles.add(ParagraphStyle(name='TextoNormal', fontSize=12, alignment=0, spaceAfter=8))
-        styles.add(ParagraphStyle(name='Destaque', fontSize=12, alignment=0, spaceAfter=8, textColor=colors.blue))
-        styles.add(ParagraphStyle(name='DetalheServico', fontSize=11, alignment=0, spaceAfter=8, leftIndent=20))
-        styles.add(ParagraphStyle(name='AssinaturaLinha', fontSize=12, alignment=1, spaceAfter=0))
-        
-        # Título
-        elements.append(Paragraph(f"ORÇAMENTO Nº {dados['numero_orcamento']}", styles['Titulo']))
-        elements.append(Paragraph(f"Data: {dados['data']}", styles['TextoNormal']))
-        elements.append(Spacer(1, 0.2*inch))
-        
-        # Dados do cliente
-        elements.append(Paragraph("DADOS DO CLIENTE", styles['Subtitulo']))
-        elements.append(Paragraph(f"<b>Empresa:</b> {dados['empresa_cliente']}", styles['TextoNormal']))
-        
-        # Garantir que o e-mail seja exibido mesmo se estiver vazio
-        email_cliente = dados['email'] if dados['email'] else "Não informado"
-        elements.append(Paragraph(f"<b>E-mail:</b> {email_cliente}", styles['TextoNormal']))
-        
-        # Garantir que o telefone seja exibido mesmo se estiver vazio
-        telefone_cliente = dados['telefone'] if dados['telefone'] else "Não informado"
-        elements.append(Paragraph(f"<b>Telefone:</b> {telefone_cliente}", styles['TextoNormal']))
-        
-        elements.append(Spacer(1, 0.2*inch))
-        
-        # Serviços
-        elements.append(Paragraph("SERVIÇOS", styles['Subtitulo']))
-        
-        for i, servico in enumerate(dados['servicos']):
-            elements.append(Paragraph(f"<b>Serviço {i+1}:</b> {servico['nome']}", styles['Destaque']))
-            
-            # Melhorar a formatação dos detalhes do serviço
-            if servico.get('detalhes'):
-                # Dividir os detalhes em linhas para melhor formatação
-                detalhes_texto = servico['detalhes']
-                
-                # Formatar o texto dos detalhes para adicionar espaço entre "1" e "2" e complementar "Até 19" com "trabalhadores"
-                detalhes_texto = detalhes_texto.replace("1e2", "1 e 2")
-                detalhes_texto = detalhes_texto.replace("Até 19", "Até 19 trabalhadores")
-                
-                # Verificar se há custos adicionais nos detalhes
-                if "Custos adicionais" in detalhes_texto:
-                    # Separar os custos adicionais para formatação especial
-                    partes = detalhes_texto.split("Custos adicionais:")
-                    detalhes_principais = partes[0].strip()
-                    custos_adicionais = partes[1].strip() if len(partes) > 1 else ""
-                    
-                    # Formatar os detalhes principais
-                    elements.append(Paragraph(f"<b>Detalhes:</b>", styles['TextoNormal']))
-                    for linha in detalhes_principais.split('. '):
-                        if linha.strip():
-                            elements.append(Paragraph(f"• {linha.strip()}", styles['DetalheServico']))
-                    
-                    # Formatar os custos adicionais
-                    if custos_adicionais:
-                        elements.append(Paragraph(f"<b>Custos adicionais:</b>", styles['TextoNormal']))
-                        for linha in custos_adicionais.split(','):
-                            if linha.strip():
-                                elements.append(Paragraph(f"• {linha.strip()}", styles['DetalheServico']))
-                else:
-                    # Se não houver custos adicionais, formatar normalmente
-                    elements.append(Paragraph(f"<b>Detalhes:</b>", styles['TextoNormal']))
-                    for linha in detalhes_texto.split('. '):
-                        if linha.strip():
-                            elements.append(Paragraph(f"• {linha.strip()}", styles['DetalheServico']))
-            
-            # Adicionar informações de dias de coleta, se houver
-            if servico.get('multiplas_coletas') == 'sim' and servico.get('dias_coleta'):
-                elements.append(Paragraph(f"<b>Informações de Coleta ({servico.get('quantidade_dias', 1)} dias):</b>", styles['TextoNormal']))
-                
-                # Criar tabela para os dias de coleta
-                coleta_data = [['Dia', 'Data', 'Hora', 'Local', 'Observações']]
-                
-                for idx, dia in enumerate(servico['dias_coleta']):
-                    coleta_data.append([
-                        str(idx + 1),
-                        dia.get('data', ''),
-                        dia.get('hora', ''),
-                        dia.get('local', ''),
-                        dia.get('observacoes', '')
-                    ])
-                
-                # Criar e estilizar a tabela
-                coleta_table = Table(coleta_data, colWidths=[0.5*inch, 1.0*inch, 0.8*inch, 2.0*inch, 1.5*inch])
-                coleta_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (4, 0), colors.lightblue),
-                    ('TEXTCOLOR', (0, 0), (4, 0), colors.black),
-                    ('ALIGN', (0, 0), (4, 0), 'CENTER'),
-                    ('FONTNAME', (0, 0), (4, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (4, 0), 10),
-                    ('BOTTOMPADDING', (0, 0), (4, 0), 8),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-                    ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-                    ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
-                    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                    ('FONTSIZE', (0, 1), (-1, -1), 8),
-                    ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                ]))
-                
-                elements.append(coleta_table)
-                elements.append(Spacer(1, 0.2*inch))
-            
-            # Tabela com informações do serviço
-            data = [
-                ["Quantidade", "Unidade", "Preço Unitário", "Preço Total"],
-                [
-                    str(servico['quantidade']), 
-                    servico['unidade'], 
-                    servico['preco_unitario_formatado'], 
-                    servico['preco_total_formatado']
-                ]
-            ]
-            
-            t = Table(data, colWidths=[1.2*inch, 1.2*inch, 1.5*inch, 1.5*inch])
-            t.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (3, 0), colors.lightgrey),
-                ('TEXTCOLOR', (0, 0), (3, 0), colors.black),
-                ('ALIGN', (0, 0), (3, 0), 'CENTER'),
-                ('FONTNAME', (0, 0), (3, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (3, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (3, 0), 12),
-                ('BACKGROUND', (0, 1), (3, 1), colors.white),
-                ('TEXTCOLOR', (0, 1), (3, 1), colors.black),
-                ('ALIGN', (0, 1), (3, 1), 'CENTER'),
-                ('FONTNAME', (0, 1), (3, 1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (3, 1), 10),
-                ('GRID', (0, 0), (3, 1), 1, colors.black)
-            ]))
-            
-            elements.append(t)
-            elements.append(Spacer(1, 0.1*inch))
-        
-        elements.append(Spacer(1, 0.2*inch))
-        
-        # Resumo financeiro
-        elements.append(Paragraph("RESUMO FINANCEIRO", styles['Subtitulo']))
-        
-        # Tabela com resumo financeiro
-        subtotal_formatado = f"R$ {dados['subtotal']:.2f}".replace('.', ',')
-        valor_sesi_formatado = f"R$ {dados['valor_sesi']:.2f}".replace('.', ',')
-        total_formatado = f"R$ {dados['total']:.2f}".replace('.', ',')
-        
-        data = [
-            ["Descrição", "Valor"],
-            ["Subtotal", subtotal_formatado],
-            [f"Percentual Indireto SESI ({dados['percentual_sesi']}%)", valor_sesi_formatado],
-            ["TOTAL", total_formatado]
-        ]
-        
-        t = Table(data, colWidths=[4*inch, 1.5*inch])
-        t.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (1, 0), colors.lightgrey),
-            ('TEXTCOLOR', (0, 0), (1, 0), colors.black),
-            ('ALIGN', (0, 0), (1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (1, 0), 12),
-            ('BACKGROUND', (0, 1), (1, 2), colors.white),
-            ('TEXTCOLOR', (0, 1), (1, 2), colors.black),
-            ('ALIGN', (0, 1), (0, 3), 'LEFT'),
-            ('ALIGN', (1, 1), (1, 3), 'RIGHT'),
-            ('FONTNAME', (0, 1), (1, 2), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (1, 2), 10),
-            ('BACKGROUND', (0, 3), (1, 3), colors.lightblue),
-            ('TEXTCOLOR', (0, 3), (1, 3), colors.black),
-            ('FONTNAME', (0, 3), (1, 3), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 3), (1, 3), 12),
-            ('GRID', (0, 0), (1, 3), 1, colors.black)
-        ]))
-        
-        elements.append(t)
-        
-        # Observações
-        elements.append(Spacer(1, 0.3*inch))
-        elements.append(Paragraph("OBSERVAÇÕES", styles['Subtitulo']))
-        elements.append(Paragraph("1. Este orçamento tem validade de 30 dias.", styles['TextoNormal']))
-        elements.append(Paragraph("2. O pagamento deve ser realizado conforme condições acordadas.", styles['TextoNormal']))
-        elements.append(Paragraph("3. Os serviços serão agendados após a confirmação do orçamento.", styles['TextoNormal']))
-        
-        # Adicionar espaço antes da linha de assinatura
-        elements.append(Spacer(1, 1*inch))
-        
-        # Adicionar linha para assinatura
-        elements.append(HRFlowable(width="60%", thickness=1, lineCap='round', color=colors.black, spaceBefore=0, spaceAfter=1, hAlign='CENTER'))
-        elements.append(Paragraph("Responsável Técnico", styles['AssinaturaLinha']))
-        
-        # Construir o documento
-        doc.build(elements)
-        
-        # Retornar ao início do buffer
-        buffer.seek(0)
-        
-        app.logger.info(f"PDF gerado com sucesso em memória para orçamento {dados['numero_orcamento']}")
+        with etapa('pdf'):
+            buffer = BytesIO(executor_pdf.renderizar(dados, app.config['PDF_LAYOUT']))
         return buffer, filename
         
     except Exception as e:
@@ -864,46 +797,34 @@ def gerar_orcamento():
     try:
         app.logger.info("Iniciando função gerar_orcamento")
         
-        # Verificar se há dados na sessão
-        if 'servicos' not in session or not session['servicos']:
-            app.logger.error("Dados de serviços não encontrados na sessão")
+        # Verificar se há um orçamento em andamento na sessão
+        orcamento = obter_orcamento_sessao()
+        if not orcamento or not orcamento['servicos']:
+            app.logger.error("Orçamento não encontrado na sessão")
             flash("Não há dados de orçamento disponíveis. Por favor, preencha o formulário novamente.")
             return redirect(url_for('formulario'))
         
-        # Obter dados da sessão
-        servicos = session.get('servicos', [])
-        email = session.get('cliente_email', '')  # Mantido como 'cliente_email' consistentemente
-        telefone = session.get('telefone', '')
-        empresa_cliente = session.get('empresa_cliente', '')
-        subtotal_orcamento = session.get('subtotal_orcamento', 0)
-        valor_sesi = session.get('valor_sesi', 0)
-        total_orcamento = session.get('total_orcamento', 0)
-        percentual_sesi = session.get('percentual_sesi', 30)
-        numero_orcamento = session.get('numero_orcamento', gerar_numero_orcamento())
+        # Obter dados do orçamento gravado
+        servicos = orcamento['servicos']
+        email = orcamento['email']
+        telefone = orcamento['telefone']
+        empresa_cliente = orcamento['empresa_cliente']
+        subtotal_orcamento = orcamento['subtotal']
+        valor_sesi = orcamento['valor_sesi']
+        total_orcamento = orcamento['total']
+        percentual_sesi = orcamento['percentual_sesi']
+        numero_orcamento = orcamento['numero_orcamento']
         
         app.logger.info(f"Gerando orçamento {numero_orcamento} para {empresa_cliente}")
         app.logger.info(f"Email: {email}, Telefone: {telefone}")
         app.logger.info(f"Serviços: {len(servicos)}, Total: {total_orcamento}")
         
-        # Criar dados para o PDF
-        dados_orcamento = {
-            'numero_orcamento': numero_orcamento,
-            'data': datetime.now().strftime("%d/%m/%Y"),
-            'empresa_cliente': empresa_cliente,
-            'email': email,
-            'telefone': telefone,
-            'servicos': servicos,
-            'subtotal': subtotal_orcamento,
-            'percentual_sesi': percentual_sesi,
-            'valor_sesi': valor_sesi,
-            'total': total_orcamento
-        }
-        
-        app.logger.info("Chamando função gerar_pdf_orcamento")
-        # Gerar o PDF em memória
-        pdf_buffer, filename = gerar_pdf_orcamento(dados_orcamento)
+        app.logger.info("Chamando função obter_pdf_orcamento")
+        # Obter o PDF (normalmente já gerado durante a exibição do resumo); os mesmos bytes
+        # são usados no download e no anexo do e-mail, sem cópias
+        pdf_conteudo, filename, chave_pdf = obter_pdf_orcamento(orcamento)
         
-        if not pdf_buffer:
+        if pdf_conteudo is None:
             app.logger.error(f"Falha ao gerar PDF do orçamento {numero_orcamento}")
             flash("Erro ao gerar o PDF do orçamento. Por favor, tente novamente.")
             return redirect(url_for('resumo_view'))
@@ -913,105 +834,64 @@ def gerar_orcamento():
         # Verificar se estamos em ambiente de produção (Vercel)
         is_vercel = os.environ.get('VERCEL', False)
         
-        # Enviar e-mail com o orçamento, se o e-mail estiver disponível
+        # Limpar a situação de envios anteriores
+        session.pop('email_enviado', None)
+        session.pop('erro_email', None)
+        session.pop('email_envio_id', None)
+        envio_apos_resposta = None
+        
+        # Enfileirar o e-mail com o orçamento, se o e-mail estiver disponível
         if email:
             try:
-                # Usar a função enviar_email_orcamento_pdf com todos os dados do orçamento
-                app.logger.info(f"Enviando e-mail para {email}")
-                
                 # Verificar se as credenciais de e-mail estão configuradas
-                email_remetente = os.environ.get('EMAIL_REMETENTE')
-                email_senha = os.environ.get('EMAIL_SENHA')
-                
-                if not email_remetente or not email_senha:
+                if not credenciais_configuradas():
                     app.logger.error("Credenciais de e-mail não configuradas")
                     session['email_enviado'] = False
                     session['erro_email'] = "Credenciais de e-mail não configuradas"
                 else:
-                    # Modificar a função enviar_email_orcamento_pdf para aceitar BytesIO em vez de caminho de arquivo
-                    try:
-                        from services.email_sender import enviar_email_orcamento_pdf_buffer
-                        
-                        # Tentar usar a nova função se existir
-                        sucesso, mensagem = enviar_email_orcamento_pdf_buffer(
-                            email, 
-                            pdf_buffer, 
-                            filename,
-                            numero_orcamento, 
-                            empresa_cliente,
-                            servicos=servicos,
-                            subtotal=subtotal_orcamento,
-                            valor_sesi=valor_sesi,
-                            total=total_orcamento,
-                            percentual_sesi=percentual_sesi
-                        )
-                    except (ImportError, AttributeError):
-                        # Fallback: salvar temporariamente o arquivo
-                        import tempfile
-                        
-                        # Criar diretório temporário se não existir
-                        temp_dir = os.path.join(tempfile.gettempdir(), 'orcamentos_pdf')
-                        os.makedirs(temp_dir, exist_ok=True)
-                        
-                        # Salvar o PDF temporariamente
-                        temp_pdf_path = os.path.join(temp_dir, filename)
-                        with open(temp_pdf_path, 'wb') as f:
-                            f.write(pdf_buffer.getvalue())
-                        
-                        # Usar a função existente com o caminho do arquivo
-                        from services.email_sender import enviar_email_orcamento_pdf
-                        sucesso, mensagem = enviar_email_orcamento_pdf(
-                            email, 
-                            temp_pdf_path, 
-                            numero_orcamento, 
-                            empresa_cliente,
-                            servicos=servicos,
-                            subtotal=subtotal_orcamento,
-                            valor_sesi=valor_sesi,
-                            total=total_orcamento,
-                            percentual_sesi=percentual_sesi
-                        )
-                        
-                        # Remover o arquivo temporário após o envio
-                        try:
-                            os.remove(temp_pdf_path)
-                        except:
-                            pass
-                    
-                    if sucesso:
-                        app.logger.info(f"E-mail enviado para {email} com o orçamento {numero_orcamento}")
-                        # Salvar na sessão que o e-mail foi enviado com sucesso
-                        session['email_enviado'] = True
+                    # O envio (SMTP) é feito em segundo plano; a página de confirmação consulta a situação
+                    envio_id = caixa_saida.enfileirar(
+                        email,
+                        pdf_conteudo,
+                        filename,
+                        orcamento_id=orcamento['id'],
+                        numero_orcamento=numero_orcamento,
+                        empresa_cliente=empresa_cliente,
+                        servicos=servicos,
+                        subtotal=subtotal_orcamento,
+                        valor_sesi=valor_sesi,
+                        total=total_orcamento,
+                        percentual_sesi=percentual_sesi
+                    )
+                    session['email_envio_id'] = envio_id
+                    if app.config['OUTBOX_MODO'] == 'thread':
+                        trabalhador_caixa_saida.notificar()
                     else:
-                        app.logger.error(f"Erro ao enviar e-mail: {mensagem}")
-                        session['email_enviado'] = False
-                        session['erro_email'] = mensagem
+                        envio_apos_resposta = envio_id
+                    app.logger.info(f"E-mail para {email} com o orçamento {numero_orcamento} enfileirado ({envio_id})")
             except Exception as e:
-                app.logger.error(f"Erro ao enviar e-mail: {str(e)}")
+                app.logger.error(f"Erro ao enfileirar e-mail: {str(e)}")
                 session['email_enviado'] = False
                 session['erro_email'] = str(e)
         
         # Salvar na sessão que o orçamento foi gerado com sucesso
         session['orcamento_gerado'] = True
-        session['numero_orcamento'] = numero_orcamento
-        
-        # Retornar o PDF para download a partir do buffer de memória
-        pdf_buffer.seek(0)  # Garantir que estamos no início do buffer
         
-        # Configurar o cabeçalho para redirecionar após o download
-        response = send_file(
-            pdf_buffer,
-            as_attachment=True,
-            download_name=f"Orcamento_{numero_orcamento}_{empresa_cliente.replace(' ', '_')}.pdf",
-            mimetype='application/pdf'
-        )
-        
-        # Adicionar um script JavaScript para redirecionar após o download
-        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        # Enviar o PDF para download em blocos, a partir dos bytes em cache
+        response = resposta_pdf(pdf_conteudo, chave_pdf, filename)
         
         # Definir um cookie para indicar que o download foi iniciado
         response.set_cookie('download_iniciado', 'true')
         
+        if envio_apos_resposta is not None:
+            # Sem thread de envio (modo 'requisicao'): enviar assim que o PDF for entregue,
+            # ainda nesta instância, em vez de depender da consulta de status. O send_file usa
+            # direct_passthrough, que ignora o call_on_close; o callback vai no próprio corpo
+            from werkzeug.wsgi import ClosingIterator
+            response.response = ClosingIterator(
+                response.response, lambda: enviar_mensagem_caixa_saida(envio_apos_resposta)
+            )
+        
         return response
         
     except Exception as e:
@@ -1027,43 +907,70 @@ def confirmacao():
     # Obter informações da sessão para exibir na página de confirmação, se disponíveis
     email_enviado = session.get('email_enviado', None)
     erro_email = session.get('erro_email', None)
-    numero_orcamento = session.get('numero_orcamento', '')
+    orcamento = obter_orcamento_sessao()
+    numero_orcamento = orcamento['numero_orcamento'] if orcamento else ''
+    
+    # Situação do e-mail na caixa de saída (atualizada pela página via /confirmacao/status)
+    envio = None
+    if session.get('email_envio_id'):
+        envio = caixa_saida.status(session['email_envio_id'])
     
     # Mesmo que não tenhamos informações na sessão, ainda exibimos a página de confirmação
     return render_template('confirmacao.html', 
                           email_enviado=email_enviado, 
                           erro_email=erro_email,
-                          numero_orcamento=numero_orcamento)
+                          numero_orcamento=numero_orcamento,
+                          envio=envio)
+
+@app.route('/confirmacao/status')
+def confirmacao_status():
+    """Retorna a situação do envio por e-mail do orçamento da sessão"""
+    envio_id = session.get('email_envio_id')
+    if not envio_id:
+        return jsonify({'erro': 'Nenhum envio em andamento'}), 404
+    
+    # Sem worker em segundo plano, a própria consulta tenta de novo o e-mail desta sessão
+    # (e apenas ele), caso o envio após a resposta tenha falhado e a espera já tenha passado
+    if app.config['OUTBOX_MODO'] == 'requisicao':
+        enviar_mensagem_caixa_saida(envio_id)
+    
+    envio = caixa_saida.status(envio_id)
+    if not envio:
+        return jsonify({'erro': 'Envio não encontrado'}), 404
+    
+    return jsonify({
+        'status': envio['status'],
+        'tentativas': envio['tentativas'],
+        'erro': envio['ultimo_erro'],
+        'finalizado': envio['status'] in (STATUS_ENVIADO, STATUS_FALHOU)
+    })
 
 def explorar_planilha():
     """Função para explorar os dados dos arquivos CSV (para debug)"""
     try:
-        pgr_path = os.path.join(os.path.dirname(__file__), 'Precos_PGR.csv')
-        ambientais_path = os.path.join(os.path.dirname(__file__), 'Precos_Ambientais.csv')
+        dados = catalogo.obter()
         
         resultado = {}
         
         # Explorar PGR
-        if os.path.exists(pgr_path):
-            df_pgr = pd.read_csv(pgr_path)
+        if dados.pgr is not None:
             resultado['pgr'] = {
-                'colunas': df_pgr.columns.tolist(),
-                'servicos': df_pgr['Serviço'].unique().tolist(),
-                'graus_risco': df_pgr['Grau_Risco'].unique().tolist(),
-                'faixas_trab': df_pgr['Faixa_Trab'].unique().tolist(),
-                'regioes': df_pgr['Região'].unique().tolist(),
-                'num_registros': len(df_pgr)
+                'colunas': list(dados.pgr.colunas),
+                'servicos': list(dados.valores_pgr['Serviço']),
+                'graus_risco': list(dados.valores_pgr['Grau_Risco']),
+                'faixas_trab': list(dados.valores_pgr['Faixa_Trab']),
+                'regioes': list(dados.valores_pgr['Região']),
+                'num_registros': len(dados.pgr)
             }
         
         # Explorar Ambientais
-        if os.path.exists(ambientais_path):
-            df_ambientais = pd.read_csv(ambientais_path)
+        if dados.ambientais is not None:
             resultado['ambientais'] = {
-                'colunas': df_ambientais.columns.tolist(),
-                'servicos': df_ambientais['Serviço'].unique().tolist(),
-                'tipos_avaliacao': df_ambientais['Tipo_Avaliacao'].unique().tolist(),
-                'regioes': df_ambientais['Região'].unique().tolist(),
-                'num_registros': len(df_ambientais)
+                'colunas': list(dados.ambientais.colunas),
+                'servicos': list(dados.valores_ambientais['Serviço']),
+                'tipos_avaliacao': list(dados.valores_ambientais['Tipo_Avaliacao']),
+                'regioes': list(dados.valores_ambientais['Região']),
+                'num_registros': len(dados.ambientais)
             }
         
         return resultado
@@ -1072,8 +979,6 @@ def explorar_planilha():
         app.logger.error(f"Erro ao explorar planilha: {str(e)}")
         return {'error': str(e)}
 
-explorar_planilha()
-
 @app.route('/processar_formulario', methods=['POST'])
 def processar_formulario():
     try:
@@ -1118,6 +1023,9 @@ def processar_formulario():
         servicos = []
         erros_servicos = []
         
+        # Os preços são recalculados no servidor sobre uma única fotografia do catálogo
+        dados_catalogo = catalogo.obter()
+        
         for i in servicos_form:
             try:
                 nome_servico = request.form.get(f'servicos[{i}][nome]', '')
@@ -1154,6 +1062,20 @@ def processar_formulario():
                     preco_total = 0
                     erros_servicos.append(f"Erro ao calcular preço para o serviço {nome_servico}")
                 
+                # O preço calculado no servidor prevalece sobre o enviado pelo navegador
+                parametros_preco, erro_parametros = validar_parametros_preco(
+                    nome_servico, regiao, grau_risco, num_trabalhadores, variavel,
+                    num_ges_ghe, num_avaliacoes_adicionais
+                )
+                if erro_parametros:
+                    erros_servicos.append(f"{erro_parametros} ({nome_servico})")
+                    continue
+                
+                preco_servidor, regra_preco = resolver_preco_servico(nome_servico, dados=dados_catalogo, **parametros_preco)
+                if abs(preco_servidor - preco_unitario) > 0.005:
+                    app.logger.warning(f"Preço enviado para {nome_servico} ({preco_unitario}) difere do calculado no servidor ({preco_servidor}, regra: {regra_preco})")
+                    preco_unitario = preco_servidor
+                
                 # Verificar se o preço foi calculado corretamente
                 if preco_unitario <= 0:
                     app.logger.warning(f"Preço unitário inválido para o serviço {nome_servico}: {preco_unitario}")
@@ -1295,20 +1217,29 @@ def processar_formulario():
         valor_sesi = total_orcamento * percentual_sesi
         total_com_sesi = total_orcamento + valor_sesi
         
-        # Armazenar na sessão
-        session['servicos'] = servicos
-        session['cliente_email'] = cliente_email  # Garantir que usamos sempre 'cliente_email'
-        session['telefone'] = telefone
-        session['empresa_cliente'] = empresa_cliente
-        session['subtotal_orcamento'] = total_orcamento
-        session['valor_sesi'] = valor_sesi
-        session['total_orcamento'] = total_com_sesi
-        session['percentual_sesi'] = percentual_sesi * 100  # Para exibir como porcentagem
+        # Gravar o orçamento com um novo número
+        numero_orcamento = gerar_numero_orcamento()
+        token = secrets.token_urlsafe(16)
+        orcamento_id = repositorio_orcamentos.salvar(
+            numero_orcamento,
+            empresa_cliente,
+            cliente_email,
+            telefone,
+            servicos,
+            subtotal=total_orcamento,
+            percentual_sesi=percentual_sesi * 100,  # Para exibir como porcentagem
+            valor_sesi=valor_sesi,
+            total=total_com_sesi,
+            token=token
+        )
         
-        # Forçar a sessão a ser salva
-        session.modified = True
+        # A sessão guarda o id e o token do orçamento em andamento
+        guardar_orcamento_sessao(orcamento_id, token)
+        session.pop('email_enviado', None)
+        session.pop('erro_email', None)
+        session.pop('orcamento_gerado', None)
         
-        app.logger.info(f"Formulário processado com sucesso. Total: {total_orcamento}, Total com SESI: {total_com_sesi}")
+        app.logger.info(f"Formulário processado com sucesso. Orçamento {numero_orcamento}, Total: {total_orcamento}, Total com SESI: {total_com_sesi}")
         
         return redirect(url_for('resumo_view'))
         
@@ -1334,25 +1265,22 @@ def obter_variaveis():
             # Para PGR, não temos variáveis específicas no CSV, então retornamos uma lista vazia
             return jsonify({'variaveis': []})
         
-        # Para serviços ambientais, buscar no CSV
-        df = pd.read_csv('Precos_Ambientais.csv')
+        # Para serviços ambientais, buscar no catálogo
+        dados = catalogo.obter()
+        if dados.ambientais is None:
+            raise FileNotFoundError("Arquivo Precos_Ambientais.csv não carregado")
         
-        # Filtrar pelo serviço
-        df_filtrado = df[df['Serviço'] == servico]
+        # Variáveis do serviço (coluna Tipo_Avaliacao), na ordem do CSV
+        variaveis = list(dados.tipos_ambientais.get(servico, []))
         
-        if df_filtrado.empty:
+        if not variaveis:
             app.logger.warning(f"Nenhuma variável encontrada para o serviço: {servico}")
             return jsonify({'variaveis': []})
         
-        # Obter variáveis únicas (coluna Tipo_Avaliacao)
-        variaveis = df_filtrado['Tipo_Avaliacao'].unique().tolist()
         app.logger.info(f"Variáveis encontradas para {servico}: {variaveis}")
         
         # Verificar se o serviço requer GES/GHE
-        requer_ges_ghe = False
-        if 'Adicional_GES_GHE' in df_filtrado.columns:
-            # Converter numpy.bool_ para bool Python nativo
-            requer_ges_ghe = bool((df_filtrado['Adicional_GES_GHE'] > 0).any())
+        requer_ges_ghe = servico in dados.servicos_com_adicional
         
         return jsonify({
             'variaveis': variaveis,
@@ -1365,6 +1293,63 @@ def obter_variaveis():
         traceback.print_exc()
         return jsonify({'erro': str(e)}), 500
 
+def validar_parametros_preco(servico, regiao, grau_risco=None, num_trabalhadores=None, variavel=None,
+                             num_ges_ghe='1', num_avaliacoes_adicionais='0'):
+    """
+    Valida os parâmetros de cálculo de preço de um serviço.
+    
+    Args:
+        servico: Nome do serviço
+        regiao: Região do serviço
+        grau_risco: Grau de risco (para serviços PGR)
+        num_trabalhadores: Faixa de número de trabalhadores (para serviços PGR)
+        variavel: Variável do serviço (para serviços não-PGR)
+        num_ges_ghe: Número de GES/GHE
+        num_avaliacoes_adicionais: Número de avaliações adicionais
+        
+    Returns:
+        tuple: (parâmetros convertidos para resolver_preco_servico, mensagem de erro ou None)
+    """
+    if not servico:
+        app.logger.error("Parâmetro 'servico' não fornecido")
+        return None, 'Serviço não especificado'
+    
+    if not regiao:
+        app.logger.error("Parâmetro 'regiao' não fornecido")
+        return None, 'Região não especificada'
+    
+    # Verificar se os parâmetros necessários estão presentes
+    if "PGR" in servico:
+        if not grau_risco:
+            app.logger.error(f"Parâmetro 'grau_risco' não fornecido para serviço PGR: {servico}")
+            return None, 'Grau de risco não especificado para serviço PGR'
+        
+        if not num_trabalhadores:
+            app.logger.error(f"Parâmetro 'num_trabalhadores' não fornecido para serviço PGR: {servico}")
+            return None, 'Número de trabalhadores não especificado para serviço PGR'
+    else:
+        # Para serviços não-PGR, verificar se a variável foi fornecida
+        if not variavel:
+            app.logger.error(f"Parâmetro 'variavel' não fornecido para serviço não-PGR: {servico}")
+            return None, 'Variável não especificada para serviço não-PGR'
+    
+    # Converter valores numéricos
+    try:
+        num_ges_ghe = int(num_ges_ghe) if num_ges_ghe else 1
+        num_avaliacoes_adicionais = int(num_avaliacoes_adicionais) if num_avaliacoes_adicionais else 0
+    except (TypeError, ValueError):
+        app.logger.error(f"Erro ao converter valores numéricos: num_ges_ghe={num_ges_ghe}, num_avaliacoes_adicionais={num_avaliacoes_adicionais}")
+        return None, 'Valores numéricos inválidos'
+    
+    return {
+        'regiao': regiao,
+        'variavel': variavel,
+        'grau_risco': grau_risco,
+        'num_trabalhadores': num_trabalhadores,
+        'num_ges_ghe': num_ges_ghe,
+        'num_avaliacoes_adicionais': num_avaliacoes_adicionais
+    }, None
+
 @app.route('/calcular_preco', methods=['GET', 'POST'])
 def calcular_preco():
     """Calcula o preço de um serviço com base nos parâmetros fornecidos"""
@@ -1387,41 +1372,19 @@ def calcular_preco():
             num_ges_ghe = request.form.get('num_ges_ghe', '1')
             num_avaliacoes_adicionais = request.form.get('num_avaliacoes_adicionais', '0')
         
-        if not servico:
-            app.logger.error("Parâmetro 'servico' não fornecido")
-            return jsonify({'success': False, 'erro': 'Serviço não especificado'}), 400
-        
-        if not regiao:
-            app.logger.error("Parâmetro 'regiao' não fornecido")
-            return jsonify({'success': False, 'erro': 'Região não especificada'}), 400
-        
-        # Verificar se os parâmetros necessários estão presentes
-        if "PGR" in servico:
-            if not grau_risco:
-                app.logger.error(f"Parâmetro 'grau_risco' não fornecido para serviço PGR: {servico}")
-                return jsonify({'success': False, 'erro': 'Grau de risco não especificado para serviço PGR'}), 400
-            
-            if not num_trabalhadores:
-                app.logger.error(f"Parâmetro 'num_trabalhadores' não fornecido para serviço PGR: {servico}")
-                return jsonify({'success': False, 'erro': 'Número de trabalhadores não especificado para serviço PGR'}), 400
-        else:
-            # Para serviços não-PGR, verificar se a variável foi fornecida
-            if not variavel:
-                app.logger.error(f"Parâmetro 'variavel' não fornecido para serviço não-PGR: {servico}")
-                return jsonify({'success': False, 'erro': 'Variável não especificada para serviço não-PGR'}), 400
-        
-        # Converter valores numéricos
-        try:
-            num_ges_ghe = int(num_ges_ghe) if num_ges_ghe else 1
-            num_avaliacoes_adicionais = int(num_avaliacoes_adicionais) if num_avaliacoes_adicionais else 0
-        except ValueError:
-            app.logger.error(f"Erro ao converter valores numéricos: num_ges_ghe={num_ges_ghe}, num_avaliacoes_adicionais={num_avaliacoes_adicionais}")
-            return jsonify({'success': False, 'erro': 'Valores numéricos inválidos'}), 400
+        parametros, erro = validar_parametros_preco(
+            servico, regiao, grau_risco, num_trabalhadores, variavel,
+            num_ges_ghe, num_avaliacoes_adicionais
+        )
+        if erro:
+            return jsonify({'success': False, 'erro': erro}), 400
+        num_ges_ghe = parametros['num_ges_ghe']
+        num_avaliacoes_adicionais = parametros['num_avaliacoes_adicionais']
         
         # Calcular o preço
         app.logger.info(f"Calculando preço para: Serviço={servico}, Região={regiao}, Variável={variavel}, GR={grau_risco}, NT={num_trabalhadores}, GES={num_ges_ghe}, Aval={num_avaliacoes_adicionais}")
         
-        preco = obter_preco_servico(
+        preco, regra_preco = resolver_preco_servico(
             servico, 
             regiao=regiao, 
             variavel=variavel, 
@@ -1440,16 +1403,19 @@ def calcular_preco():
                 'regiao': regiao,
                 'grau_risco': grau_risco,
                 'num_trabalhadores': num_trabalhadores,
-                'variavel': variavel
+                'variavel': variavel,
+                'regra_preco': regra_preco
             }), 404
         
-        app.logger.info(f"Preço calculado: {preco}")
+        app.logger.info(f"Preço calculado: {preco} (regra: {regra_preco})")
         
-        # Retornar o preço calculado
+        # Retornar o preço calculado e a regra que o produziu
         return jsonify({
             'success': True,
             'preco': preco,
-            'preco_formatado': f"R$ {preco:.2f}".replace('.', ',')
+            'preco_formatado': f"R$ {preco:.2f}".replace('.', ','),
+            'regra_preco': regra_preco,
+            'fallback': regra_preco != REGRA_EXATA
         })
         
     except Exception as e:
@@ -1458,6 +1424,108 @@ def calcular_preco():
         traceback.print_exc()
         return jsonify({'success': False, 'erro': f'Erro ao calcular preço: {str(e)}'}), 500
 
+# Limite de itens aceitos em uma única requisição de cálculo em lote
+MAX_ITENS_LOTE = 200
+
+@app.route('/calcular_precos', methods=['POST'])
+def calcular_precos():
+    """
+    Calcula, em uma única requisição, os preços de todas as linhas de um orçamento.
+    
+    Espera um JSON no formato {"itens": [{...}, ...]}, em que cada item aceita os mesmos
+    parâmetros de /calcular_preco, além de "id" (ecoado na resposta) e "quantidade".
+    Todas as linhas são precificadas sobre o mesmo snapshot do catálogo.
+    """
+    try:
+        payload = request.get_json(silent=True) or {}
+        itens = payload.get('itens')
+        
+        if not isinstance(itens, list):
+            app.logger.error("Parâmetro 'itens' não fornecido ou inválido")
+            return jsonify({'success': False, 'erro': 'Lista de itens não especificada'}), 400
+        
+        if len(itens) > MAX_ITENS_LOTE:
+            app.logger.error(f"Quantidade de itens acima do limite: {len(itens)}")
+            return jsonify({'success': False, 'erro': f'Máximo de {MAX_ITENS_LOTE} itens por requisição'}), 400
+        
+        # Um único snapshot do catálogo para todas as linhas
+        dados = catalogo.obter()
+        
+        resultados = []
+        subtotal = 0.0
+        total_fallback = 0
+        
+        for indice, item in enumerate(itens):
+            if not isinstance(item, dict):
+                resultados.append({'id': indice, 'success': False, 'erro': 'Item inválido'})
+                continue
+            
+            id_item = item.get('id', indice)
+            servico = item.get('servico')
+            parametros, erro = validar_parametros_preco(
+                servico,
+                item.get('regiao'),
+                item.get('grau_risco'),
+                item.get('num_trabalhadores'),
+                item.get('variavel'),
+                item.get('num_ges_ghe', '1'),
+                item.get('num_avaliacoes_adicionais', '0')
+            )
+            if erro:
+                resultados.append({'id': id_item, 'success': False, 'erro': erro})
+                continue
+            
+            try:
+                quantidade = int(item.get('quantidade') or 1)
+            except (TypeError, ValueError):
+                resultados.append({'id': id_item, 'success': False, 'erro': 'Quantidade inválida'})
+                continue
+            
+            preco, regra_preco = resolver_preco_servico(servico, dados=dados, **parametros)
+            
+            if preco <= 0:
+                resultados.append({
+                    'id': id_item,
+                    'success': False,
+                    'erro': 'Não foi possível calcular o preço para os parâmetros fornecidos',
+                    'regra_preco': regra_preco
+                })
+                continue
+            
+            fallback = regra_preco != REGRA_EXATA
+            if fallback:
+                total_fallback += 1
+            
+            preco_total = preco * quantidade
+            subtotal += preco_total
+            
+            resultados.append({
+                'id': id_item,
+                'success': True,
+                'preco': preco,
+                'preco_formatado': f"R$ {preco:.2f}".replace('.', ','),
+                'quantidade': quantidade,
+                'preco_total': preco_total,
+                'regra_preco': regra_preco,
+                'fallback': fallback
+            })
+        
+        app.logger.info(f"Preços calculados em lote: {len(resultados)} itens, subtotal {subtotal}, {total_fallback} por fallback")
+        
+        return jsonify({
+            'success': True,
+            'itens': resultados,
+            'subtotal': subtotal,
+            'subtotal_formatado': f"R$ {subtotal:.2f}".replace('.', ','),
+            'total_fallback': total_fallback
+        })
+        
+    except Exception as e:
+        app.logger.error(f"Erro ao calcular preços em lote: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'success': False, 'erro': f'Erro ao calcular preços: {str(e)}'}), 500
+
 def calcular_custos_laboratoriais(tipo_amostrador, quantidade_amostras, tipo_analise, necessita_art, metodo_envio):
     """
     Calcula os custos laboratoriais com base nos parâmetros informados.
@@ -1526,22 +1594,23 @@ def calcular_custos_laboratoriais(tipo_amostrador, quantidade_amostras, tipo_ana
 @app.route('/enviar_orcamento', methods=['POST'])
 def enviar_orcamento():
     try:
-        # Verificar se há dados na sessão
-        if 'servicos' not in session:
-            app.logger.error("Serviços não encontrados na sessão")
+        # Verificar se há um orçamento em andamento na sessão
+        orcamento = obter_orcamento_sessao()
+        if not orcamento:
+            app.logger.error("Orçamento não encontrado na sessão")
             flash("Dados de orçamento não encontrados. Por favor, preencha o formulário novamente.")
             return redirect(url_for('formulario'))
         
-        # Obter dados da sessão
-        cliente_email = session.get('cliente_email', '')  # Mantido como 'cliente_email' para consistência
+        # Obter dados do orçamento gravado
+        cliente_email = orcamento['email']
         if not cliente_email:
-            app.logger.error("E-mail do cliente não encontrado na sessão")
+            app.logger.error("E-mail do cliente não encontrado no orçamento")
             flash("E-mail do cliente não encontrado. Por favor, preencha o formulário novamente.")
             return redirect(url_for('formulario'))
             
-        empresa_cliente = session.get('empresa_cliente', '')
-        servicos = session.get('servicos', [])
-        total_orcamento = session.get('total_orcamento', 0)
+        empresa_cliente = orcamento['empresa_cliente']
+        servicos = orcamento['servicos']
+        total_orcamento = orcamento['total']
         
         app.logger.info(f"Enviando orçamento para {cliente_email}, {len(servicos)} serviços, total: {total_orcamento}")
         
@@ -1577,28 +1646,29 @@ def enviar_orcamento():
 
 def verificar_precos_csv():
     """
-    Verifica se os arquivos CSV de preços estão completos e atualiza-os se necessário.
-    Garante que todas as regiões tenham preços definidos para todos os serviços.
+    Verifica se os arquivos CSV de preços estão completos.
+    Registra um aviso para cada combinação sem preço (a região Central é a referência
+    dos fallbacks). A verificação usa os índices do catálogo, sem percorrer as linhas.
     """
     try:
         app.logger.info("Verificando arquivos CSV de preços...")
         
         # Verificar preços ambientais
         try:
-            df_ambientais = pd.read_csv('Precos_Ambientais.csv')
+            dados = catalogo.obter()
+            if dados.ambientais is None:
+                raise FileNotFoundError("Arquivo Precos_Ambientais.csv não carregado")
             
             # Obter lista de serviços e regiões únicas
-            servicos = df_ambientais['Serviço'].unique()
-            regioes = df_ambientais['Região'].unique()
-            variaveis = df_ambientais['Tipo_Avaliacao'].unique()
+            servicos = dados.valores_ambientais['Serviço']
+            regioes = dados.valores_ambientais['Região']
+            variaveis = dados.valores_ambientais['Tipo_Avaliacao']
             
             # Verificar se há preços para todas as combinações de serviço, região e variável
-            registros_faltantes = []
             for servico in servicos:
                 for variavel in variaveis:
                     # Verificar se há pelo menos um preço para a região Central
-                    filtro_central = (df_ambientais['Serviço'] == servico) & (df_ambientais['Região'] == 'Central') & (df_ambientais['Tipo_Avaliacao'] == variavel)
-                    if df_ambientais[filtro_central].empty:
+                    if dados.buscar_ambientais(servico, 'Central', variavel) is None:
                         app.logger.warning(f"Preço não encontrado para {servico}, Central, {variavel}")
                     
                     # Verificar outras regiões
@@ -1606,8 +1676,7 @@ def verificar_precos_csv():
                         if regiao == 'Central':
                             continue
                         
-                        filtro = (df_ambientais['Serviço'] == servico) & (df_ambientais['Região'] == regiao) & (df_ambientais['Tipo_Avaliacao'] == variavel)
-                        if df_ambientais[filtro].empty:
+                        if dados.buscar_ambientais(servico, regiao, variavel) is None:
                             app.logger.warning(f"Preço não encontrado para {servico}, {regiao}, {variavel}")
             
             app.logger.info("Verificação de preços ambientais concluída")
@@ -1616,26 +1685,20 @@ def verificar_precos_csv():
         
         # Verificar preços PGR
         try:
-            df_pgr = pd.read_csv('Precos_PGR.csv')
+            dados = catalogo.obter()
+            if dados.pgr is None:
+                raise FileNotFoundError("Arquivo Precos_PGR.csv não carregado")
             
-            # Obter lista de serviços, regiões e graus de risco únicos
-            servicos_pgr = df_pgr['Serviço'].unique()
-            regioes_pgr = df_pgr['Região'].unique()
-            graus_risco = df_pgr['Grau_Risco'].unique() if 'Grau_Risco' in df_pgr.columns else []
-            faixas_trab = df_pgr['Faixa_Trab'].unique() if 'Faixa_Trab' in df_pgr.columns else []
+            # Obter lista de serviços, graus de risco e faixas únicos
+            servicos_pgr = dados.valores_pgr['Serviço']
+            graus_risco = dados.valores_pgr['Grau_Risco']
+            faixas_trab = dados.valores_pgr['Faixa_Trab']
             
-            # Verificar se há preços para todas as combinações
+            # Verificar se há pelo menos um preço na região Central para todas as combinações
             for servico in servicos_pgr:
                 for grau_risco in graus_risco:
                     for faixa_trab in faixas_trab:
-                        # Verificar se há pelo menos um preço para a região Central
-                        filtro_central = (df_pgr['Serviço'] == servico) & (df_pgr['Região'] == 'Central')
-                        if 'Grau_Risco' in df_pgr.columns:
-                            filtro_central = filtro_central & (df_pgr['Grau_Risco'] == grau_risco)
-                        if 'Faixa_Trab' in df_pgr.columns:
-                            filtro_central = filtro_central & (df_pgr['Faixa_Trab'] == faixa_trab)
-                        
-                        if df_pgr[filtro_central].empty:
+                        if dados.buscar_pgr(servico, 'Central', grau_risco, faixa_trab) is None:
                             app.logger.warning(f"Preço não encontrado para PGR {servico}, Central, {grau_risco}, {faixa_trab}")
             
             app.logger.info("Verificação de preços PGR concluída")
@@ -1657,37 +1720,19 @@ def regioes_disponiveis():
             return jsonify({'erro': 'Serviço não especificado'}), 400
         
         # Carregar dados
-        dados = carregar_dados_excel()
+        dados = catalogo.obter()
         
         # Verificar se os dados foram carregados corretamente
-        if not dados or not isinstance(dados, dict):
+        if dados.pgr is None and dados.ambientais is None:
             return jsonify({'erro': 'Erro ao carregar dados'}), 500
         
-        # Obter regiões disponíveis para o serviço
-        regioes = []
-        
+        # Obter regiões disponíveis para o serviço, na ordem do CSV
         if "PGR" in servico:
-            # Para serviços PGR, verificar no DataFrame de PGR
-            df_pgr = dados.get('pgr')
-            if df_pgr is not None and isinstance(df_pgr, pd.DataFrame):
-                # Filtrar por serviço
-                filtro = df_pgr['Serviço'] == servico
-                resultado = df_pgr[filtro]
-                
-                if not resultado.empty:
-                    # Obter valores únicos da coluna Região
-                    regioes = resultado['Região'].unique().tolist()
+            # Para serviços PGR, verificar na tabela de PGR
+            regioes = list(dados.regioes_pgr.get(servico, []))
         else:
             # Para serviços ambientais
-            df_ambientais = dados.get('ambientais')
-            if df_ambientais is not None and isinstance(df_ambientais, pd.DataFrame):
-                # Filtrar por serviço
-                filtro = df_ambientais['Serviço'] == servico
-                resultado = df_ambientais[filtro]
-                
-                if not resultado.empty:
-                    # Obter valores únicos da coluna Região
-                    regioes = resultado['Região'].unique().tolist()
+            regioes = list(dados.regioes_ambientais.get(servico, []))
         
         # Ordenar regiões
         regioes.sort()
@@ -1719,31 +1764,17 @@ def variaveis_disponiveis_api():
             return jsonify({'variaveis': []})
         
         # Carregar dados
-        dados = carregar_dados_excel()
+        dados = catalogo.obter()
         
         # Verificar se os dados foram carregados corretamente
-        if not dados or not isinstance(dados, dict):
+        if dados.pgr is None and dados.ambientais is None:
             return jsonify({'erro': 'Erro ao carregar dados'}), 500
         
-        # Para serviços ambientais
-        df_ambientais = dados.get('ambientais')
-        variaveis = []
-        
-        if df_ambientais is not None and isinstance(df_ambientais, pd.DataFrame):
-            # Filtrar por serviço e região
-            filtro = (df_ambientais['Serviço'] == servico) & (df_ambientais['Região'] == regiao)
-            resultado = df_ambientais[filtro]
-            
-            if not resultado.empty:
-                # Obter valores únicos da coluna Tipo_Avaliacao
-                variaveis = resultado['Tipo_Avaliacao'].unique().tolist()
-            else:
-                # Se não encontrar para a região específica, tentar região Central como fallback
-                filtro_fallback = (df_ambientais['Serviço'] == servico) & (df_ambientais['Região'] == 'Central')
-                resultado_fallback = df_ambientais[filtro_fallback]
-                
-                if not resultado_fallback.empty:
-                    variaveis = resultado_fallback['Tipo_Avaliacao'].unique().tolist()
+        # Para serviços ambientais: tipos de avaliação da região, na ordem do CSV
+        variaveis = list(dados.variaveis_ambientais.get((servico, regiao), []))
+        if not variaveis:
+            # Se não encontrar para a região específica, tentar região Central como fallback
+            variaveis = list(dados.variaveis_ambientais.get((servico, 'Central'), []))
         
         # Ordenar variáveis
         variaveis.sort()
@@ -1769,8 +1800,447 @@ def servicos_api():
         traceback.print_exc()
         return jsonify({'erro': str(e)}), 500
 
+# Graus de risco enviados pelo formulário e seus valores na coluna Grau_Risco do CSV de PGR
+MAPEAMENTO_GRAUS_RISCO = {'1e2': '1 e 2', '3e4': '3 e 4'}
+
+# Catálogo serializado da última fotografia carregada: (fotografia, corpo JSON, ETag)
+_catalogo_serializado = (None, None, None)
+
+def serializar_catalogo(dados):
+    """
+    Serializa o catálogo para a rota /api/catalogo, reaproveitando o resultado
+    enquanto a fotografia do catálogo não mudar.
+    
+    Returns:
+        Tupla (corpo JSON em bytes, ETag calculada a partir do conteúdo)
+    """
+    global _catalogo_serializado
+    fotografia, corpo, etag = _catalogo_serializado
+    if fotografia is dados:
+        return corpo, etag
+    
+    conteudo = dados.exportar()
+    conteudo['servico_pgr'] = SERVICO_PGR_CSV
+    conteudo['faixas_formulario'] = MAPEAMENTO_FAIXAS_TRAB
+    conteudo['graus_formulario'] = MAPEAMENTO_GRAUS_RISCO
+    corpo = json.dumps(conteudo, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    etag = hashlib.sha256(corpo).hexdigest()[:32]
+    _catalogo_serializado = (dados, corpo, etag)
+    app.logger.info(f"Catálogo serializado: {len(corpo)} bytes, versão {etag}")
+    return corpo, etag
+
+@app.route('/api/catalogo', methods=['GET'])
+def catalogo_api():
+    """
+    Retorna o catálogo completo (serviços, regiões, variáveis, faixas e preços já
+    resolvidos) para que o formulário funcione sem novas consultas ao servidor.
+    
+    A resposta leva uma ETag derivada do conteúdo; requisições com If-None-Match
+    recebem 304 enquanto os arquivos de preços não forem alterados.
+    """
+    try:
+        corpo, etag = serializar_catalogo(catalogo.obter())
+        
+        response = Response(corpo, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+    except Exception as e:
+        app.logger.error(f"Erro ao obter catálogo: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'erro': str(e)}), 500
+
+@app.route('/metrics', methods=['GET'])
+def metricas_prometheus():
+    """
+    Métricas do processo no formato de texto do Prometheus: duração por rota,
+    requisições em andamento, erros e duração das etapas internas. Exige o ADMIN_TOKEN
+    (bearer_token na configuração do Prometheus); sem token configurado, a rota só fica
+    ativa com METRICS_PUBLICO.
+    """
+    if app.config.get('ADMIN_TOKEN'):
+        if not token_admin_valido():
+            return Response("Não autorizado\n", status=401, mimetype='text/plain')
+    elif not app.config.get('METRICS_PUBLICO'):
+        abort(404)
+    return Response(metricas.exportar(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+@app.route('/admin/perfis', methods=['GET'])
+def perfis_requisicoes():
+    """
+    Lista os perfis de requisição mais recentes com as funções mais custosas.
+    
+    Parâmetros: limite (perfis, padrão 10), top (funções por perfil, padrão 15) e
+    ordem ('acumulado' ou 'proprio'). Requer o ADMIN_TOKEN.
+    """
+    if not app.config.get('ADMIN_TOKEN'):
+        abort(404)
+    if not token_admin_valido():
+        return jsonify({'erro': 'Não autorizado'}), 401
+    
+    limite = request.args.get('limite', 10, type=int)
+    top = request.args.get('top', 15, type=int)
+    ordem = request.args.get('ordem', 'acumulado')
+    return jsonify({
+        'habilitado': app.config['PERFIL_HABILITADO'],
+        'modo': app.config['PERFIL_MODO'],
+        'perfis': listar_perfis(app.config['PERFIL_DIR'], limite, top, ordem)
+    })
+
+@app.route('/admin/perfis/<nome>', methods=['GET'])
+def baixar_perfil(nome):
+    """Baixa um arquivo de perfil (.prof para o pstats/snakeviz ou .txt para flamegraph)"""
+    if not app.config.get('ADMIN_TOKEN'):
+        abort(404)
+    if not token_admin_valido():
+        return jsonify({'erro': 'Não autorizado'}), 401
+    if nome not in listar_arquivos_perfil(app.config['PERFIL_DIR']):
+        abort(404)
+    return send_file(os.path.join(app.config['PERFIL_DIR'], nome), as_attachment=True, download_name=nome)
+
+@app.route('/admin/memoria', methods=['GET'])
+def memoria_requisicoes():
+    """
+    Memória do processo e, com MEMORIA_HABILITADA, o pico e a memória retida por rota,
+    os principais locais de alocação e as comparações de snapshot (vazamentos).
+    
+    Parâmetros: top (locais, padrão 20) e agrupar ('lineno', 'filename' ou
+    'traceback'). Requer o ADMIN_TOKEN.
+    """
+    if not app.config.get('ADMIN_TOKEN'):
+        abort(404)
+    if not token_admin_valido():
+        return jsonify({'erro': 'Não autorizado'}), 401
+    
+    if monitor_memoria is None:
+        return jsonify({'habilitado': False, 'processo': memoria_processo()})
+    try:
+        resumo = monitor_memoria.resumo(request.args.get('top', 20, type=int), request.args.get('agrupar', 'lineno'))
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+    return jsonify(dict(resumo, habilitado=True))
+
+def enviar_orcamentos_em_lote(itens, lote=None, renderizadores=4, conexoes=None, taxa=None, incluir_falhas=True):
+    """
+    Envia (ou reenvia) vários orçamentos gravados por e-mail, com o PDF anexo.
+    
+    Os PDFs são gerados em paralelo e as mensagens compartilham as conexões do pool
+    SMTP. Executar de novo o mesmo lote envia apenas os itens que ainda não foram
+    entregues.
+    
+    Args:
+        itens: Tuplas (numero_orcamento, email ou None para o e-mail do orçamento)
+        lote: Identificador do lote (padrão: data e hora atuais)
+        renderizadores: Quantidade de threads de geração de PDF
+        conexoes: Quantidade de conexões SMTP simultâneas (padrão: tamanho do pool)
+        taxa: Máximo de mensagens por segundo (None para ilimitado)
+        incluir_falhas: Tentar de novo os itens que falharam anteriormente
+        
+    Returns:
+        dict: Resultado do lote (enviados, falhas, tempo e situação dos itens)
+    """
+    lote = lote or datetime.now().strftime("lote-%Y%m%d-%H%M%S")
+    envio = EnvioLote(
+        registro_envio_lote,
+        repositorio_orcamentos.obter_por_numero,
+        gerar_pdf_orcamento,
+        entregar_email_orcamento,
+        renderizadores=renderizadores,
+        conexoes=conexoes or obter_pool_smtp().tamanho,
+        taxa=taxa
+    )
+    return envio.executar(lote, itens, incluir_falhas)
+
+def orcamento_benchmark(indice):
+    """Orçamento fictício usado no modo de benchmark do envio em lote"""
+    servicos = []
+    for i in range(5):
+        preco_unitario = 100.0 * (i + 1)
+        preco_total = preco_unitario * (i + 1)
+        servicos.append({
+            'nome': f"Serviço de teste {i + 1}",
+            'regiao': 'Central',
+            'variavel': None,
+            'grau_risco': None,
+            'num_trabalhadores': None,
+            'num_ges_ghe': 1,
+            'num_avaliacoes_adicionais': 0,
+            'quantidade': i + 1,
+            'unidade': 'unidade',
+            'preco_unitario': preco_unitario,
+            'preco_total': preco_total,
+            'custos_logisticos': 0,
+            'custos_laboratoriais': 0,
+            'custos_multiplos_dias': 0,
+            'detalhes': '',
+            'preco_unitario_formatado': f"R$ {preco_unitario:.2f}".replace('.', ','),
+            'preco_total_formatado': f"R$ {preco_total:.2f}".replace('.', ',')
+        })
+    subtotal = sum(servico['preco_total'] for servico in servicos)
+    return {
+        'numero_orcamento': f"BENCH-{indice:06d}",
+        'data': datetime.now().strftime("%d/%m/%Y"),
+        'empresa_cliente': f"Empresa {indice}",
+        'email': f"cliente{indice}@exemplo.com",
+        'telefone': '',
+        'servicos': servicos,
+        'subtotal': subtotal,
+        'percentual_sesi': 30.0,
+        'valor_sesi': subtotal * 0.3,
+        'total': subtotal * 1.3
+    }
+
+def benchmark_envio_lote(quantidade, renderizadores=4, conexoes=2, taxa=None):
+    """
+    Mede o envio em lote contra um servidor SMTP local que apenas conta as mensagens.
+    Usa orçamentos fictícios e um registro temporário, sem tocar nos dados reais.
+    
+    Returns:
+        dict: Resultado do lote acrescido das conexões e mensagens vistas pelo servidor
+    """
+    import tempfile
+    from services.smtp_pool import PoolSMTP
+    from services.smtp_sink import ServidorSMTPTeste
+    
+    os.environ.setdefault('EMAIL_REMETENTE', 'benchmark@localhost')
+    pool_anterior = obter_pool_smtp()
+    with tempfile.TemporaryDirectory() as diretorio, ServidorSMTPTeste() as servidor:
+        configurar_pool_smtp(PoolSMTP('127.0.0.1', servidor.porta, usar_tls=False, tamanho=conexoes))
+        try:
+            envio = EnvioLote(
+                RegistroEnvioLote(os.path.join(diretorio, 'benchmark.db')),
+                lambda numero: orcamento_benchmark(int(numero.split('-')[1])),
+                gerar_pdf_orcamento,
+                entregar_email_orcamento,
+                renderizadores=renderizadores,
+                conexoes=conexoes,
+                taxa=taxa
+            )
+            resultado = envio.executar('benchmark', [(f"BENCH-{i:06d}", None) for i in range(quantidade)])
+        finally:
+            configurar_pool_smtp(pool_anterior)
+        resultado['conexoes_smtp'] = servidor.conexoes
+        resultado['mensagens_recebidas'] = servidor.mensagens
+    return resultado
+
+@app.cli.command('enviar-lote')
+@click.option('--numeros', help="Números de orçamento separados por vírgula")
+@click.option('--csv', 'caminho_csv', type=click.Path(exists=True, dir_okay=False),
+              help="CSV com a coluna numero_orcamento e, opcionalmente, email")
+@click.option('--lote', help="Identificador do lote; repita-o para retomar um envio interrompido")
+@click.option('--renderizadores', default=4, show_default=True, help="Threads de geração de PDF")
+@click.option('--conexoes', type=int, help="Conexões SMTP simultâneas (padrão: SMTP_POOL_TAMANHO)")
+@click.option('--taxa', type=float, help="Máximo de mensagens por segundo")
+@click.option('--sem-reenviar-falhas', is_flag=True, help="Não tentar de novo os itens que já falharam")
+@click.option('--benchmark', type=int, metavar='N', help="Envia N orçamentos fictícios para um servidor SMTP local")
+def enviar_lote_comando(numeros, caminho_csv, lote, renderizadores, conexoes, taxa, sem_reenviar_falhas, benchmark):
+    """Envia vários orçamentos por e-mail (ex.: após uma revisão de preços)."""
+    if benchmark:
+        resultado = benchmark_envio_lote(benchmark, renderizadores, conexoes or 2, taxa)
+        click.echo(json.dumps(resultado, ensure_ascii=False, indent=2))
+        return
+    
+    itens = []
+    if numeros:
+        itens.extend((numero.strip(), None) for numero in numeros.split(',') if numero.strip())
+    if caminho_csv:
+        itens.extend(ler_csv_destinatarios(caminho_csv))
+    if not itens and not lote:
+        raise click.UsageError("Informe --numeros, --csv ou o --lote a retomar")
+    if not credenciais_configuradas():
+        raise click.ClickException("Credenciais de e-mail (EMAIL_REMETENTE ou EMAIL_SENHA) não estão configuradas")
+    
+    resultado = enviar_orcamentos_em_lote(itens, lote, renderizadores, conexoes, taxa, not sem_reenviar_falhas)
+    for falha in registro_envio_lote.falhas(resultado['lote']):
+        click.echo(f"Falha: {falha['numero_orcamento']} {falha['destinatario']} - {falha['ultimo_erro']}", err=True)
+    click.echo(json.dumps(resultado, ensure_ascii=False, indent=2))
+
+def periodo_exportacao(inicio=None, fim=None):
+    """
+    Converte as datas da exportação (AAAA-MM-DD ou DD/MM/AAAA) no período usado pelo
+    repositório, com a data final inclusive.
+    
+    Returns:
+        Tupla com (datetime inicial ou None, datetime final exclusive ou None)
+    
+    Raises:
+        ValueError: Se alguma data for inválida
+    """
+    def converter(valor):
+        valor = (valor or '').strip()
+        if not valor:
+            return None
+        for formato in ("%Y-%m-%d", "%d/%m/%Y"):
+            try:
+                return datetime.strptime(valor, formato)
+            except ValueError:
+                continue
+        raise ValueError(f"Data inválida: {valor} (use AAAA-MM-DD)")
+    
+    inicio, fim = converter(inicio), converter(fim)
+    if fim is not None:
+        fim += timedelta(days=1)
+    return inicio, fim
+
+def exportacao_pdfs(empresa=None, regiao=None, inicio=None, fim=None, workers=None):
+    """
+    Prepara a exportação em ZIP dos PDFs dos orçamentos gravados que atendem aos filtros.
+    Os PDFs que não estão no cache são gerados em paralelo pelo pool de renderização,
+    sem guardá-los no cache.
+    
+    Args:
+        empresa: Nome exato da empresa (opcional)
+        regiao: Região de ao menos um dos serviços (opcional)
+        inicio: datetime inicial, inclusive (opcional)
+        fim: datetime final, exclusive (opcional)
+        workers: PDFs obtidos em paralelo (padrão: PDF_WORKERS)
+        
+    Returns:
+        Tupla com (ExportacaoZIP, gerador dos blocos do ZIP)
+    """
+    def obter_pdf(orcamento):
+        conteudo, filename, _ = obter_pdf_orcamento(orcamento, guardar=False)
+        return conteudo, filename
+    
+    exportacao = ExportacaoZIP(obter_pdf, workers=workers or app.config['PDF_WORKERS'])
+    orcamentos = repositorio_orcamentos.iterar(empresa=empresa, regiao=regiao, inicio=inicio, fim=fim)
+    return exportacao, exportacao.gerar(orcamentos)
+
+def token_admin_valido():
+    """
+    Indica se a requisição traz o ADMIN_TOKEN no cabeçalho Authorization: Bearer. O token
+    não é aceito na query string, que fica nos logs de acesso e no histórico do navegador.
+    """
+    import hmac
+    
+    token_configurado = app.config.get('ADMIN_TOKEN')
+    if not token_configurado:
+        return False
+    autorizacao = request.headers.get('Authorization', '')
+    token = autorizacao[7:] if autorizacao.startswith('Bearer ') else ''
+    return hmac.compare_digest(token.encode('utf-8'), token_configurado.encode('utf-8'))
+
+@app.route('/admin/exportar_pdfs', methods=['GET'])
+def exportar_pdfs():
+    """
+    Baixa um ZIP com os PDFs dos orçamentos de um período, empresa e/ou região.
+    
+    Parâmetros: inicio e fim (AAAA-MM-DD, fim inclusive), empresa e regiao.
+    Requer o ADMIN_TOKEN no cabeçalho Authorization (Bearer).
+    """
+    if not app.config.get('ADMIN_TOKEN'):
+        abort(404)
+    if not token_admin_valido():
+        app.logger.warning(f"Tentativa de exportação de PDFs sem token válido ({request.remote_addr})")
+        return jsonify({'erro': 'Não autorizado'}), 401
+    
+    try:
+        inicio, fim = periodo_exportacao(request.args.get('inicio'), request.args.get('fim'))
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+    empresa = request.args.get('empresa') or None
+    regiao = request.args.get('regiao') or None
+    
+    app.logger.info(f"Exportação de PDFs: empresa={empresa}, regiao={regiao}, inicio={inicio}, fim={fim}")
+    _, blocos = exportacao_pdfs(empresa, regiao, inicio, fim)
+    nome = "orcamentos_{}_{}.zip".format(
+        inicio.strftime("%Y%m%d") if inicio else 'inicio',
+        (fim - timedelta(days=1)).strftime("%Y%m%d") if fim else datetime.now().strftime("%Y%m%d")
+    )
+    resposta = Response(stream_with_context(blocos), mimetype='application/zip')
+    resposta.headers['Content-Disposition'] = f'attachment; filename="{nome}"'
+    # Não deixar proxies acumularem a resposta inteira antes de repassá-la
+    resposta.headers['X-Accel-Buffering'] = 'no'
+    resposta.headers['Cache-Control'] = 'no-store'
+    return resposta
+
+@app.cli.command('exportar-pdfs')
+@click.option('--inicio', help="Data inicial (AAAA-MM-DD)")
+@click.option('--fim', help="Data final, inclusive (AAAA-MM-DD)")
+@click.option('--empresa', help="Nome exato da empresa")
+@click.option('--regiao', help="Região de ao menos um dos serviços")
+@click.option('--saida', required=True, type=click.Path(dir_okay=False, writable=True), help="Arquivo ZIP a gravar")
+@click.option('--workers', type=int, help="PDFs gerados em paralelo (padrão: PDF_WORKERS)")
+def exportar_pdfs_comando(inicio, fim, empresa, regiao, saida, workers):
+    """Exporta em um ZIP os PDFs dos orçamentos de um período (ex.: auditoria mensal)."""
+    try:
+        inicio, fim = periodo_exportacao(inicio, fim)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    
+    exportacao, blocos = exportacao_pdfs(empresa, regiao, inicio, fim, workers)
+    with open(saida, 'wb') as arquivo:
+        for bloco in blocos:
+            arquivo.write(bloco)
+    click.echo(json.dumps({
+        'arquivo': saida,
+        'pdfs': exportacao.arquivos,
+        'falhas': exportacao.falhas,
+        'bytes': exportacao.bytes_enviados
+    }, ensure_ascii=False, indent=2))
+
+@app.cli.command('compilar-catalogo')
+@click.option('--saida', type=click.Path(dir_okay=False, writable=True),
+              help="Arquivo a gravar (padrão: CATALOGO_COMPILADO ou catalogo.bin no diretório dos CSVs)")
+def compilar_catalogo_comando(saida):
+    """Valida os CSVs de preços e grava o catálogo compilado (ex.: no buildCommand do deploy)."""
+    resultado = compilar_catalogo(catalogo.pgr_path, catalogo.ambientais_path, saida or CATALOGO_COMPILADO)
+    click.echo(json.dumps(resultado, ensure_ascii=False, indent=2))
+    if resultado['erros']:
+        raise click.ClickException("Catálogo de preços inválido: nenhum arquivo foi gravado")
+
 # A chamada da função será feita apenas no bloco if __name__ == "__main__"
 
+def iniciar_processo():
+    """
+    Inicia o que pertence a cada processo que atende requisições: a renderização de
+    PDFs (o pool de processos ou, no modo 'local', o ReportLab) e, com OUTBOX_MODO
+    'thread', a thread da caixa de saída, que envia logo as mensagens deixadas
+    pendentes antes da subida. Com o gunicorn, é chamada em cada worker (post_fork em
+    gunicorn.conf.py), nunca no processo principal.
+    """
+    try:
+        executor_pdf.iniciar()
+    except Exception as e:
+        app.logger.error(f"Erro ao iniciar a renderização de PDFs: {str(e)}")
+    if app.config['OUTBOX_MODO'] == 'thread':
+        trabalhador_caixa_saida.iniciar()
+
+def aquecer_aplicacao(servicos_do_processo=True):
+    """
+    Prepara o que a importação do app deixa para o primeiro uso: carrega e verifica o
+    catálogo de preços, aquece a formatação de moeda do e-mail (babel) e inicia os
+    serviços do processo (ver iniciar_processo).
+
+    Args:
+        servicos_do_processo: Se False, iniciar_processo não é chamada (ex.: no processo
+            principal do gunicorn com --preload, que não atende requisições)
+    """
+    inicio = time.perf_counter()
+    verificar_precos_csv()
+    if servicos_do_processo:
+        iniciar_processo()
+    try:
+        from services.email_sender import formatar_moeda
+        formatar_moeda(0)
+    except Exception as e:
+        app.logger.error(f"Erro ao aquecer a aplicação: {str(e)}")
+        import traceback
+        traceback.print_exc()
+    app.logger.info(f"Aplicação aquecida em {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+def aquecer_em_segundo_plano(servicos_do_processo=True):
+    """
+    Executa aquecer_aplicacao em uma thread, sem atrasar a inicialização do servidor.
+    Uma requisição que chegue antes do fim apenas carrega o que precisar (o catálogo
+    é carregado uma única vez, sob lock).
+    """
+    import threading
+    thread = threading.Thread(target=aquecer_aplicacao, args=(servicos_do_processo,), name='aquecimento', daemon=True)
+    thread.start()
+    return thread
+
 def encontrar_porta_disponivel(porta_inicial=3000, max_tentativas=10):
     """
     Encontra uma porta disponível começando pela porta_inicial.
@@ -1802,6 +2272,7 @@ def encontrar_porta_disponivel(porta_inicial=3000, max_tentativas=10):
 # Chamar a função verificar_precos_csv após sua definição
 if __name__ == "__main__":
     verificar_precos_csv()
+    iniciar_processo()
     
     # Tentar encontrar uma porta disponível
     porta_padrao = int(os.environ.get("PORT", 3000))
@@ -1918,69 +2389,3 @@ def calcular_custos_multiplos_dias(dias_coleta):
     except Exception as e:
         app.logger.error(f"Erro ao calcular custos de múltiplos dias: {str(e)}")
         return 0.0
-
-def enviar_email_orcamento(email_destino, pdf_path, numero_orcamento, empresa_cliente):
-    """
-    Envia um e-mail com o orçamento em anexo.
-    
-    Args:
-        email_destino: E-mail do destinatário
-        pdf_path: Caminho para o arquivo PDF do orçamento
-        numero_orcamento: Número do orçamento
-        empresa_cliente: Nome da empresa cliente
-    """
-    try:
-        import smtplib
-        from email.mime.multipart import MIMEMultipart
-        from email.mime.text import MIMEText
-        from email.mime.application import MIMEApplication
-        
-        # Configurações de e-mail
-        email_remetente = app.config.get('EMAIL_REMETENTE', 'sistema@exemplo.com')
-        email_senha = app.config.get('EMAIL_SENHA', '')
-        smtp_servidor = app.config.get('SMTP_SERVIDOR', 'smtp.gmail.com')
-        smtp_porta = app.config.get('SMTP_PORTA', 587)
-        
-        # Criar mensagem
-        msg = MIMEMultipart()
-        msg['From'] = email_remetente
-        msg['To'] = email_destino
-        msg['Subject'] = f"Orçamento {numero_orcamento} - {empresa_cliente}"
-        
-        # Corpo do e-mail
-        corpo_email = f"""
-        <html>
-        <body>
-            <p>Prezado(a) cliente,</p>
-            <p>Segue em anexo o orçamento solicitado para a empresa <b>{empresa_cliente}</b>.</p>
-            <p>Número do orçamento: <b>{numero_orcamento}</b></p>
-            <p>Para confirmar o orçamento ou em caso de dúvidas, por favor responda a este e-mail ou entre em contato conosco.</p>
-            <p>Atenciosamente,<br>Equipe de Atendimento</p>
-        </body>
-        </html>
-        """
-        
-        msg.attach(MIMEText(corpo_email, 'html'))
-        
-        # Anexar PDF
-        with open(pdf_path, 'rb') as f:
-            anexo = MIMEApplication(f.read(), _subtype='pdf')
-            anexo.add_header('Content-Disposition', 'attachment', filename=f"Orcamento_{numero_orcamento}.pdf")
-            msg.attach(anexo)
-        
-        # Enviar e-mail
-        with smtplib.SMTP(smtp_servidor, smtp_porta) as servidor:
-            servidor.starttls()
-            if email_senha:  # Se tiver senha configurada
-                servidor.login(email_remetente, email_senha)
-            servidor.send_message(msg)
-        
-        app.logger.info(f"E-mail enviado com sucesso para {email_destino}")
-        return True
-        
-    except Exception as e:
-        app.logger.error(f"Erro ao enviar e-mail: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        raise
-        raise
\ No newline at end of file
@@ -0,0 +1,230 @@
+from io import BytesIO
+
+from benchmarks.medicao import Caso
+
+
+# Valores que não existem em nenhum catálogo, para forçar os caminhos de fallback
+REGIAO_INEXISTENTE = 'Região Inexistente'
+VARIAVEL_INEXISTENTE = 'Avaliação Inexistente'
+FAIXA_INEXISTENTE = 'faixa_inexistente'
+
+
+def _parametros_catalogo(m):
+    """
+    Extrai do catálogo carregado os parâmetros dos casos de preço: a primeira linha de
+    PGR cuja faixa tem código no formulário e a primeira linha de serviços ambientais.
+    """
+    dados = m.catalogo.obter()
+    codigos_faixa = {faixa: codigo for codigo, faixa in m.MAPEAMENTO_FAIXAS_TRAB.items()}
+
+    pgr = None
+    for servico, regiao, grau, faixa in zip(dados.pgr['Serviço'], dados.pgr['Região'], dados.pgr['Grau_Risco'], dados.pgr['Faixa_Trab']):
+        if servico == m.SERVICO_PGR_CSV and faixa in codigos_faixa:
+            pgr = {'servico': servico, 'regiao': regiao, 'grau_risco': grau, 'num_trabalhadores': codigos_faixa[faixa]}
+            break
+    if pgr is None:
+        raise RuntimeError(f"O catálogo não tem linhas de '{m.SERVICO_PGR_CSV}' com faixa de trabalhadores conhecida")
+
+    linha = dados.ambientais.linha(0)
+    ambiental = {'servico': linha['Serviço'], 'regiao': linha['Região'], 'variavel': linha['Tipo_Avaliacao']}
+    return pgr, ambiental
+
+
+def _servico_formulario(indice, parametros):
+    """Campos de um serviço no formulário enviado a /processar_formulario"""
+    prefixo = f'servicos[{indice}]'
+    campos = {
+        f'{prefixo}[nome]': parametros['servico'],
+        f'{prefixo}[regiao]': parametros['regiao'],
+        f'{prefixo}[quantidade]': '1',
+        f'{prefixo}[num_ges_ghe]': '1',
+        f'{prefixo}[preco_unitario]': '0',
+        f'{prefixo}[preco_total]': '0',
+        f'{prefixo}[custos_logisticos]': '0'
+    }
+    for campo in ('grau_risco', 'num_trabalhadores', 'variavel'):
+        if parametros.get(campo):
+            campos[f'{prefixo}[{campo}]'] = parametros[campo]
+    return campos
+
+
+def _orcamento(m, quantidade_servicos):
+    """Orçamento fictício com a quantidade de serviços informada"""
+    orcamento = m.orcamento_benchmark(quantidade_servicos)
+    modelos = orcamento['servicos']
+    orcamento['servicos'] = [
+        dict(modelos[i % len(modelos)], nome=f"Serviço de teste {i + 1}") for i in range(quantidade_servicos)
+    ]
+    orcamento['subtotal'] = sum(servico['preco_total'] for servico in orcamento['servicos'])
+    orcamento['valor_sesi'] = orcamento['subtotal'] * 0.3
+    orcamento['total'] = orcamento['subtotal'] * 1.3
+    return orcamento
+
+
+def _verificar_preco(preco):
+    assert preco and preco > 0, f"preço inválido: {preco}"
+
+
+def _verificar_json(resposta):
+    assert resposta.status_code == 200, f"status {resposta.status_code}: {resposta.get_data(as_text=True)[:200]}"
+
+
+def casos_preco(m):
+    """obter_preco_servico nos acertos exatos e nos caminhos de fallback"""
+    pgr, ambiental = _parametros_catalogo(m)
+    obter = m.obter_preco_servico
+    return [
+        Caso('preco/pgr_exato', lambda: obter(pgr['servico'], regiao=pgr['regiao'], grau_risco=pgr['grau_risco'],
+                                              num_trabalhadores=pgr['num_trabalhadores']),
+             repeticoes=2000, verificar=_verificar_preco),
+        Caso('preco/pgr_fallback', lambda: obter(pgr['servico'], regiao=REGIAO_INEXISTENTE, grau_risco=pgr['grau_risco'],
+                                                 num_trabalhadores=FAIXA_INEXISTENTE),
+             repeticoes=2000, verificar=_verificar_preco),
+        Caso('preco/ambiental_exato', lambda: obter(ambiental['servico'], regiao=ambiental['regiao'],
+                                                    variavel=ambiental['variavel']),
+             repeticoes=2000, verificar=_verificar_preco),
+        Caso('preco/ambiental_fallback', lambda: obter(ambiental['servico'], regiao=REGIAO_INEXISTENTE,
+                                                       variavel=VARIAVEL_INEXISTENTE, num_ges_ghe=3,
+                                                       num_avaliacoes_adicionais=2),
+             repeticoes=2000, verificar=_verificar_preco)
+    ]
+
+
+def casos_importacao(m):
+    """Partida a frio: "import app" em um processo novo, medido com -X importtime"""
+    from benchmarks.importacao import medir_importacao
+
+    def verificar(resultado):
+        assert not resultado['pesados'], f"módulos pesados importados na inicialização: {', '.join(resultado['pesados'])}"
+
+    return [
+        Caso('importacao/app', lambda: medir_importacao('app'), repeticoes=10, aquecimento=1, verificar=verificar)
+    ]
+
+
+def casos_catalogo(m):
+    """
+    Carga do catálogo (leitura dos CSVs e pré-cálculo das resoluções), compilação e carga
+    do catálogo compilado, e verificar_precos_csv
+    """
+    import os
+    from services.catalogo import CatalogoPrecos
+    from services.catalogo_compilado import compilar_catalogo
+
+    compilado = os.path.join(m.app.config['DATA_DIR'], 'catalogo.bin')
+
+    def carregar():
+        return CatalogoPrecos(m.catalogo.pgr_path, m.catalogo.ambientais_path).obter()
+
+    def compilar():
+        return compilar_catalogo(m.catalogo.pgr_path, m.catalogo.ambientais_path, compilado)
+
+    def carregar_compilado():
+        return CatalogoPrecos(m.catalogo.pgr_path, m.catalogo.ambientais_path, compilado).obter()
+
+    def preparar_compilado():
+        if not os.path.exists(compilado):
+            compilar()
+
+    def verificar(dados):
+        assert dados.pgr is not None and dados.ambientais is not None, "catálogo não carregado"
+
+    def verificar_compilacao(resultado):
+        assert resultado['arquivo'] and not resultado['erros'], f"catálogo não compilado: {resultado['erros']}"
+
+    return [
+        Caso('catalogo/carregar', carregar, repeticoes=5, aquecimento=0, verificar=verificar),
+        Caso('catalogo/compilar', compilar, repeticoes=3, aquecimento=0, verificar=verificar_compilacao),
+        Caso('catalogo/carregar_compilado', carregar_compilado, preparar=preparar_compilado,
+             repeticoes=5, aquecimento=0, verificar=verificar),
+        Caso('catalogo/verificar_precos_csv', m.verificar_precos_csv, repeticoes=3, aquecimento=0)
+    ]
+
+
+def casos_rotas(m, cliente):
+    """/calcular_preco e as rotas /api/* pelo cliente de teste do Flask"""
+    pgr, ambiental = _parametros_catalogo(m)
+    return [
+        Caso('rota/calcular_preco_pgr', lambda: cliente.get('/calcular_preco', query_string=pgr),
+             repeticoes=500, verificar=_verificar_json),
+        Caso('rota/calcular_preco_ambiental', lambda: cliente.get('/calcular_preco', query_string=ambiental),
+             repeticoes=500, verificar=_verificar_json),
+        Caso('rota/api_servicos', lambda: cliente.get('/api/servicos'),
+             repeticoes=500, verificar=_verificar_json),
+        Caso('rota/api_regioes_disponiveis', lambda: cliente.get('/api/regioes_disponiveis', query_string={'servico': pgr['servico']}),
+             repeticoes=500, verificar=_verificar_json),
+        Caso('rota/api_variaveis_disponiveis', lambda: cliente.get('/api/variaveis_disponiveis', query_string={
+                 'servico': ambiental['servico'], 'regiao': ambiental['regiao']}),
+             repeticoes=500, verificar=_verificar_json),
+        Caso('rota/api_catalogo', lambda: cliente.get('/api/catalogo'),
+             repeticoes=100, verificar=_verificar_json)
+    ]
+
+
+def casos_formulario(m, cliente, tamanhos=(1, 20, 200)):
+    """/processar_formulario com orçamentos de vários tamanhos (cada execução grava um orçamento)"""
+    pgr, ambiental = _parametros_catalogo(m)
+
+    def verificar(resposta):
+        destino = resposta.headers.get('Location', '')
+        assert resposta.status_code == 302 and destino.startswith('/resumo'), f"formulário recusado (redirecionado para '{destino}')"
+
+    casos = []
+    for tamanho in tamanhos:
+        formulario = {'empresa': 'Empresa Benchmark', 'cliente_email': 'benchmark@exemplo.com', 'telefone': ''}
+        for i in range(tamanho):
+            formulario.update(_servico_formulario(i, pgr if i % 2 == 0 else ambiental))
+        casos.append(Caso(
+            f'formulario/processar_{tamanho}_servicos',
+            lambda formulario=formulario: cliente.post('/processar_formulario', data=formulario),
+            repeticoes=max(10, 2000 // tamanho), verificar=verificar
+        ))
+    return casos
+
+
+def casos_pdf(m, tamanhos=(1, 10, 50, 200)):
+    """gerar_pdf_orcamento com o cache esvaziado antes de cada execução (renderização completa)"""
+    def verificar(retorno):
+        buffer, _ = retorno
+        assert buffer is not None and buffer.getvalue().startswith(b'%PDF'), "PDF não gerado"
+
+    casos = []
+    for tamanho in tamanhos:
+        orcamento = _orcamento(m, tamanho)
+        casos.append(Caso(
+            f'pdf/gerar_{tamanho}_servicos',
+            lambda orcamento=orcamento: m.gerar_pdf_orcamento(orcamento),
+            preparar=m.cache_pdf.limpar,
+            repeticoes=max(5, 200 // tamanho), aquecimento=2, verificar=verificar
+        ))
+    casos.append(Caso(
+        'pdf/gerar_10_servicos_cache',
+        lambda orcamento=_orcamento(m, 10): m.gerar_pdf_orcamento(orcamento),
+        repeticoes=1000, verificar=verificar
+    ))
+    return casos
+
+
+def casos_email(m, tamanho_pdf_kb=40):
+    """Montagem e envio das mensagens de orçamento para o servidor SMTP local"""
+    from services.email_sender import montar_mensagem_orcamento_pdf, enviar_email_orcamento, enviar_email_orcamento_pdf_buffer
+
+    orcamento = _orcamento(m, 10)
+    pdf = b'%PDF-1.4\n' + b'0' * (tamanho_pdf_kb * 1024)
+    metadados = {chave: orcamento[chave] for chave in ('numero_orcamento', 'empresa_cliente', 'servicos', 'subtotal', 'valor_sesi', 'total')}
+
+    def verificar_envio(retorno):
+        sucesso, mensagem = retorno
+        assert sucesso, f"envio falhou: {mensagem}"
+
+    return [
+        Caso('email/montar_mensagem_pdf',
+             lambda: montar_mensagem_orcamento_pdf(orcamento['email'], pdf, 'orcamento.pdf', sender_email='benchmark@localhost', **metadados),
+             repeticoes=500),
+        Caso('email/enviar_pdf',
+             lambda: enviar_email_orcamento_pdf_buffer(orcamento['email'], BytesIO(pdf), 'orcamento.pdf', **metadados),
+             repeticoes=300, verificar=verificar_envio),
+        Caso('email/enviar_html',
+             lambda: enviar_email_orcamento(orcamento['email'], orcamento['empresa_cliente'], orcamento['servicos'], orcamento['total']),
+             repeticoes=300, verificar=verificar_envio)
+    ]
@@ -0,0 +1,179 @@
+"""
+Benchmarks dos caminhos críticos: importação, catálogo, preços, rotas, formulário, PDF
+e e-mail.
+
+Roda sem rede: o aplicativo usa um diretório de dados temporário e os e-mails vão para
+um servidor SMTP local que apenas conta as mensagens.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.executar                              # todos os grupos
+    python -m benchmarks.executar --grupos preco rota          # apenas alguns grupos
+    python -m benchmarks.executar --salvar base.json           # grava a linha de base
+    python -m benchmarks.executar --comparar base.json         # compara e sinaliza regressões
+    python -m benchmarks.executar --memoria --comparar base.json   # só a memória (pico e retida)
+    python -m benchmarks.executar --catalogo /tmp/catalogo     # catálogo gerado por benchmarks.gerar_catalogo
+
+Os resultados são sempre gravados em benchmarks/resultados/. Com --comparar, o
+comando termina com código 1 se alguma métrica regredir além da tolerância. Com
+--memoria, cada caso é executado poucas vezes e só a memória é comparada: ao contrário
+dos tempos, ela quase não varia entre máquinas, o que permite usar o modo na CI.
+"""
+import os
+import sys
+import argparse
+import logging
+import tempfile
+from datetime import datetime
+
+from benchmarks import medicao
+
+# Grupos de casos, na ordem de execução
+GRUPOS = ('importacao', 'catalogo', 'preco', 'rota', 'formulario', 'pdf', 'email')
+
+DIRETORIO_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resultados')
+
+
+def preparar_ambiente(diretorio_dados, catalogo=None):
+    """
+    Configura o aplicativo para o benchmark antes de importá-lo: dados em um diretório
+    temporário, sem geração antecipada de PDFs, sem worker da caixa de saída e sem
+    cache de PDF em disco. O executor de PDF e o CATALOGO_DIR já definidos no ambiente
+    são respeitados.
+    """
+    os.environ['DATA_DIR'] = diretorio_dados
+    if catalogo:
+        os.environ['CATALOGO_DIR'] = os.path.abspath(catalogo)
+    os.environ.setdefault('PDF_EXECUTOR', 'local')
+    os.environ['PDF_PRE_RENDERIZAR'] = 'false'
+    os.environ['PDF_CACHE_DIR'] = ''
+    os.environ['OUTBOX_MODO'] = 'requisicao'
+    os.environ['EMAIL_REMETENTE'] = 'benchmark@localhost'
+    os.environ['SMTP_AUTENTICAR'] = 'false'
+
+
+def redirecionar_logs(diretorio_dados):
+    """
+    Mantém o custo real dos logs (formatação e escrita em arquivo), mas grava-os no
+    diretório temporário em vez do app.log do projeto.
+    """
+    raiz = logging.getLogger()
+    for handler in list(raiz.handlers):
+        raiz.removeHandler(handler)
+        handler.close()
+    raiz.addHandler(logging.FileHandler(os.path.join(diretorio_dados, 'app.log')))
+
+
+def montar_casos(m, grupos):
+    """Cria os casos dos grupos pedidos"""
+    from benchmarks import cenarios
+
+    m.app.config['WTF_CSRF_ENABLED'] = False
+    cliente = m.app.test_client()
+    casos = []
+    if 'importacao' in grupos:
+        casos += cenarios.casos_importacao(m)
+    if 'catalogo' in grupos:
+        casos += cenarios.casos_catalogo(m)
+    if 'preco' in grupos:
+        casos += cenarios.casos_preco(m)
+    if 'rota' in grupos:
+        casos += cenarios.casos_rotas(m, cliente)
+    if 'formulario' in grupos:
+        casos += cenarios.casos_formulario(m, cliente)
+    if 'pdf' in grupos:
+        casos += cenarios.casos_pdf(m)
+    if 'email' in grupos:
+        casos += cenarios.casos_email(m)
+    return casos
+
+
+def imprimir_resultados(resultado):
+    print(f"{'caso':<40} {'n':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'op/s':>10} {'pico KB':>10} {'retido KB':>10}")
+    for nome, metricas in resultado['casos'].items():
+        print(f"{nome:<40} {metricas['repeticoes']:>6} {metricas['p50_ms']:>10.3f} {metricas['p95_ms']:>10.3f} "
+              f"{metricas['p99_ms']:>10.3f} {metricas['vazao_por_segundo']:>10.1f} {metricas['pico_memoria_kb']:>10.1f} "
+              f"{metricas.get('retido_memoria_kb', 0.0):>10.1f}")
+
+
+def imprimir_comparacao(comparacoes, tolerancia):
+    regressoes = [c for c in comparacoes if c['regressao']]
+    print(f"\nComparação com a linha de base (tolerância de {tolerancia:.0%}):")
+    for c in comparacoes:
+        marcador = 'REGRESSÃO' if c['regressao'] else ('melhora' if c['variacao'] < -tolerancia else '')
+        print(f"  {c['caso']:<40} {c['metrica']:<16} {c['base']:>10} -> {c['atual']:>10} ({c['variacao']:+.1%}) {marcador}")
+    print(f"{len(regressoes)} regressão(ões) em {len(comparacoes)} métricas comparadas")
+    return regressoes
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do sistema de precificação")
+    parser.add_argument('--grupos', nargs='+', choices=GRUPOS, default=list(GRUPOS), help="Grupos de casos a executar")
+    parser.add_argument('--filtro', help="Executa apenas os casos cujo nome contém este texto")
+    parser.add_argument('--repeticoes', type=float, default=1.0,
+                        help="Multiplicador das repetições de cada caso (ex.: 0.1 para uma rodada rápida)")
+    parser.add_argument('--catalogo', help="Diretório com Precos_PGR.csv e Precos_Ambientais.csv (padrão: CATALOGO_DIR ou o do projeto)")
+    parser.add_argument('--salvar', help="Arquivo JSON onde gravar os resultados (além de benchmarks/resultados/)")
+    parser.add_argument('--comparar', help="Arquivo JSON de uma execução anterior usada como linha de base")
+    parser.add_argument('--tolerancia', type=float, default=0.15,
+                        help="Aumento relativo tolerado antes de sinalizar uma regressão (padrão: 0.15)")
+    parser.add_argument('--memoria', action='store_true',
+                        help="Mede e compara apenas a memória (pico e retida), com poucas execuções por caso")
+    args = parser.parse_args(argumentos)
+
+    with tempfile.TemporaryDirectory(prefix='benchmark-') as diretorio_dados:
+        preparar_ambiente(diretorio_dados, args.catalogo)
+        import app as m
+        from services.smtp_pool import PoolSMTP
+        from services.smtp_sink import ServidorSMTPTeste
+        from services.email_sender import configurar_pool_smtp
+
+        redirecionar_logs(diretorio_dados)
+        resultado = dict(medicao.ambiente(), grupos=args.grupos, casos={})
+        dados = m.catalogo.obter()
+        resultado['catalogo'] = {
+            'diretorio': str(m.CATALOGO_DIR),
+            'versao': dados.versao,
+            'linhas_pgr': 0 if dados.pgr is None else len(dados.pgr),
+            'linhas_ambientais': 0 if dados.ambientais is None else len(dados.ambientais)
+        }
+
+        with ServidorSMTPTeste() as servidor:
+            configurar_pool_smtp(PoolSMTP('127.0.0.1', servidor.porta, usar_tls=False))
+            try:
+                for caso in montar_casos(m, args.grupos):
+                    if args.filtro and args.filtro not in caso.nome:
+                        continue
+                    repeticoes = 3 if args.memoria else max(3, int(caso.repeticoes * args.repeticoes))
+                    print(f"Medindo {caso.nome} ({repeticoes} execuções)...", file=sys.stderr)
+                    resultado['casos'][caso.nome] = medicao.medir(caso, repeticoes)
+            finally:
+                m.executor_pdf.encerrar()
+
+        if 'importacao' in args.grupos:
+            # Módulos mais caros da importação, para localizar o que encareceu a partida
+            from benchmarks.importacao import medir_importacao
+            resultado['importacao'] = medir_importacao('app')
+
+    imprimir_resultados(resultado)
+
+    os.makedirs(DIRETORIO_RESULTADOS, exist_ok=True)
+    caminho = os.path.join(DIRETORIO_RESULTADOS, datetime.now().strftime("%Y%m%d-%H%M%S") + '.json')
+    medicao.salvar(resultado, caminho)
+    print(f"\nResultados gravados em {caminho}")
+    if args.salvar:
+        medicao.salvar(resultado, args.salvar)
+        print(f"Linha de base gravada em {args.salvar}")
+
+    if args.comparar:
+        base = medicao.carregar(args.comparar)
+        if base.get('catalogo', {}).get('versao') != resultado['catalogo']['versao']:
+            print("\nAtenção: a linha de base foi medida com outro catálogo de preços")
+        comparadas = medicao.METRICAS_MEMORIA if args.memoria else medicao.METRICAS_COMPARADAS
+        comparacoes = medicao.comparar(resultado, base, args.tolerancia, metricas=comparadas)
+        if imprimir_comparacao(comparacoes, args.tolerancia):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""
+Gera um catálogo de preços sintético, no formato de Precos_PGR.csv e
+Precos_Ambientais.csv, para testes de escala.
+
+As quantidades de serviços, regiões, graus de risco, faixas de trabalhadores e tipos
+de avaliação são configuráveis (o catálogo pode ter milhões de linhas; as linhas são
+gravadas uma a uma, sem montar o arquivo em memória). Os primeiros valores de cada
+eixo são os do catálogo real, de modo que os parâmetros do formulário continuam
+válidos; os demais são sintéticos (ex.: 'Regional 008', '801 a 850 Trab.').
+
+Lacunas controladas removem linhas ao acaso (com semente fixa) para exercitar os
+fallbacks: fora da região Central elas levam ao preço da Central; na Central levam
+aos fallbacks de outra faixa/outra região (PGR) e de outra variável (Ambientais).
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.gerar_catalogo /tmp/catalogo --regioes 60 --faixas 40 --servicos-ambientais 200
+    CATALOGO_DIR=/tmp/catalogo python -m benchmarks.executar
+    python -m benchmarks.executar --catalogo /tmp/catalogo
+"""
+import os
+import json
+import random
+import argparse
+
+
+SERVICO_PGR = 'Elaboração e acompanhamento do PGR'
+
+REGIOES_BASE = ('Central', 'Instituto', 'Norte', 'Oeste', 'Sudoeste', 'Sul', 'Extremo Sul')
+GRAUS_BASE = ('1 e 2', '3 e 4')
+FAIXAS_BASE = (
+    'Até 19 Trab.', '20 a 50 Trab.', '51 a 100 Trab.', '101 a 160 Trab.', '161 a 250 Trab.',
+    '251 a 300 Trab.', '301 a 350 Trab.', '351 a 400 Trab.', '401 a 450 Trab.', '451 a 500 Trab.',
+    '501 a 550 Trab.', '551 a 600 Trab.', '601 a 650 Trab.', '651 a 700 Trab.', '701 a 750 Trab.',
+    '751 a 800 Trab.'
+)
+SERVICOS_AMBIENTAIS_BASE = (
+    'Coleta para Avaliação Ambiental', 'Ruído Limítrofe (NBR 10151)', 'Relatório Técnico por Agente Ambiental',
+    'Revisão de Relatório Técnico (após 90 dias)', 'Laudo de Insalubridade',
+    'Revisão de Laudo de Insalubridade (após 90 dias)', 'LTCAT - Condições Ambientais de Trabalho',
+    'Revisão de LTCAT (após 90 dias)', 'Laudo de Periculosidade', 'Revisão de Laudo de Periculosidade (após 90 dias)'
+)
+TIPOS_BASE = (
+    'Pacote (1 a 4 avaliações)', 'Por Avaliação Adicional', 'Por Relatório Unitário',
+    'Instituto + Adicional por GES/GHE', 'Adicional por GES/GHE Revisado', 'Por Laudo Técnico'
+)
+
+
+def _eixo(base, quantidade, sintetico):
+    """Os `quantidade` primeiros valores da base, completados com valores sintéticos"""
+    valores = list(base[:quantidade])
+    for i in range(len(valores), quantidade):
+        valores.append(sintetico(i))
+    return valores
+
+
+def regioes(quantidade):
+    return _eixo(REGIOES_BASE, max(1, quantidade), lambda i: f"Regional {i + 1:03d}")
+
+
+def graus_risco(quantidade):
+    return _eixo(GRAUS_BASE, max(1, quantidade), lambda i: f"Grau {i + 1}")
+
+
+def faixas_trabalhadores(quantidade):
+    def sintetica(i):
+        inicio = 801 + 50 * (i - len(FAIXAS_BASE))
+        return f"{inicio} a {inicio + 49} Trab."
+    return _eixo(FAIXAS_BASE, max(1, quantidade), sintetica)
+
+
+def servicos_pgr(quantidade):
+    return _eixo((SERVICO_PGR,), max(1, quantidade), lambda i: f"PGR Sintético {i:04d}")
+
+
+def servicos_ambientais(quantidade):
+    return _eixo(SERVICOS_AMBIENTAIS_BASE, max(1, quantidade), lambda i: f"Serviço Ambiental {i + 1:05d}")
+
+
+def tipos_avaliacao(quantidade):
+    return _eixo(TIPOS_BASE, max(1, quantidade), lambda i: f"Tipo de Avaliação {i + 1:03d}")
+
+
+def gerar_catalogo(destino, servicos_pgr_qtd=1, servicos_ambientais_qtd=10, regioes_qtd=7, graus_qtd=2,
+                   faixas_qtd=16, tipos_qtd=6, lacunas=0.05, lacunas_central=0.01, semente=42):
+    """
+    Grava Precos_PGR.csv e Precos_Ambientais.csv sintéticos em `destino`.
+
+    Args:
+        destino: Diretório de saída (criado se necessário)
+        servicos_pgr_qtd, servicos_ambientais_qtd, regioes_qtd, graus_qtd, faixas_qtd, tipos_qtd:
+            Quantidade de valores de cada eixo
+        lacunas: Fração das linhas fora da região Central que são omitidas
+        lacunas_central: Fração das linhas da região Central que são omitidas
+        semente: Semente do gerador aleatório (mesmos parâmetros, mesmos arquivos)
+
+    Returns:
+        dict: Caminhos, parâmetros e quantidade de linhas gravadas e omitidas por arquivo
+    """
+    os.makedirs(destino, exist_ok=True)
+    aleatorio = random.Random(semente)
+    lista_regioes = regioes(regioes_qtd)
+    fatores_regiao = [1.0 if regiao == 'Central' else round(aleatorio.uniform(0.75, 1.7), 2) for regiao in lista_regioes]
+
+    def omitir(regiao):
+        return aleatorio.random() < (lacunas_central if regiao == 'Central' else lacunas)
+
+    resumo = {
+        'parametros': {
+            'servicos_pgr': servicos_pgr_qtd, 'servicos_ambientais': servicos_ambientais_qtd, 'regioes': regioes_qtd,
+            'graus_risco': graus_qtd, 'faixas_trabalhadores': faixas_qtd, 'tipos_avaliacao': tipos_qtd,
+            'lacunas': lacunas, 'lacunas_central': lacunas_central, 'semente': semente
+        }
+    }
+
+    caminho_pgr = os.path.join(destino, 'Precos_PGR.csv')
+    gravadas = omitidas = 0
+    with open(caminho_pgr, 'w', encoding='utf-8', newline='') as f:
+        f.write('Serviço,Grau_Risco,Faixa_Trab,Região,Preço\n')
+        for indice_servico, servico in enumerate(servicos_pgr(servicos_pgr_qtd)):
+            for indice_grau, grau in enumerate(graus_risco(graus_qtd)):
+                for indice_faixa, faixa in enumerate(faixas_trabalhadores(faixas_qtd)):
+                    base = 550.0 + 75.0 * indice_faixa + 150.0 * indice_grau + 10.0 * indice_servico
+                    for regiao, fator in zip(lista_regioes, fatores_regiao):
+                        if omitir(regiao):
+                            omitidas += 1
+                            continue
+                        f.write(f'"{servico}","{grau}","{faixa}","{regiao}",{base * fator:.2f}\n')
+                        gravadas += 1
+    resumo['pgr'] = {'arquivo': caminho_pgr, 'linhas': gravadas, 'omitidas': omitidas}
+
+    caminho_ambientais = os.path.join(destino, 'Precos_Ambientais.csv')
+    gravadas = omitidas = 0
+    with open(caminho_ambientais, 'w', encoding='utf-8', newline='') as f:
+        f.write('Serviço,Tipo_Avaliacao,Adicional_GES_GHE,Região,Preço\n')
+        for indice_servico, servico in enumerate(servicos_ambientais(servicos_ambientais_qtd)):
+            for indice_tipo, tipo in enumerate(tipos_avaliacao(tipos_qtd)):
+                base = 300.0 + 25.0 * indice_tipo + 5.0 * (indice_servico % 40)
+                adicional = 50.0 if indice_tipo == 0 else 0.0
+                for regiao, fator in zip(lista_regioes, fatores_regiao):
+                    if omitir(regiao):
+                        omitidas += 1
+                        continue
+                    f.write(f'"{servico}","{tipo}",{adicional:.2f},"{regiao}",{base * fator:.2f}\n')
+                    gravadas += 1
+    resumo['ambientais'] = {'arquivo': caminho_ambientais, 'linhas': gravadas, 'omitidas': omitidas}
+    return resumo
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Gera um catálogo de preços sintético para testes de escala")
+    parser.add_argument('destino', help="Diretório onde gravar Precos_PGR.csv e Precos_Ambientais.csv")
+    parser.add_argument('--servicos-pgr', type=int, default=1, help="Serviços de PGR (o primeiro é o real)")
+    parser.add_argument('--servicos-ambientais', type=int, default=10, help="Serviços ambientais")
+    parser.add_argument('--regioes', type=int, default=7, help="Regiões (a primeira é a Central)")
+    parser.add_argument('--graus', type=int, default=2, help="Graus de risco")
+    parser.add_argument('--faixas', type=int, default=16, help="Faixas de trabalhadores")
+    parser.add_argument('--tipos', type=int, default=6, help="Tipos de avaliação")
+    parser.add_argument('--lacunas', type=float, default=0.05, help="Fração de linhas omitidas fora da Central")
+    parser.add_argument('--lacunas-central', type=float, default=0.01, help="Fração de linhas omitidas na Central")
+    parser.add_argument('--semente', type=int, default=42, help="Semente do gerador aleatório")
+    args = parser.parse_args(argumentos)
+
+    resumo = gerar_catalogo(
+        args.destino, args.servicos_pgr, args.servicos_ambientais, args.regioes, args.graus,
+        args.faixas, args.tipos, args.lacunas, args.lacunas_central, args.semente
+    )
+    print(json.dumps(resumo, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
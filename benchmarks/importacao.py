@@ -0,0 +1,93 @@
+"""
+Custo de importação (partida a frio) medido com python -X importtime.
+
+Cada medição roda a importação em um processo novo, como no primeiro acesso a uma
+função da Vercel ou na subida de um worker do gunicorn, e verifica que os módulos
+pesados (pandas, ReportLab) ficaram fora do caminho de inicialização.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.importacao                 # módulos mais caros de "import app"
+    python -m benchmarks.importacao --modulo wsgi --top 30
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import subprocess
+
+# Módulos que não devem ser importados na inicialização (são carregados sob demanda).
+# O babel não está na lista: o Flask-WTF importa o núcleo dele; os dados de localidade,
+# a parte cara, só são lidos na primeira formatação de moeda.
+MODULOS_PESADOS = ('pandas', 'reportlab')
+
+RAIZ_PROJETO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_LINHA = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def medir_importacao(modulo='app', top=15):
+    """
+    Importa `modulo` em um novo interpretador com -X importtime.
+
+    Returns:
+        dict: modulo, total_ms (tempo acumulado da importação do módulo), parede_ms
+        (duração do processo, com a partida do interpretador), pesados (módulos de
+        MODULOS_PESADOS importados) e principais (os `top` módulos com maior tempo
+        acumulado: modulo, proprio_ms, acumulado_ms)
+    """
+    inicio = time.perf_counter()
+    processo = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+        cwd=RAIZ_PROJETO, capture_output=True, text=True
+    )
+    parede_ms = (time.perf_counter() - inicio) * 1000
+    if processo.returncode != 0:
+        raise RuntimeError(f"Falha ao importar {modulo}: {processo.stderr.strip().splitlines()[-1:]}")
+
+    modulos = []
+    total_ms = None
+    for linha in processo.stderr.splitlines():
+        encontrado = _LINHA.match(linha)
+        if not encontrado:
+            continue
+        proprio, acumulado, recuo, nome = encontrado.groups()
+        modulos.append((nome, int(proprio) / 1000, int(acumulado) / 1000))
+        if nome == modulo and len(recuo) == 1:
+            total_ms = int(acumulado) / 1000
+
+    importados = {nome for nome, _, _ in modulos}
+    pesados = sorted(
+        pesado for pesado in MODULOS_PESADOS
+        if pesado in importados or any(nome.startswith(pesado + '.') for nome in importados)
+    )
+    principais = sorted(modulos, key=lambda item: item[2], reverse=True)[:top]
+    return {
+        'modulo': modulo,
+        'total_ms': total_ms,
+        'parede_ms': round(parede_ms, 1),
+        'pesados': pesados,
+        'principais': [{'modulo': nome, 'proprio_ms': proprio, 'acumulado_ms': acumulado}
+                       for nome, proprio, acumulado in principais]
+    }
+
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Custo de importação do aplicativo (python -X importtime)")
+    parser.add_argument('--modulo', default='app', help="Módulo importado (padrão: app)")
+    parser.add_argument('--top', type=int, default=20, help="Quantidade de módulos listados")
+    args = parser.parse_args(argumentos)
+
+    resultado = medir_importacao(args.modulo, args.top)
+    print(f"import {resultado['modulo']}: {resultado['total_ms']:.1f} ms (processo: {resultado['parede_ms']:.1f} ms)")
+    print(f"{'módulo':<50} {'próprio ms':>12} {'acumulado ms':>14}")
+    for item in resultado['principais']:
+        print(f"{item['modulo']:<50} {item['proprio_ms']:>12.1f} {item['acumulado_ms']:>14.1f}")
+    if resultado['pesados']:
+        print(f"\nMódulos pesados importados na inicialização: {', '.join(resultado['pesados'])}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+import gc
+import json
+import time
+import platform
+import statistics
+import tracemalloc
+from datetime import datetime
+
+
+# Métricas comparadas com a linha de base (maior é pior em todas)
+METRICAS_MEMORIA = ('pico_memoria_kb', 'retido_memoria_kb')
+METRICAS_COMPARADAS = ('p50_ms', 'p95_ms') + METRICAS_MEMORIA
+
+
+class Caso:
+    """
+    Um caso de benchmark.
+
+    Args:
+        nome: Identificador do caso (ex.: 'preco/pgr_exato')
+        funcao: Função medida, chamada sem argumentos
+        preparar: Função chamada antes de cada execução, fora da medição (opcional)
+        repeticoes: Execuções medidas (o executor pode reduzir ou aumentar)
+        aquecimento: Execuções descartadas antes da medição
+        verificar: Função que recebe o retorno de uma execução e levanta AssertionError
+            se o caso não estiver medindo o caminho esperado (opcional)
+    """
+
+    def __init__(self, nome, funcao, preparar=None, repeticoes=200, aquecimento=5, verificar=None):
+        self.nome = nome
+        self.funcao = funcao
+        self.preparar = preparar
+        self.repeticoes = repeticoes
+        self.aquecimento = aquecimento
+        self.verificar = verificar
+
+
+def _percentil(ordenados, percentual):
+    """Percentil com interpolação linear sobre tempos já ordenados"""
+    if len(ordenados) == 1:
+        return ordenados[0]
+    posicao = (len(ordenados) - 1) * percentual / 100.0
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (posicao - inferior)
+
+
+def medir(caso, repeticoes=None):
+    """
+    Executa um caso e calcula as estatísticas.
+
+    Os tempos são medidos sem o tracemalloc (que deixa o Python bem mais lento); o pico
+    de memória e a memória retida (a que continua alocada após a execução e uma coleta
+    de lixo: caches ou vazamentos) vêm de uma execução extra, com o tracemalloc ligado.
+    Ambos consideram apenas as alocações do Python neste processo.
+
+    Returns:
+        dict: repeticoes, p50_ms, p95_ms, p99_ms, media_ms, min_ms, max_ms,
+        vazao_por_segundo, pico_memoria_kb e retido_memoria_kb
+    """
+    repeticoes = repeticoes or caso.repeticoes
+
+    for indice in range(caso.aquecimento + 1):
+        if caso.preparar:
+            caso.preparar()
+        retorno = caso.funcao()
+        if indice == 0 and caso.verificar:
+            caso.verificar(retorno)
+
+    tempos = []
+    gc.collect()
+    for _ in range(repeticoes):
+        if caso.preparar:
+            caso.preparar()
+        inicio = time.perf_counter_ns()
+        caso.funcao()
+        tempos.append(time.perf_counter_ns() - inicio)
+
+    if caso.preparar:
+        caso.preparar()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        antes = tracemalloc.get_traced_memory()[0]
+        caso.funcao()
+        _, pico = tracemalloc.get_traced_memory()
+        gc.collect()
+        retido = tracemalloc.get_traced_memory()[0] - antes
+    finally:
+        tracemalloc.stop()
+
+    tempos.sort()
+    milissegundos = [t / 1e6 for t in tempos]
+    soma_segundos = sum(tempos) / 1e9
+    return {
+        'repeticoes': repeticoes,
+        'p50_ms': round(_percentil(milissegundos, 50), 4),
+        'p95_ms': round(_percentil(milissegundos, 95), 4),
+        'p99_ms': round(_percentil(milissegundos, 99), 4),
+        'media_ms': round(statistics.fmean(milissegundos), 4),
+        'min_ms': round(milissegundos[0], 4),
+        'max_ms': round(milissegundos[-1], 4),
+        'vazao_por_segundo': round(repeticoes / soma_segundos, 1) if soma_segundos > 0 else 0.0,
+        'pico_memoria_kb': round(pico / 1024, 1),
+        'retido_memoria_kb': round(retido / 1024, 1)
+    }
+
+
+def ambiente():
+    """Descrição da máquina e do Python, gravada junto com os resultados"""
+    return {
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'processador': platform.processor() or platform.machine()
+    }
+
+
+def salvar(resultado, caminho):
+    """Grava os resultados em JSON"""
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+
+
+def carregar(caminho):
+    """Lê resultados gravados por salvar"""
+    with open(caminho, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def comparar(atual, base, tolerancia=0.15, minimo_ms=0.05, minimo_kb=16, metricas=METRICAS_COMPARADAS):
+    """
+    Compara os casos em comum entre duas execuções.
+
+    Uma métrica regride quando fica mais de `tolerancia` (fração) acima da linha de
+    base; diferenças de tempo abaixo de `minimo_ms` e de memória abaixo de `minimo_kb`
+    são ignoradas, pois nesses casos o ruído da medição é maior que a própria
+    diferença. A variação da memória é calculada sobre pelo menos `minimo_kb`, já que
+    a memória retida da linha de base costuma ser zero.
+
+    Returns:
+        list: Dicionários com caso, metrica, base, atual, variacao e regressao (bool),
+        um por métrica de cada caso em comum
+    """
+    comparacoes = []
+    for nome, medidas in atual['casos'].items():
+        anteriores = base['casos'].get(nome)
+        if not anteriores:
+            continue
+        for metrica in metricas:
+            valor_base = anteriores.get(metrica)
+            valor_atual = medidas.get(metrica)
+            if valor_base is None or valor_atual is None:
+                continue
+            minimo = minimo_ms if metrica.endswith('_ms') else minimo_kb
+            referencia = valor_base if metrica.endswith('_ms') else max(valor_base, minimo_kb)
+            variacao = (valor_atual - valor_base) / referencia if referencia else 0.0
+            diferenca_relevante = (valor_atual - valor_base) >= minimo
+            comparacoes.append({
+                'caso': nome,
+                'metrica': metrica,
+                'base': valor_base,
+                'atual': valor_atual,
+                'variacao': round(variacao, 4),
+                'regressao': variacao > tolerancia and diferenca_relevante
+            })
+    return comparacoes
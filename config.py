@@ -29,4 +29,71 @@ class Config:
     PERMANENT_SESSION_LIFETIME = 3600  # Duração da sessão em segundos (1 hora)
     SESSION_USE_SIGNER = True    # Assinar cookies de sessão
     SESSION_KEY_PREFIX = 'precificacao_'  # Prefixo para chaves de sessão
+    
+    # Diretório dos bancos de dados locais (sequência de números, orçamentos e caixa de saída)
+    # Na Vercel apenas o /tmp é gravável, e ele é de cada instância e apagado a cada partida a
+    # frio: lá esses dados não são duráveis nem compartilhados entre instâncias
+    if os.environ.get("VERCEL"):
+        DATA_DIR = os.getenv('DATA_DIR', '/tmp/precificacao')
+        DATA_DIR_TEMPORARIO = True
+    else:
+        DATA_DIR = os.getenv('DATA_DIR', os.path.join(os.getcwd(), 'dados'))
+        DATA_DIR_TEMPORARIO = False
+    
+    # Diretório dos arquivos Precos_PGR.csv e Precos_Ambientais.csv (padrão: o do aplicativo)
+    CATALOGO_DIR = os.getenv('CATALOGO_DIR') or None
+    
+    # Catálogo compilado (flask compilar-catalogo), carregado no lugar dos CSVs enquanto
+    # estiver atualizado (padrão: catalogo.bin no diretório dos CSVs)
+    CATALOGO_COMPILADO = os.getenv('CATALOGO_COMPILADO') or None
+    
+    # Cache de PDFs gerados: limite da camada em memória e diretório da camada em disco (opcional)
+    PDF_CACHE_MAX_BYTES = int(os.getenv('PDF_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR') or None
+    
+    # Renderização dos PDFs: 'processo' (pool de processos, não bloqueia o servidor) ou 'local'
+    # (na thread da requisição; usado na Vercel, onde cada invocação tem um único processo)
+    PDF_EXECUTOR = os.getenv('PDF_EXECUTOR', 'local' if os.environ.get("VERCEL") else 'processo')
+    PDF_WORKERS = int(os.getenv('PDF_WORKERS', min(4, os.cpu_count() or 1)))
+    PDF_TIMEOUT_SEGUNDOS = float(os.getenv('PDF_TIMEOUT_SEGUNDOS', 30))
+    PDF_EXECUTOR_CONTEXTO = os.getenv('PDF_EXECUTOR_CONTEXTO') or None  # padrão: forkserver (spawn no Windows)
+    
+    # Layout do PDF: 'detalhado', 'compacto' (uma tabela única de itens) ou 'automatico'
+    # (compacto para orçamentos longos)
+    PDF_LAYOUT = os.getenv('PDF_LAYOUT', 'automatico')
+    
+    # Gerar o PDF em segundo plano ao exibir o resumo do orçamento
+    PDF_PRE_RENDERIZAR = os.getenv('PDF_PRE_RENDERIZAR', 'false' if os.environ.get("VERCEL") else 'true').lower() in ('1', 'true', 'sim')
+    
+    # Token das rotas administrativas (exportação dos PDFs); sem ele, essas rotas ficam desativadas
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN') or None
+    # /metrics exige o ADMIN_TOKEN; sem token configurado, só responde com METRICS_PUBLICO ligado
+    METRICS_PUBLICO = os.getenv('METRICS_PUBLICO', 'false').lower() in ('1', 'true', 'sim')
+    
+    # Perfil de requisições sob demanda (ver services.perfil). Desligado, nada é instalado;
+    # ligado, perfila as requisições com o cabeçalho X-Perfil: <ADMIN_TOKEN> e, por sorteio,
+    # a fração PERFIL_AMOSTRAGEM das requisições às rotas de PERFIL_ROTAS
+    PERFIL_HABILITADO = os.getenv('PERFIL_HABILITADO', 'false').lower() in ('1', 'true', 'sim')
+    PERFIL_MODO = os.getenv('PERFIL_MODO', 'amostragem')  # 'amostragem' (custo baixo) ou 'cprofile'
+    PERFIL_AMOSTRAGEM = float(os.getenv('PERFIL_AMOSTRAGEM', 0))
+    PERFIL_ROTAS = tuple(rota.strip() for rota in os.getenv('PERFIL_ROTAS', '/processar_formulario,/gerar_orcamento').split(',') if rota.strip())
+    PERFIL_DIR = os.getenv('PERFIL_DIR') or os.path.join(DATA_DIR, 'perfis')
+    PERFIL_MAX_ARQUIVOS = int(os.getenv('PERFIL_MAX_ARQUIVOS', 50))
+    
+    # Memória por rota com o tracemalloc (ver services.memoria e /admin/memoria). Deixa o
+    # Python bem mais lento: ligue para diagnóstico. Com PYTHONTRACEMALLOC=1 no ambiente,
+    # as alocações da importação (numpy, Flask) também são rastreadas
+    MEMORIA_HABILITADA = os.getenv('MEMORIA_HABILITADA', 'false').lower() in ('1', 'true', 'sim')
+    MEMORIA_FRAMES = int(os.getenv('MEMORIA_FRAMES', 1))
+    MEMORIA_INTERVALO_SNAPSHOT = int(os.getenv('MEMORIA_INTERVALO_SNAPSHOT', 100))
+    MEMORIA_ALERTA_KB = int(os.getenv('MEMORIA_ALERTA_KB', 1024))
+    
+    # Caixa de saída de e-mails: tentativas, espera inicial entre tentativas (dobra a cada falha)
+    # e modo de envio: 'thread' (worker em segundo plano, iniciado na subida de cada processo) ou
+    # 'requisicao' (para ambientes sem threads de fundo como a Vercel: o e-mail é enviado pela
+    # própria requisição que o gravou, logo após entregar o PDF, e /confirmacao/status só tenta
+    # de novo o e-mail da sessão, se a consulta cair na mesma instância)
+    OUTBOX_MAX_TENTATIVAS = int(os.getenv('OUTBOX_MAX_TENTATIVAS', 5))
+    OUTBOX_BACKOFF_SEGUNDOS = float(os.getenv('OUTBOX_BACKOFF_SEGUNDOS', 30))
+    OUTBOX_MODO = os.getenv('OUTBOX_MODO', 'requisicao' if os.environ.get("VERCEL") else 'thread')
     # Adicione outras configurações conforme necessário
@@ -0,0 +1,12 @@
+# Configuração do gunicorn, lida automaticamente quando ele é iniciado na raiz do projeto
+# (ex.: startCommand do render.yaml)
+
+
+def post_fork(server, worker):
+    """
+    Inicia a renderização de PDFs e a caixa de saída em cada worker. Com --preload, o
+    aplicativo é importado no processo principal, que não deve ter um pool de processos
+    nem threads: os workers herdariam um pool (e um servidor de fork) que não controlam.
+    """
+    from app import iniciar_processo
+    iniciar_processo()
@@ -0,0 +1,49 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+
+class BancoSQLite:
+    """
+    Acesso a um arquivo SQLite compartilhado por threads e processos.
+
+    O banco usa modo WAL (leitores não bloqueiam o escritor). As conexões são mantidas
+    por thread e recriadas após um fork (workers do gunicorn). As escritas devem ser
+    feitas com transacao(), que obtém o lock de escrita logo no início (BEGIN IMMEDIATE).
+    """
+
+    def __init__(self, caminho_db, timeout=30.0):
+        self.caminho_db = str(caminho_db)
+        self.timeout = timeout
+        self._local = threading.local()
+
+        diretorio = os.path.dirname(self.caminho_db)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+
+    def conexao(self):
+        """Retorna a conexão da thread atual, abrindo uma nova se necessário"""
+        conexao = getattr(self._local, 'conexao', None)
+        if conexao is None or self._local.pid != os.getpid():
+            # isolation_level=None: as transações são controladas explicitamente
+            conexao = sqlite3.connect(self.caminho_db, timeout=self.timeout, isolation_level=None)
+            conexao.row_factory = sqlite3.Row
+            conexao.execute('PRAGMA journal_mode=WAL')
+            conexao.execute('PRAGMA synchronous=NORMAL')
+            conexao.execute(f'PRAGMA busy_timeout={int(self.timeout * 1000)}')
+            self._local.conexao = conexao
+            self._local.pid = os.getpid()
+        return conexao
+
+    @contextmanager
+    def transacao(self):
+        """Executa o bloco em uma transação de escrita (COMMIT ao final, ROLLBACK em caso de erro)"""
+        conexao = self.conexao()
+        conexao.execute('BEGIN IMMEDIATE')
+        try:
+            yield conexao
+        except BaseException:
+            conexao.execute('ROLLBACK')
+            raise
+        conexao.execute('COMMIT')
@@ -0,0 +1,243 @@
+import io
+import os
+import json
+import hashlib
+import tempfile
+import threading
+import logging
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+def chave_conteudo(dados, *versoes):
+    """
+    Calcula a chave de cache de um conteúdo: SHA-256 da serialização canônica do
+    dicionário (chaves ordenadas, sem espaços) prefixada pelas versões informadas.
+
+    Args:
+        dados: Dicionário com os dados usados na geração
+        *versoes: Versões que invalidam o cache quando mudam (ex.: layout, catálogo)
+
+    Returns:
+        str: Hash hexadecimal
+    """
+    canonico = json.dumps(dados, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    hash_conteudo = hashlib.sha256()
+    for versao in versoes:
+        hash_conteudo.update(str(versao).encode('utf-8'))
+        hash_conteudo.update(b'\0')
+    hash_conteudo.update(canonico.encode('utf-8'))
+    return hash_conteudo.hexdigest()
+
+
+class LeitorBytes(io.RawIOBase):
+    """
+    Arquivo somente leitura sobre um objeto bytes, sem copiá-lo.
+
+    io.BytesIO copia o conteúdo quando o servidor pede o seu buffer (send_file faz isso
+    para obter o tamanho); este leitor entrega o PDF em cache diretamente, em blocos,
+    com suporte a seek para as requisições com Range.
+    """
+
+    def __init__(self, conteudo):
+        super().__init__()
+        self._dados = memoryview(conteudo)
+        self._posicao = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._posicao
+
+    def seek(self, deslocamento, origem=io.SEEK_SET):
+        if origem == io.SEEK_SET:
+            posicao = deslocamento
+        elif origem == io.SEEK_CUR:
+            posicao = self._posicao + deslocamento
+        else:
+            posicao = len(self._dados) + deslocamento
+        self._posicao = max(0, posicao)
+        return self._posicao
+
+    def readinto(self, destino):
+        bloco = self._dados[self._posicao:self._posicao + len(destino)]
+        quantidade = len(bloco)
+        destino[:quantidade] = bloco
+        self._posicao += quantidade
+        return quantidade
+
+    def close(self):
+        self._dados.release()
+        super().close()
+
+
+class CachePDF:
+    """
+    Cache de PDFs endereçado por conteúdo.
+
+    A camada em memória é um LRU limitado pelo total de bytes armazenados; a camada em
+    disco (opcional) guarda um arquivo por chave e sobrevive a reinícios e é
+    compartilhada entre os workers. Acertos no disco são promovidos para a memória.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, diretorio=None):
+        self.max_bytes = max_bytes
+        self.diretorio = str(diretorio) if diretorio else None
+        self._itens = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.acertos_memoria = 0
+        self.acertos_disco = 0
+        self.faltas = 0
+
+        if self.diretorio:
+            os.makedirs(self.diretorio, exist_ok=True)
+
+    def _caminho(self, chave):
+        """Caminho do arquivo de uma chave na camada em disco"""
+        return os.path.join(self.diretorio, chave[:2], f"{chave}.pdf")
+
+    def _guardar_memoria(self, chave, conteudo):
+        """Insere na camada em memória, descartando os itens menos usados (com o lock obtido)"""
+        if len(conteudo) > self.max_bytes:
+            return
+        anterior = self._itens.pop(chave, None)
+        if anterior is not None:
+            self._bytes -= len(anterior)
+        self._itens[chave] = conteudo
+        self._bytes += len(conteudo)
+        while self._bytes > self.max_bytes:
+            _, descartado = self._itens.popitem(last=False)
+            self._bytes -= len(descartado)
+
+    def obter(self, chave):
+        """
+        Busca um PDF no cache.
+
+        Returns:
+            bytes do PDF ou None se não estiver em cache
+        """
+        with self._lock:
+            conteudo = self._itens.get(chave)
+            if conteudo is not None:
+                self._itens.move_to_end(chave)
+                self.acertos_memoria += 1
+                return conteudo
+
+        if self.diretorio:
+            try:
+                with open(self._caminho(chave), 'rb') as f:
+                    conteudo = f.read()
+            except OSError:
+                conteudo = None
+            if conteudo is not None:
+                with self._lock:
+                    self._guardar_memoria(chave, conteudo)
+                    self.acertos_disco += 1
+                return conteudo
+
+        with self._lock:
+            self.faltas += 1
+        return None
+
+    def contem(self, chave):
+        """Indica se a chave está em cache, sem alterar os contadores nem a ordem do LRU"""
+        with self._lock:
+            if chave in self._itens:
+                return True
+        return bool(self.diretorio) and os.path.exists(self._caminho(chave))
+
+    def guardar(self, chave, conteudo):
+        """Armazena os bytes de um PDF nas duas camadas"""
+        with self._lock:
+            self._guardar_memoria(chave, conteudo)
+
+        if self.diretorio:
+            caminho = self._caminho(chave)
+            try:
+                os.makedirs(os.path.dirname(caminho), exist_ok=True)
+                # Gravar em arquivo temporário e renomear: leitores nunca veem um PDF parcial
+                descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho), suffix='.tmp')
+                with os.fdopen(descritor, 'wb') as f:
+                    f.write(conteudo)
+                os.replace(temporario, caminho)
+            except OSError as e:
+                logger.warning(f"Erro ao gravar PDF no cache em disco: {str(e)}")
+
+    def limpar(self):
+        """Esvazia a camada em memória"""
+        with self._lock:
+            self._itens.clear()
+            self._bytes = 0
+
+    def estatisticas(self):
+        """Retorna os contadores e a ocupação do cache"""
+        with self._lock:
+            return {
+                'itens': len(self._itens),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'acertos_memoria': self.acertos_memoria,
+                'acertos_disco': self.acertos_disco,
+                'faltas': self.faltas
+            }
+
+
+class GeracoesEmAndamento:
+    """
+    Evita gerar o mesmo conteúdo duas vezes ao mesmo tempo (single-flight).
+
+    A primeira chamada de executar() para uma chave executa a função; as chamadas
+    feitas com a mesma chave enquanto ela não termina esperam e recebem o mesmo
+    resultado (ou a mesma exceção).
+    """
+
+    def __init__(self):
+        self._futuros = {}
+        self._lock = threading.Lock()
+
+    def em_andamento(self, chave):
+        """Indica se há uma geração em andamento para a chave"""
+        with self._lock:
+            return chave in self._futuros
+
+    def executar(self, chave, funcao, timeout=None):
+        """
+        Executa funcao() ou espera pela execução já em andamento para a mesma chave.
+
+        Args:
+            chave: Identificação do conteúdo (ex.: chave_conteudo dos dados)
+            funcao: Função sem argumentos que gera o conteúdo
+            timeout: Tempo máximo de espera por uma execução de outra thread (None = sem limite)
+
+        Returns:
+            O retorno de funcao()
+        """
+        with self._lock:
+            futuro = self._futuros.get(chave)
+            dono = futuro is None
+            if dono:
+                futuro = Future()
+                self._futuros[chave] = futuro
+
+        if not dono:
+            return futuro.result(timeout=timeout)
+
+        try:
+            resultado = funcao()
+        except BaseException as e:
+            futuro.set_exception(e)
+            raise
+        else:
+            futuro.set_result(resultado)
+            return resultado
+        finally:
+            with self._lock:
+                self._futuros.pop(chave, None)
@@ -0,0 +1,697 @@
+import io
+import os
+import csv
+import math
+import hashlib
+import itertools
+import threading
+import logging
+from collections import namedtuple
+from collections.abc import Mapping
+import numpy as np
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+# Colunas que compõem a chave de busca de cada tabela
+COLUNAS_CHAVE_PGR = ('Serviço', 'Região', 'Grau_Risco', 'Faixa_Trab')
+COLUNAS_CHAVE_AMBIENTAIS = ('Serviço', 'Região', 'Tipo_Avaliacao')
+
+# Regras de resolução de preço (proveniência do valor retornado)
+REGRA_EXATA = 'exato'
+REGRA_REGIAO_DESCONHECIDA = 'regiao_desconhecida'    # região inexistente no CSV, substituída pela Central
+REGRA_FAIXA_DESCONHECIDA = 'faixa_desconhecida'      # faixa inexistente no CSV, substituída pela primeira
+REGRA_REGIAO_CENTRAL = 'regiao_central'              # sem preço na região, usado o da região Central
+REGRA_QUALQUER_FAIXA = 'qualquer_faixa'              # PGR: primeira faixa disponível na região
+REGRA_QUALQUER_REGIAO = 'qualquer_regiao'            # PGR: primeiro preço do grau de risco em qualquer região
+REGRA_PRIMEIRO_REGISTRO = 'primeiro_registro'        # PGR: primeiro registro do arquivo (último recurso)
+REGRA_VARIAVEL_SIMILAR = 'variavel_similar'          # Ambientais: tipo de avaliação com nome semelhante
+REGRA_PRIMEIRA_VARIAVEL = 'primeira_variavel'        # Ambientais: primeiro tipo de avaliação disponível
+
+# Linhas do CSV transpostas de cada vez na leitura
+_LINHAS_POR_BLOCO = 10000
+
+# Tipo de avaliação usado para cobrar avaliações adicionais em pacotes
+VARIAVEL_AVALIACAO_ADICIONAL = 'Por Avaliação Adicional'
+
+# Resultado da resolução de um preço.
+# regiao/variavel são os valores efetivamente usados; preco_avaliacao_adicional é o preço
+# unitário de 'Por Avaliação Adicional' na região efetiva (None se não houver).
+ResolucaoPreco = namedtuple('ResolucaoPreco', ['preco', 'adicional_ges_ghe', 'preco_avaliacao_adicional', 'regra', 'regiao', 'variavel'])
+
+
+# Regras que podem aparecer no tensor de PGR, na ordem dos códigos de regras_pgr
+REGRAS_TENSOR_PGR = (REGRA_EXATA, REGRA_REGIAO_CENTRAL, REGRA_QUALQUER_FAIXA, REGRA_QUALQUER_REGIAO, REGRA_PRIMEIRO_REGISTRO)
+
+
+def _combinar_regras(*regras):
+    """Combina as regras aplicadas em uma única string (ex.: 'regiao_central+variavel_similar')"""
+    aplicadas = [regra for regra in regras if regra and regra != REGRA_EXATA]
+    return '+'.join(aplicadas) if aplicadas else REGRA_EXATA
+
+
+def _converter_coluna(valores):
+    """
+    Converte os textos de uma coluna: vazios viram None e, se todos os demais forem
+    numéricos, os valores viram float
+    """
+    preenchidos = [valor for valor in valores if valor != '']
+    try:
+        numeros = list(map(float, preenchidos)) if preenchidos else None
+    except ValueError:
+        numeros = None
+    if numeros is None:
+        return [valor if valor != '' else None for valor in valores]
+    if len(numeros) == len(valores):
+        return numeros
+    numeros = iter(numeros)
+    return [next(numeros) if valor != '' else None for valor in valores]
+
+
+class TabelaPrecos:
+    """
+    Conteúdo de um CSV de preços em colunas (listas do Python), lido sem o pandas.
+
+    Células vazias viram None e as colunas em que todos os valores preenchidos são
+    numéricos (Preço, Adicional_GES_GHE) são convertidas para float, como faria o
+    read_csv do pandas. A tabela é compartilhada entre as requisições e não deve ser
+    modificada.
+    """
+
+    def __init__(self, colunas, assinatura=None):
+        self.colunas = colunas  # nome -> lista de valores
+        self.assinatura = assinatura  # SHA-256 do arquivo lido (None se montada em memória)
+
+    @classmethod
+    def ler(cls, caminho):
+        """Lê um arquivo CSV com cabeçalho"""
+        with open(caminho, 'rb') as f:
+            bruto = f.read()
+        assinatura = hashlib.sha256(bruto).hexdigest()
+        # Decodificado aos poucos (um StringIO guardaria o texto inteiro, 4 bytes por caractere)
+        leitor = csv.reader(io.TextIOWrapper(io.BytesIO(bruto), encoding='utf-8-sig', newline=''))
+        nomes = next((linha for linha in leitor if linha), None)
+        if nomes is None:
+            return cls({}, assinatura)
+        # Transpor em colunas por blocos de linhas (zip é feito em C), sem manter todas as
+        # linhas em memória; textos repetidos (serviços, regiões) passam a ser um só objeto
+        largura = len(nomes)
+        brutas = [[] for _ in range(largura)]
+        textos = {}
+        while True:
+            bloco = [linha if len(linha) == largura else (linha + [''] * largura)[:largura]
+                     for linha in itertools.islice(leitor, _LINHAS_POR_BLOCO) if linha]
+            if not bloco:
+                break
+            for coluna, valores in zip(brutas, zip(*bloco)):
+                coluna.extend(map(textos.setdefault, valores, valores))
+        del bruto, textos
+        colunas = {}
+        for nome, valores in zip(nomes, brutas):
+            colunas[nome] = _converter_coluna(valores)
+        return cls(colunas, assinatura)
+
+    def __len__(self):
+        return len(next(iter(self.colunas.values()), ()))
+
+    def __contains__(self, coluna):
+        return coluna in self.colunas
+
+    def __getitem__(self, coluna):
+        return self.colunas[coluna]
+
+    @property
+    def vazia(self):
+        return len(self) == 0
+
+    def linha(self, indice):
+        """Retorna uma linha como dicionário coluna -> valor"""
+        return {nome: valores[indice] for nome, valores in self.colunas.items()}
+
+
+def _valores_unicos(tabela, coluna):
+    """Retorna os valores distintos de uma coluna, na ordem em que aparecem, com busca O(1)"""
+    if tabela is None or coluna not in tabela:
+        return {}
+    return dict.fromkeys(tabela[coluna])
+
+
+def _valores_por_chave(tabela, coluna_chave, coluna_valor):
+    """Valores distintos de uma coluna para cada valor de outra, na ordem do arquivo"""
+    agrupados = {}
+    if tabela is None or coluna_chave not in tabela or coluna_valor not in tabela:
+        return agrupados
+    # Pares distintos primeiro (em C), depois o agrupamento dos poucos pares restantes
+    for chave, valor in dict.fromkeys(zip(tabela[coluna_chave], tabela[coluna_valor])):
+        if valor is not None:
+            agrupados.setdefault(chave, []).append(valor)
+    return agrupados
+
+
+def _linhas(tabela, colunas):
+    """Itera sobre as linhas da tabela como tuplas, preenchendo colunas ausentes com None"""
+    valores = [tabela[coluna] if coluna in tabela else [None] * len(tabela) for coluna in colunas]
+    return zip(*valores)
+
+
+def _versao_dados(*tabelas):
+    """
+    Hash do conteúdo das tabelas, estável entre processos: o dos arquivos lidos ou,
+    para tabelas montadas em memória, o das colunas e valores
+    """
+    hash_conteudo = hashlib.sha256()
+    for tabela in tabelas:
+        if tabela is None:
+            hash_conteudo.update(b'-')
+        elif tabela.assinatura:
+            hash_conteudo.update(tabela.assinatura.encode('ascii'))
+        else:
+            for nome, valores in tabela.colunas.items():
+                hash_conteudo.update(nome.encode('utf-8') + b'\0')
+                hash_conteudo.update(repr(valores).encode('utf-8') + b'\0')
+    return hash_conteudo.hexdigest()[:16]
+
+
+class _ResolucaoSobDemanda(Mapping):
+    """
+    Resoluções da cascata de fallback para todas as combinações dos valores conhecidos
+    (mais None, exceto no serviço), calculadas na primeira consulta de cada chave e
+    guardadas. O produto dos eixos pode ter centenas de milhares de combinações, das
+    quais as requisições usam poucas; percorrer o mapeamento (compilação, exportação)
+    resolve as combinações na ordem dos eixos, sem guardá-las.
+
+    Args:
+        valores: Coluna -> valores distintos, na ordem do CSV
+        colunas_chave: Colunas que compõem a chave, começando pelo serviço
+        resolver: Função (*chave) -> ResolucaoPreco ou None
+    """
+
+    def __init__(self, valores, colunas_chave, resolver):
+        self._eixos = [dict.fromkeys(valores[colunas_chave[0]])] + [
+            dict.fromkeys([*valores[coluna], None]) for coluna in colunas_chave[1:]
+        ]
+        self._resolver = resolver
+        self._consultadas = {}
+
+    def get(self, chave, padrao=None):
+        try:
+            resultado = self._consultadas[chave]
+        except KeyError:
+            try:
+                conhecida = len(chave) == len(self._eixos) and all(valor in eixo for eixo, valor in zip(self._eixos, chave))
+            except TypeError:
+                conhecida = False
+            if not conhecida:
+                # Só as combinações de valores conhecidos são guardadas (o total é limitado)
+                return padrao
+            resultado = self._consultadas[chave] = self._resolver(*chave)
+        return padrao if resultado is None else resultado
+
+    def __getitem__(self, chave):
+        resultado = self.get(chave)
+        if resultado is None:
+            raise KeyError(chave)
+        return resultado
+
+    def __iter__(self):
+        return (chave for chave, _ in self.items())
+
+    def __len__(self):
+        return sum(1 for _ in self.items())
+
+    def items(self):
+        # Mesma ordem da antiga resolução antecipada: eixos na ordem do CSV, None ao final
+        consultadas = self._consultadas
+        for chave in itertools.product(*self._eixos):
+            resultado = consultadas[chave] if chave in consultadas else self._resolver(*chave)
+            if resultado is not None:
+                yield chave, resultado
+
+    def values(self):
+        return (resolucao for _, resolucao in self.items())
+
+
+class DadosCatalogo:
+    """
+    Fotografia imutável dos arquivos de preços carregados em memória.
+
+    As tabelas (TabelaPrecos) são compartilhadas entre todas as requisições e não
+    devem ser modificadas pelos chamadores. Na construção são montados índices por
+    tupla que substituem a filtragem das linhas:
+
+    - indice_pgr: (serviço, região, grau de risco, faixa) -> (preço, adicional GES/GHE).
+      Qualquer componente exceto o serviço pode ser None, significando "qualquer valor";
+      nesse caso o índice aponta para o primeiro registro do CSV que atende aos demais.
+    - indice_ambientais: (serviço, região, tipo de avaliação) -> (preço, adicional GES/GHE)
+    - variaveis_ambientais: (serviço, região) -> tipos de avaliação na ordem do CSV
+    - regioes_pgr / regioes_ambientais: serviço -> regiões na ordem do CSV
+    - tipos_ambientais: serviço -> tipos de avaliação (de todas as regiões) na ordem do CSV
+    - servicos_com_adicional: serviços ambientais com adicional por GES/GHE
+
+    Em chaves repetidas prevalece o primeiro registro do arquivo, como no filtro original.
+
+    Além dos índices, cada combinação de valores conhecidos (mais None) tem a cascata de
+    fallback aplicada uma única vez, na primeira consulta, e o resultado guardado:
+
+    - resolucao_pgr: (serviço, região, grau de risco, faixa) -> ResolucaoPreco
+    - resolucao_ambientais: (serviço, região, tipo de avaliação) -> ResolucaoPreco
+
+    Assim um fallback repetido custa o mesmo que um acerto exato, sem resolver na carga
+    todo o produto dos eixos (que cresce com o número de serviços, regiões e tipos).
+
+    A tabela de PGR também é compilada em um tensor denso (tensor_pgr) com eixos
+    (serviço, região, grau de risco, faixa), indexado pelos códigos inteiros de
+    codigos_pgr, para precificação vetorizada com precificar_pgr.
+
+    Args:
+        pgr: TabelaPrecos de PGR (ou None)
+        ambientais: TabelaPrecos de serviços ambientais (ou None)
+    """
+
+    def __init__(self, pgr=None, ambientais=None):
+        self.pgr = pgr
+        self.ambientais = ambientais
+
+        # Versão do conteúdo (muda sempre que algum preço ou chave muda)
+        self.versao = _versao_dados(pgr, ambientais)
+
+        # Lista de serviços disponíveis nos dois arquivos
+        servicos = set()
+        for tabela in (pgr, ambientais):
+            if tabela is not None and 'Serviço' in tabela:
+                servicos.update(servico for servico in tabela['Serviço'] if servico is not None)
+        self.servicos = sorted(servicos)
+
+        # Valores distintos de cada coluna de chave (para verificações de existência)
+        self.valores_pgr = {coluna: _valores_unicos(pgr, coluna) for coluna in COLUNAS_CHAVE_PGR}
+        self.valores_ambientais = {coluna: _valores_unicos(ambientais, coluna) for coluna in COLUNAS_CHAVE_AMBIENTAIS}
+        self.regioes_pgr = _valores_por_chave(pgr, 'Serviço', 'Região')
+        self.regioes_ambientais = _valores_por_chave(ambientais, 'Serviço', 'Região')
+        self.tipos_ambientais = _valores_por_chave(ambientais, 'Serviço', 'Tipo_Avaliacao')
+        self.servicos_com_adicional = set()
+        if ambientais is not None and 'Serviço' in ambientais and 'Adicional_GES_GHE' in ambientais:
+            self.servicos_com_adicional = {servico for servico, adicional in zip(ambientais['Serviço'], ambientais['Adicional_GES_GHE'])
+                                           if adicional is not None and adicional > 0}
+
+        self.indice_pgr = {}
+        self.primeiro_pgr = None
+        if pgr is not None and not pgr.vazia and all(c in pgr for c in COLUNAS_CHAVE_PGR + ('Preço',)):
+            for servico, regiao, grau, faixa, preco, adicional in _linhas(pgr, COLUNAS_CHAVE_PGR + ('Preço', 'Adicional_GES_GHE')):
+                valor = (math.nan if preco is None else float(preco), adicional)
+                if self.primeiro_pgr is None:
+                    self.primeiro_pgr = valor
+                # Registrar a chave completa e todas as combinações parciais (região/grau/faixa livres)
+                for r in (regiao, None):
+                    for g in (grau, None):
+                        for f in (faixa, None):
+                            self.indice_pgr.setdefault((servico, r, g, f), valor)
+
+        self.indice_ambientais = {}
+        self.variaveis_ambientais = {}
+        if ambientais is not None and all(c in ambientais for c in COLUNAS_CHAVE_AMBIENTAIS + ('Preço',)):
+            chaves = list(_linhas(ambientais, COLUNAS_CHAVE_AMBIENTAIS))
+            precos = [math.nan if preco is None else float(preco) for preco in ambientais['Preço']]
+            adicionais = ambientais['Adicional_GES_GHE'] if 'Adicional_GES_GHE' in ambientais else [None] * len(ambientais)
+            valores = list(zip(precos, adicionais))
+            # Pares em ordem inversa: em chaves repetidas prevalece o primeiro registro
+            self.indice_ambientais = dict(zip(reversed(chaves), reversed(valores)))
+            for servico, regiao, variavel in dict.fromkeys(chaves):
+                self.variaveis_ambientais.setdefault((servico, regiao), []).append(variavel)
+
+        self.resolucao_pgr = _ResolucaoSobDemanda(self.valores_pgr, COLUNAS_CHAVE_PGR, self._resolver_pgr)
+        self.resolucao_ambientais = _ResolucaoSobDemanda(self.valores_ambientais, COLUNAS_CHAVE_AMBIENTAIS, self._cascata_ambientais)
+        self._compilar_tensor_pgr()
+
+    def buscar_pgr(self, servico, regiao=None, grau_risco=None, faixa_trab=None):
+        """
+        Busca O(1) no índice PGR. Parâmetros None não restringem a busca.
+
+        Returns:
+            Tupla (preço, adicional GES/GHE) ou None se não houver registro
+        """
+        return self.indice_pgr.get((servico, regiao, grau_risco, faixa_trab))
+
+    def buscar_ambientais(self, servico, regiao, variavel):
+        """
+        Busca O(1) no índice de serviços ambientais.
+
+        Returns:
+            Tupla (preço, adicional GES/GHE) ou None se não houver registro
+        """
+        return self.indice_ambientais.get((servico, regiao, variavel))
+
+    def _cascata_pgr(self, servico, regiao, grau_risco, faixa_trab):
+        """
+        Aplica a cascata de fallback de PGR: região informada, região Central,
+        qualquer faixa, qualquer região e, por fim, o primeiro registro do arquivo.
+
+        Returns:
+            Tupla ((preço, adicional), regra) ou (None, None)
+        """
+        valor = self.buscar_pgr(servico, regiao, grau_risco, faixa_trab)
+        if valor is not None:
+            return valor, REGRA_EXATA
+
+        # Região Central (ou qualquer região, se a região pedida já era a Central)
+        valor = self.buscar_pgr(servico, 'Central' if regiao != 'Central' else None, grau_risco, faixa_trab)
+        if valor is not None:
+            return valor, REGRA_REGIAO_CENTRAL
+
+        # Qualquer faixa de trabalhadores (uma região vazia não corresponde a nenhum registro)
+        if regiao != 'Central':
+            valor = self.buscar_pgr(servico, regiao, grau_risco) if regiao else None
+        else:
+            valor = self.buscar_pgr(servico, None, grau_risco)
+        if valor is not None:
+            return valor, REGRA_QUALQUER_FAIXA
+
+        # Qualquer região e qualquer faixa
+        valor = self.buscar_pgr(servico, None, grau_risco)
+        if valor is not None:
+            return valor, REGRA_QUALQUER_REGIAO
+
+        if self.primeiro_pgr is not None:
+            return self.primeiro_pgr, REGRA_PRIMEIRO_REGISTRO
+        return None, None
+
+    def _cascata_ambientais(self, servico, regiao, variavel):
+        """
+        Aplica a cascata de fallback dos serviços ambientais: região Central quando a
+        região não tem preços, depois tipo de avaliação semelhante ou o primeiro disponível.
+
+        Returns:
+            ResolucaoPreco ou None
+        """
+        regra_regiao = None
+        variaveis = self.variaveis_ambientais.get((servico, regiao))
+        if not variaveis:
+            regiao = 'Central'
+            regra_regiao = REGRA_REGIAO_CENTRAL
+            variaveis = self.variaveis_ambientais.get((servico, regiao))
+            if not variaveis:
+                return None
+
+        regra_variavel = None
+        if variavel and (servico, regiao, variavel) in self.indice_ambientais:
+            variavel_efetiva = variavel
+        elif variavel:
+            # Tentar encontrar uma variável similar, senão usar a primeira disponível
+            variavel_efetiva = next((v for v in variaveis if variavel in v or v in variavel), None)
+            regra_variavel = REGRA_VARIAVEL_SIMILAR
+            if variavel_efetiva is None:
+                variavel_efetiva = variaveis[0]
+                regra_variavel = REGRA_PRIMEIRA_VARIAVEL
+        else:
+            variavel_efetiva = variaveis[0]
+            regra_variavel = REGRA_PRIMEIRA_VARIAVEL
+
+        preco, adicional = self.indice_ambientais[(servico, regiao, variavel_efetiva)]
+        avaliacao_adicional = self.indice_ambientais.get((servico, regiao, VARIAVEL_AVALIACAO_ADICIONAL))
+        return ResolucaoPreco(
+            preco,
+            adicional,
+            avaliacao_adicional[0] if avaliacao_adicional is not None else None,
+            _combinar_regras(regra_regiao, regra_variavel),
+            regiao,
+            variavel_efetiva
+        )
+
+    def _resolver_pgr(self, servico, regiao, grau_risco, faixa_trab):
+        """Cascata de PGR como ResolucaoPreco (None se não houver preços)"""
+        valor, regra = self._cascata_pgr(servico, regiao, grau_risco, faixa_trab)
+        if valor is None:
+            return None
+        return ResolucaoPreco(valor[0], valor[1], None, regra, regiao, None)
+
+    def _compilar_tensor_pgr(self):
+        """Compila a resolução de PGR em arrays densos de preço e de código de regra"""
+        # Código inteiro de cada valor, na ordem em que aparece no CSV
+        self.codigos_pgr = {coluna: {valor: i for i, valor in enumerate(valores)} for coluna, valores in self.valores_pgr.items()}
+
+        forma = tuple(len(self.codigos_pgr[coluna]) for coluna in COLUNAS_CHAVE_PGR)
+        self.tensor_pgr = np.full(forma, np.nan, dtype=np.float64)
+        self.regras_pgr = np.full(forma, -1, dtype=np.int8)
+        codigo_regra = {regra: i for i, regra in enumerate(REGRAS_TENSOR_PGR)}
+        # Só as células com todos os valores informados (as combinações com None não entram no tensor)
+        eixos = [self.codigos_pgr[coluna].items() for coluna in COLUNAS_CHAVE_PGR]
+        for celula in itertools.product(*eixos):
+            resolucao = self._resolver_pgr(*(valor for valor, _ in celula))
+            if resolucao is not None:
+                posicao = tuple(codigo for _, codigo in celula)
+                self.tensor_pgr[posicao] = resolucao.preco
+                self.regras_pgr[posicao] = codigo_regra[resolucao.regra]
+
+    def codificar_pgr(self, regioes, graus_risco, faixas_trab, servicos=None):
+        """
+        Converte sequências de valores do CSV em arrays de códigos para precificar_pgr.
+
+        Regiões desconhecidas são trocadas pela Central e faixas desconhecidas pela
+        primeira, como em resolver_pgr. Graus de risco e serviços desconhecidos recebem -1.
+
+        Args:
+            servicos: Sequência de serviços (opcional, padrão: primeiro serviço do CSV)
+
+        Returns:
+            Tupla (regiões, graus, faixas, serviços) de arrays numpy de inteiros
+        """
+        codigos = self.codigos_pgr
+        regiao_padrao = codigos['Região'].get('Central', -1)
+        faixa_padrao = 0 if codigos['Faixa_Trab'] else -1
+        regioes = np.fromiter((codigos['Região'].get(r, regiao_padrao) for r in regioes), dtype=np.intp)
+        graus = np.fromiter((codigos['Grau_Risco'].get(g, -1) for g in graus_risco), dtype=np.intp)
+        faixas = np.fromiter((codigos['Faixa_Trab'].get(f, faixa_padrao) for f in faixas_trab), dtype=np.intp)
+        if servicos is None:
+            servicos = np.zeros(len(regioes), dtype=np.intp)
+        else:
+            servicos = np.fromiter((codigos['Serviço'].get(s, -1) for s in servicos), dtype=np.intp)
+        return regioes, graus, faixas, servicos
+
+    def precificar_pgr(self, regioes, graus_risco, faixas_trab, servicos=0):
+        """
+        Precifica arrays de códigos (região, grau, faixa[, serviço]) em uma única indexação.
+
+        Os argumentos seguem as regras de broadcasting do numpy, de modo que é possível,
+        por exemplo, precificar todas as regiões com np.arange(n_regioes) e escalares
+        para o grau e a faixa. Códigos negativos resultam em NaN.
+
+        Returns:
+            Tupla (preços, códigos de regra) como arrays numpy; os códigos indexam REGRAS_TENSOR_PGR
+        """
+        regioes, graus, faixas, servicos = np.broadcast_arrays(
+            *(np.asarray(x, dtype=np.intp) for x in (regioes, graus_risco, faixas_trab, servicos))
+        )
+        validos = (regioes >= 0) & (graus >= 0) & (faixas >= 0) & (servicos >= 0)
+        if validos.all():
+            return self.tensor_pgr[servicos, regioes, graus, faixas], self.regras_pgr[servicos, regioes, graus, faixas]
+
+        precos = np.full(regioes.shape, np.nan, dtype=np.float64)
+        regras = np.full(regioes.shape, -1, dtype=np.int8)
+        indices = (servicos[validos], regioes[validos], graus[validos], faixas[validos])
+        precos[validos] = self.tensor_pgr[indices]
+        regras[validos] = self.regras_pgr[indices]
+        return precos, regras
+
+    def resolver_pgr(self, servico, regiao=None, grau_risco=None, faixa_trab=None):
+        """
+        Resolve o preço de PGR usando a tabela de resoluções do catálogo.
+
+        Regiões e faixas inexistentes no CSV são substituídas pela região Central e pela
+        primeira faixa, respectivamente. Valores vazios não restringem a busca.
+
+        Returns:
+            ResolucaoPreco ou None se o grau de risco não existir ou não houver preços
+        """
+        regra_normalizacao = None
+        if regiao and regiao not in self.valores_pgr['Região']:
+            regiao = 'Central'
+            regra_normalizacao = REGRA_REGIAO_DESCONHECIDA
+        if grau_risco and grau_risco not in self.valores_pgr['Grau_Risco']:
+            return None
+        if faixa_trab and faixa_trab not in self.valores_pgr['Faixa_Trab']:
+            faixa_trab = next(iter(self.valores_pgr['Faixa_Trab']), None)
+            regra_normalizacao = _combinar_regras(regra_normalizacao, REGRA_FAIXA_DESCONHECIDA)
+
+        chave = (servico, regiao or None, grau_risco or None, faixa_trab or None)
+        resultado = self.resolucao_pgr.get(chave)
+        if resultado is None:
+            # Combinação fora da tabela (ex.: região Central ausente no arquivo)
+            valor, regra = self._cascata_pgr(*chave)
+            if valor is None:
+                return None
+            resultado = ResolucaoPreco(valor[0], valor[1], None, regra, chave[1], None)
+
+        if regra_normalizacao:
+            resultado = resultado._replace(regra=_combinar_regras(regra_normalizacao, resultado.regra))
+        return resultado
+
+    def resolver_ambientais(self, servico, regiao=None, variavel=None):
+        """
+        Resolve o preço de um serviço ambiental usando a tabela de resoluções do catálogo.
+        Combinações com valores desconhecidos são resolvidas na hora pela mesma cascata.
+
+        Returns:
+            ResolucaoPreco ou None se não houver preços para o serviço
+        """
+        chave = (servico, regiao or None, variavel or None)
+        resultado = self.resolucao_ambientais.get(chave)
+        if resultado is None:
+            resultado = self._cascata_ambientais(*chave)
+        return resultado
+
+    def exportar(self):
+        """
+        Exporta o catálogo em uma estrutura compacta, serializável em JSON, para que o
+        navegador preencha os formulários e pré-visualize preços sem consultar o servidor.
+
+        - pgr: eixos do tensor (regiões, graus de risco, faixas) e, por serviço, as
+          matrizes região x grau x faixa de preços e de códigos de regra (REGRAS_TENSOR_PGR)
+        - ambientais: serviço -> região -> tipo de avaliação ->
+          [preço, adicional GES/GHE, preço da avaliação adicional, regra], já resolvidos
+        - regioes / variaveis: opções de cada serviço (e região), como nas rotas /api/*
+
+        Returns:
+            dict
+        """
+        precos_pgr = np.where(np.isnan(self.tensor_pgr), None, self.tensor_pgr.astype(object))
+        pgr = {
+            'regioes': list(self.codigos_pgr['Região']),
+            'graus_risco': list(self.codigos_pgr['Grau_Risco']),
+            'faixas_trab': list(self.codigos_pgr['Faixa_Trab']),
+            'regras': list(REGRAS_TENSOR_PGR),
+            'servicos': {
+                servico: {'precos': precos_pgr[i].tolist(), 'regras': self.regras_pgr[i].tolist()}
+                for servico, i in self.codigos_pgr['Serviço'].items()
+            }
+        }
+
+        ambientais = {}
+        for (servico, regiao, variavel), resolucao in self.resolucao_ambientais.items():
+            if regiao is None or variavel is None:
+                continue
+            adicional = resolucao.adicional_ges_ghe
+            ambientais.setdefault(servico, {}).setdefault(regiao, {})[variavel] = [
+                resolucao.preco,
+                None if adicional is None else float(adicional),
+                resolucao.preco_avaliacao_adicional,
+                resolucao.regra
+            ]
+
+        regioes = {}
+        for servico, regiao, grau, faixa in self.indice_pgr:
+            if regiao is not None and grau is None and faixa is None:
+                regioes.setdefault(servico, []).append(regiao)
+        variaveis = {}
+        for (servico, regiao), tipos in self.variaveis_ambientais.items():
+            regioes.setdefault(servico, []).append(regiao)
+            variaveis.setdefault(servico, {})[regiao] = sorted(tipos)
+        for lista in regioes.values():
+            lista.sort()
+
+        return {
+            'servicos': self.servicos,
+            'regioes': regioes,
+            'variaveis': variaveis,
+            'pgr': pgr,
+            'ambientais': ambientais
+        }
+
+    def como_dicionario(self):
+        """Retorna as tabelas no formato usado por carregar_dados_excel"""
+        dados = {}
+        if self.pgr is not None:
+            dados['pgr'] = self.pgr
+        if self.ambientais is not None:
+            dados['ambientais'] = self.ambientais
+        return dados
+
+
+class CatalogoPrecos:
+    """
+    Catálogo de preços compartilhado pelo processo.
+
+    Os arquivos CSV são lidos uma única vez e relidos apenas quando o mtime de
+    algum deles (ou do catálogo compilado) muda. A verificação custa um os.stat por
+    arquivo.
+
+    Se `compilado_path` apontar para um catálogo compilado (flask compilar-catalogo)
+    gerado a partir dos CSVs atuais, ele é mapeado em memória no lugar da leitura dos
+    CSVs e do pré-cálculo das resoluções; ausente ou desatualizado, os CSVs são lidos.
+    Os workers do gunicorn que mapeiam o mesmo arquivo (carregado antes do fork, com
+    --preload, ou depois) compartilham uma única cópia física pelo cache de páginas.
+    Para trocar o catálogo, grava-se um novo arquivo e renomeia-se por cima do atual:
+    cada processo passa ao novo na próxima chamada de obter(), e as requisições em
+    andamento terminam com a fotografia anterior.
+    """
+
+    def __init__(self, pgr_path, ambientais_path, compilado_path=None):
+        self.pgr_path = str(pgr_path)
+        self.ambientais_path = str(ambientais_path)
+        self.compilado_path = str(compilado_path) if compilado_path else None
+        self._lock = threading.Lock()
+        self._mtimes = None
+        self._dados = DadosCatalogo()
+        if hasattr(os, 'register_at_fork'):
+            # Um worker criado enquanto outra thread recarregava o catálogo (ex.: o
+            # aquecimento com --preload) herdaria o lock ocupado para sempre
+            os.register_at_fork(after_in_child=self._renovar_lock)
+
+    def _renovar_lock(self):
+        self._lock = threading.Lock()
+
+    def _obter_mtimes(self):
+        """Retorna a tupla de mtimes dos arquivos (None para arquivos inexistentes)"""
+        mtimes = []
+        for caminho in (self.pgr_path, self.ambientais_path, self.compilado_path):
+            if caminho is None:
+                mtimes.append(None)
+                continue
+            try:
+                mtimes.append(os.stat(caminho).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
+
+    def _ler_csv(self, caminho, descricao):
+        """Lê um arquivo CSV, retornando None em caso de erro"""
+        if not os.path.exists(caminho):
+            logger.error(f"Arquivo não encontrado: {caminho}")
+            return None
+        try:
+            return TabelaPrecos.ler(caminho)
+        except Exception as e:
+            logger.error(f"Erro ao ler arquivo {descricao}: {str(e)}")
+            return None
+
+    def _carregar(self):
+        """Monta uma nova fotografia do catálogo (do catálogo compilado ou dos CSVs)"""
+        if self.compilado_path:
+            from services.catalogo_compilado import carregar_compilado
+            dados = carregar_compilado(self.compilado_path, self.pgr_path, self.ambientais_path)
+            if dados is not None:
+                return dados
+        pgr = self._ler_csv(self.pgr_path, 'PGR')
+        ambientais = self._ler_csv(self.ambientais_path, 'Ambientais')
+        logger.info(f"Catálogo de preços carregado: PGR={0 if pgr is None else len(pgr)} registros, Ambientais={0 if ambientais is None else len(ambientais)} registros")
+        return DadosCatalogo(pgr, ambientais)
+
+    def obter(self):
+        """
+        Retorna a fotografia atual do catálogo, recarregando os arquivos se
+        algum deles tiver sido alterado desde a última leitura.
+
+        Returns:
+            DadosCatalogo
+        """
+        mtimes = self._obter_mtimes()
+        if mtimes != self._mtimes:
+            with self._lock:
+                if mtimes != self._mtimes:
+                    self._dados = self._carregar()
+                    self._mtimes = mtimes
+        return self._dados
+
+    def invalidar(self):
+        """Força a releitura dos arquivos na próxima chamada de obter()"""
+        with self._lock:
+            self._mtimes = None
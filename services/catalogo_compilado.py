@@ -0,0 +1,751 @@
+import os
+import math
+import mmap
+import time
+import struct
+import hashlib
+import tempfile
+import itertools
+import logging
+from collections import Counter
+from collections.abc import Mapping
+from functools import partial
+from datetime import datetime
+import numpy as np
+
+from services.catalogo import (
+    TabelaPrecos, DadosCatalogo, ResolucaoPreco, COLUNAS_CHAVE_PGR, COLUNAS_CHAVE_AMBIENTAIS, REGRAS_TENSOR_PGR
+)
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+# Catálogo compilado: os dois CSVs validados, com todas as resoluções de preço já
+# calculadas, gravados como arrays do NumPy em um único arquivo que é mapeado em memória
+# (somente leitura). O arquivo começa com o prefixo (identificação, versão do formato e
+# tamanho do cabeçalho), seguido do cabeçalho em MessagePack (versão dos dados, SHA-256
+# dos CSVs de origem e a posição de cada array) e dos arrays, alinhados a 64 bytes.
+MAGICO = b'PRECOCAT'
+FORMATO = 2  # incrementar ao mudar a estrutura: arquivos de outro formato são ignorados
+NOME_ARQUIVO = 'catalogo.bin'
+
+_PREFIXO = struct.Struct('<8sII')
+_ALINHAMENTO = 64
+
+# Tipos das colunas: códigos da tabela de textos (-1 para vazio) ou float64 (NaN para vazio)
+TEXTO = 'texto'
+NUMERO = 'numero'
+
+# Marcador de "nenhuma linha" no cálculo das primeiras linhas (depois trocado por -1)
+_SEM_LINHA = np.iinfo(np.int32).max
+
+
+class _TabelaTextos:
+    """
+    Textos distintos do catálogo (células, chaves e regras): cada um é gravado uma única
+    vez, em UTF-8, e referenciado pelo seu código (-1 para vazio). No arquivo ficam os
+    bytes concatenados e a tabela de offsets (o texto i ocupa offsets[i]:offsets[i + 1]).
+    """
+
+    def __init__(self):
+        self.textos = []
+        self._codigos = {}
+
+    def codigo(self, texto):
+        if texto is None:
+            return -1
+        codigo = self._codigos.get(texto)
+        if codigo is None:
+            codigo = self._codigos[texto] = len(self.textos)
+            self.textos.append(texto)
+        return codigo
+
+    def codificar(self, textos):
+        return np.fromiter(map(self.codigo, textos), dtype=np.int32, count=len(textos))
+
+    def arrays(self):
+        """Retorna os arrays (offsets, bytes)"""
+        codificados = [texto.encode('utf-8') for texto in self.textos]
+        offsets = np.zeros(len(codificados) + 1, dtype=np.int64)
+        np.cumsum([len(texto) for texto in codificados], out=offsets[1:])
+        return offsets, np.frombuffer(b''.join(codificados), dtype=np.uint8)
+
+
+def _ler_textos(offsets, dados):
+    """Decodifica a tabela de textos; o None final é o destino do código -1"""
+    bruto = dados.tobytes()
+    limites = offsets.tolist()
+    return [bruto[inicio:fim].decode('utf-8') for inicio, fim in zip(limites, limites[1:])] + [None]
+
+
+def _opcional(valor):
+    """Converte um número de um array em float, ou em None se for NaN (célula vazia)"""
+    valor = float(valor)
+    return None if math.isnan(valor) else valor
+
+
+def _posicoes(valores, codigos, tipo=np.intp):
+    """Posição de cada valor no seu eixo"""
+    return np.fromiter(map(codigos.__getitem__, valores), dtype=tipo, count=len(valores))
+
+
+def _menor_linha(linhas, eixo):
+    """Menor linha válida ao longo de um eixo (-1 onde não há nenhuma)"""
+    menores = np.where(linhas >= 0, linhas, _SEM_LINHA).min(axis=eixo)
+    return np.where(menores == _SEM_LINHA, -1, menores)
+
+
+def _chaves_por_linha(linhas, eixos):
+    """Chaves (tuplas de valores dos eixos) das posições com linha válida, na ordem do CSV"""
+    posicoes = np.argwhere(linhas >= 0)
+    ordem = np.argsort(linhas[tuple(posicoes.T)], kind='stable')
+    return [tuple(eixo[i] for eixo, i in zip(eixos, posicao)) for posicao in posicoes[ordem].tolist()]
+
+
+def _agrupar_por_linha(linhas, chaves, valores):
+    """
+    Para cada linha de uma matriz (chave x valor) de primeiras linhas do CSV, os valores
+    presentes na ordem em que aparecem no arquivo, como em _valores_por_chave
+    """
+    agrupados = {}
+    for chave, primeiras in zip(chaves, linhas):
+        presentes = np.flatnonzero(primeiras >= 0)
+        if len(presentes):
+            ordem = presentes[np.argsort(primeiras[presentes], kind='stable')]
+            agrupados[chave] = [valores[i] for i in ordem.tolist()]
+    return agrupados
+
+
+class _ColunasMapeadas(Mapping):
+    """Colunas de uma TabelaMapeada: nome -> lista de valores, montada a cada acesso"""
+
+    def __init__(self, colunas, textos):
+        self._colunas = colunas  # nome -> (tipo, array)
+        self._textos = textos
+
+    def __getitem__(self, nome):
+        tipo, valores = self._colunas[nome]
+        if tipo == TEXTO:
+            return list(map(self._textos.__getitem__, valores.tolist()))
+        return [None if math.isnan(valor) else valor for valor in valores.tolist()]
+
+    def __contains__(self, nome):
+        return nome in self._colunas
+
+    def __iter__(self):
+        return iter(self._colunas)
+
+    def __len__(self):
+        return len(self._colunas)
+
+    def valor(self, nome, indice):
+        tipo, valores = self._colunas[nome]
+        if tipo == TEXTO:
+            return self._textos[valores[indice]]
+        return _opcional(valores[indice])
+
+
+class TabelaMapeada(TabelaPrecos):
+    """
+    TabelaPrecos cujas colunas são arrays do catálogo compilado. As listas de valores
+    só são montadas quando uma coluna é pedida (tabela['Região']); o catálogo consulta
+    os arrays diretamente.
+    """
+
+    def __init__(self, colunas, textos, assinatura):
+        super().__init__(_ColunasMapeadas(colunas, textos), assinatura)
+        self._tamanho = len(next(iter(colunas.values()))[1]) if colunas else 0
+
+    def __len__(self):
+        return self._tamanho
+
+    def linha(self, indice):
+        return {nome: self.colunas.valor(nome, indice) for nome in self.colunas}
+
+
+class _IndiceMapeado(Mapping):
+    """
+    Índice chave -> (preço, adicional GES/GHE) do primeiro registro do CSV, a partir do
+    array com a linha de cada combinação de posições (-1 se não houver registro)
+    """
+
+    def __init__(self, linhas, posicoes, eixos, precos, adicionais):
+        self._linhas = linhas
+        self._posicoes = posicoes  # por componente da chave: valor -> posição no eixo
+        self._eixos = eixos
+        self._precos = precos
+        self._adicionais = adicionais
+
+    def _linha(self, chave):
+        try:
+            posicao = tuple(posicoes[valor] for posicoes, valor in zip(self._posicoes, chave))
+        except (KeyError, TypeError):
+            return -1
+        if len(posicao) != len(self._posicoes):
+            return -1
+        return int(self._linhas[posicao])
+
+    def valor(self, linha):
+        adicional = None if self._adicionais is None else _opcional(self._adicionais[linha])
+        return float(self._precos[linha]), adicional
+
+    def __getitem__(self, chave):
+        linha = self._linha(chave)
+        if linha < 0:
+            raise KeyError(chave)
+        return self.valor(linha)
+
+    def __contains__(self, chave):
+        return self._linha(chave) >= 0
+
+    def __iter__(self):
+        return iter(_chaves_por_linha(self._linhas, self._eixos))
+
+    def __len__(self):
+        return int(np.count_nonzero(self._linhas >= 0))
+
+
+class _VariaveisMapeadas(Mapping):
+    """(serviço, região) -> tipos de avaliação na ordem do CSV"""
+
+    def __init__(self, ordem, primeiras, posicoes, eixos, variaveis):
+        self._ordem = ordem            # (serviço, região, i) -> posição do i-ésimo tipo (-1 ao final)
+        self._primeiras = primeiras    # (serviço, região) -> primeira linha do CSV
+        self._posicoes = posicoes
+        self._eixos = eixos
+        self._variaveis = variaveis
+        self._listas = {}
+
+    def __getitem__(self, chave):
+        lista = self._listas.get(chave)
+        if lista is None:
+            try:
+                servico, regiao = (posicoes[valor] for posicoes, valor in zip(self._posicoes, chave))
+            except (KeyError, TypeError, ValueError):
+                raise KeyError(chave)
+            lista = [self._variaveis[i] for i in self._ordem[servico, regiao].tolist() if i >= 0]
+            if not lista:
+                raise KeyError(chave)
+            self._listas[chave] = lista
+        return lista
+
+    def __iter__(self):
+        return iter(_chaves_por_linha(self._primeiras, self._eixos))
+
+    def __len__(self):
+        return int(np.count_nonzero(self._primeiras >= 0))
+
+
+class _ResolucaoMapeada(Mapping):
+    """
+    Resoluções pré-calculadas, lidas dos arrays (nos eixos, a última posição é a de
+    None). Cada ResolucaoPreco consultada com get é guardada, de modo que as combinações
+    usadas pelas requisições custam uma consulta de dicionário.
+
+    Args:
+        posicoes: Por componente da chave, valor -> posição no eixo
+        eixos: Por componente da chave, os valores na ordem das posições
+        campos: Nome do campo -> array com os eixos acima (com 'regra': -1 onde não há resolução)
+        montar: Função (campos, chave, posição) -> ResolucaoPreco
+    """
+
+    def __init__(self, posicoes, eixos, campos, montar):
+        self._posicoes = posicoes
+        self._eixos = eixos
+        self._campos = campos
+        self._regras = campos['regra']
+        self._montar_resolucao = montar
+        self._consultadas = {}
+
+    def _posicao(self, chave):
+        try:
+            posicao = tuple(posicoes[valor] for posicoes, valor in zip(self._posicoes, chave))
+        except (KeyError, TypeError):
+            return None
+        if len(posicao) != len(self._posicoes) or self._regras[posicao] < 0:
+            return None
+        return posicao
+
+    def _montar(self, chave, posicao):
+        return self._montar_resolucao(self._campos, chave, posicao)
+
+    def get(self, chave, padrao=None):
+        resultado = self._consultadas.get(chave)
+        if resultado is None:
+            posicao = self._posicao(chave)
+            if posicao is None:
+                return padrao
+            resultado = self._consultadas[chave] = self._montar(chave, posicao)
+        return resultado
+
+    def __getitem__(self, chave):
+        posicao = self._posicao(chave)
+        if posicao is None:
+            raise KeyError(chave)
+        return self._montar(chave, posicao)
+
+    def __iter__(self):
+        for posicao in np.argwhere(self._regras >= 0).tolist():
+            yield tuple(eixo[i] for eixo, i in zip(self._eixos, posicao))
+
+    def __len__(self):
+        return int(np.count_nonzero(self._regras >= 0))
+
+    def items(self):
+        # Na mesma ordem da resolução feita a partir dos CSVs (eixos na ordem do arquivo, None ao final)
+        for posicao in np.argwhere(self._regras >= 0).tolist():
+            chave = tuple(eixo[i] for eixo, i in zip(self._eixos, posicao))
+            yield chave, self._montar(chave, tuple(posicao))
+
+    def values(self):
+        return (resolucao for _, resolucao in self.items())
+
+
+def _montar_resolucao_pgr(campos, chave, posicao):
+    """ResolucaoPreco de PGR na posição dada (a região é a da própria chave)"""
+    return ResolucaoPreco(
+        float(campos['preco'][posicao]),
+        _opcional(campos['adicional'][posicao]),
+        None,
+        REGRAS_TENSOR_PGR[campos['regra'][posicao]],
+        chave[1],
+        None
+    )
+
+
+def _montar_resolucao_ambientais(textos, campos, chave, posicao):
+    """ResolucaoPreco de serviço ambiental na posição dada (regra, região e variável são códigos de textos)"""
+    return ResolucaoPreco(
+        float(campos['preco'][posicao]),
+        _opcional(campos['adicional'][posicao]),
+        _opcional(campos['preco_avaliacao_adicional'][posicao]),
+        textos[campos['regra'][posicao]],
+        textos[campos['regiao'][posicao]],
+        textos[campos['variavel'][posicao]]
+    )
+
+
+class DadosCatalogoMapeado(DadosCatalogo):
+    """
+    DadosCatalogo lido de um catálogo compilado mapeado em memória.
+
+    Colunas, índices e resoluções ficam nos arrays do arquivo (somente leitura): os
+    workers que mapeiam o mesmo arquivo compartilham uma única cópia física pelo cache
+    de páginas do sistema operacional, inclusive após um fork (gunicorn --preload).
+    Cada processo monta apenas objetos pequenos (textos distintos, eixos e listas por
+    serviço) e as resoluções efetivamente consultadas. A cascata de fallback, a
+    exportação e a precificação vetorizada são as de DadosCatalogo.
+    """
+
+    def __init__(self, mapa, cabecalho, arrays):
+        # Os atributos de DadosCatalogo são montados aqui, sem o pré-cálculo
+        self._mapa = mapa
+        self.versao = cabecalho['versao']
+        textos = _ler_textos(arrays['textos/offsets'], arrays['textos/dados'])
+
+        tabelas = {}
+        for nome in ('pgr', 'ambientais'):
+            colunas = {coluna: (tipo, arrays[f'{nome}/{coluna}']) for coluna, tipo in cabecalho['colunas'][nome]}
+            tabelas[nome] = TabelaMapeada(colunas, textos, cabecalho['fontes'][nome]['sha256'])
+        self.pgr = tabelas['pgr']
+        self.ambientais = tabelas['ambientais']
+
+        eixos_pgr = {coluna: [textos[i] for i in arrays[f'eixos/pgr/{coluna}'].tolist()] for coluna in COLUNAS_CHAVE_PGR}
+        eixos_ambientais = {coluna: [textos[i] for i in arrays[f'eixos/ambientais/{coluna}'].tolist()]
+                            for coluna in COLUNAS_CHAVE_AMBIENTAIS}
+        self.valores_pgr = {coluna: dict.fromkeys(eixo) for coluna, eixo in eixos_pgr.items()}
+        self.valores_ambientais = {coluna: dict.fromkeys(eixo) for coluna, eixo in eixos_ambientais.items()}
+        self.servicos = sorted(set(self.valores_pgr['Serviço']) | set(self.valores_ambientais['Serviço']))
+        self.codigos_pgr = {coluna: {valor: i for i, valor in enumerate(eixo)} for coluna, eixo in eixos_pgr.items()}
+        codigos_ambientais = {coluna: {valor: i for i, valor in enumerate(eixo)} for coluna, eixo in eixos_ambientais.items()}
+
+        # Nos eixos das resoluções e do índice de PGR, None ocupa a última posição
+        def livres(codigos, eixos, colunas_chave):
+            posicoes = [codigos[colunas_chave[0]]] + [{**codigos[c], None: len(codigos[c])} for c in colunas_chave[1:]]
+            return posicoes, [eixos[colunas_chave[0]]] + [eixos[c] + [None] for c in colunas_chave[1:]]
+
+        posicoes_pgr, eixos_pgr_livres = livres(self.codigos_pgr, eixos_pgr, COLUNAS_CHAVE_PGR)
+        posicoes_ambientais_livres, eixos_ambientais_livres = livres(codigos_ambientais, eixos_ambientais, COLUNAS_CHAVE_AMBIENTAIS)
+        posicoes_ambientais = [codigos_ambientais[c] for c in COLUNAS_CHAVE_AMBIENTAIS]
+
+        self.indice_pgr = _IndiceMapeado(
+            arrays['indice_pgr'], posicoes_pgr, eixos_pgr_livres,
+            arrays['pgr/Preço'], arrays.get('pgr/Adicional_GES_GHE')
+        )
+        self.primeiro_pgr = self.indice_pgr.valor(0) if len(self.pgr) else None
+        linhas_ambientais = arrays['indice_ambientais']
+        self.indice_ambientais = _IndiceMapeado(
+            linhas_ambientais, posicoes_ambientais, [eixos_ambientais[c] for c in COLUNAS_CHAVE_AMBIENTAIS],
+            arrays['ambientais/Preço'], arrays.get('ambientais/Adicional_GES_GHE')
+        )
+        primeiras_pares = _menor_linha(linhas_ambientais, 2)
+        self.variaveis_ambientais = _VariaveisMapeadas(
+            arrays['variaveis_ambientais'], primeiras_pares, posicoes_ambientais[:2],
+            [eixos_ambientais['Serviço'], eixos_ambientais['Região']], eixos_ambientais['Tipo_Avaliacao']
+        )
+
+        # Listas por serviço, na ordem do CSV (primeira linha de cada par)
+        self.regioes_pgr = _agrupar_por_linha(arrays['indice_pgr'][:, :-1, -1, -1], eixos_pgr['Serviço'], eixos_pgr['Região'])
+        self.regioes_ambientais = _agrupar_por_linha(primeiras_pares, eixos_ambientais['Serviço'], eixos_ambientais['Região'])
+        self.tipos_ambientais = _agrupar_por_linha(_menor_linha(linhas_ambientais, 1), eixos_ambientais['Serviço'],
+                                                   eixos_ambientais['Tipo_Avaliacao'])
+        self.servicos_com_adicional = set()
+        if 'ambientais/Adicional_GES_GHE' in arrays:
+            com_adicional = arrays['ambientais/Serviço'][arrays['ambientais/Adicional_GES_GHE'] > 0]
+            self.servicos_com_adicional = {textos[i] for i in np.unique(com_adicional).tolist()}
+
+        self.resolucao_pgr = _ResolucaoMapeada(posicoes_pgr, eixos_pgr_livres, {
+            campo: arrays[f'resolucao_pgr/{campo}'] for campo in ('preco', 'adicional', 'regra')
+        }, _montar_resolucao_pgr)
+        self.resolucao_ambientais = _ResolucaoMapeada(posicoes_ambientais_livres, eixos_ambientais_livres, {
+            campo: arrays[f'resolucao_ambientais/{campo}']
+            for campo in ('preco', 'adicional', 'preco_avaliacao_adicional', 'regra', 'regiao', 'variavel')
+        }, partial(_montar_resolucao_ambientais, textos))
+
+        # Tensor de PGR: as resoluções sem None, vistas dos mesmos arrays
+        self.tensor_pgr = arrays['resolucao_pgr/preco'][:, :-1, :-1, :-1]
+        self.regras_pgr = arrays['resolucao_pgr/regra'][:, :-1, :-1, :-1]
+
+
+def _preco_invalido(valor):
+    if isinstance(valor, str):
+        try:
+            valor = float(valor)
+        except ValueError:
+            return True
+    return math.isnan(valor) or valor < 0
+
+
+def validar_tabela(tabela, descricao, colunas_chave):
+    """
+    Verifica uma tabela de preços antes da compilação.
+
+    Erros: arquivo sem registros, colunas ausentes, chaves vazias ou só numéricas (o
+    formulário envia textos) e preços (ou adicionais GES/GHE) vazios, não numéricos ou
+    negativos. Avisos: chaves repetidas (vale o primeiro registro) e ausência da região
+    Central, usada pelos fallbacks.
+
+    Args:
+        tabela: TabelaPrecos
+        descricao: Nome do arquivo, usado nas mensagens
+        colunas_chave: Colunas que compõem a chave de busca
+
+    Returns:
+        Tupla (erros, avisos) com listas de mensagens
+    """
+    erros = []
+    avisos = []
+    if tabela.vazia:
+        return [f"{descricao}: arquivo sem registros"], avisos
+    ausentes = [coluna for coluna in colunas_chave + ('Preço',) if coluna not in tabela]
+    if ausentes:
+        return [f"{descricao}: colunas ausentes: {', '.join(ausentes)}"], avisos
+
+    for coluna in colunas_chave:
+        vazias = [i for i, valor in enumerate(tabela[coluna]) if valor is None]
+        if vazias:
+            erros.append(f"{descricao}: coluna {coluna} vazia em {len(vazias)} registro(s) (ex.: registro {vazias[0] + 1})")
+        elif not all(isinstance(valor, str) for valor in tabela[coluna]):
+            erros.append(f"{descricao}: coluna {coluna} só tem números; as chaves devem ser textos")
+    for coluna, obrigatoria in (('Preço', True), ('Adicional_GES_GHE', False)):
+        if coluna not in tabela:
+            continue
+        invalidos = [i for i, valor in enumerate(tabela[coluna])
+                     if (obrigatoria if valor is None else _preco_invalido(valor))]
+        if invalidos:
+            exemplo = tabela[coluna][invalidos[0]]
+            erros.append(f"{descricao}: {coluna} vazio, não numérico ou negativo em {len(invalidos)} registro(s) "
+                         f"(ex.: registro {invalidos[0] + 1}: {exemplo!r})")
+
+    repetidas = [chave for chave, n in Counter(zip(*(tabela[coluna] for coluna in colunas_chave))).items() if n > 1]
+    if repetidas:
+        avisos.append(f"{descricao}: {len(repetidas)} chave(s) repetida(s), vale o primeiro registro "
+                      f"(ex.: {' / '.join(map(str, repetidas[0]))})")
+    if 'Central' not in tabela['Região']:
+        avisos.append(f"{descricao}: nenhum preço na região Central, usada quando a região não tem preço")
+    return erros, avisos
+
+
+def _primeiras_linhas(forma, indices, linhas):
+    """Primeira linha de cada posição de `forma` em que os índices caem (-1 se nenhuma)"""
+    primeiras = np.full(forma, _SEM_LINHA, dtype=np.int32)
+    for indice in indices:
+        np.minimum.at(primeiras, indice, linhas)
+    return primeiras
+
+
+def _montar_arrays(dados):
+    """
+    Converte um DadosCatalogo (lido dos CSVs já validados) nos arrays do catálogo compilado
+
+    Returns:
+        Tupla (arrays, colunas): nome -> array e, por tabela, a lista [coluna, tipo]
+    """
+    textos = _TabelaTextos()
+    arrays = {}
+    colunas = {}
+    posicoes_linhas = {}
+    for nome, tabela, colunas_chave, valores in (('pgr', dados.pgr, COLUNAS_CHAVE_PGR, dados.valores_pgr),
+                                                 ('ambientais', dados.ambientais, COLUNAS_CHAVE_AMBIENTAIS, dados.valores_ambientais)):
+        colunas[nome] = []
+        for coluna, conteudo in tabela.colunas.items():
+            if any(isinstance(valor, str) for valor in conteudo):
+                arrays[f'{nome}/{coluna}'] = textos.codificar(conteudo)
+                colunas[nome].append([coluna, TEXTO])
+            else:
+                arrays[f'{nome}/{coluna}'] = np.array([math.nan if valor is None else valor for valor in conteudo], dtype=np.float64)
+                colunas[nome].append([coluna, NUMERO])
+        for coluna in colunas_chave:
+            arrays[f'eixos/{nome}/{coluna}'] = textos.codificar(list(valores[coluna]))
+            posicoes_linhas[(nome, coluna)] = _posicoes(tabela[coluna], {valor: i for i, valor in enumerate(valores[coluna])})
+
+    # Primeira linha de cada chave de PGR, inclusive com região, grau e faixa livres
+    # (a posição extra de cada eixo), como as chaves parciais de indice_pgr
+    servicos, *demais = (posicoes_linhas[('pgr', coluna)] for coluna in COLUNAS_CHAVE_PGR)
+    tamanhos = [len(dados.valores_pgr[coluna]) for coluna in COLUNAS_CHAVE_PGR[1:]]
+    indices = [
+        (servicos,) + tuple(np.full(len(servicos), tamanho) if livre else posicoes
+                            for livre, posicoes, tamanho in zip(livres, demais, tamanhos))
+        for livres in itertools.product((False, True), repeat=len(demais))
+    ]
+    forma = (len(dados.valores_pgr['Serviço']),) + tuple(tamanho + 1 for tamanho in tamanhos)
+    primeiras = _primeiras_linhas(forma, indices, np.arange(len(dados.pgr), dtype=np.int32))
+    arrays['indice_pgr'] = np.where(primeiras == _SEM_LINHA, -1, primeiras).astype(np.int32)
+
+    # Primeira linha de cada chave de serviços ambientais e a ordem dos tipos de avaliação
+    indice = tuple(posicoes_linhas[('ambientais', coluna)] for coluna in COLUNAS_CHAVE_AMBIENTAIS)
+    forma = tuple(len(dados.valores_ambientais[coluna]) for coluna in COLUNAS_CHAVE_AMBIENTAIS)
+    primeiras = _primeiras_linhas(forma, [indice], np.arange(len(dados.ambientais), dtype=np.int32))
+    ordem = np.argsort(primeiras, axis=2, kind='stable')
+    ordenadas = np.take_along_axis(primeiras, ordem, axis=2)
+    arrays['variaveis_ambientais'] = np.where(ordenadas == _SEM_LINHA, -1, ordem).astype(np.int32)
+    arrays['indice_ambientais'] = np.where(primeiras == _SEM_LINHA, -1, primeiras).astype(np.int32)
+
+    # Resoluções: eixos na ordem do CSV, com None na última posição
+    def resolucoes(resolucao, valores, colunas_chave):
+        forma = (len(valores[colunas_chave[0]]),) + tuple(len(valores[coluna]) + 1 for coluna in colunas_chave[1:])
+        codigos = [{valor: i for i, valor in enumerate(valores[colunas_chave[0]])}] + [
+            {**{valor: i for i, valor in enumerate(valores[coluna])}, None: len(valores[coluna])}
+            for coluna in colunas_chave[1:]
+        ]
+        # As resoluções são calculadas ao percorrer o mapeamento: uma única passada
+        itens = list(resolucao.items())
+        chaves, resolvidas = zip(*itens) if itens else ((), ())
+        posicao = tuple(_posicoes(componente, codigos_componente)
+                        for componente, codigos_componente in zip(zip(*chaves), codigos))
+        campos = list(zip(*resolvidas)) or [()] * len(ResolucaoPreco._fields)
+        return forma, posicao, dict(zip(ResolucaoPreco._fields, campos))
+
+    def preencher(forma, posicao, valores, tipo, vazio):
+        array = np.full(forma, vazio, dtype=tipo)
+        if posicao:
+            array[posicao] = valores
+        return array
+
+    def numeros(valores):
+        return np.array([math.nan if valor is None else valor for valor in valores], dtype=np.float64)
+
+    forma, posicao, campos = resolucoes(dados.resolucao_pgr, dados.valores_pgr, COLUNAS_CHAVE_PGR)
+    codigo_regra = {regra: i for i, regra in enumerate(REGRAS_TENSOR_PGR)}
+    arrays['resolucao_pgr/preco'] = preencher(forma, posicao, numeros(campos['preco']), np.float64, np.nan)
+    arrays['resolucao_pgr/adicional'] = preencher(forma, posicao, numeros(campos['adicional_ges_ghe']), np.float64, np.nan)
+    arrays['resolucao_pgr/regra'] = preencher(forma, posicao, _posicoes(campos['regra'], codigo_regra, np.int8), np.int8, -1)
+
+    forma, posicao, campos = resolucoes(dados.resolucao_ambientais, dados.valores_ambientais, COLUNAS_CHAVE_AMBIENTAIS)
+    for campo, nome in (('preco', 'preco'), ('adicional_ges_ghe', 'adicional'),
+                        ('preco_avaliacao_adicional', 'preco_avaliacao_adicional')):
+        arrays[f'resolucao_ambientais/{nome}'] = preencher(forma, posicao, numeros(campos[campo]), np.float64, np.nan)
+    for campo in ('regra', 'regiao', 'variavel'):
+        arrays[f'resolucao_ambientais/{campo}'] = preencher(forma, posicao, textos.codificar(campos[campo]), np.int32, -1)
+
+    arrays['textos/offsets'], arrays['textos/dados'] = textos.arrays()
+    return arrays, colunas
+
+
+def _alinhar(posicao):
+    return -(-posicao // _ALINHAMENTO) * _ALINHAMENTO
+
+
+def _serializar(cabecalho, arrays):
+    """Monta o conteúdo do arquivo: prefixo, cabeçalho (com a posição de cada array) e arrays alinhados"""
+    import msgspec
+
+    diretorio = {}
+    posicao = 0
+    for nome, array in arrays.items():
+        posicao = _alinhar(posicao)
+        diretorio[nome] = [array.dtype.str, list(array.shape), posicao]
+        posicao += array.nbytes
+    codificado = msgspec.msgpack.encode(dict(cabecalho, arrays=diretorio))
+    inicio = _alinhar(_PREFIXO.size + len(codificado))
+
+    conteudo = bytearray(inicio + posicao)
+    conteudo[:_PREFIXO.size] = _PREFIXO.pack(MAGICO, FORMATO, len(codificado))
+    conteudo[_PREFIXO.size:_PREFIXO.size + len(codificado)] = codificado
+    for nome, array in arrays.items():
+        deslocamento = inicio + diretorio[nome][2]
+        conteudo[deslocamento:deslocamento + array.nbytes] = np.ascontiguousarray(array).tobytes()
+    return conteudo
+
+
+def _gravar(caminho, conteudo):
+    """
+    Grava em um arquivo temporário e renomeia: quem lê nunca vê um arquivo parcial, e os
+    processos que mapearam o arquivo anterior continuam com ele até recarregarem o catálogo
+    """
+    diretorio = os.path.dirname(os.path.abspath(caminho))
+    os.makedirs(diretorio, exist_ok=True)
+    descritor, temporario = tempfile.mkstemp(dir=diretorio, prefix='.catalogo-', suffix='.tmp')
+    try:
+        with os.fdopen(descritor, 'wb') as f:
+            f.write(conteudo)
+        os.chmod(temporario, 0o644)
+        os.replace(temporario, caminho)
+    except BaseException:
+        try:
+            os.remove(temporario)
+        except OSError:
+            pass
+        raise
+
+
+def compilar_catalogo(pgr_path, ambientais_path, destino):
+    """
+    Valida Precos_PGR.csv e Precos_Ambientais.csv, resolve todas as combinações de preço
+    (a cascata de fallback) e grava o catálogo compilado em `destino`. Nada é gravado se
+    a validação encontrar erros.
+
+    Args:
+        pgr_path: Caminho do Precos_PGR.csv
+        ambientais_path: Caminho do Precos_Ambientais.csv
+        destino: Arquivo a gravar (substituído de forma atômica)
+
+    Returns:
+        dict: arquivo (None se nada foi gravado), versao, bytes, linhas_pgr,
+        linhas_ambientais, textos_distintos, duracao_ms, erros e avisos
+    """
+    inicio = time.perf_counter()
+    erros = []
+    avisos = []
+    tabelas = {}
+    fontes = {}
+    for nome, caminho, colunas_chave in (('pgr', pgr_path, COLUNAS_CHAVE_PGR),
+                                         ('ambientais', ambientais_path, COLUNAS_CHAVE_AMBIENTAIS)):
+        descricao = os.path.basename(caminho)
+        try:
+            estado = os.stat(caminho)
+            tabela = TabelaPrecos.ler(caminho)
+        except Exception as e:
+            erros.append(f"{descricao}: não foi possível ler o arquivo ({str(e)})")
+            continue
+        erros_tabela, avisos_tabela = validar_tabela(tabela, descricao, colunas_chave)
+        erros.extend(erros_tabela)
+        avisos.extend(avisos_tabela)
+        tabelas[nome] = tabela
+        fontes[nome] = {'tamanho': estado.st_size, 'mtime_ns': estado.st_mtime_ns, 'sha256': tabela.assinatura}
+
+    resultado = {
+        'arquivo': None,
+        'versao': None,
+        'bytes': 0,
+        'linhas_pgr': len(tabelas['pgr']) if 'pgr' in tabelas else 0,
+        'linhas_ambientais': len(tabelas['ambientais']) if 'ambientais' in tabelas else 0,
+        'textos_distintos': 0,
+        'duracao_ms': None,
+        'erros': erros,
+        'avisos': avisos
+    }
+    if erros:
+        return resultado
+
+    dados = DadosCatalogo(tabelas['pgr'], tabelas['ambientais'])
+    arrays, colunas = _montar_arrays(dados)
+    conteudo = _serializar({
+        'versao': dados.versao,
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'fontes': fontes,
+        'colunas': colunas
+    }, arrays)
+    _gravar(destino, conteudo)
+
+    resultado.update({
+        'arquivo': str(destino),
+        'versao': dados.versao,
+        'bytes': len(conteudo),
+        'textos_distintos': len(arrays['textos/offsets']) - 1,
+        'duracao_ms': round((time.perf_counter() - inicio) * 1000, 1)
+    })
+    logger.info(f"Catálogo compilado gravado em {destino}: {len(conteudo)} bytes, versão {dados.versao}")
+    return resultado
+
+
+def _fonte_confere(caminho, fonte):
+    """
+    Indica se o arquivo ainda é o usado na compilação: mesmo tamanho e mtime ou, se o
+    mtime mudou (ex.: novo checkout), o mesmo SHA-256
+    """
+    try:
+        estado = os.stat(caminho)
+        if estado.st_size != fonte['tamanho']:
+            return False
+        if estado.st_mtime_ns == fonte['mtime_ns']:
+            return True
+        with open(caminho, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest() == fonte['sha256']
+    except OSError:
+        return False
+
+
+def carregar_compilado(caminho, pgr_path, ambientais_path):
+    """
+    Mapeia o catálogo compilado em memória, desde que ele tenha sido gerado a partir do
+    conteúdo atual dos CSVs.
+
+    Args:
+        caminho: Arquivo gerado por compilar_catalogo
+        pgr_path: Caminho do Precos_PGR.csv
+        ambientais_path: Caminho do Precos_Ambientais.csv
+
+    Returns:
+        DadosCatalogoMapeado ou None se o arquivo não existir, for de outro formato, estiver
+        desatualizado ou ilegível (o chamador lê então os CSVs)
+    """
+    if not os.path.exists(caminho):
+        return None
+    try:
+        import msgspec
+
+        inicio = time.perf_counter()
+        with open(caminho, 'rb') as f:
+            # O mapeamento continua válido depois de fechado o arquivo e de renomeado outro
+            # por cima dele; é desfeito quando esta fotografia do catálogo deixa de ser usada
+            mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magico, formato, tamanho_cabecalho = _PREFIXO.unpack_from(mapa)
+        if magico != MAGICO or formato != FORMATO:
+            logger.warning(f"Catálogo compilado {caminho} em formato desconhecido; lendo os CSVs")
+            mapa.close()
+            return None
+        cabecalho = msgspec.msgpack.decode(mapa[_PREFIXO.size:_PREFIXO.size + tamanho_cabecalho])
+        for nome, caminho_csv in (('pgr', pgr_path), ('ambientais', ambientais_path)):
+            if not _fonte_confere(caminho_csv, cabecalho['fontes'][nome]):
+                logger.info(f"Catálogo compilado desatualizado ({os.path.basename(caminho_csv)} mudou); lendo os CSVs")
+                mapa.close()
+                return None
+
+        inicio_arrays = _alinhar(_PREFIXO.size + tamanho_cabecalho)
+        arrays = {
+            nome: np.frombuffer(mapa, dtype=np.dtype(tipo), count=math.prod(forma),
+                                offset=inicio_arrays + deslocamento).reshape(forma)
+            for nome, (tipo, forma, deslocamento) in cabecalho['arrays'].items()
+        }
+        dados = DadosCatalogoMapeado(mapa, cabecalho, arrays)
+        logger.info(f"Catálogo compilado mapeado de {caminho} em {(time.perf_counter() - inicio) * 1000:.1f} ms "
+                    f"(versão {dados.versao}): PGR={len(dados.pgr)} registros, Ambientais={len(dados.ambientais)} registros")
+        return dados
+    except ImportError:
+        logger.warning("msgspec não instalado: o catálogo compilado será ignorado")
+        return None
+    except Exception as e:
+        logger.error(f"Erro ao ler o catálogo compilado {caminho}: {str(e)}")
+        return None
@@ -1,35 +1,81 @@
-import smtplib
 import os
+import threading
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.application import MIMEApplication
 from dotenv import load_dotenv
 import logging
-from babel.numbers import format_currency  # Importa para formatação de moeda
 from datetime import datetime
 
+from services.smtp_pool import PoolSMTP
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def formatar_moeda(valor):
+    """Formata um valor em reais (o babel é importado apenas no primeiro uso)"""
+    from babel.numbers import format_currency
+    return format_currency(valor, 'BRL', locale='pt_BR')
+
 # Carregar variáveis de ambiente
 load_dotenv()
 
+# Pool de conexões SMTP compartilhado por todas as funções de envio (criado sob demanda)
+_pool_smtp = None
+_lock_pool = threading.Lock()
+
 def init_mail(app):
     """Inicializa o Flask-Mail, mas mantido para compatibilidade (não usado aqui)"""
     pass
 
+def obter_pool_smtp():
+    """Retorna o pool de conexões SMTP, criando-o a partir das variáveis de ambiente na primeira chamada"""
+    global _pool_smtp
+    with _lock_pool:
+        if _pool_smtp is None:
+            _pool_smtp = PoolSMTP.do_ambiente()
+        return _pool_smtp
+
+def configurar_pool_smtp(pool):
+    """
+    Substitui o pool de conexões SMTP (ex.: para apontar para um servidor local de testes).
+    
+    Args:
+        pool: Instância de PoolSMTP ou None para recriar a partir do ambiente
+    """
+    global _pool_smtp
+    with _lock_pool:
+        anterior, _pool_smtp = _pool_smtp, pool
+    if anterior is not None and anterior is not pool:
+        anterior.fechar()
+
+def credenciais_configuradas():
+    """
+    Indica se o envio de e-mails está configurado: EMAIL_REMETENTE é obrigatório e
+    EMAIL_SENHA também, a menos que a autenticação esteja desligada (SMTP_AUTENTICAR).
+    """
+    pool = obter_pool_smtp()
+    return bool(os.environ.get('EMAIL_REMETENTE')) and (pool.usuario is None or pool.autenticar)
+
+def _remetente():
+    """Retorna o remetente configurado ou levanta ValueError se faltarem credenciais"""
+    if not credenciais_configuradas():
+        raise ValueError("Credenciais de e-mail (EMAIL_REMETENTE ou EMAIL_SENHA) não estão configuradas no .env")
+    return os.environ.get('EMAIL_REMETENTE')
+
 def enviar_email(nome_arquivo, cliente_email=None):
     # Implementação da função original (mantida para compatibilidade, mas não usada)
     pass
 
-def enviar_email_orcamento_pdf(email_destino, pdf_path, numero_orcamento, empresa_cliente, servicos=None, subtotal=0, valor_sesi=0, total=0, percentual_sesi=30):
+def montar_mensagem_orcamento_pdf(email_destino, pdf_bytes, filename, numero_orcamento, empresa_cliente, servicos=None, subtotal=0, valor_sesi=0, total=0, percentual_sesi=30, sender_email=None):
     """
-    Envia um e-mail com o orçamento em PDF anexo e o resumo no corpo do e-mail.
+    Monta a mensagem com o resumo do orçamento no corpo e o PDF anexo.
     
     Args:
         email_destino: E-mail do destinatário
-        pdf_path: Caminho para o arquivo PDF do orçamento
+        pdf_bytes: Conteúdo do PDF
+        filename: Nome do arquivo para o anexo
         numero_orcamento: Número do orçamento
         empresa_cliente: Nome da empresa cliente
         servicos: Lista de serviços do orçamento (opcional)
@@ -37,135 +83,152 @@ def enviar_email_orcamento_pdf(email_destino, pdf_path, numero_orcamento, empres
         valor_sesi: Valor do SESI (opcional)
         total: Valor total do orçamento (opcional)
         percentual_sesi: Percentual do SESI (opcional)
+        sender_email: Remetente (opcional, padrão: EMAIL_REMETENTE)
         
     Returns:
-        tuple: (sucesso, mensagem)
+        MIMEMultipart: Mensagem pronta para envio
     """
-    try:
-        # Configurações do servidor SMTP
-        smtp_server = "smtp.gmail.com"
-        port = 587  # Porta para TLS
-        sender_email = os.environ.get('EMAIL_REMETENTE')
-        password = os.environ.get('EMAIL_SENHA')
+    # Criar mensagem
+    msg = MIMEMultipart()
+    msg['From'] = sender_email or os.environ.get('EMAIL_REMETENTE')
+    msg['To'] = email_destino
+    msg['Subject'] = f"Orçamento {numero_orcamento} - {empresa_cliente}"
+    
+    # Preparar a tabela de serviços se houver serviços
+    servicos_html = ""
+    if servicos:
+        servicos_html = """
+        <h2 style="margin-top: 30px; color: #0d6efd;">Resumo dos Serviços</h2>
+        <table style="width: 100%; border-collapse: collapse; margin-bottom: 20px;">
+            <thead>
+                <tr>
+                    <th style="background-color: #0d6efd; color: white; text-align: left; padding: 12px;">Serviço</th>
+                    <th style="background-color: #0d6efd; color: white; text-align: center; padding: 12px;">Quantidade</th>
+                    <th style="background-color: #0d6efd; color: white; text-align: right; padding: 12px;">Preço Unitário</th>
+                    <th style="background-color: #0d6efd; color: white; text-align: right; padding: 12px;">Preço Total</th>
+                </tr>
+            </thead>
+            <tbody>
+        """
         
-        # Depuração: Verifique se as credenciais estão disponíveis
-        logger.info("Tentando enviar e-mail com PDF para %s com remetente %s", email_destino, sender_email)
-        if not sender_email or not password:
-            raise ValueError("Credenciais de e-mail (EMAIL_REMETENTE ou EMAIL_SENHA) não estão configuradas no .env")
+        for servico in servicos:
+            servicos_html += f"""
+                <tr>
+                    <td style="padding: 12px; border-bottom: 1px solid #ddd; text-align: left;">{servico['nome']}</td>
+                    <td style="padding: 12px; border-bottom: 1px solid #ddd; text-align: center;">{servico['quantidade']}</td>
+                    <td style="padding: 12px; border-bottom: 1px solid #ddd; text-align: right;">{servico.get('preco_unitario_formatado', f"R$ {servico['preco_unitario']:.2f}".replace('.', ','))}</td>
+                    <td style="padding: 12px; border-bottom: 1px solid #ddd; text-align: right;">{servico.get('preco_total_formatado', f"R$ {servico['preco_total']:.2f}".replace('.', ','))}</td>
+                </tr>
+            """
         
-        # Verificar se o arquivo PDF existe
-        if not os.path.exists(pdf_path):
-            raise FileNotFoundError(f"Arquivo PDF não encontrado: {pdf_path}")
+        # Adicionar resumo financeiro
+        subtotal_formatado = f"R$ {subtotal:.2f}".replace('.', ',') if isinstance(subtotal, (int, float)) else subtotal
+        valor_sesi_formatado = f"R$ {valor_sesi:.2f}".replace('.', ',') if isinstance(valor_sesi, (int, float)) else valor_sesi
+        total_formatado = f"R$ {total:.2f}".replace('.', ',') if isinstance(total, (int, float)) else total
         
-        # Criar mensagem
-        msg = MIMEMultipart()
-        msg['From'] = sender_email
-        msg['To'] = email_destino
-        msg['Subject'] = f"Orçamento {numero_orcamento} - {empresa_cliente}"
-        
-        # Preparar a tabela de serviços se houver serviços
-        servicos_html = ""
-        if servicos:
-            servicos_html = """
-            <h2 style="margin-top: 30px; color: #0d6efd;">Resumo dos Serviços</h2>
-            <table style="width: 100%; border-collapse: collapse; margin-bottom: 20px;">
-                <thead>
-                    <tr>
-                        <th style="background-color: #0d6efd; color: white; text-align: left; padding: 12px;">Serviço</th>
-                        <th style="background-color: #0d6efd; color: white; text-align: center; padding: 12px;">Quantidade</th>
-                        <th style="background-color: #0d6efd; color: white; text-align: right; padding: 12px;">Preço Unitário</th>
-                        <th style="background-color: #0d6efd; color: white; text-align: right; padding: 12px;">Preço Total</th>
-                    </tr>
-                </thead>
-                <tbody>
+        servicos_html += """
+            </tbody>
+        </table>
+        
+        <div style="margin-top: 20px; text-align: right; font-size: 16px; padding: 10px; background-color: #e9ecef; border-radius: 4px;">
+        """
+        
+        if subtotal:
+            servicos_html += f"""
+            <p><strong>Subtotal:</strong> {subtotal_formatado}</p>
             """
-            
-            for servico in servicos:
-                servicos_html += f"""
-                    <tr>
-                        <td style="padding: 12px; border-bottom: 1px solid #ddd; text-align: left;">{servico['nome']}</td>
-                        <td style="padding: 12px; border-bottom: 1px solid #ddd; text-align: center;">{servico['quantidade']}</td>
-                        <td style="padding: 12px; border-bottom: 1px solid #ddd; text-align: right;">{servico.get('preco_unitario_formatado', f"R$ {servico['preco_unitario']:.2f}".replace('.', ','))}</td>
-                        <td style="padding: 12px; border-bottom: 1px solid #ddd; text-align: right;">{servico.get('preco_total_formatado', f"R$ {servico['preco_total']:.2f}".replace('.', ','))}</td>
-                    </tr>
-                """
-            
-            # Adicionar resumo financeiro
-            subtotal_formatado = f"R$ {subtotal:.2f}".replace('.', ',') if isinstance(subtotal, (int, float)) else subtotal
-            valor_sesi_formatado = f"R$ {valor_sesi:.2f}".replace('.', ',') if isinstance(valor_sesi, (int, float)) else valor_sesi
-            total_formatado = f"R$ {total:.2f}".replace('.', ',') if isinstance(total, (int, float)) else total
-            
-            servicos_html += """
-                </tbody>
-            </table>
-            
-            <div style="margin-top: 20px; text-align: right; font-size: 16px; padding: 10px; background-color: #e9ecef; border-radius: 4px;">
+        
+        if valor_sesi:
+            servicos_html += f"""
+            <p><strong>Percentual Indireto SESI ({percentual_sesi}%):</strong> {valor_sesi_formatado}</p>
+            """
+        
+        if total:
+            servicos_html += f"""
+            <p style="font-size: 18px; color: #0d6efd;"><strong>Total do Orçamento:</strong> {total_formatado}</p>
             """
+        
+        servicos_html += """
+        </div>
+        """
+    
+    # Corpo do e-mail
+    corpo_email = f"""
+    <html>
+    <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333; margin: 0; padding: 0; background-color: #f9f9f9;">
+        <div style="max-width: 800px; margin: 0 auto; padding: 20px; background-color: #ffffff; border-radius: 8px; box-shadow: 0 0 10px rgba(0,0,0,0.1);">
+            <div style="text-align: center; padding: 20px 0; background-color: #0d6efd; color: white; border-radius: 8px 8px 0 0; margin-bottom: 20px;">
+                <h1>Orçamento {numero_orcamento}</h1>
+            </div>
             
-            if subtotal:
-                servicos_html += f"""
-                <p><strong>Subtotal:</strong> {subtotal_formatado}</p>
-                """
+            <p>Prezado(a) cliente,</p>
+            <p>Segue em anexo o orçamento solicitado para a empresa <b>{empresa_cliente}</b>.</p>
+            <p>Número do orçamento: <b>{numero_orcamento}</b></p>
             
-            if valor_sesi:
-                servicos_html += f"""
-                <p><strong>Percentual Indireto SESI ({percentual_sesi}%):</strong> {valor_sesi_formatado}</p>
-                """
+            {servicos_html}
             
-            if total:
-                servicos_html += f"""
-                <p style="font-size: 18px; color: #0d6efd;"><strong>Total do Orçamento:</strong> {total_formatado}</p>
-                """
+            <p>Para confirmar o orçamento ou em caso de dúvidas, por favor responda a este e-mail ou entre em contato conosco.</p>
             
-            servicos_html += """
+            <div style="margin-top: 30px; padding: 15px; background-color: #f8d7da; border-radius: 4px; color: #721c24;">
+                <p>Este orçamento é válido por 30 dias a partir da data de emissão.</p>
             </div>
-            """
-        
-        # Corpo do e-mail
-        corpo_email = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333; margin: 0; padding: 0; background-color: #f9f9f9;">
-            <div style="max-width: 800px; margin: 0 auto; padding: 20px; background-color: #ffffff; border-radius: 8px; box-shadow: 0 0 10px rgba(0,0,0,0.1);">
-                <div style="text-align: center; padding: 20px 0; background-color: #0d6efd; color: white; border-radius: 8px 8px 0 0; margin-bottom: 20px;">
-                    <h1>Orçamento {numero_orcamento}</h1>
-                </div>
-                
-                <p>Prezado(a) cliente,</p>
-                <p>Segue em anexo o orçamento solicitado para a empresa <b>{empresa_cliente}</b>.</p>
-                <p>Número do orçamento: <b>{numero_orcamento}</b></p>
-                
-                {servicos_html}
-                
-                <p>Para confirmar o orçamento ou em caso de dúvidas, por favor responda a este e-mail ou entre em contato conosco.</p>
-                
-                <div style="margin-top: 30px; padding: 15px; background-color: #f8d7da; border-radius: 4px; color: #721c24;">
-                    <p>Este orçamento é válido por 30 dias a partir da data de emissão.</p>
-                </div>
-                
-                <div style="margin-top: 30px; padding-top: 20px; border-top: 1px solid #ddd; text-align: center; font-size: 14px; color: #6c757d;">
-                    <p>Para mais informações ou para aceitar este orçamento, entre em contato conosco:</p>
-                    <p>WhatsApp: <a href="https://wa.me/5571987075563" style="color: #28a745; text-decoration: none;">(71) 9 8707-5563</a></p>
-                    <a href="https://wa.me/5571987075563" style="display: inline-block; margin: 15px 0; padding: 10px 20px; background-color: #28a745; color: white; text-decoration: none; border-radius: 4px; font-weight: bold;">Falar com um consultor</a>
-                    <p>© {datetime.now().year} {empresa_cliente}. Todos os direitos reservados.</p>
-                </div>
+            
+            <div style="margin-top: 30px; padding-top: 20px; border-top: 1px solid #ddd; text-align: center; font-size: 14px; color: #6c757d;">
+                <p>Para mais informações ou para aceitar este orçamento, entre em contato conosco:</p>
+                <p>WhatsApp: <a href="https://wa.me/5571987075563" style="color: #28a745; text-decoration: none;">(71) 9 8707-5563</a></p>
+                <a href="https://wa.me/5571987075563" style="display: inline-block; margin: 15px 0; padding: 10px 20px; background-color: #28a745; color: white; text-decoration: none; border-radius: 4px; font-weight: bold;">Falar com um consultor</a>
+                <p>© {datetime.now().year} {empresa_cliente}. Todos os direitos reservados.</p>
             </div>
-        </body>
-        </html>
-        """
+        </div>
+    </body>
+    </html>
+    """
+    
+    msg.attach(MIMEText(corpo_email, 'html'))
+    
+    # Anexar PDF
+    anexo = MIMEApplication(pdf_bytes, _subtype='pdf')
+    anexo.add_header('Content-Disposition', 'attachment', filename=filename)
+    msg.attach(anexo)
+    return msg
+
+def enviar_email_orcamento_pdf(email_destino, pdf_path, numero_orcamento, empresa_cliente, servicos=None, subtotal=0, valor_sesi=0, total=0, percentual_sesi=30):
+    """
+    Envia um e-mail com o orçamento em PDF anexo e o resumo no corpo do e-mail.
+    
+    Args:
+        email_destino: E-mail do destinatário
+        pdf_path: Caminho para o arquivo PDF do orçamento
+        numero_orcamento: Número do orçamento
+        empresa_cliente: Nome da empresa cliente
+        servicos: Lista de serviços do orçamento (opcional)
+        subtotal: Valor subtotal do orçamento (opcional)
+        valor_sesi: Valor do SESI (opcional)
+        total: Valor total do orçamento (opcional)
+        percentual_sesi: Percentual do SESI (opcional)
         
-        msg.attach(MIMEText(corpo_email, 'html'))
+    Returns:
+        tuple: (sucesso, mensagem)
+    """
+    try:
+        sender_email = _remetente()
+        
+        logger.info("Tentando enviar e-mail com PDF para %s com remetente %s", email_destino, sender_email)
+        
+        # Verificar se o arquivo PDF existe
+        if not os.path.exists(pdf_path):
+            raise FileNotFoundError(f"Arquivo PDF não encontrado: {pdf_path}")
         
-        # Anexar PDF
         with open(pdf_path, 'rb') as f:
-            anexo = MIMEApplication(f.read(), _subtype='pdf')
-            anexo.add_header('Content-Disposition', 'attachment', filename=f"Orcamento_{numero_orcamento}.pdf")
-            msg.attach(anexo)
+            pdf_bytes = f.read()
         
-        # Enviar e-mail
-        with smtplib.SMTP(smtp_server, port) as servidor:
-            servidor.starttls()
-            servidor.login(sender_email, password)
-            servidor.send_message(msg)
+        msg = montar_mensagem_orcamento_pdf(
+            email_destino, pdf_bytes, f"Orcamento_{numero_orcamento}.pdf", numero_orcamento, empresa_cliente,
+            servicos, subtotal, valor_sesi, total, percentual_sesi, sender_email=sender_email
+        )
+        
+        # Enviar e-mail por uma conexão do pool
+        obter_pool_smtp().enviar(msg)
         
         logger.info(f"E-mail com PDF enviado com sucesso para {email_destino}")
         return True, "E-mail enviado com sucesso!"
@@ -176,21 +239,16 @@ def enviar_email_orcamento_pdf(email_destino, pdf_path, numero_orcamento, empres
         traceback.print_exc()
         return False, f"Erro ao enviar e-mail: {str(e)}"
 
+
 def enviar_email_orcamento(destinatario, empresa, servicos, total):
     """
-    Envia um e-mail com o orçamento para o cliente usando smtplib
+    Envia um e-mail com o orçamento para o cliente pelo pool de conexões SMTP
     """
     try:
-        # Configurações do servidor SMTP
-        smtp_server = "smtp.gmail.com"
-        port = 587  # Porta para TLS
-        sender_email = os.environ.get('EMAIL_REMETENTE')
-        password = os.environ.get('EMAIL_SENHA')
+        sender_email = _remetente()
         
         # Depuração: Verifique se as credenciais estão disponíveis
         logger.info("Tentando enviar e-mail para %s com remetente %s", destinatario, sender_email)
-        if not sender_email or not password:
-            raise ValueError("Credenciais de e-mail (EMAIL_REMETENTE ou EMAIL_SENHA) não estão configuradas no .env")
         
         # Cria a mensagem
         msg = MIMEMultipart()
@@ -235,7 +293,7 @@ def enviar_email_orcamento(destinatario, empresa, servicos, total):
             corpo_email += f"""
                             <tr>
                                 <td style="padding: 12px; border-bottom: 1px solid #ddd; text-align: left;">{servico['nome']} (Quantidade: {servico['quantidade']} {servico['unidade']})</td>
-                                <td style="padding: 12px; border-bottom: 1px solid #ddd; text-align: right;">{format_currency(servico['preco_total'], 'BRL', locale='pt_BR')}</td>
+                                <td style="padding: 12px; border-bottom: 1px solid #ddd; text-align: right;">{formatar_moeda(servico['preco_total'])}</td>
                             </tr>
             """
         
@@ -245,7 +303,7 @@ def enviar_email_orcamento(destinatario, empresa, servicos, total):
                     </table>
                     
                     <div style="margin-top: 20px; text-align: right; font-size: 18px; font-weight: bold; padding: 10px; background-color: #e9ecef; border-radius: 4px;">
-                        <p>Total do Orçamento: {format_currency(total, 'BRL', locale='pt_BR')}</p>
+                        <p>Total do Orçamento: {formatar_moeda(total)}</p>
                     </div>
                     
                     <div style="margin-top: 20px; padding: 15px; background-color: #f8d7da; border-radius: 4px; color: #721c24;">
@@ -267,14 +325,8 @@ def enviar_email_orcamento(destinatario, empresa, servicos, total):
         # Adiciona o corpo HTML à mensagem
         msg.attach(MIMEText(corpo_email, 'html', 'utf-8'))
         
-        # Inicia a conexão com o servidor SMTP
-        server = smtplib.SMTP(smtp_server, port)
-        server.starttls()
-        server.login(sender_email, password)
-        
-        # Envia o e-mail
-        server.send_message(msg)
-        server.quit()
+        # Envia o e-mail por uma conexão do pool
+        obter_pool_smtp().enviar(msg)
         
         logger.info("E-mail enviado com sucesso para %s", destinatario)
         return True, "E-mail enviado com sucesso!"
@@ -287,7 +339,7 @@ def enviar_email_orcamento(destinatario, empresa, servicos, total):
 def format_servicos_email(servicos):
     """Formata a lista de serviços para o e-mail (não usada diretamente, mas mantida para compatibilidade)"""
     return '\n'.join([
-        f"- {s['nome']}: {format_currency(s['preco_unitario'], 'BRL', locale='pt_BR')} x {s['quantidade']} = {format_currency(s['preco_unitario'] * s['quantidade'], 'BRL', locale='pt_BR')}"
+        f"- {s['nome']}: {formatar_moeda(s['preco_unitario'])} x {s['quantidade']} = {formatar_moeda(s['preco_unitario'] * s['quantidade'])}"
         for s in servicos
     ])
 
@@ -317,130 +369,21 @@ def enviar_email_orcamento_pdf_buffer(email_destino, pdf_buffer, filename, numer
         tuple: (sucesso, mensagem)
     """
     try:
-        # Configurações do servidor SMTP
-        smtp_server = "smtp.gmail.com"
-        port = 587  # Porta para TLS
-        sender_email = os.environ.get('EMAIL_REMETENTE')
-        password = os.environ.get('EMAIL_SENHA')
+        sender_email = _remetente()
         
-        # Depuração: Verifique se as credenciais estão disponíveis
         logger.info("Tentando enviar e-mail com PDF para %s com remetente %s", email_destino, sender_email)
-        if not sender_email or not password:
-            raise ValueError("Credenciais de e-mail (EMAIL_REMETENTE ou EMAIL_SENHA) não estão configuradas no .env")
         
         # Verificar se o buffer PDF existe e não está vazio
         if not pdf_buffer or pdf_buffer.getvalue() == b'':
             raise ValueError("Buffer PDF vazio ou inválido")
         
-        # Criar mensagem
-        msg = MIMEMultipart()
-        msg['From'] = sender_email
-        msg['To'] = email_destino
-        msg['Subject'] = f"Orçamento {numero_orcamento} - {empresa_cliente}"
-        
-        # Preparar a tabela de serviços se houver serviços
-        servicos_html = ""
-        if servicos:
-            servicos_html = """
-            <h2 style="margin-top: 30px; color: #0d6efd;">Resumo dos Serviços</h2>
-            <table style="width: 100%; border-collapse: collapse; margin-bottom: 20px;">
-                <thead>
-                    <tr>
-                        <th style="background-color: #0d6efd; color: white; text-align: left; padding: 12px;">Serviço</th>
-                        <th style="background-color: #0d6efd; color: white; text-align: center; padding: 12px;">Quantidade</th>
-                        <th style="background-color: #0d6efd; color: white; text-align: right; padding: 12px;">Preço Unitário</th>
-                        <th style="background-color: #0d6efd; color: white; text-align: right; padding: 12px;">Preço Total</th>
-                    </tr>
-                </thead>
-                <tbody>
-            """
-            
-            for servico in servicos:
-                servicos_html += f"""
-                    <tr>
-                        <td style="padding: 12px; border-bottom: 1px solid #ddd; text-align: left;">{servico['nome']}</td>
-                        <td style="padding: 12px; border-bottom: 1px solid #ddd; text-align: center;">{servico['quantidade']}</td>
-                        <td style="padding: 12px; border-bottom: 1px solid #ddd; text-align: right;">{servico.get('preco_unitario_formatado', f"R$ {servico['preco_unitario']:.2f}".replace('.', ','))}</td>
-                        <td style="padding: 12px; border-bottom: 1px solid #ddd; text-align: right;">{servico.get('preco_total_formatado', f"R$ {servico['preco_total']:.2f}".replace('.', ','))}</td>
-                    </tr>
-                """
-            
-            # Adicionar resumo financeiro
-            subtotal_formatado = f"R$ {subtotal:.2f}".replace('.', ',') if isinstance(subtotal, (int, float)) else subtotal
-            valor_sesi_formatado = f"R$ {valor_sesi:.2f}".replace('.', ',') if isinstance(valor_sesi, (int, float)) else valor_sesi
-            total_formatado = f"R$ {total:.2f}".replace('.', ',') if isinstance(total, (int, float)) else total
-            
-            servicos_html += """
-                </tbody>
-            </table>
-            
-            <div style="margin-top: 20px; text-align: right; font-size: 16px; padding: 10px; background-color: #e9ecef; border-radius: 4px;">
-            """
-            
-            if subtotal:
-                servicos_html += f"""
-                <p><strong>Subtotal:</strong> {subtotal_formatado}</p>
-                """
-            
-            if valor_sesi:
-                servicos_html += f"""
-                <p><strong>Percentual Indireto SESI ({percentual_sesi}%):</strong> {valor_sesi_formatado}</p>
-                """
-            
-            if total:
-                servicos_html += f"""
-                <p style="font-size: 18px; color: #0d6efd;"><strong>Total do Orçamento:</strong> {total_formatado}</p>
-                """
-            
-            servicos_html += """
-            </div>
-            """
-        
-        # Corpo do e-mail
-        corpo_email = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333; margin: 0; padding: 0; background-color: #f9f9f9;">
-            <div style="max-width: 800px; margin: 0 auto; padding: 20px; background-color: #ffffff; border-radius: 8px; box-shadow: 0 0 10px rgba(0,0,0,0.1);">
-                <div style="text-align: center; padding: 20px 0; background-color: #0d6efd; color: white; border-radius: 8px 8px 0 0; margin-bottom: 20px;">
-                    <h1>Orçamento {numero_orcamento}</h1>
-                </div>
-                
-                <p>Prezado(a) cliente,</p>
-                <p>Segue em anexo o orçamento solicitado para a empresa <b>{empresa_cliente}</b>.</p>
-                <p>Número do orçamento: <b>{numero_orcamento}</b></p>
-                
-                {servicos_html}
-                
-                <p>Para confirmar o orçamento ou em caso de dúvidas, por favor responda a este e-mail ou entre em contato conosco.</p>
-                
-                <div style="margin-top: 30px; padding: 15px; background-color: #f8d7da; border-radius: 4px; color: #721c24;">
-                    <p>Este orçamento é válido por 30 dias a partir da data de emissão.</p>
-                </div>
-                
-                <div style="margin-top: 30px; padding-top: 20px; border-top: 1px solid #ddd; text-align: center; font-size: 14px; color: #6c757d;">
-                    <p>Para mais informações ou para aceitar este orçamento, entre em contato conosco:</p>
-                    <p>WhatsApp: <a href="https://wa.me/5571987075563" style="color: #28a745; text-decoration: none;">(71) 9 8707-5563</a></p>
-                    <a href="https://wa.me/5571987075563" style="display: inline-block; margin: 15px 0; padding: 10px 20px; background-color: #28a745; color: white; text-decoration: none; border-radius: 4px; font-weight: bold;">Falar com um consultor</a>
-                    <p>© {datetime.now().year} {empresa_cliente}. Todos os direitos reservados.</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        msg.attach(MIMEText(corpo_email, 'html'))
-        
-        # Anexar PDF do buffer
-        pdf_data = pdf_buffer.getvalue()
-        anexo = MIMEApplication(pdf_data, _subtype='pdf')
-        anexo.add_header('Content-Disposition', 'attachment', filename=filename)
-        msg.attach(anexo)
+        msg = montar_mensagem_orcamento_pdf(
+            email_destino, pdf_buffer.getvalue(), filename, numero_orcamento, empresa_cliente,
+            servicos, subtotal, valor_sesi, total, percentual_sesi, sender_email=sender_email
+        )
         
-        # Enviar e-mail
-        with smtplib.SMTP(smtp_server, port) as servidor:
-            servidor.starttls()
-            servidor.login(sender_email, password)
-            servidor.send_message(msg)
+        # Enviar e-mail por uma conexão do pool
+        obter_pool_smtp().enviar(msg)
         
         logger.info(f"E-mail com PDF enviado com sucesso para {email_destino}")
         return True, "E-mail enviado com sucesso!"
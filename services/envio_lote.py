@@ -0,0 +1,298 @@
+import csv
+import time
+import queue
+import threading
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+from services.banco import BancoSQLite
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+# Situações de um item do lote
+LOTE_PENDENTE = 'pendente'
+LOTE_ENVIADO = 'enviado'
+LOTE_FALHOU = 'falhou'
+
+
+def ler_csv_destinatarios(caminho_csv):
+    """
+    Lê um CSV com os orçamentos a enviar.
+
+    O arquivo deve ter a coluna numero_orcamento (ou numero) e, opcionalmente, a coluna
+    email; quando o e-mail não é informado, usa-se o e-mail gravado no orçamento.
+
+    Returns:
+        list: Tuplas (numero_orcamento, email ou None)
+    """
+    itens = []
+    with open(caminho_csv, newline='', encoding='utf-8-sig') as f:
+        for linha in csv.DictReader(f):
+            numero = (linha.get('numero_orcamento') or linha.get('numero') or '').strip()
+            if not numero:
+                continue
+            email = (linha.get('email') or '').strip() or None
+            itens.append((numero, email))
+    return itens
+
+
+def metadados_email(orcamento):
+    """Argumentos do e-mail de um orçamento (repassados à função de envio)"""
+    return {
+        'numero_orcamento': orcamento['numero_orcamento'],
+        'empresa_cliente': orcamento['empresa_cliente'],
+        'servicos': orcamento['servicos'],
+        'subtotal': orcamento['subtotal'],
+        'valor_sesi': orcamento['valor_sesi'],
+        'total': orcamento['total'],
+        'percentual_sesi': orcamento['percentual_sesi']
+    }
+
+
+class RegistroEnvioLote(BancoSQLite):
+    """
+    Situação de cada mensagem de um envio em lote.
+
+    Cada item (lote, número do orçamento, destinatário) é gravado uma única vez; ao
+    executar de novo o mesmo lote, apenas os itens ainda não enviados são processados,
+    o que permite retomar um envio interrompido.
+    """
+
+    def __init__(self, caminho_db, timeout=30.0):
+        super().__init__(caminho_db, timeout)
+        conexao = self.conexao()
+        conexao.execute("""
+            CREATE TABLE IF NOT EXISTS envio_lote (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                lote TEXT NOT NULL,
+                numero_orcamento TEXT NOT NULL,
+                destinatario TEXT NOT NULL DEFAULT '',
+                status TEXT NOT NULL,
+                tentativas INTEGER NOT NULL DEFAULT 0,
+                ultimo_erro TEXT,
+                atualizado_em TEXT NOT NULL,
+                UNIQUE (lote, numero_orcamento, destinatario)
+            )
+        """)
+        conexao.execute("CREATE INDEX IF NOT EXISTS idx_envio_lote_status ON envio_lote (lote, status)")
+
+    def registrar(self, lote, itens):
+        """
+        Grava os itens do lote (itens já gravados são mantidos com a situação atual).
+
+        Args:
+            lote: Identificador do lote
+            itens: Tuplas (numero_orcamento, email ou None)
+        """
+        agora = datetime.now().isoformat(sep=' ', timespec='seconds')
+        with self.transacao() as conexao:
+            conexao.executemany(
+                """
+                INSERT OR IGNORE INTO envio_lote (lote, numero_orcamento, destinatario, status, atualizado_em)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                [(lote, numero, email or '', LOTE_PENDENTE, agora) for numero, email in itens]
+            )
+
+    def pendentes(self, lote, incluir_falhas=True):
+        """
+        Lista os itens do lote que ainda devem ser enviados.
+
+        Returns:
+            list: Dicionários com id, numero_orcamento, destinatario (None = e-mail do orçamento) e tentativas
+        """
+        situacoes = (LOTE_PENDENTE, LOTE_FALHOU) if incluir_falhas else (LOTE_PENDENTE,)
+        linhas = self.conexao().execute(
+            f"SELECT id, numero_orcamento, destinatario, tentativas FROM envio_lote "
+            f"WHERE lote = ? AND status IN ({', '.join('?' * len(situacoes))}) ORDER BY id",
+            (lote, *situacoes)
+        ).fetchall()
+        return [{
+            'id': linha['id'],
+            'numero_orcamento': linha['numero_orcamento'],
+            'destinatario': linha['destinatario'] or None,
+            'tentativas': linha['tentativas']
+        } for linha in linhas]
+
+    def marcar(self, item_id, status, erro=None):
+        """Registra o resultado de uma tentativa de envio"""
+        with self.transacao() as conexao:
+            conexao.execute(
+                "UPDATE envio_lote SET status = ?, tentativas = tentativas + 1, ultimo_erro = ?, atualizado_em = ? WHERE id = ?",
+                (status, erro, datetime.now().isoformat(sep=' ', timespec='seconds'), item_id)
+            )
+
+    def resumo(self, lote):
+        """Retorna a quantidade de itens do lote em cada situação"""
+        linhas = self.conexao().execute(
+            "SELECT status, COUNT(*) AS quantidade FROM envio_lote WHERE lote = ? GROUP BY status", (lote,)
+        ).fetchall()
+        return {linha['status']: linha['quantidade'] for linha in linhas}
+
+    def falhas(self, lote):
+        """Lista os itens que falharam, com o último erro"""
+        linhas = self.conexao().execute(
+            "SELECT numero_orcamento, destinatario, tentativas, ultimo_erro FROM envio_lote WHERE lote = ? AND status = ? ORDER BY id",
+            (lote, LOTE_FALHOU)
+        ).fetchall()
+        return [dict(linha) for linha in linhas]
+
+
+class LimitadorTaxa:
+    """Limita a quantidade de operações por segundo, compartilhado entre threads"""
+
+    def __init__(self, por_segundo=None):
+        self.intervalo = 1.0 / por_segundo if por_segundo else 0.0
+        self._proximo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        """Bloqueia até a próxima vaga disponível"""
+        if not self.intervalo:
+            return
+        with self._lock:
+            agora = time.monotonic()
+            vaga = max(agora, self._proximo)
+            self._proximo = vaga + self.intervalo
+        if vaga > agora:
+            time.sleep(vaga - agora)
+
+
+class EnvioLote:
+    """
+    Envia muitos orçamentos por e-mail em um pipeline.
+
+    Um grupo de `renderizadores` threads busca os orçamentos e gera os PDFs; as
+    mensagens prontas passam por uma fila limitada (para não acumular PDFs em memória)
+    até `conexoes` threads de envio, cada uma usando uma conexão do pool SMTP. O
+    resultado de cada mensagem é gravado no RegistroEnvioLote assim que conhecido.
+
+    Args:
+        registro: RegistroEnvioLote com a situação dos itens
+        obter_orcamento: Função numero_orcamento -> dicionário do orçamento (ou None)
+        gerar_pdf: Função orcamento -> (BytesIO, nome do arquivo), como gerar_pdf_orcamento
+        enviar: Função (destinatario, pdf, nome_arquivo, **metadados) -> (sucesso, mensagem)
+        renderizadores: Quantidade de threads de geração de PDF
+        conexoes: Quantidade de threads de envio (não mais que o tamanho do pool SMTP)
+        taxa: Máximo de mensagens por segundo (None para ilimitado)
+    """
+
+    def __init__(self, registro, obter_orcamento, gerar_pdf, enviar, renderizadores=4, conexoes=2, taxa=None):
+        self.registro = registro
+        self.obter_orcamento = obter_orcamento
+        self.gerar_pdf = gerar_pdf
+        self.enviar = enviar
+        self.renderizadores = max(1, renderizadores)
+        self.conexoes = max(1, conexoes)
+        self.limitador = LimitadorTaxa(taxa)
+
+    def _preparar(self, item, fila):
+        """Gera o PDF de um item e o coloca na fila de envio (executado pelos renderizadores)"""
+        try:
+            orcamento = self.obter_orcamento(item['numero_orcamento'])
+            if orcamento is None:
+                raise LookupError(f"Orçamento {item['numero_orcamento']} não encontrado")
+            destinatario = item['destinatario'] or orcamento['email']
+            if not destinatario:
+                raise ValueError(f"Orçamento {item['numero_orcamento']} não tem e-mail de destino")
+            pdf_buffer, filename = self.gerar_pdf(orcamento)
+            if not pdf_buffer:
+                raise RuntimeError(f"Falha ao gerar o PDF do orçamento {item['numero_orcamento']}")
+        except Exception as e:
+            self._concluir(item, False, str(e))
+            return
+        fila.put((item, destinatario, pdf_buffer.getvalue(), filename, metadados_email(orcamento)))
+
+    def _enviar(self, fila):
+        """Laço das threads de envio: consome a fila até receber None"""
+        while True:
+            mensagem = fila.get()
+            if mensagem is None:
+                return
+            item, destinatario, pdf, filename, metadados = mensagem
+            self.limitador.aguardar()
+            try:
+                sucesso, resultado = self.enviar(destinatario, pdf, filename, **metadados)
+            except Exception as e:
+                sucesso, resultado = False, str(e)
+            try:
+                self._concluir(item, sucesso, None if sucesso else resultado)
+            except Exception as e:
+                # Esta thread não pode parar: os renderizadores ficariam bloqueados na fila cheia
+                logger.error(f"Erro ao gravar a situação do orçamento {item['numero_orcamento']} no lote: {str(e)}")
+
+    def _concluir(self, item, sucesso, erro):
+        """
+        Atualiza os contadores e grava o resultado de um item. Se a gravação falhar, o
+        item continua pendente no registro e é reenviado quando o lote for retomado.
+        """
+        with self._lock:
+            if sucesso:
+                self._enviados += 1
+            else:
+                self._falhas += 1
+                logger.warning(f"Falha no envio do orçamento {item['numero_orcamento']}: {erro}")
+            processados = self._enviados + self._falhas
+        if processados % 100 == 0:
+            logger.info(f"Envio em lote: {processados} de {self._total} mensagens processadas")
+        self.registro.marcar(item['id'], LOTE_ENVIADO if sucesso else LOTE_FALHOU, erro)
+
+    def executar(self, lote, itens=None, incluir_falhas=True):
+        """
+        Executa (ou retoma) um lote.
+
+        Args:
+            lote: Identificador do lote
+            itens: Tuplas (numero_orcamento, email ou None) a acrescentar ao lote (opcional)
+            incluir_falhas: Tentar de novo os itens que falharam em execuções anteriores
+
+        Returns:
+            dict: enviados, falhas, segundos, mensagens_por_segundo e a situação final do lote
+        """
+        if itens:
+            self.registro.registrar(lote, itens)
+        pendentes = self.registro.pendentes(lote, incluir_falhas)
+
+        self._lock = threading.Lock()
+        self._enviados = 0
+        self._falhas = 0
+        self._total = len(pendentes)
+        logger.info(f"Envio em lote '{lote}': {self._total} mensagens pendentes")
+
+        inicio = time.perf_counter()
+        fila = queue.Queue(maxsize=self.conexoes * 4)
+        remetentes = [
+            threading.Thread(target=self._enviar, args=(fila,), name=f'lote-envio-{i}', daemon=True)
+            for i in range(self.conexoes)
+        ]
+        for thread in remetentes:
+            thread.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.renderizadores, thread_name_prefix='lote-pdf') as executor:
+                futuros = [executor.submit(self._preparar, item, fila) for item in pendentes]
+        finally:
+            for _ in remetentes:
+                fila.put(None)
+            for thread in remetentes:
+                thread.join()
+        # _preparar trata os erros do próprio item; uma exceção aqui (ex.: falha ao gravar a
+        # situação) não pode passar despercebida
+        for item, futuro in zip(pendentes, futuros):
+            erro = futuro.exception()
+            if erro is not None:
+                logger.error(f"Erro ao preparar o orçamento {item['numero_orcamento']} do lote: {str(erro)}")
+
+        segundos = time.perf_counter() - inicio
+        resultado = {
+            'lote': lote,
+            'enviados': self._enviados,
+            'falhas': self._falhas,
+            'segundos': round(segundos, 3),
+            'mensagens_por_segundo': round(self._total / segundos, 1) if segundos > 0 else 0.0,
+            'situacao': self.registro.resumo(lote)
+        }
+        logger.info(f"Envio em lote '{lote}' concluído: {resultado}")
+        return resultado
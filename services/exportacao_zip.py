@@ -0,0 +1,156 @@
+import csv
+import io
+import shutil
+import logging
+import tempfile
+import zipfile
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+# Nome do índice gravado ao final do arquivo ZIP
+NOME_INDICE = 'indice.csv'
+
+
+class _SaidaEmBlocos:
+    """
+    Destino de escrita do zipfile que apenas acumula os blocos escritos até serem
+    retirados. Por não ter seek nem tell, o zipfile grava cada entrada em sequência
+    (com descritor de dados) e nunca volta atrás no arquivo.
+    """
+
+    def __init__(self):
+        self._blocos = []
+
+    def write(self, dados):
+        self._blocos.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def retirar(self):
+        """Retorna (e descarta) tudo o que foi escrito desde a última retirada"""
+        dados = b''.join(self._blocos)
+        self._blocos = []
+        return dados
+
+
+class ExportacaoZIP:
+    """
+    Gera um arquivo ZIP com os PDFs de muitos orçamentos, em blocos, à medida que
+    cada PDF fica pronto.
+
+    Os PDFs são obtidos em paralelo por `workers` threads (que reaproveitam o cache e
+    o pool de renderização); no máximo `janela` PDFs ficam em andamento ou prontos
+    aguardando a escrita, e os orçamentos são lidos do iterável sob demanda, de modo que
+    a memória não cresce com a quantidade de orçamentos. A única parte proporcional ao
+    total é o diretório central do ZIP (cerca de 100 bytes por arquivo), exigido pelo
+    formato. O índice (indice.csv) vai para um arquivo temporário e é a última entrada.
+
+    As entradas aparecem na ordem em que os PDFs ficam prontos, não na ordem dos
+    orçamentos; orçamentos cujo PDF falhou constam do índice com o erro.
+
+    Args:
+        obter_pdf: Função orcamento -> (bytes do PDF ou None, nome do arquivo)
+        workers: Quantidade de PDFs obtidos em paralelo
+        janela: Máximo de PDFs em andamento (padrão: o dobro de workers)
+    """
+
+    def __init__(self, obter_pdf, workers=4, janela=None):
+        self.obter_pdf = obter_pdf
+        self.workers = max(1, workers)
+        self.janela = max(self.workers, janela or self.workers * 2)
+        self.arquivos = 0
+        self.falhas = 0
+        self.bytes_enviados = 0
+
+    def _obter(self, orcamento):
+        """Obtém o PDF de um orçamento (executado pelas threads)"""
+        try:
+            conteudo, filename = self.obter_pdf(orcamento)
+            if conteudo is None:
+                return orcamento, None, None, "Falha ao gerar o PDF"
+            return orcamento, conteudo, filename, None
+        except Exception as e:
+            return orcamento, None, None, str(e)
+
+    def _escrever(self, arquivo, indice, resultado):
+        """Grava a entrada de um PDF pronto e a sua linha no índice"""
+        orcamento, conteudo, filename, erro = resultado
+        numero = orcamento['numero_orcamento']
+        if erro is None:
+            info = zipfile.ZipInfo(filename, _data_entrada(orcamento))
+            info.compress_type = zipfile.ZIP_STORED  # o PDF já tem os conteúdos comprimidos
+            arquivo.writestr(info, conteudo)
+            self.arquivos += 1
+        else:
+            self.falhas += 1
+            logger.warning(f"Exportação: PDF do orçamento {numero} não incluído: {erro}")
+        indice.writerow([
+            numero, orcamento.get('criado_em', orcamento.get('data', '')), orcamento['empresa_cliente'],
+            f"{orcamento['total']:.2f}", filename or '', erro or ''
+        ])
+
+    def gerar(self, orcamentos):
+        """
+        Gera o ZIP.
+
+        Args:
+            orcamentos: Iterável de dicionários de orçamento (ex.: RepositorioOrcamentos.iterar)
+
+        Yields:
+            bytes: Blocos consecutivos do arquivo ZIP
+        """
+        saida = _SaidaEmBlocos()
+        with tempfile.TemporaryFile('w+', encoding='utf-8', newline='') as arquivo_indice, \
+                ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='exportacao-pdf') as executor:
+            indice = csv.writer(arquivo_indice)
+            indice.writerow(['numero_orcamento', 'criado_em', 'empresa', 'total', 'arquivo', 'erro'])
+            arquivo = zipfile.ZipFile(saida, 'w', allowZip64=True)
+            pendentes = set()
+            try:
+                for orcamento in orcamentos:
+                    pendentes.add(executor.submit(self._obter, orcamento))
+                    if len(pendentes) < self.janela:
+                        continue
+                    concluidos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+                    for futuro in concluidos:
+                        self._escrever(arquivo, indice, futuro.result())
+                    yield from self._retirar(saida)
+
+                while pendentes:
+                    concluidos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+                    for futuro in concluidos:
+                        self._escrever(arquivo, indice, futuro.result())
+                    yield from self._retirar(saida)
+
+                arquivo_indice.seek(0)
+                with arquivo.open(NOME_INDICE, 'w') as entrada:
+                    with io.TextIOWrapper(entrada, encoding='utf-8-sig', newline='') as texto:
+                        shutil.copyfileobj(arquivo_indice, texto)
+                arquivo.close()
+                yield from self._retirar(saida)
+                logger.info(f"Exportação concluída: {self.arquivos} PDFs, {self.falhas} falhas, {self.bytes_enviados} bytes")
+            finally:
+                # Cliente desconectado ou erro: não gerar os PDFs que ainda não começaram
+                for futuro in pendentes:
+                    futuro.cancel()
+
+    def _retirar(self, saida):
+        dados = saida.retirar()
+        if dados:
+            self.bytes_enviados += len(dados)
+            yield dados
+
+
+def _data_entrada(orcamento):
+    """Data e hora da entrada no ZIP: a criação do orçamento (ou agora, se ausente)"""
+    try:
+        data = datetime.fromisoformat(orcamento['criado_em'])
+    except (KeyError, TypeError, ValueError):
+        data = datetime.now()
+    return max(data, datetime(1980, 1, 1)).timetuple()[:6]
@@ -0,0 +1,216 @@
+import os
+import gc
+import threading
+import tracemalloc
+import logging
+from collections import deque
+from datetime import datetime
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+# Alocações ignoradas nos snapshots (o próprio tracemalloc, este monitor e o mecanismo de importação)
+FILTROS_SNAPSHOT = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+AGRUPAMENTOS = ('lineno', 'filename', 'traceback')
+
+
+def memoria_processo():
+    """
+    Memória do processo segundo o sistema operacional (inclui o que o tracemalloc não
+    vê: bibliotecas nativas, SQLite, fragmentação)
+
+    Returns:
+        dict: rss_kb (atual) e pico_rss_kb, ou None onde não estiver disponível
+    """
+    rss_kb = pico_rss_kb = None
+    try:
+        with open('/proc/self/statm') as f:
+            rss_kb = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        pico_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KB no Linux
+    except (ImportError, OSError):
+        pass
+    return {'rss_kb': rss_kb, 'pico_rss_kb': pico_rss_kb}
+
+
+def _kb(valor):
+    return round(valor / 1024, 1)
+
+
+def _local(estatistica):
+    quadro = estatistica.traceback[0]
+    return f"{quadro.filename}:{quadro.lineno}"
+
+
+class MonitorMemoria:
+    """
+    Memória das requisições medida com o tracemalloc.
+
+    Para cada rota guarda o pico (memória alocada acima da que havia no início da
+    requisição) e a memória retida ao final. Como o tracemalloc mede o processo
+    inteiro, apenas uma requisição é medida por vez; as concorrentes seguem sem
+    medição. A cada `intervalo_snapshot` requisições medidas, um snapshot é comparado
+    com o anterior e os locais que mais cresceram são guardados (e registrados no log
+    quando o crescimento passa de `alerta_kb`), o que revela objetos presos em
+    referências de módulo.
+
+    O tracemalloc deixa o Python bem mais lento: use para diagnóstico. Alocações
+    anteriores a `iniciar` (ex.: a importação do numpy) só aparecem se o processo
+    for iniciado com PYTHONTRACEMALLOC.
+
+    Args:
+        frames: Quadros guardados por alocação (mais quadros, mais custo)
+        intervalo_snapshot: Requisições medidas entre duas comparações de snapshot
+        historico: Comparações mantidas
+        top: Locais guardados em cada comparação
+        alerta_kb: Crescimento entre snapshots a partir do qual é emitido um aviso
+    """
+
+    def __init__(self, frames=1, intervalo_snapshot=100, historico=10, top=10, alerta_kb=1024):
+        self.frames = max(1, frames)
+        self.intervalo_snapshot = max(1, intervalo_snapshot)
+        self.top = top
+        self.alerta_kb = alerta_kb
+        self._historico = historico
+        self.limpar()
+        if hasattr(os, 'register_at_fork'):
+            # Um worker recém-criado não herda as medições nem o lock do processo pai
+            os.register_at_fork(after_in_child=self.limpar)
+
+    def limpar(self):
+        """Descarta as medições e os snapshots"""
+        self._vaga = threading.Lock()
+        self._lock = threading.Lock()
+        self._rotas = {}  # rota -> [requisições, soma dos picos, maior pico, soma retida, maior retida]
+        self._medidas = 0
+        self._snapshot = None
+        self.crescimentos = deque(maxlen=self._historico)
+
+    def iniciar(self):
+        """Liga o tracemalloc (se ainda não estiver ligado) e tira o snapshot inicial"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        self._snapshot = self._tirar_snapshot()
+        logger.info(f"Monitor de memória iniciado ({tracemalloc.get_traceback_limit()} quadro(s) por alocação)")
+
+    @staticmethod
+    def _tirar_snapshot():
+        return tracemalloc.take_snapshot().filter_traces(FILTROS_SNAPSHOT)
+
+    def comecar(self):
+        """
+        Início de uma requisição
+
+        Returns:
+            int: Memória rastreada no início, ou None se outra requisição já está sendo medida
+        """
+        if not tracemalloc.is_tracing() or not self._vaga.acquire(blocking=False):
+            return None
+        tracemalloc.reset_peak()
+        return tracemalloc.get_traced_memory()[0]
+
+    def concluir(self, inicio, rota):
+        """Fim de uma requisição iniciada com `comecar` (que devolveu `inicio`)"""
+        try:
+            atual, pico = tracemalloc.get_traced_memory()
+            pico = max(0, pico - inicio)
+            retido = atual - inicio
+            with self._lock:
+                dados = self._rotas.get(rota)
+                if dados is None:
+                    dados = self._rotas[rota] = [0, 0, 0, 0, 0]
+                dados[0] += 1
+                dados[1] += pico
+                dados[2] = max(dados[2], pico)
+                dados[3] += retido
+                dados[4] = max(dados[4], retido)
+                self._medidas += 1
+                comparar = self._medidas % self.intervalo_snapshot == 0
+            if comparar:
+                self.comparar_snapshot()
+        except Exception as e:
+            logger.error(f"Erro ao registrar a memória da requisição: {str(e)}")
+        finally:
+            self._vaga.release()
+
+    def comparar_snapshot(self):
+        """
+        Compara um novo snapshot com o anterior e guarda os locais que mais cresceram
+
+        Returns:
+            dict: em, requisicoes, crescimento_kb e locais (local, crescimento_kb, blocos)
+        """
+        gc.collect()
+        snapshot = self._tirar_snapshot()
+        anterior, self._snapshot = self._snapshot, snapshot
+        if anterior is None:
+            return None
+        diferencas = snapshot.compare_to(anterior, 'lineno')
+        crescimentos = [d for d in diferencas if d.size_diff > 0]
+        comparacao = {
+            'em': datetime.now().isoformat(timespec='seconds'),
+            'requisicoes': self._medidas,
+            'crescimento_kb': _kb(sum(d.size_diff for d in diferencas)),
+            'locais': [{
+                'local': _local(d),
+                'crescimento_kb': _kb(d.size_diff),
+                'blocos': d.count_diff
+            } for d in crescimentos[:self.top]]
+        }
+        self.crescimentos.append(comparacao)
+        if comparacao['crescimento_kb'] >= self.alerta_kb:
+            principais = ', '.join(f"{l['local']} (+{l['crescimento_kb']} KB)" for l in comparacao['locais'][:3])
+            logger.warning(f"Memória cresceu {comparacao['crescimento_kb']} KB em {self.intervalo_snapshot} requisições: {principais}")
+        return comparacao
+
+    def resumo(self, top=20, agrupar='lineno'):
+        """
+        Estado atual da memória: totais, medições por rota, principais locais de
+        alocação e as comparações de snapshot mais recentes
+
+        Args:
+            top: Quantidade de locais de alocação
+            agrupar: 'lineno', 'filename' ou 'traceback'
+        """
+        if agrupar not in AGRUPAMENTOS:
+            raise ValueError(f"Agrupamento inválido: {agrupar}")
+        atual = tracemalloc.get_traced_memory()[0]
+        with self._lock:
+            rotas = {rota: list(dados) for rota, dados in self._rotas.items()}
+
+        locais = []
+        if tracemalloc.is_tracing():
+            for estatistica in self._tirar_snapshot().statistics(agrupar)[:top]:
+                local = {'local': _local(estatistica), 'tamanho_kb': _kb(estatistica.size), 'blocos': estatistica.count}
+                if agrupar == 'traceback':
+                    local['pilha'] = estatistica.traceback.format()
+                locais.append(local)
+
+        return {
+            'rastreando': tracemalloc.is_tracing(),
+            'rastreada_kb': _kb(atual),
+            'processo': memoria_processo(),
+            'rotas': {
+                rota: {
+                    'requisicoes': n,
+                    'pico_medio_kb': _kb(soma_pico / n),
+                    'pico_max_kb': _kb(maior_pico),
+                    'retida_media_kb': _kb(soma_retida / n),
+                    'retida_max_kb': _kb(maior_retida),
+                    'retida_total_kb': _kb(soma_retida)
+                } for rota, (n, soma_pico, maior_pico, soma_retida, maior_retida) in sorted(rotas.items())
+            },
+            'principais_alocacoes': locais,
+            'crescimentos': list(self.crescimentos)
+        }
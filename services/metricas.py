@@ -0,0 +1,201 @@
+import os
+import time
+import bisect
+import threading
+import logging
+from contextlib import contextmanager
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+# Limites dos histogramas de duração, em segundos (os mesmos do cliente oficial do Prometheus)
+BUCKETS_PADRAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HISTOGRAMA = 'histogram'
+CONTADOR = 'counter'
+MEDIDOR = 'gauge'
+
+# Métricas registradas pelo aplicativo
+DURACAO_REQUISICAO = 'precificacao_requisicao_duracao_segundos'
+REQUISICOES = 'precificacao_requisicoes_total'
+ERROS_REQUISICAO = 'precificacao_requisicao_erros_total'
+EM_ANDAMENTO = 'precificacao_requisicoes_em_andamento'
+DURACAO_ETAPA = 'precificacao_etapa_duracao_segundos'
+ERROS_ETAPA = 'precificacao_etapa_erros_total'
+
+
+def _escapar(valor):
+    """Escapa o valor de um rótulo no formato de texto do Prometheus"""
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _formatar_rotulos(rotulos, extra=None):
+    pares = list(rotulos) + ([extra] if extra else [])
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{nome}="{_escapar(valor)}"' for nome, valor in pares) + '}'
+
+
+def _formatar_numero(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    if isinstance(valor, float) and valor.is_integer() and abs(valor) < 1e15:
+        return str(int(valor))
+    return repr(valor)
+
+
+class _Fragmento:
+    """Valores registrados por uma única thread (só ela os altera)"""
+
+    __slots__ = ('histogramas', 'contadores')
+
+    def __init__(self):
+        self.histogramas = {}  # (nome, rótulos) -> [contagem por faixa..., soma, total]
+        self.contadores = {}   # (nome, rótulos) -> valor (contadores e medidores)
+
+
+class RegistroMetricas:
+    """
+    Métricas do processo (histogramas, contadores e medidores) no formato de texto do
+    Prometheus.
+
+    Cada thread grava em um fragmento próprio, sem lock; o lock é usado apenas quando
+    uma thread registra o seu fragmento (uma vez) e na exportação, que soma os
+    fragmentos. Assim o custo por requisição fica em algumas operações de dicionário,
+    mesmo com muitas threads do waitress. Os valores são por processo: com vários
+    workers do gunicorn, cada um expõe os seus.
+
+    Os rótulos são tuplas de pares (nome, valor) em ordem fixa; use valores de
+    cardinalidade limitada (a regra da rota, não o caminho).
+    """
+
+    def __init__(self, buckets=BUCKETS_PADRAO):
+        self.buckets = tuple(buckets)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._fragmentos = []
+        self._descricoes = {}  # nome -> (tipo, ajuda)
+        if hasattr(os, 'register_at_fork'):
+            # Um worker recém-criado não herda as contagens do processo pai
+            os.register_at_fork(after_in_child=self.limpar)
+
+    def descrever(self, nome, tipo, ajuda):
+        """Registra o tipo e a descrição de uma métrica (linhas # TYPE e # HELP)"""
+        self._descricoes[nome] = (tipo, ajuda)
+
+    def _fragmento(self):
+        fragmento = getattr(self._local, 'fragmento', None)
+        if fragmento is None:
+            fragmento = _Fragmento()
+            with self._lock:
+                self._fragmentos.append(fragmento)
+            self._local.fragmento = fragmento
+        return fragmento
+
+    def observar(self, nome, rotulos, valor):
+        """Registra um valor em um histograma"""
+        series = self._fragmento().histogramas
+        serie = series.get((nome, rotulos))
+        if serie is None:
+            serie = series[(nome, rotulos)] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        serie[bisect.bisect_left(self.buckets, valor)] += 1
+        serie[-2] += valor
+        serie[-1] += 1
+
+    def incrementar(self, nome, rotulos=(), valor=1):
+        """Soma `valor` a um contador ou medidor (use valores negativos para medidores)"""
+        series = self._fragmento().contadores
+        chave = (nome, rotulos)
+        series[chave] = series.get(chave, 0) + valor
+
+    @contextmanager
+    def cronometrar(self, nome, rotulos=(), nome_erros=None):
+        """
+        Mede a duração do bloco (ou da função decorada) em um histograma; se o bloco
+        levantar uma exceção e `nome_erros` for informado, incrementa esse contador.
+        """
+        inicio = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            if nome_erros:
+                self.incrementar(nome_erros, rotulos)
+            raise
+        finally:
+            self.observar(nome, rotulos, time.perf_counter() - inicio)
+
+    def limpar(self):
+        """Descarta todos os valores registrados"""
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._fragmentos = []
+
+    def _somar(self):
+        """Soma os fragmentos de todas as threads"""
+        histogramas = {}
+        contadores = {}
+        with self._lock:
+            fragmentos = list(self._fragmentos)
+        for fragmento in fragmentos:
+            for chave, serie in list(fragmento.histogramas.items()):
+                total = histogramas.get(chave)
+                if total is None:
+                    histogramas[chave] = list(serie)
+                else:
+                    for i, valor in enumerate(serie):
+                        total[i] += valor
+            for chave, valor in list(fragmento.contadores.items()):
+                contadores[chave] = contadores.get(chave, 0) + valor
+        return histogramas, contadores
+
+    def exportar(self):
+        """
+        Retorna todas as métricas no formato de texto do Prometheus (versão 0.0.4)
+
+        Returns:
+            str: Texto da exposição
+        """
+        histogramas, contadores = self._somar()
+        por_nome = {}
+        for (nome, rotulos), serie in histogramas.items():
+            por_nome.setdefault(nome, []).append((rotulos, serie))
+        for (nome, rotulos), valor in contadores.items():
+            por_nome.setdefault(nome, []).append((rotulos, valor))
+
+        linhas = []
+        for nome in sorted(set(por_nome) | set(self._descricoes)):
+            tipo, ajuda = self._descricoes.get(nome, (None, None))
+            if ajuda:
+                linhas.append(f"# HELP {nome} {ajuda}")
+            if tipo:
+                linhas.append(f"# TYPE {nome} {tipo}")
+            for rotulos, valor in sorted(por_nome.get(nome, []), key=lambda item: item[0]):
+                if isinstance(valor, list):
+                    acumulado = 0
+                    for limite, quantidade in zip(self.buckets + (float('inf'),), valor):
+                        acumulado += quantidade
+                        linhas.append(f"{nome}_bucket{_formatar_rotulos(rotulos, ('le', _formatar_numero(float(limite))))} {acumulado}")
+                    linhas.append(f"{nome}_sum{_formatar_rotulos(rotulos)} {_formatar_numero(valor[-2])}")
+                    linhas.append(f"{nome}_count{_formatar_rotulos(rotulos)} {valor[-1]}")
+                else:
+                    linhas.append(f"{nome}{_formatar_rotulos(rotulos)} {_formatar_numero(valor)}")
+        return '\n'.join(linhas) + '\n'
+
+
+# Registro compartilhado pelo processo
+metricas = RegistroMetricas()
+metricas.descrever(DURACAO_REQUISICAO, HISTOGRAMA, "Duração das requisições por rota e método, em segundos")
+metricas.descrever(REQUISICOES, CONTADOR, "Requisições atendidas por rota, método e status")
+metricas.descrever(ERROS_REQUISICAO, CONTADOR, "Requisições com erro (status 5xx ou exceção) por rota e método")
+metricas.descrever(EM_ANDAMENTO, MEDIDOR, "Requisições em andamento por rota")
+metricas.descrever(DURACAO_ETAPA, HISTOGRAMA, "Duração das etapas internas (busca de preço, PDF, envio SMTP), em segundos")
+metricas.descrever(ERROS_ETAPA, CONTADOR, "Etapas internas que terminaram com exceção")
+
+
+def etapa(nome):
+    """
+    Mede uma etapa interna (ex.: 'busca_preco', 'pdf', 'smtp'); pode ser usada com
+    `with` ou como decorador.
+    """
+    return metricas.cronometrar(DURACAO_ETAPA, (('etapa', nome),), ERROS_ETAPA)
@@ -0,0 +1,102 @@
+import os
+import json
+import logging
+from datetime import datetime
+
+from services.banco import BancoSQLite
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+class SequenciaOrcamentos(BancoSQLite):
+    """
+    Gerador de números de orçamento no formato DD-MM-AAAA-XXXX.
+
+    O contador de cada dia fica em um banco SQLite em modo WAL. Cada reserva é feita
+    dentro de uma transação BEGIN IMMEDIATE, que obtém o lock de escrita antes de ler
+    o contador; assim threads e processos (workers do gunicorn) nunca recebem o mesmo
+    número.
+
+    A garantia vale apenas para quem usa o mesmo arquivo. Na Vercel (DATA_DIR no /tmp
+    de cada instância) cada instância tem o seu contador, zerado a cada partida a frio:
+    duas instâncias podem gerar o mesmo número no mesmo dia.
+    """
+
+    def __init__(self, caminho_db, timeout=30.0):
+        super().__init__(caminho_db, timeout)
+        self.conexao().execute("""
+            CREATE TABLE IF NOT EXISTS sequencia_orcamento (
+                data TEXT PRIMARY KEY,
+                ultimo INTEGER NOT NULL
+            )
+        """)
+
+    def reservar(self, quantidade=1, data=None):
+        """
+        Reserva uma faixa contínua de números para o dia informado.
+
+        Args:
+            quantidade: Quantidade de números a reservar
+            data: Data dos orçamentos (opcional, padrão: hoje)
+
+        Returns:
+            list: Números reservados no formato DD-MM-AAAA-XXXX
+        """
+        if quantidade < 1:
+            raise ValueError("A quantidade de números reservados deve ser positiva")
+
+        data_formatada = (data or datetime.now()).strftime("%d-%m-%Y")
+
+        with self.transacao() as conexao:
+            conexao.execute(
+                "INSERT OR IGNORE INTO sequencia_orcamento (data, ultimo) VALUES (?, 0)",
+                (data_formatada,)
+            )
+            conexao.execute(
+                "UPDATE sequencia_orcamento SET ultimo = ultimo + ? WHERE data = ?",
+                (quantidade, data_formatada)
+            )
+            ultimo = conexao.execute(
+                "SELECT ultimo FROM sequencia_orcamento WHERE data = ?",
+                (data_formatada,)
+            ).fetchone()[0]
+
+        primeiro = ultimo - quantidade + 1
+        return [f"{data_formatada}-{contador:04d}" for contador in range(primeiro, ultimo + 1)]
+
+    def proximo(self, data=None):
+        """Reserva e retorna o próximo número de orçamento"""
+        return self.reservar(1, data)[0]
+
+    def importar_contador_json(self, caminho_json):
+        """
+        Importa o contador do antigo arquivo contador_orcamento.json, para que os
+        números emitidos no dia da migração não se repitam.
+
+        Returns:
+            bool: True se algum contador foi importado
+        """
+        if not os.path.exists(caminho_json):
+            return False
+        try:
+            with open(caminho_json, 'r') as f:
+                dados = json.load(f)
+            data_formatada = dados['data']
+            contador = int(dados['contador'])
+        except Exception as e:
+            logger.warning(f"Não foi possível importar o contador de {caminho_json}: {str(e)}")
+            return False
+
+        with self.transacao() as conexao:
+            conexao.execute(
+                "INSERT OR IGNORE INTO sequencia_orcamento (data, ultimo) VALUES (?, 0)",
+                (data_formatada,)
+            )
+            conexao.execute(
+                "UPDATE sequencia_orcamento SET ultimo = MAX(ultimo, ?) WHERE data = ?",
+                (contador, data_formatada)
+            )
+
+        logger.info(f"Contador de orçamentos importado de {caminho_json}: {data_formatada} -> {contador}")
+        return True
@@ -0,0 +1,215 @@
+import json
+import secrets
+import logging
+from datetime import datetime
+
+from services.banco import BancoSQLite
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+class RepositorioOrcamentos(BancoSQLite):
+    """
+    Armazena os orçamentos finalizados em SQLite.
+
+    Cada orçamento é uma linha com os dados do cliente, os totais e a lista de serviços
+    serializada em JSON. Há índices por número, empresa, e-mail e data, de modo que
+    as consultas (e a nova geração do PDF) não dependem da sessão do usuário.
+
+    Os orçamentos são devolvidos como dicionários no formato usado por
+    gerar_pdf_orcamento (numero_orcamento, data, empresa_cliente, email, telefone,
+    servicos, subtotal, percentual_sesi, valor_sesi, total), acrescidos do id.
+
+    Cada orçamento tem também um token aleatório, exigido por obter quando o id vem de
+    fora (ex.: da sessão do usuário): ids são sequenciais e se repetem entre bases.
+    """
+
+    def __init__(self, caminho_db, timeout=30.0):
+        super().__init__(caminho_db, timeout)
+        conexao = self.conexao()
+        conexao.execute("""
+            CREATE TABLE IF NOT EXISTS orcamentos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                numero TEXT NOT NULL UNIQUE,
+                criado_em TEXT NOT NULL,
+                empresa TEXT NOT NULL,
+                email TEXT NOT NULL,
+                telefone TEXT,
+                subtotal REAL NOT NULL,
+                percentual_sesi REAL NOT NULL,
+                valor_sesi REAL NOT NULL,
+                total REAL NOT NULL,
+                servicos TEXT NOT NULL,
+                token TEXT
+            )
+        """)
+        # Bases criadas antes do token: acrescentar a coluna (os orçamentos antigos ficam sem token)
+        with self.transacao() as transacao:
+            if 'token' not in {coluna['name'] for coluna in transacao.execute("PRAGMA table_info(orcamentos)")}:
+                transacao.execute("ALTER TABLE orcamentos ADD COLUMN token TEXT")
+        conexao.execute("CREATE INDEX IF NOT EXISTS idx_orcamentos_empresa ON orcamentos (empresa)")
+        conexao.execute("CREATE INDEX IF NOT EXISTS idx_orcamentos_email ON orcamentos (email)")
+        conexao.execute("CREATE INDEX IF NOT EXISTS idx_orcamentos_criado_em ON orcamentos (criado_em)")
+
+    def _como_dicionario(self, linha):
+        """Converte uma linha da tabela no dicionário de dados do orçamento"""
+        if linha is None:
+            return None
+        return {
+            'id': linha['id'],
+            'numero_orcamento': linha['numero'],
+            'data': datetime.fromisoformat(linha['criado_em']).strftime("%d/%m/%Y"),
+            'criado_em': linha['criado_em'],
+            'empresa_cliente': linha['empresa'],
+            'email': linha['email'],
+            'telefone': linha['telefone'] or '',
+            'servicos': json.loads(linha['servicos']),
+            'subtotal': linha['subtotal'],
+            'percentual_sesi': linha['percentual_sesi'],
+            'valor_sesi': linha['valor_sesi'],
+            'total': linha['total']
+        }
+
+    def salvar(self, numero_orcamento, empresa_cliente, email, telefone, servicos,
+               subtotal, percentual_sesi, valor_sesi, total, criado_em=None, token=None):
+        """
+        Grava um orçamento finalizado.
+
+        Args:
+            numero_orcamento: Número do orçamento (único)
+            empresa_cliente: Nome da empresa
+            email: E-mail do cliente
+            telefone: Telefone do cliente
+            servicos: Lista de dicionários com os serviços do orçamento
+            subtotal: Soma dos serviços
+            percentual_sesi: Percentual indireto do SESI (ex.: 30.0)
+            valor_sesi: Valor do percentual indireto
+            total: Total do orçamento
+            criado_em: Data de criação (opcional, padrão: agora)
+            token: Token do orçamento (opcional, padrão: um novo token aleatório)
+
+        Returns:
+            int: id do orçamento gravado
+        """
+        criado_em = (criado_em or datetime.now()).isoformat(sep=' ', timespec='seconds')
+        token = token or secrets.token_urlsafe(16)
+        with self.transacao() as conexao:
+            cursor = conexao.execute(
+                """
+                INSERT INTO orcamentos (numero, criado_em, empresa, email, telefone,
+                                        subtotal, percentual_sesi, valor_sesi, total, servicos, token)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (numero_orcamento, criado_em, empresa_cliente, email, telefone,
+                 subtotal, percentual_sesi, valor_sesi, total,
+                 json.dumps(servicos, ensure_ascii=False), token)
+            )
+            orcamento_id = cursor.lastrowid
+        logger.info(f"Orçamento {numero_orcamento} gravado com id {orcamento_id}")
+        return orcamento_id
+
+    def obter(self, orcamento_id, token=None):
+        """
+        Retorna o orçamento com o id informado (None se não existir).
+
+        Args:
+            orcamento_id: id do orçamento
+            token: Se informado, o orçamento só é devolvido se o seu token for este
+        """
+        linha = self.conexao().execute("SELECT * FROM orcamentos WHERE id = ?", (orcamento_id,)).fetchone()
+        if linha is not None and token is not None:
+            if linha['token'] is None or not secrets.compare_digest(linha['token'], token):
+                return None
+        return self._como_dicionario(linha)
+
+    def token(self, orcamento_id):
+        """Retorna o token do orçamento, criando um para orçamentos gravados sem token"""
+        with self.transacao() as conexao:
+            linha = conexao.execute("SELECT token FROM orcamentos WHERE id = ?", (orcamento_id,)).fetchone()
+            if linha is None:
+                return None
+            if linha['token'] is not None:
+                return linha['token']
+            token = secrets.token_urlsafe(16)
+            conexao.execute("UPDATE orcamentos SET token = ? WHERE id = ?", (token, orcamento_id))
+            return token
+
+    def obter_por_numero(self, numero_orcamento):
+        """Retorna o orçamento com o número informado (None se não existir)"""
+        linha = self.conexao().execute("SELECT * FROM orcamentos WHERE numero = ?", (numero_orcamento,)).fetchone()
+        return self._como_dicionario(linha)
+
+    def _filtros(self, empresa=None, email=None, inicio=None, fim=None, regiao=None):
+        """Monta as condições SQL (e os parâmetros) dos filtros de busca"""
+        condicoes = []
+        parametros = []
+        if empresa:
+            condicoes.append("empresa = ?")
+            parametros.append(empresa)
+        if email:
+            condicoes.append("email = ?")
+            parametros.append(email)
+        if inicio:
+            condicoes.append("criado_em >= ?")
+            parametros.append(inicio.isoformat(sep=' ', timespec='seconds'))
+        if fim:
+            condicoes.append("criado_em < ?")
+            parametros.append(fim.isoformat(sep=' ', timespec='seconds'))
+        if regiao:
+            # A região fica em cada serviço do JSON; basta um serviço na região
+            condicoes.append("EXISTS (SELECT 1 FROM json_each(orcamentos.servicos) WHERE json_extract(json_each.value, '$.regiao') = ?)")
+            parametros.append(regiao)
+        return condicoes, parametros
+
+    def buscar(self, empresa=None, email=None, inicio=None, fim=None, limite=100, regiao=None):
+        """
+        Lista orçamentos filtrando por empresa, e-mail, região e/ou período, do mais
+        recente para o mais antigo.
+
+        Args:
+            empresa: Nome exato da empresa (opcional)
+            email: E-mail exato do cliente (opcional)
+            inicio: datetime inicial do período, inclusive (opcional)
+            fim: datetime final do período, exclusive (opcional)
+            limite: Quantidade máxima de orçamentos retornados (None para todos)
+            regiao: Região de ao menos um dos serviços (opcional)
+
+        Returns:
+            list: Orçamentos encontrados
+        """
+        condicoes, parametros = self._filtros(empresa, email, inicio, fim, regiao)
+
+        sql = "SELECT * FROM orcamentos"
+        if condicoes:
+            sql += " WHERE " + " AND ".join(condicoes)
+        sql += " ORDER BY criado_em DESC, id DESC"
+        if limite is not None:
+            sql += " LIMIT ?"
+            parametros.append(int(limite))
+
+        return [self._como_dicionario(linha) for linha in self.conexao().execute(sql, parametros)]
+
+    def iterar(self, empresa=None, email=None, inicio=None, fim=None, regiao=None, tamanho_pagina=500):
+        """
+        Percorre os orçamentos que atendem aos filtros em ordem de id, buscando uma
+        página por vez: a memória usada não depende da quantidade de orçamentos e
+        nenhuma transação de leitura fica aberta entre as páginas.
+
+        Yields:
+            dict: Cada orçamento encontrado
+        """
+        condicoes, parametros = self._filtros(empresa, email, inicio, fim, regiao)
+        sql = "SELECT * FROM orcamentos WHERE id > ?"
+        if condicoes:
+            sql += " AND " + " AND ".join(condicoes)
+        sql += " ORDER BY id LIMIT ?"
+
+        ultimo_id = 0
+        while True:
+            linhas = self.conexao().execute(sql, [ultimo_id, *parametros, tamanho_pagina]).fetchall()
+            for linha in linhas:
+                yield self._como_dicionario(linha)
+            if len(linhas) < tamanho_pagina:
+                return
+            ultimo_id = linhas[-1]['id']
@@ -0,0 +1,272 @@
+import os
+import json
+import time
+import threading
+import logging
+from datetime import datetime
+
+from services.banco import BancoSQLite
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+# Situações de um e-mail na caixa de saída
+STATUS_PENDENTE = 'pendente'    # aguardando envio (ou nova tentativa)
+STATUS_ENVIANDO = 'enviando'    # reservado por um worker
+STATUS_ENVIADO = 'enviado'      # entregue ao servidor SMTP
+STATUS_FALHOU = 'falhou'        # tentativas esgotadas
+
+
+class CaixaSaida(BancoSQLite):
+    """
+    Caixa de saída durável de e-mails com orçamento.
+
+    A requisição apenas grava a mensagem (PDF e metadados) e retorna; o envio é feito
+    depois por TrabalhadorCaixaSaida. Cada mensagem é reservada dentro de uma transação
+    BEGIN IMMEDIATE, de modo que vários workers podem processar a mesma caixa sem
+    enviar um e-mail duas vezes. Uma reserva vale por `reserva_segundos`: se o worker
+    morrer no meio do envio, a mensagem volta a ficar disponível depois desse prazo.
+    """
+
+    def __init__(self, caminho_db, max_tentativas=5, backoff_segundos=30.0, reserva_segundos=300.0, timeout=30.0):
+        super().__init__(caminho_db, timeout)
+        self.max_tentativas = max_tentativas
+        self.backoff_segundos = backoff_segundos
+        self.reserva_segundos = reserva_segundos
+
+        conexao = self.conexao()
+        conexao.execute("""
+            CREATE TABLE IF NOT EXISTS caixa_saida (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                orcamento_id INTEGER,
+                destinatario TEXT NOT NULL,
+                nome_arquivo TEXT NOT NULL,
+                pdf BLOB,
+                metadados TEXT NOT NULL,
+                status TEXT NOT NULL,
+                tentativas INTEGER NOT NULL DEFAULT 0,
+                proxima_tentativa REAL NOT NULL,
+                ultimo_erro TEXT,
+                criado_em TEXT NOT NULL,
+                enviado_em TEXT
+            )
+        """)
+        conexao.execute("CREATE INDEX IF NOT EXISTS idx_caixa_saida_fila ON caixa_saida (status, proxima_tentativa)")
+        conexao.execute("CREATE INDEX IF NOT EXISTS idx_caixa_saida_orcamento ON caixa_saida (orcamento_id)")
+
+    def enfileirar(self, destinatario, pdf, nome_arquivo, orcamento_id=None, **metadados):
+        """
+        Grava um e-mail para envio em segundo plano.
+
+        Args:
+            destinatario: E-mail do destinatário
+            pdf: Bytes do PDF anexo
+            nome_arquivo: Nome do arquivo anexo
+            orcamento_id: id do orçamento (opcional)
+            **metadados: Argumentos repassados à função de envio (número, empresa, totais...)
+
+        Returns:
+            int: id da mensagem na caixa de saída
+        """
+        with self.transacao() as conexao:
+            cursor = conexao.execute(
+                """
+                INSERT INTO caixa_saida (orcamento_id, destinatario, nome_arquivo, pdf, metadados,
+                                         status, proxima_tentativa, criado_em)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (orcamento_id, destinatario, nome_arquivo, pdf,
+                 json.dumps(metadados, ensure_ascii=False, default=str),
+                 STATUS_PENDENTE, time.time(), datetime.now().isoformat(sep=' ', timespec='seconds'))
+            )
+            mensagem_id = cursor.lastrowid
+        logger.info(f"E-mail {mensagem_id} para {destinatario} adicionado à caixa de saída")
+        return mensagem_id
+
+    def reservar(self, mensagem_id=None):
+        """
+        Reserva a próxima mensagem pronta para envio.
+
+        Args:
+            mensagem_id: Se informado, reserva apenas esta mensagem (se estiver pronta)
+
+        Returns:
+            dict com id, destinatario, nome_arquivo, pdf, metadados e tentativas, ou None
+        """
+        agora = time.time()
+        with self.transacao() as conexao:
+            if mensagem_id is None:
+                linha = conexao.execute(
+                    """
+                    SELECT id, destinatario, nome_arquivo, pdf, metadados, tentativas
+                    FROM caixa_saida
+                    WHERE status IN (?, ?) AND proxima_tentativa <= ?
+                    ORDER BY proxima_tentativa, id
+                    LIMIT 1
+                    """,
+                    (STATUS_PENDENTE, STATUS_ENVIANDO, agora)
+                ).fetchone()
+            else:
+                linha = conexao.execute(
+                    """
+                    SELECT id, destinatario, nome_arquivo, pdf, metadados, tentativas
+                    FROM caixa_saida
+                    WHERE id = ? AND status IN (?, ?) AND proxima_tentativa <= ?
+                    """,
+                    (mensagem_id, STATUS_PENDENTE, STATUS_ENVIANDO, agora)
+                ).fetchone()
+            if linha is None:
+                return None
+            conexao.execute(
+                "UPDATE caixa_saida SET status = ?, tentativas = tentativas + 1, proxima_tentativa = ? WHERE id = ?",
+                (STATUS_ENVIANDO, agora + self.reserva_segundos, linha['id'])
+            )
+        return {
+            'id': linha['id'],
+            'destinatario': linha['destinatario'],
+            'nome_arquivo': linha['nome_arquivo'],
+            'pdf': linha['pdf'],
+            'metadados': json.loads(linha['metadados']),
+            'tentativas': linha['tentativas'] + 1
+        }
+
+    def concluir(self, mensagem_id):
+        """Marca a mensagem como enviada e descarta o PDF armazenado"""
+        with self.transacao() as conexao:
+            conexao.execute(
+                "UPDATE caixa_saida SET status = ?, pdf = NULL, ultimo_erro = NULL, enviado_em = ? WHERE id = ?",
+                (STATUS_ENVIADO, datetime.now().isoformat(sep=' ', timespec='seconds'), mensagem_id)
+            )
+
+    def registrar_falha(self, mensagem_id, tentativas, erro):
+        """
+        Registra uma tentativa malsucedida, agendando nova tentativa com backoff
+        exponencial ou marcando a mensagem como falha quando as tentativas se esgotam.
+
+        Returns:
+            str: Novo status da mensagem
+        """
+        if tentativas >= self.max_tentativas:
+            status, proxima = STATUS_FALHOU, time.time()
+        else:
+            status, proxima = STATUS_PENDENTE, time.time() + self.backoff_segundos * (2 ** (tentativas - 1))
+        with self.transacao() as conexao:
+            conexao.execute(
+                "UPDATE caixa_saida SET status = ?, proxima_tentativa = ?, ultimo_erro = ? WHERE id = ?",
+                (status, proxima, str(erro), mensagem_id)
+            )
+        return status
+
+    def status(self, mensagem_id):
+        """
+        Retorna a situação de uma mensagem (sem o PDF).
+
+        Returns:
+            dict com status, tentativas, ultimo_erro, criado_em e enviado_em, ou None
+        """
+        linha = self.conexao().execute(
+            "SELECT id, status, tentativas, ultimo_erro, criado_em, enviado_em FROM caixa_saida WHERE id = ?",
+            (mensagem_id,)
+        ).fetchone()
+        return dict(linha) if linha is not None else None
+
+
+class TrabalhadorCaixaSaida:
+    """
+    Envia as mensagens da caixa de saída em uma thread de segundo plano.
+
+    A função de envio recebe (destinatario, pdf, nome_arquivo, **metadados) e retorna
+    a tupla (sucesso, mensagem), como as funções de services.email_sender. A thread é
+    iniciada na subida de cada processo (ou pela primeira notificação) e recriada após
+    um fork; a cada ciclo ela esvazia a fila, inclusive as mensagens que ficaram
+    pendentes ou aguardando nova tentativa antes de um reinício.
+    """
+
+    def __init__(self, caixa, funcao_envio, intervalo=5.0):
+        self.caixa = caixa
+        self.funcao_envio = funcao_envio
+        self.intervalo = intervalo
+        self._apos_fork()
+        if hasattr(os, 'register_at_fork'):
+            # A thread não sobrevive ao fork; o processo filho cria a sua com lock e evento novos
+            os.register_at_fork(after_in_child=self._apos_fork)
+
+    def _apos_fork(self):
+        self._evento = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def processar_pendentes(self, limite=None):
+        """
+        Envia as mensagens prontas, até esgotar a fila ou atingir o limite.
+
+        Returns:
+            int: Quantidade de mensagens processadas
+        """
+        processadas = 0
+        while limite is None or processadas < limite:
+            mensagem = self.caixa.reservar()
+            if mensagem is None:
+                break
+            processadas += 1
+            self._enviar(mensagem)
+        return processadas
+
+    def processar_mensagem(self, mensagem_id):
+        """
+        Envia uma mensagem específica, se estiver pronta (usado no modo 'requisicao',
+        em que cada requisição só deve enviar o e-mail da própria sessão).
+
+        Returns:
+            bool: Se a mensagem foi reservada e processada
+        """
+        mensagem = self.caixa.reservar(mensagem_id)
+        if mensagem is None:
+            return False
+        self._enviar(mensagem)
+        return True
+
+    def _enviar(self, mensagem):
+        """Envia uma mensagem reservada e registra o resultado na caixa de saída"""
+        try:
+            sucesso, resultado = self.funcao_envio(
+                mensagem['destinatario'], mensagem['pdf'], mensagem['nome_arquivo'], **mensagem['metadados']
+            )
+        except Exception as e:
+            sucesso, resultado = False, str(e)
+
+        if sucesso:
+            self.caixa.concluir(mensagem['id'])
+            logger.info(f"E-mail {mensagem['id']} enviado para {mensagem['destinatario']}")
+        else:
+            status = self.caixa.registrar_falha(mensagem['id'], mensagem['tentativas'], resultado)
+            logger.warning(f"Falha ao enviar e-mail {mensagem['id']} (tentativa {mensagem['tentativas']}, {status}): {resultado}")
+
+    def _executar(self):
+        """Laço da thread: esvazia a fila e espera uma notificação ou o intervalo"""
+        while True:
+            # Limpar antes de ler a fila: uma notificação recebida durante o envio faz o
+            # wait retornar na hora, em vez de a mensagem esperar o próximo intervalo
+            self._evento.clear()
+            try:
+                self.processar_pendentes()
+            except Exception as e:
+                logger.error(f"Erro no processamento da caixa de saída: {str(e)}")
+            self._evento.wait(self.intervalo)
+
+    def iniciar(self):
+        """Inicia a thread de envio, se ainda não estiver em execução neste processo"""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._executar, name='caixa-saida', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+            logger.info("Thread da caixa de saída iniciada")
+
+    def notificar(self):
+        """Acorda a thread de envio (chamado após enfileirar uma mensagem)"""
+        self.iniciar()
+        self._evento.set()
@@ -0,0 +1,146 @@
+import os
+import threading
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as TimeoutFuturo
+from concurrent.futures.process import BrokenProcessPool
+
+from services.pdf_orcamento import preparar_trabalhador, renderizar_pdf_orcamento, LAYOUT_AUTOMATICO
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+# Modos de execução da renderização
+MODO_LOCAL = 'local'        # na thread da requisição (sem processos extras)
+MODO_PROCESSO = 'processo'  # em um pool de processos (não bloqueia o GIL do servidor)
+
+
+def _pronto():
+    """Tarefa vazia usada para iniciar os processos do pool"""
+    return os.getpid()
+
+
+class ExecutorPDF:
+    """
+    Executa a renderização dos PDFs de orçamento.
+
+    No modo 'processo', os PDFs são gerados em um ProcessPoolExecutor: o doc.build do
+    ReportLab é Python puro e segura o GIL, então renderizá-lo em outro processo deixa
+    as threads do servidor livres para as demais rotas e permite usar vários núcleos
+    nos envios em lote. Os processos são iniciados com preparar_trabalhador (ReportLab
+    importado e fontes carregadas) e recriados após um fork, se um deles morrer ou
+    se um PDF exceder o timeout (os processos do pool antigo são encerrados).
+
+    No modo 'local' a renderização é feita na própria thread, como antes; o timeout
+    não se aplica nesse modo.
+    """
+
+    def __init__(self, modo=MODO_PROCESSO, workers=2, timeout=30.0, contexto=None):
+        if modo not in (MODO_LOCAL, MODO_PROCESSO):
+            raise ValueError(f"Modo de renderização inválido: {modo}")
+        self.modo = modo
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        # forkserver evita copiar as threads e conexões do servidor; no Windows só há spawn
+        if contexto is None:
+            contexto = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        self.contexto = contexto
+        self._apos_fork()
+        if hasattr(os, 'register_at_fork'):
+            # Um worker criado durante o aquecimento (gunicorn --preload) herdaria o lock
+            # ocupado e o pool do processo pai, cujos processos ele não controla
+            os.register_at_fork(after_in_child=self._apos_fork)
+
+    def _apos_fork(self):
+        """Estado inicial: sem pool; o próximo PDF (ou iniciar) cria o deste processo"""
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _obter_pool(self):
+        """Retorna o pool de processos deste processo, criando e aquecendo-o se necessário"""
+        with self._lock:
+            if self._pool is None or self._pid != os.getpid():
+                contexto = multiprocessing.get_context(self.contexto)
+                if self.contexto == 'forkserver':
+                    # O servidor de fork carrega só o renderizador, não o aplicativo inteiro
+                    contexto.set_forkserver_preload(['services.pdf_orcamento'])
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=contexto,
+                    initializer=preparar_trabalhador
+                )
+                self._pid = os.getpid()
+                # Iniciar todos os processos agora, sem esperar, em vez de um por PDF
+                for _ in range(self.workers):
+                    self._pool.submit(_pronto)
+                logger.info(f"Pool de renderização de PDF iniciado com {self.workers} processos ({self.contexto})")
+            return self._pool
+
+    def _descartar(self, pool, terminar=False):
+        """
+        Descarta um pool quebrado (um processo morreu) ou travado; o próximo PDF cria outro.
+
+        Args:
+            pool: Pool a descartar
+            terminar: Se True, encerra também os processos, inclusive os que ainda estão
+                renderizando (o shutdown sozinho espera que terminem)
+        """
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        # O shutdown apaga a lista de processos do pool: guardá-la antes
+        processos = list((pool._processes or {}).values()) if terminar else []
+        pool.shutdown(wait=False, cancel_futures=True)
+        for processo in processos:
+            if processo.is_alive():
+                processo.terminate()
+
+    def iniciar(self):
+        """
+        Inicia os processos de renderização antecipadamente (opcional); no modo 'local',
+        aquece o ReportLab neste processo
+        """
+        if self.modo == MODO_PROCESSO:
+            self._obter_pool()
+        else:
+            preparar_trabalhador()
+
+    def renderizar(self, dados, layout=LAYOUT_AUTOMATICO):
+        """
+        Gera o PDF de um orçamento.
+
+        Args:
+            dados: Dicionário com os dados do orçamento
+            layout: Layout do PDF (ver services.pdf_orcamento)
+
+        Returns:
+            bytes: Conteúdo do PDF
+
+        Raises:
+            TimeoutError: Se o PDF não ficar pronto em `timeout` segundos (modo 'processo')
+        """
+        if self.modo == MODO_LOCAL:
+            return renderizar_pdf_orcamento(dados, layout)
+
+        pool = self._obter_pool()
+        try:
+            futuro = pool.submit(renderizar_pdf_orcamento, dados, layout)
+            return futuro.result(timeout=self.timeout)
+        except TimeoutFuturo:
+            # cancel() não interrompe um PDF já em renderização: o processo ficaria ocupado
+            # (ou travado) indefinidamente. Descartar o pool e encerrar os seus processos; os
+            # PDFs em andamento nele falham com BrokenProcessPool e o próximo cria um pool novo
+            self._descartar(pool, terminar=True)
+            raise TimeoutError(f"Tempo limite de {self.timeout}s excedido ao gerar o PDF do orçamento {dados.get('numero_orcamento')}")
+        except BrokenProcessPool:
+            self._descartar(pool)
+            raise
+
+    def encerrar(self):
+        """Encerra os processos de renderização"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None and self._pid == os.getpid():
+            pool.shutdown(wait=True, cancel_futures=True)
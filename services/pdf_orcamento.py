@@ -0,0 +1,370 @@
+import logging
+import threading
+from io import BytesIO
+from xml.sax.saxutils import escape
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+# Versão do layout do PDF: incrementar a cada alteração em renderizar_pdf_orcamento,
+# para que os PDFs em cache com o layout antigo deixem de ser usados
+VERSAO_LAYOUT_PDF = 2
+
+# Layouts disponíveis
+LAYOUT_DETALHADO = 'detalhado'    # um bloco (título, detalhes e tabela) por serviço
+LAYOUT_COMPACTO = 'compacto'      # uma única tabela de itens, com cabeçalho repetido a cada página
+LAYOUT_AUTOMATICO = 'automatico'  # compacto a partir de LIMITE_LAYOUT_COMPACTO serviços
+
+LIMITE_LAYOUT_COMPACTO = 30
+
+# Estilos criados uma vez por processo e compartilhados entre os PDFs
+_recursos = None
+_lock_recursos = threading.Lock()
+
+
+def _obter_recursos():
+    """Folha de estilos e estilos de tabela compartilhados (criados na primeira chamada)"""
+    global _recursos
+    with _lock_recursos:
+        if _recursos is not None:
+            return _recursos
+
+        from reportlab.lib import colors
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+        from reportlab.platypus import TableStyle
+
+        styles = getSampleStyleSheet()
+        # Em vez de adicionar um novo estilo 'Normal', vamos criar estilos com nomes diferentes
+        styles.add(ParagraphStyle(name='Titulo', fontSize=16, alignment=1, spaceAfter=12))
+        styles.add(ParagraphStyle(name='Subtitulo', fontSize=14, alignment=0, spaceAfter=10))
+        styles.add(ParagraphStyle(name='TextoNormal', fontSize=12, alignment=0, spaceAfter=8))
+        styles.add(ParagraphStyle(name='Destaque', fontSize=12, alignment=0, spaceAfter=8, textColor=colors.blue))
+        styles.add(ParagraphStyle(name='DetalheServico', fontSize=11, alignment=0, spaceAfter=8, leftIndent=20))
+        styles.add(ParagraphStyle(name='AssinaturaLinha', fontSize=12, alignment=1, spaceAfter=0))
+        styles.add(ParagraphStyle(name='CelulaItem', fontName='Helvetica', fontSize=9, leading=11))
+
+        _recursos = {
+            'styles': styles,
+            'tabela_servico': TableStyle([
+                ('BACKGROUND', (0, 0), (3, 0), colors.lightgrey),
+                ('TEXTCOLOR', (0, 0), (3, 0), colors.black),
+                ('ALIGN', (0, 0), (3, 0), 'CENTER'),
+                ('FONTNAME', (0, 0), (3, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (3, 0), 12),
+                ('BOTTOMPADDING', (0, 0), (3, 0), 12),
+                ('BACKGROUND', (0, 1), (3, 1), colors.white),
+                ('TEXTCOLOR', (0, 1), (3, 1), colors.black),
+                ('ALIGN', (0, 1), (3, 1), 'CENTER'),
+                ('FONTNAME', (0, 1), (3, 1), 'Helvetica'),
+                ('FONTSIZE', (0, 1), (3, 1), 10),
+                ('GRID', (0, 0), (3, 1), 1, colors.black)
+            ]),
+            'tabela_coleta': TableStyle([
+                ('BACKGROUND', (0, 0), (4, 0), colors.lightblue),
+                ('TEXTCOLOR', (0, 0), (4, 0), colors.black),
+                ('ALIGN', (0, 0), (4, 0), 'CENTER'),
+                ('FONTNAME', (0, 0), (4, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (4, 0), 10),
+                ('BOTTOMPADDING', (0, 0), (4, 0), 8),
+                ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+                ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+                ('ALIGN', (0, 1), (-1, -1), 'LEFT'),
+                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+                ('FONTSIZE', (0, 1), (-1, -1), 8),
+                ('GRID', (0, 0), (-1, -1), 1, colors.black)
+            ]),
+            'tabela_itens': TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), 9),
+                ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+                ('FONTSIZE', (0, 1), (-1, -1), 9),
+                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+                ('ALIGN', (0, 1), (0, -1), 'CENTER'),
+                ('ALIGN', (2, 1), (3, -1), 'CENTER'),
+                ('ALIGN', (4, 1), (5, -1), 'RIGHT'),
+                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.whitesmoke]),
+                ('LINEBELOW', (0, 0), (-1, 0), 1, colors.black),
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
+            ]),
+            'tabela_resumo': TableStyle([
+                ('BACKGROUND', (0, 0), (1, 0), colors.lightgrey),
+                ('TEXTCOLOR', (0, 0), (1, 0), colors.black),
+                ('ALIGN', (0, 0), (1, 0), 'CENTER'),
+                ('FONTNAME', (0, 0), (1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (1, 0), 12),
+                ('BOTTOMPADDING', (0, 0), (1, 0), 12),
+                ('BACKGROUND', (0, 1), (1, 2), colors.white),
+                ('TEXTCOLOR', (0, 1), (1, 2), colors.black),
+                ('ALIGN', (0, 1), (0, 3), 'LEFT'),
+                ('ALIGN', (1, 1), (1, 3), 'RIGHT'),
+                ('FONTNAME', (0, 1), (1, 2), 'Helvetica'),
+                ('FONTSIZE', (0, 1), (1, 2), 10),
+                ('BACKGROUND', (0, 3), (1, 3), colors.lightblue),
+                ('TEXTCOLOR', (0, 3), (1, 3), colors.black),
+                ('FONTNAME', (0, 3), (1, 3), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 3), (1, 3), 12),
+                ('GRID', (0, 0), (1, 3), 1, colors.black)
+            ])
+        }
+        return _recursos
+
+
+def preparar_trabalhador():
+    """
+    Aquece um processo de renderização: importa o ReportLab, carrega as fontes usadas
+    no orçamento e monta os estilos, para que o primeiro PDF não pague esse custo.
+    """
+    from reportlab.pdfbase import pdfmetrics
+    import reportlab.platypus  # noqa: F401 (importação lenta, feita uma vez por processo)
+
+    for fonte in ('Helvetica', 'Helvetica-Bold'):
+        pdfmetrics.getFont(fonte)
+    _obter_recursos()
+
+
+def escolher_layout(dados, layout=LAYOUT_AUTOMATICO):
+    """Resolve o layout automático pela quantidade de serviços do orçamento"""
+    if layout in (LAYOUT_DETALHADO, LAYOUT_COMPACTO):
+        return layout
+    if layout not in (None, LAYOUT_AUTOMATICO):
+        raise ValueError(f"Layout de PDF inválido: {layout}")
+    return LAYOUT_COMPACTO if len(dados['servicos']) >= LIMITE_LAYOUT_COMPACTO else LAYOUT_DETALHADO
+
+
+def _formatar_detalhes(detalhes_texto):
+    """
+    Divide o texto de detalhes de um serviço em linhas.
+
+    Returns:
+        Tupla (linhas dos detalhes, custos adicionais ou None se o texto não tiver custos)
+    """
+    # Formatar o texto dos detalhes para adicionar espaço entre "1" e "2" e complementar "Até 19" com "trabalhadores"
+    detalhes_texto = detalhes_texto.replace("1e2", "1 e 2")
+    detalhes_texto = detalhes_texto.replace("Até 19", "Até 19 trabalhadores")
+
+    if "Custos adicionais" not in detalhes_texto:
+        return [linha.strip() for linha in detalhes_texto.split('. ') if linha.strip()], None
+
+    # Separar os custos adicionais para formatação especial
+    partes = detalhes_texto.split("Custos adicionais:")
+    detalhes_principais = partes[0].strip()
+    custos_adicionais = partes[1].strip() if len(partes) > 1 else ""
+    linhas = [linha.strip() for linha in detalhes_principais.split('. ') if linha.strip()]
+    custos = [linha.strip() for linha in custos_adicionais.split(',') if linha.strip()] if custos_adicionais else []
+    return linhas, custos
+
+
+def _cabecalho(dados, styles):
+    """Título e dados do cliente"""
+    from reportlab.platypus import Paragraph, Spacer
+    from reportlab.lib.units import inch
+
+    # Título
+    yield Paragraph(f"ORÇAMENTO Nº {dados['numero_orcamento']}", styles['Titulo'])
+    yield Paragraph(f"Data: {dados['data']}", styles['TextoNormal'])
+    yield Spacer(1, 0.2*inch)
+
+    # Dados do cliente
+    yield Paragraph("DADOS DO CLIENTE", styles['Subtitulo'])
+    yield Paragraph(f"<b>Empresa:</b> {dados['empresa_cliente']}", styles['TextoNormal'])
+
+    # Garantir que o e-mail seja exibido mesmo se estiver vazio
+    email_cliente = dados['email'] if dados['email'] else "Não informado"
+    yield Paragraph(f"<b>E-mail:</b> {email_cliente}", styles['TextoNormal'])
+
+    # Garantir que o telefone seja exibido mesmo se estiver vazio
+    telefone_cliente = dados['telefone'] if dados['telefone'] else "Não informado"
+    yield Paragraph(f"<b>Telefone:</b> {telefone_cliente}", styles['TextoNormal'])
+
+    yield Spacer(1, 0.2*inch)
+
+    # Serviços
+    yield Paragraph("SERVIÇOS", styles['Subtitulo'])
+
+
+def _servicos_detalhados(servicos, recursos):
+    """Layout detalhado: título, detalhes, dias de coleta e uma tabela de valores por serviço"""
+    from reportlab.platypus import Paragraph, Spacer, Table
+    from reportlab.lib.units import inch
+
+    styles = recursos['styles']
+    for i, servico in enumerate(servicos):
+        yield Paragraph(f"<b>Serviço {i+1}:</b> {servico['nome']}", styles['Destaque'])
+
+        # Melhorar a formatação dos detalhes do serviço
+        if servico.get('detalhes'):
+            linhas, custos = _formatar_detalhes(servico['detalhes'])
+            yield Paragraph(f"<b>Detalhes:</b>", styles['TextoNormal'])
+            for linha in linhas:
+                yield Paragraph(f"• {linha}", styles['DetalheServico'])
+            if custos:
+                yield Paragraph(f"<b>Custos adicionais:</b>", styles['TextoNormal'])
+                for linha in custos:
+                    yield Paragraph(f"• {linha}", styles['DetalheServico'])
+
+        # Adicionar informações de dias de coleta, se houver
+        if servico.get('multiplas_coletas') == 'sim' and servico.get('dias_coleta'):
+            yield Paragraph(f"<b>Informações de Coleta ({servico.get('quantidade_dias', 1)} dias):</b>", styles['TextoNormal'])
+
+            # Criar tabela para os dias de coleta
+            coleta_data = [['Dia', 'Data', 'Hora', 'Local', 'Observações']]
+            for idx, dia in enumerate(servico['dias_coleta']):
+                coleta_data.append([
+                    str(idx + 1),
+                    dia.get('data', ''),
+                    dia.get('hora', ''),
+                    dia.get('local', ''),
+                    dia.get('observacoes', '')
+                ])
+
+            coleta_table = Table(coleta_data, colWidths=[0.5*inch, 1.0*inch, 0.8*inch, 2.0*inch, 1.5*inch])
+            coleta_table.setStyle(recursos['tabela_coleta'])
+            yield coleta_table
+            yield Spacer(1, 0.2*inch)
+
+        # Tabela com informações do serviço
+        data = [
+            ["Quantidade", "Unidade", "Preço Unitário", "Preço Total"],
+            [
+                str(servico['quantidade']),
+                servico['unidade'],
+                servico['preco_unitario_formatado'],
+                servico['preco_total_formatado']
+            ]
+        ]
+
+        t = Table(data, colWidths=[1.2*inch, 1.2*inch, 1.5*inch, 1.5*inch])
+        t.setStyle(recursos['tabela_servico'])
+        yield t
+        yield Spacer(1, 0.1*inch)
+
+
+def _linhas_itens(servicos, estilo_celula):
+    """Linhas da tabela de itens do layout compacto (uma por serviço)"""
+    from reportlab.platypus import Paragraph
+
+    yield ["#", "Serviço", "Qtd.", "Unid.", "Preço Unitário", "Preço Total"]
+    for i, servico in enumerate(servicos):
+        descricao = f"<b>{escape(str(servico['nome']))}</b>"
+
+        if servico.get('detalhes'):
+            linhas, custos = _formatar_detalhes(servico['detalhes'])
+            if linhas:
+                descricao += '<br/><font size="8">' + escape('; '.join(linhas)) + '</font>'
+            if custos:
+                descricao += '<br/><font size="8"><i>Custos adicionais:</i> ' + escape('; '.join(custos)) + '</font>'
+
+        if servico.get('multiplas_coletas') == 'sim' and servico.get('dias_coleta'):
+            dias = '; '.join(
+                ' '.join(filter(None, [f"{idx + 1}) {dia.get('data', '')} {dia.get('hora', '')}".strip(),
+                                       dia.get('local', ''), dia.get('observacoes', '')]))
+                for idx, dia in enumerate(servico['dias_coleta'])
+            )
+            descricao += (f'<br/><font size="8"><i>Coleta ({servico.get("quantidade_dias", 1)} dias):</i> '
+                          f'{escape(dias)}</font>')
+
+        yield [
+            str(i + 1),
+            Paragraph(descricao, estilo_celula),
+            str(servico['quantidade']),
+            servico['unidade'],
+            servico['preco_unitario_formatado'],
+            servico['preco_total_formatado']
+        ]
+
+
+def _servicos_compactos(servicos, recursos):
+    """Layout compacto: uma única tabela de itens, que se divide entre as páginas repetindo o cabeçalho"""
+    from reportlab.platypus import LongTable
+    from reportlab.lib.units import inch
+
+    tabela = LongTable(
+        list(_linhas_itens(servicos, recursos['styles']['CelulaItem'])),
+        colWidths=[0.35*inch, 3.05*inch, 0.5*inch, 0.7*inch, 0.95*inch, 0.95*inch],
+        repeatRows=1
+    )
+    tabela.setStyle(recursos['tabela_itens'])
+    yield tabela
+
+
+def _resumo_e_observacoes(dados, recursos):
+    """Resumo financeiro, observações e linha de assinatura"""
+    from reportlab.lib import colors
+    from reportlab.platypus import Paragraph, Spacer, Table, HRFlowable
+    from reportlab.lib.units import inch
+
+    styles = recursos['styles']
+    yield Spacer(1, 0.2*inch)
+
+    # Resumo financeiro
+    yield Paragraph("RESUMO FINANCEIRO", styles['Subtitulo'])
+
+    # Tabela com resumo financeiro
+    subtotal_formatado = f"R$ {dados['subtotal']:.2f}".replace('.', ',')
+    valor_sesi_formatado = f"R$ {dados['valor_sesi']:.2f}".replace('.', ',')
+    total_formatado = f"R$ {dados['total']:.2f}".replace('.', ',')
+
+    data = [
+        ["Descrição", "Valor"],
+        ["Subtotal", subtotal_formatado],
+        [f"Percentual Indireto SESI ({dados['percentual_sesi']}%)", valor_sesi_formatado],
+        ["TOTAL", total_formatado]
+    ]
+
+    t = Table(data, colWidths=[4*inch, 1.5*inch])
+    t.setStyle(recursos['tabela_resumo'])
+    yield t
+
+    # Observações
+    yield Spacer(1, 0.3*inch)
+    yield Paragraph("OBSERVAÇÕES", styles['Subtitulo'])
+    yield Paragraph("1. Este orçamento tem validade de 30 dias.", styles['TextoNormal'])
+    yield Paragraph("2. O pagamento deve ser realizado conforme condições acordadas.", styles['TextoNormal'])
+    yield Paragraph("3. Os serviços serão agendados após a confirmação do orçamento.", styles['TextoNormal'])
+
+    # Adicionar espaço antes da linha de assinatura
+    yield Spacer(1, 1*inch)
+
+    # Adicionar linha para assinatura
+    yield HRFlowable(width="60%", thickness=1, lineCap='round', color=colors.black, spaceBefore=0, spaceAfter=1, hAlign='CENTER')
+    yield Paragraph("Responsável Técnico", styles['AssinaturaLinha'])
+
+
+def renderizar_pdf_orcamento(dados, layout=LAYOUT_AUTOMATICO):
+    """
+    Renderiza com o ReportLab o PDF com os dados do orçamento.
+
+    A função não depende do aplicativo Flask, para poder ser executada em um processo
+    separado (ver services.pdf_executor).
+
+    Args:
+        dados: Dicionário com os dados do orçamento
+        layout: 'detalhado', 'compacto' ou 'automatico' (compacto para orçamentos longos)
+
+    Returns:
+        bytes: Conteúdo do PDF
+    """
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate
+
+    recursos = _obter_recursos()
+    layout = escolher_layout(dados, layout)
+
+    # Criar documento em um buffer de memória
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+
+    elements = list(_cabecalho(dados, recursos['styles']))
+    if layout == LAYOUT_COMPACTO:
+        elements.extend(_servicos_compactos(dados['servicos'], recursos))
+    else:
+        elements.extend(_servicos_detalhados(dados['servicos'], recursos))
+    elements.extend(_resumo_e_observacoes(dados, recursos))
+
+    # Construir o documento
+    doc.build(elements)
+
+    logger.info(f"PDF gerado com sucesso em memória para orçamento {dados['numero_orcamento']} (layout {layout})")
+    return buffer.getvalue()
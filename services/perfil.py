@@ -0,0 +1,248 @@
+import os
+import re
+import sys
+import time
+import random
+import pstats
+import cProfile
+import threading
+import logging
+from collections import Counter
+from datetime import datetime
+
+from werkzeug.wsgi import ClosingIterator
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+# Modos de perfil
+MODO_CPROFILE = 'cprofile'        # determinístico: todas as chamadas (mais preciso, mais lento)
+MODO_AMOSTRAGEM = 'amostragem'    # estatístico: pilha da thread a cada intervalo (custo baixo)
+
+# Cabeçalho que pede o perfil de uma requisição; o valor deve ser o ADMIN_TOKEN
+CABECALHO_PERFIL = 'HTTP_X_PERFIL'
+
+EXTENSOES = {MODO_CPROFILE: '.prof', MODO_AMOSTRAGEM: '.txt'}
+
+
+def _rotulo_quadro(quadro):
+    codigo = quadro.f_code
+    return f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})"
+
+
+class AmostradorPilhas:
+    """
+    Perfil estatístico de uma thread: uma thread auxiliar lê a pilha da thread
+    observada a cada `intervalo` segundos e conta as pilhas no formato "collapsed"
+    (quadros separados por ';'), aceito por flamegraph.pl e speedscope.
+    """
+
+    def __init__(self, thread_id, intervalo=0.005):
+        self.thread_id = thread_id
+        self.intervalo = intervalo
+        self.pilhas = Counter()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._amostrar, name='perfil-amostragem', daemon=True)
+
+    def _amostrar(self):
+        while not self._parar.wait(self.intervalo):
+            quadro = sys._current_frames().get(self.thread_id)
+            if quadro is None:
+                continue
+            pilha = []
+            while quadro is not None:
+                pilha.append(_rotulo_quadro(quadro))
+                quadro = quadro.f_back
+            self.pilhas[';'.join(reversed(pilha))] += 1
+
+    def iniciar(self):
+        self._thread.start()
+
+    def parar(self):
+        self._parar.set()
+        self._thread.join()
+
+    def gravar(self, caminho):
+        with open(caminho, 'w', encoding='utf-8') as f:
+            for pilha, amostras in self.pilhas.most_common():
+                f.write(f"{pilha} {amostras}\n")
+
+
+class PerfilRequisicoes:
+    """
+    Middleware WSGI que grava o perfil de requisições escolhidas.
+
+    Uma requisição é perfilada quando traz o cabeçalho X-Perfil com o token de
+    administração ou quando é sorteada pela taxa de `amostragem` (0 a 1). Apenas uma
+    requisição é perfilada por vez (as demais seguem normalmente), o que limita o
+    custo e evita perfis concorrentes na mesma thread. O perfil cobre também o envio
+    das respostas em fluxo.
+
+    Os arquivos (.prof do pstats ou .txt com pilhas "collapsed") vão para `diretorio`,
+    que guarda no máximo `max_arquivos` perfis: os mais antigos são apagados. Só é
+    instalado quando o perfil está habilitado, então não há custo quando desligado.
+
+    Args:
+        app: Aplicação WSGI (app.wsgi_app)
+        diretorio: Diretório dos perfis
+        modo: 'cprofile' ou 'amostragem'
+        amostragem: Fração das requisições perfiladas sem o cabeçalho
+        max_arquivos: Quantidade máxima de perfis mantidos
+        token: Valor esperado no cabeçalho X-Perfil (None desativa o cabeçalho)
+        rotas: Prefixos de caminho perfilados pela amostragem (vazio: todos)
+        intervalo: Intervalo entre amostras no modo 'amostragem', em segundos
+    """
+
+    def __init__(self, app, diretorio, modo=MODO_AMOSTRAGEM, amostragem=0.0, max_arquivos=50,
+                 token=None, rotas=(), intervalo=0.005):
+        if modo not in EXTENSOES:
+            raise ValueError(f"Modo de perfil inválido: {modo}")
+        self.app = app
+        self.diretorio = diretorio
+        self.modo = modo
+        self.amostragem = amostragem
+        self.max_arquivos = max(1, max_arquivos)
+        self.token = token
+        self.rotas = tuple(rotas)
+        self.intervalo = intervalo
+        self._vaga = threading.Lock()
+        os.makedirs(diretorio, exist_ok=True)
+
+    def _solicitado(self, environ):
+        """Indica se a requisição deve ser perfilada"""
+        import hmac
+
+        cabecalho = environ.get(CABECALHO_PERFIL)
+        if cabecalho and self.token:
+            return hmac.compare_digest(cabecalho.encode('utf-8'), self.token.encode('utf-8'))
+        if self.amostragem <= 0 or random.random() >= self.amostragem:
+            return False
+        caminho = environ.get('PATH_INFO', '')
+        return not self.rotas or caminho.startswith(self.rotas)
+
+    def __call__(self, environ, start_response):
+        if not self._solicitado(environ) or not self._vaga.acquire(blocking=False):
+            return self.app(environ, start_response)
+
+        inicio = time.perf_counter()
+        if self.modo == MODO_CPROFILE:
+            perfilador = cProfile.Profile()
+            perfilador.enable()
+        else:
+            perfilador = AmostradorPilhas(threading.get_ident(), self.intervalo)
+            perfilador.iniciar()
+
+        def concluir():
+            try:
+                if self.modo == MODO_CPROFILE:
+                    perfilador.disable()
+                else:
+                    perfilador.parar()
+                self._gravar(perfilador, environ, time.perf_counter() - inicio)
+            except Exception as e:
+                logger.error(f"Erro ao gravar perfil da requisição: {str(e)}")
+            finally:
+                self._vaga.release()
+
+        try:
+            resposta = self.app(environ, start_response)
+        except BaseException:
+            concluir()
+            raise
+        return ClosingIterator(resposta, [concluir])
+
+    def _gravar(self, perfilador, environ, segundos):
+        """Grava o perfil e apaga os mais antigos além do limite"""
+        caminho_http = re.sub(r'[^A-Za-z0-9]+', '_', environ.get('PATH_INFO', '')).strip('_') or 'raiz'
+        nome = "{}_{}_{}_{}ms{}".format(
+            datetime.now().strftime("%Y%m%d-%H%M%S-%f"), environ.get('REQUEST_METHOD', 'GET'),
+            caminho_http[:60], int(segundos * 1000), EXTENSOES[self.modo]
+        )
+        caminho = os.path.join(self.diretorio, nome)
+        if self.modo == MODO_CPROFILE:
+            perfilador.dump_stats(caminho)
+        else:
+            perfilador.gravar(caminho)
+        logger.info(f"Perfil de {environ.get('REQUEST_METHOD')} {environ.get('PATH_INFO')} gravado em {caminho}")
+
+        arquivos = sorted(listar_arquivos(self.diretorio))
+        for antigo in arquivos[:-self.max_arquivos]:
+            try:
+                os.remove(os.path.join(self.diretorio, antigo))
+            except OSError:
+                pass
+
+
+def listar_arquivos(diretorio):
+    """Nomes dos arquivos de perfil do diretório"""
+    if not os.path.isdir(diretorio):
+        return []
+    return [nome for nome in os.listdir(diretorio) if nome.endswith(tuple(EXTENSOES.values()))]
+
+
+def _principais_cprofile(caminho, top, ordem):
+    estatisticas = pstats.Stats(caminho).stats
+    indice = 2 if ordem == 'proprio' else 3
+    linhas = sorted(estatisticas.items(), key=lambda item: item[1][indice], reverse=True)[:top]
+    return [{
+        'funcao': f"{os.path.basename(arquivo)}:{linha}({funcao})",
+        'chamadas': chamadas,
+        'tempo_proprio_ms': round(proprio * 1000, 3),
+        'tempo_acumulado_ms': round(acumulado * 1000, 3)
+    } for (arquivo, linha, funcao), (_, chamadas, proprio, acumulado, _) in linhas]
+
+
+def _principais_amostragem(caminho, top, ordem):
+    proprias = Counter()
+    acumuladas = Counter()
+    with open(caminho, encoding='utf-8') as f:
+        for linha in f:
+            pilha, _, amostras = linha.rstrip('\n').rpartition(' ')
+            quadros = pilha.split(';')
+            amostras = int(amostras)
+            proprias[quadros[-1]] += amostras
+            for quadro in set(quadros):
+                acumuladas[quadro] += amostras
+    ordenadas = (proprias if ordem == 'proprio' else acumuladas).most_common(top)
+    return [{
+        'funcao': quadro,
+        'amostras_proprias': proprias[quadro],
+        'amostras_acumuladas': acumuladas[quadro]
+    } for quadro, _ in ordenadas]
+
+
+def listar_perfis(diretorio, limite=10, top=15, ordem='acumulado'):
+    """
+    Resume os perfis mais recentes.
+
+    Args:
+        diretorio: Diretório dos perfis
+        limite: Quantidade de perfis (dos mais recentes)
+        top: Quantidade de funções por perfil
+        ordem: 'acumulado' (tempo incluindo as chamadas internas) ou 'proprio'
+
+    Returns:
+        list: Dicionários com arquivo, metodo, rota (o caminho com '_' no lugar das barras),
+        duracao_ms e funcoes
+    """
+    perfis = []
+    for nome in sorted(listar_arquivos(diretorio), reverse=True)[:limite]:
+        partes = nome.rsplit('.', 1)[0].split('_')
+        caminho = os.path.join(diretorio, nome)
+        try:
+            if nome.endswith(EXTENSOES[MODO_CPROFILE]):
+                funcoes = _principais_cprofile(caminho, top, ordem)
+            else:
+                funcoes = _principais_amostragem(caminho, top, ordem)
+        except Exception as e:
+            logger.warning(f"Perfil {nome} ilegível: {str(e)}")
+            continue
+        perfis.append({
+            'arquivo': nome,
+            'metodo': partes[1] if len(partes) > 3 else None,
+            'rota': '_'.join(partes[2:-1]) if len(partes) > 3 else None,
+            'duracao_ms': int(partes[-1][:-2]) if partes[-1].endswith('ms') else None,
+            'funcoes': funcoes
+        })
+    return perfis
@@ -0,0 +1,220 @@
+import os
+import ssl
+import time
+import smtplib
+import threading
+import logging
+from contextlib import contextmanager
+
+from services.metricas import etapa
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+def erro_de_conexao(erro):
+    """
+    Indica se o erro torna a conexão inutilizável (a mensagem pode ser reenviada por
+    outra conexão), em oposição a uma recusa do servidor (smtplib.SMTPException é
+    subclasse de OSError, por isso a ordem das verificações importa).
+    """
+    if isinstance(erro, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    if isinstance(erro, smtplib.SMTPException):
+        return False
+    return isinstance(erro, OSError)
+
+
+def _variavel_booleana(nome, padrao):
+    """Lê uma variável de ambiente booleana ('1', 'true', 'sim'...)"""
+    valor = os.environ.get(nome)
+    if valor is None or valor == '':
+        return padrao
+    return valor.strip().lower() in ('1', 'true', 'sim', 'yes', 'on')
+
+
+class PoolSMTP:
+    """
+    Pool limitado de conexões SMTP autenticadas e reutilizáveis.
+
+    Cada conexão é aberta (com STARTTLS e login, se configurados) uma única vez e
+    devolvida ao pool após o envio. Antes de reutilizar uma conexão ociosa há mais de
+    `verificar_apos` segundos, o pool envia um NOOP; conexões que falham na verificação,
+    ociosas há mais de `max_ocioso` segundos ou que já enviaram `max_mensagens`
+    mensagens são descartadas e substituídas. As conexões herdadas de um fork são
+    abandonadas sem QUIT, pois o socket pertence ao processo pai.
+    """
+
+    def __init__(self, servidor, porta=587, usuario=None, senha=None, usar_tls=True, usar_ssl=False,
+                 tamanho=2, timeout_conexao=10.0, timeout_envio=30.0, max_ocioso=60.0,
+                 verificar_apos=5.0, max_mensagens=100):
+        self.servidor = servidor
+        self.porta = porta
+        self.usuario = usuario
+        self.senha = senha
+        self.usar_tls = usar_tls
+        self.usar_ssl = usar_ssl
+        self.tamanho = tamanho
+        self.timeout_conexao = timeout_conexao
+        self.timeout_envio = timeout_envio
+        self.max_ocioso = max_ocioso
+        self.verificar_apos = verificar_apos
+        self.max_mensagens = max_mensagens
+
+        self._vagas = threading.BoundedSemaphore(tamanho)
+        self._lock = threading.Lock()
+        self._ociosas = []  # pilha de [conexão, último uso, mensagens enviadas]
+        self._pid = os.getpid()
+        self.conexoes_abertas = 0
+
+    @classmethod
+    def do_ambiente(cls):
+        """
+        Cria o pool a partir das variáveis de ambiente:
+        SMTP_SERVIDOR, SMTP_PORTA, SMTP_TLS, SMTP_SSL, SMTP_AUTENTICAR, EMAIL_REMETENTE,
+        EMAIL_SENHA, SMTP_POOL_TAMANHO, SMTP_TIMEOUT_CONEXAO e SMTP_TIMEOUT_ENVIO.
+        """
+        autenticar = _variavel_booleana('SMTP_AUTENTICAR', True)
+        return cls(
+            os.environ.get('SMTP_SERVIDOR', 'smtp.gmail.com'),
+            int(os.environ.get('SMTP_PORTA', 587)),
+            usuario=os.environ.get('EMAIL_REMETENTE') if autenticar else None,
+            senha=os.environ.get('EMAIL_SENHA') if autenticar else None,
+            usar_tls=_variavel_booleana('SMTP_TLS', True),
+            usar_ssl=_variavel_booleana('SMTP_SSL', False),
+            tamanho=int(os.environ.get('SMTP_POOL_TAMANHO', 2)),
+            timeout_conexao=float(os.environ.get('SMTP_TIMEOUT_CONEXAO', 10)),
+            timeout_envio=float(os.environ.get('SMTP_TIMEOUT_ENVIO', 30))
+        )
+
+    @property
+    def autenticar(self):
+        """Indica se as conexões fazem login no servidor"""
+        return bool(self.usuario and self.senha)
+
+    def _abrir(self):
+        """Abre e autentica uma nova conexão"""
+        if self.usar_ssl:
+            conexao = smtplib.SMTP_SSL(self.servidor, self.porta, timeout=self.timeout_conexao,
+                                       context=ssl.create_default_context())
+        else:
+            conexao = smtplib.SMTP(self.servidor, self.porta, timeout=self.timeout_conexao)
+        try:
+            conexao.ehlo()
+            if self.usar_tls and not self.usar_ssl:
+                conexao.starttls(context=ssl.create_default_context())
+                conexao.ehlo()
+            if self.autenticar:
+                conexao.login(self.usuario, self.senha)
+            # A partir daqui vale o timeout de envio
+            if conexao.sock is not None:
+                conexao.sock.settimeout(self.timeout_envio)
+        except Exception:
+            self._fechar(conexao)
+            raise
+        with self._lock:
+            self.conexoes_abertas += 1
+        logger.info(f"Conexão SMTP aberta com {self.servidor}:{self.porta}")
+        return conexao
+
+    def _fechar(self, conexao):
+        """Encerra uma conexão, ignorando erros"""
+        try:
+            conexao.quit()
+        except Exception:
+            try:
+                conexao.close()
+            except Exception:
+                pass
+
+    def _saudavel(self, conexao):
+        """Verifica com NOOP se a conexão ainda responde"""
+        try:
+            codigo, _ = conexao.noop()
+            return codigo == 250
+        except Exception:
+            return False
+
+    def _verificar_fork(self):
+        """Abandona as conexões herdadas do processo pai (com o lock obtido)"""
+        if self._pid != os.getpid():
+            self._ociosas = []
+            self._vagas = threading.BoundedSemaphore(self.tamanho)
+            self._pid = os.getpid()
+
+    def _retirar(self):
+        """Retira uma conexão utilizável do pool ou abre uma nova"""
+        while True:
+            with self._lock:
+                self._verificar_fork()
+                item = self._ociosas.pop() if self._ociosas else None
+            if item is None:
+                return [self._abrir(), time.monotonic(), 0]
+
+            conexao, ultimo_uso, _ = item
+            ocioso = time.monotonic() - ultimo_uso
+            if ocioso > self.max_ocioso:
+                self._fechar(conexao)
+            elif ocioso > self.verificar_apos and not self._saudavel(conexao):
+                logger.info("Conexão SMTP ociosa não respondeu ao NOOP; reconectando")
+                self._fechar(conexao)
+            else:
+                return item
+
+    @contextmanager
+    def conexao(self, timeout=None):
+        """
+        Empresta uma conexão do pool. Em caso de erro a conexão é descartada.
+
+        Args:
+            timeout: Tempo máximo de espera por uma vaga no pool (padrão: timeout_conexao)
+        """
+        with self._lock:
+            self._verificar_fork()
+            vagas = self._vagas
+        if not vagas.acquire(timeout=self.timeout_conexao if timeout is None else timeout):
+            raise TimeoutError("Nenhuma conexão SMTP disponível no pool")
+        item = None
+        try:
+            item = self._retirar()
+            yield item[0]
+        except BaseException:
+            if item is not None:
+                self._fechar(item[0])
+                item = None
+            raise
+        finally:
+            if item is not None:
+                item[1] = time.monotonic()
+                item[2] += 1
+                if item[2] >= self.max_mensagens:
+                    self._fechar(item[0])
+                else:
+                    with self._lock:
+                        if vagas is self._vagas:
+                            self._ociosas.append(item)
+            vagas.release()
+
+    @etapa('smtp')
+    def enviar(self, mensagem, tentativas=2):
+        """
+        Envia uma mensagem (email.message.Message) por uma conexão do pool.
+
+        Falhas de conexão são repetidas em uma nova conexão; recusas do servidor
+        (destinatário inválido, mensagem rejeitada) são propagadas imediatamente.
+        """
+        for tentativa in range(1, tentativas + 1):
+            try:
+                with self.conexao() as conexao:
+                    return conexao.send_message(mensagem)
+            except Exception as e:
+                if tentativa == tentativas or not erro_de_conexao(e):
+                    raise
+                logger.warning(f"Falha na conexão SMTP ({str(e)}); tentando novamente com nova conexão")
+
+    def fechar(self):
+        """Encerra todas as conexões ociosas"""
+        with self._lock:
+            ociosas, self._ociosas = self._ociosas, []
+        for conexao, _, _ in ociosas:
+            self._fechar(conexao)
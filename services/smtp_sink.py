@@ -0,0 +1,102 @@
+import threading
+import socketserver
+import logging
+
+# Configurar logging
+logger = logging.getLogger(__name__)
+
+
+class _SessaoSMTP(socketserver.StreamRequestHandler):
+    """Atende uma conexão com o subconjunto do SMTP usado pelo smtplib (sem TLS e sem login)"""
+
+    def _responder(self, linha):
+        self.wfile.write(linha.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        servidor = self.server
+        servidor.registrar_conexao()
+        self._responder('220 localhost Servidor SMTP de teste')
+        while True:
+            linha = self.rfile.readline()
+            if not linha:
+                return
+            comando = linha.decode('latin-1').strip()
+            verbo = comando[:4].upper()
+
+            if verbo == 'EHLO':
+                self._responder('250-localhost')
+                self._responder('250-8BITMIME')
+                self._responder('250 SIZE 104857600')
+            elif verbo in ('HELO', 'MAIL', 'RCPT', 'RSET', 'NOOP'):
+                self._responder('250 OK')
+            elif verbo == 'DATA':
+                self._responder('354 Envie a mensagem; termine com <CRLF>.<CRLF>')
+                tamanho = 0
+                while True:
+                    linha = self.rfile.readline()
+                    if not linha or linha in (b'.\r\n', b'.\n'):
+                        break
+                    tamanho += len(linha)
+                servidor.registrar_mensagem(tamanho)
+                self._responder('250 OK: mensagem recebida')
+            elif verbo == 'QUIT':
+                self._responder('221 Ate logo')
+                return
+            else:
+                self._responder('502 Comando nao implementado')
+
+
+class ServidorSMTPTeste(socketserver.ThreadingTCPServer):
+    """
+    Servidor SMTP local que apenas conta as conexões e as mensagens recebidas.
+
+    Usado no modo de benchmark do envio em lote e para testar o pool de conexões sem
+    um servidor real. Configure o pool com usar_tls=False e sem usuário/senha.
+
+    Exemplo:
+        with ServidorSMTPTeste() as servidor:
+            pool = PoolSMTP('127.0.0.1', servidor.porta, usar_tls=False)
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host='127.0.0.1', porta=0):
+        super().__init__((host, porta), _SessaoSMTP)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.conexoes = 0
+        self.mensagens = 0
+        self.bytes_recebidos = 0
+
+    @property
+    def porta(self):
+        """Porta em que o servidor está escutando (útil quando criado com porta=0)"""
+        return self.server_address[1]
+
+    def registrar_conexao(self):
+        with self._lock:
+            self.conexoes += 1
+
+    def registrar_mensagem(self, tamanho):
+        with self._lock:
+            self.mensagens += 1
+            self.bytes_recebidos += tamanho
+
+    def iniciar(self):
+        """Atende as conexões em uma thread de segundo plano"""
+        self._thread = threading.Thread(target=self.serve_forever, name='smtp-teste', daemon=True)
+        self._thread.start()
+        logger.info(f"Servidor SMTP de teste escutando em {self.server_address[0]}:{self.porta}")
+        return self
+
+    def parar(self):
+        """Encerra o servidor"""
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *args):
+        self.parar()
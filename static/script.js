@@ -1,8 +1,16 @@
 // Variável para controlar o contador de serviços
 let contadorServicos = 1;
 
-// Variável para controlar atualizações simultâneas de preço
-let atualizandoPreco = {};
+// Serviços com preço a recalcular e temporizador que agrupa as alterações em uma única requisição
+let precosPendentes = new Set();
+let temporizadorPrecos = null;
+// Versão do último cálculo pedido para cada serviço: lotes sobrepostos podem responder fora
+// de ordem, e a resposta de um cálculo já substituído por outro mais novo é descartada
+const versoesPreco = new Map();
+
+// Catálogo de preços (serviços, regiões, variáveis e preços) e a requisição que o carrega
+let catalogoPrecos = null;
+let carregandoCatalogo = null;
 
 // Função para mostrar campos adicionais quando PGR for selecionado
 function mostrarCamposAdicionais(id) {
@@ -143,6 +151,9 @@ function inicializarEventos() {
     // Adicionar eventos para o primeiro serviço
     adicionarEventosAoNovoServico(1);
     
+    // Carregar o catálogo de preços usado pelos dropdowns e pela pré-visualização de preços
+    carregarCatalogo();
+    
     // Carregar opções de serviços para o primeiro serviço
     obterOpcoesServicos().then(servicos => {
         const servicoSelect = document.getElementById('servico-1-nome');
@@ -431,6 +442,116 @@ function toggleDiasColeta(servicoId) {
     atualizarPreco(servicoId);
 }
 
+// Função para carregar o catálogo de preços uma única vez por página
+// O navegador revalida a cópia em cache pela ETag (304 quando os preços não mudaram)
+function carregarCatalogo() {
+    if (!carregandoCatalogo) {
+        carregandoCatalogo = fetch('/api/catalogo', { cache: 'no-cache' })
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`Erro HTTP: ${response.status} - ${response.statusText}`);
+                }
+                return response.json();
+            })
+            .then(data => {
+                catalogoPrecos = data;
+                console.log(`Catálogo de preços carregado: ${data.servicos.length} serviços`);
+                return data;
+            })
+            .catch(error => {
+                console.error('Erro ao carregar catálogo de preços:', error);
+                // Permitir nova tentativa; enquanto isso as consultas vão ao servidor
+                carregandoCatalogo = null;
+                return null;
+            });
+    }
+    return carregandoCatalogo;
+}
+
+// Função para obter as regiões de um serviço, consultando o servidor apenas sem catálogo
+async function obterRegioesDisponiveis(servico) {
+    const catalogo = await carregarCatalogo();
+    if (catalogo) {
+        return { regioes: catalogo.regioes[servico] || [] };
+    }
+    
+    const response = await fetch(`/api/regioes_disponiveis?servico=${encodeURIComponent(servico)}`);
+    if (!response.ok) {
+        throw new Error(`Erro HTTP: ${response.status} - ${response.statusText}`);
+    }
+    return response.json();
+}
+
+// Função para obter as variáveis de um serviço e região, consultando o servidor apenas sem catálogo
+async function obterVariaveisDisponiveis(servico, regiao) {
+    const catalogo = await carregarCatalogo();
+    if (catalogo) {
+        // Serviços PGR não têm variáveis; regiões sem variáveis usam as da região Central
+        const porRegiao = servico.includes('PGR') ? {} : (catalogo.variaveis[servico] || {});
+        return { variaveis: porRegiao[regiao] || porRegiao['Central'] || [] };
+    }
+    
+    const response = await fetch(`/api/variaveis_disponiveis?servico=${encodeURIComponent(servico)}&regiao=${encodeURIComponent(regiao)}`);
+    if (!response.ok) {
+        throw new Error(`Erro HTTP: ${response.status} - ${response.statusText}`);
+    }
+    return response.json();
+}
+
+// Função para pré-visualizar o preço de um serviço a partir do catálogo em cache
+// Retorna null quando o catálogo não cobre os parâmetros (o preço é pedido ao servidor)
+function resolverPrecoLocal(parametros) {
+    const catalogo = catalogoPrecos;
+    if (!catalogo) {
+        return null;
+    }
+    
+    if (parametros.servico.includes('PGR')) {
+        const pgr = catalogo.pgr;
+        const precosServico = pgr.servicos[catalogo.servico_pgr];
+        const grauRisco = catalogo.graus_formulario[parametros.grau_risco] || parametros.grau_risco;
+        const faixaTrab = catalogo.faixas_formulario[parametros.num_trabalhadores];
+        
+        const r = pgr.regioes.indexOf(parametros.regiao);
+        const g = pgr.graus_risco.indexOf(grauRisco);
+        const f = pgr.faixas_trab.indexOf(faixaTrab);
+        if (!precosServico || r < 0 || g < 0 || f < 0) {
+            return null;
+        }
+        
+        const preco = precosServico.precos[r][g][f];
+        if (preco === null || preco <= 0) {
+            return null;
+        }
+        return { preco: preco, regra: pgr.regras[precosServico.regras[r][g][f]] };
+    }
+    
+    const porRegiao = catalogo.ambientais[parametros.servico] || {};
+    const porVariavel = porRegiao[parametros.regiao] || {};
+    const entrada = parametros.variavel ? porVariavel[parametros.variavel] : null;
+    if (!entrada) {
+        return null;
+    }
+    
+    const [precoBase, adicionalGesGhe, precoAvaliacaoAdicional, regra] = entrada;
+    let preco = precoBase;
+    
+    // Adicional por GES/GHE e por avaliações adicionais, como no servidor
+    const numGesGhe = parametros.num_ges_ghe || 1;
+    if (adicionalGesGhe && adicionalGesGhe > 0 && numGesGhe > 1) {
+        preco += adicionalGesGhe * (numGesGhe - 1);
+    }
+    const numAvaliacoesAdicionais = parametros.num_avaliacoes_adicionais || 0;
+    if (numAvaliacoesAdicionais > 0 && precoAvaliacaoAdicional !== null) {
+        preco += precoAvaliacaoAdicional * numAvaliacoesAdicionais;
+    }
+    
+    if (preco <= 0) {
+        return null;
+    }
+    return { preco: preco, regra: regra };
+}
+
 // Função para carregar regiões disponíveis com base no serviço selecionado
 function carregarRegioes(id) {
     try {
@@ -458,14 +579,8 @@ function carregarRegioes(id) {
         
         console.log(`Carregando regiões para o serviço: ${servico}`);
         
-        // Fazer requisição para obter regiões disponíveis
-        fetch(`/api/regioes_disponiveis?servico=${encodeURIComponent(servico)}`)
-            .then(response => {
-                if (!response.ok) {
-                    throw new Error(`Erro HTTP: ${response.status} - ${response.statusText}`);
-                }
-                return response.json();
-            })
+        // Obter regiões disponíveis (do catálogo em cache ou do servidor)
+        obterRegioesDisponiveis(servico)
             .then(data => {
                 console.log(`Resposta recebida para regiões: ${JSON.stringify(data)}`);
                 
@@ -573,14 +688,8 @@ function carregarVariaveis(id) {
         variavelSelect.disabled = true;
         variavelSelect.innerHTML = '<option value="">Carregando...</option>';
         
-        // Fazer requisição para obter variáveis disponíveis
-        fetch(`/api/variaveis_disponiveis?servico=${encodeURIComponent(servico)}&regiao=${encodeURIComponent(regiao)}`)
-            .then(response => {
-                if (!response.ok) {
-                    throw new Error(`Erro HTTP: ${response.status} - ${response.statusText}`);
-                }
-                return response.json();
-            })
+        // Obter variáveis disponíveis (do catálogo em cache ou do servidor)
+        obterVariaveisDisponiveis(servico, regiao)
             .then(data => {
                 console.log(`Resposta recebida para variáveis: ${JSON.stringify(data)}`);
                 
@@ -747,207 +856,209 @@ function calcularCustosLaboratoriais(id) {
     return custoTotal;
 }
 
-// Função para atualizar o preço unitário com base nos parâmetros selecionados
-async function atualizarPreco(id) {
-    try {
-        console.log(`Atualizando preço para o serviço ${id}`);
-        
-        // Evitar múltiplas chamadas simultâneas para o mesmo serviço
-        if (atualizandoPreco[id]) {
-            console.log(`Atualização de preço para o serviço ${id} já em andamento, ignorando chamada`);
-            return;
-        }
-        
-        atualizandoPreco[id] = true;
-        
-        // Verificar se os elementos existem
-        const servicoSelect = document.getElementById(`servico-${id}-nome`);
-        const regiaoSelect = document.getElementById(`regiao-${id}`);
-        const variavelSelect = document.getElementById(`variavel-${id}`);
-        const variavelContainer = document.getElementById(`variavel-container-${id}`);
-        const precoUnitarioElement = document.getElementById(`precoUnitario-${id}`);
-        const precoUnitarioHiddenInput = document.getElementById(`precoUnitarioHidden-${id}`);
-        
-        if (!servicoSelect || !regiaoSelect || !precoUnitarioElement || !precoUnitarioHiddenInput) {
-            console.error(`Elementos necessários não encontrados para o serviço ${id}`);
-            console.error(`servicoSelect: ${servicoSelect ? 'encontrado' : 'não encontrado'}`);
-            console.error(`regiaoSelect: ${regiaoSelect ? 'encontrado' : 'não encontrado'}`);
-            console.error(`precoUnitarioElement: ${precoUnitarioElement ? 'encontrado' : 'não encontrado'}`);
-            console.error(`precoUnitarioHiddenInput: ${precoUnitarioHiddenInput ? 'encontrado' : 'não encontrado'}`);
-            atualizandoPreco[id] = false;
-            return;
-        }
-        
-        // Obter valores dos campos
-        const servico = servicoSelect.value;
-        const regiao = regiaoSelect.value;
+// Função para obter os parâmetros de preço de um serviço a partir do formulário
+// Retorna null (e atualiza a mensagem exibida) se algum campo obrigatório não estiver preenchido
+function obterParametrosPreco(id) {
+    // Verificar se os elementos existem
+    const servicoSelect = document.getElementById(`servico-${id}-nome`);
+    const regiaoSelect = document.getElementById(`regiao-${id}`);
+    const variavelSelect = document.getElementById(`variavel-${id}`);
+    const variavelContainer = document.getElementById(`variavel-container-${id}`);
+    const precoUnitarioElement = document.getElementById(`precoUnitario-${id}`);
+    const precoUnitarioHiddenInput = document.getElementById(`precoUnitarioHidden-${id}`);
+    
+    if (!servicoSelect || !regiaoSelect || !precoUnitarioElement || !precoUnitarioHiddenInput) {
+        console.error(`Elementos necessários não encontrados para o serviço ${id}`);
+        console.error(`servicoSelect: ${servicoSelect ? 'encontrado' : 'não encontrado'}`);
+        console.error(`regiaoSelect: ${regiaoSelect ? 'encontrado' : 'não encontrado'}`);
+        console.error(`precoUnitarioElement: ${precoUnitarioElement ? 'encontrado' : 'não encontrado'}`);
+        console.error(`precoUnitarioHiddenInput: ${precoUnitarioHiddenInput ? 'encontrado' : 'não encontrado'}`);
+        return null;
+    }
+    
+    // Obter valores dos campos
+    const servico = servicoSelect.value;
+    const regiao = regiaoSelect.value;
+    
+    // Verificar se os campos obrigatórios estão preenchidos
+    if (!servico || !regiao) {
+        console.log(`Serviço ou região não selecionados para o serviço ${id}`);
+        exibirPrecoUnitario(id, 'R$ 0,00', 0);
+        return null;
+    }
+    
+    // Verificar se é um serviço PGR ou não
+    const isPGR = servico.includes('PGR');
+    
+    const parametros = {
+        id: id,
+        servico: servico,
+        regiao: regiao
+    };
+    
+    if (isPGR) {
+        // Para serviços PGR, verificar grau de risco e número de trabalhadores
+        const grauRiscoSelect = document.getElementById(`grau-risco-${id}`);
+        const numTrabalhadoresSelect = document.getElementById(`numTrabalhadores-${id}`);
+        const grauRisco = grauRiscoSelect ? grauRiscoSelect.value : null;
+        const numTrabalhadores = numTrabalhadoresSelect ? numTrabalhadoresSelect.value : null;
         
-        // Verificar se os campos obrigatórios estão preenchidos
-        if (!servico || !regiao) {
-            console.log(`Serviço ou região não selecionados para o serviço ${id}`);
-            precoUnitarioElement.textContent = 'R$ 0,00';
-            precoUnitarioHiddenInput.value = '0';
-            atualizarPrecoTotal(id);
-            atualizandoPreco[id] = false;
-            return;
+        if (!grauRisco || !numTrabalhadores) {
+            console.log(`Grau de risco ou número de trabalhadores não selecionados para o serviço PGR ${id}`);
+            exibirPrecoUnitario(id, 'Selecione todos os campos', 0);
+            return null;
         }
         
-        // Verificar se é um serviço PGR ou não
-        const isPGR = servico.includes('PGR');
-        
-        // Parâmetros específicos para PGR
-        let grauRisco = null;
-        let numTrabalhadores = null;
-        
-        if (isPGR) {
-            // Para serviços PGR, verificar grau de risco e número de trabalhadores
-            const grauRiscoSelect = document.getElementById(`grau-risco-${id}`);
-            const numTrabalhadoresSelect = document.getElementById(`numTrabalhadores-${id}`);
-            
-            if (grauRiscoSelect) {
-                grauRisco = grauRiscoSelect.value;
-            }
-            
-            if (numTrabalhadoresSelect) {
-                numTrabalhadores = numTrabalhadoresSelect.value;
-            }
-            
-            if (!grauRisco || !numTrabalhadores) {
-                console.log(`Grau de risco ou número de trabalhadores não selecionados para o serviço PGR ${id}`);
-                precoUnitarioElement.textContent = 'Selecione todos os campos';
-                precoUnitarioHiddenInput.value = '0';
-                atualizarPrecoTotal(id);
-                atualizandoPreco[id] = false;
-                return;
-            }
-            
-            console.log(`Serviço PGR: ${servico}, Grau de Risco: ${grauRisco}, Número de Trabalhadores: ${numTrabalhadores}`);
-        } else {
-            // Para serviços não-PGR, verificar se a variável está selecionada
-            if (variavelContainer && variavelContainer.style.display !== 'none' && 
-                (!variavelSelect || !variavelSelect.value)) {
-                console.log(`Variável não selecionada para o serviço não-PGR ${id}`);
-                precoUnitarioElement.textContent = 'Selecione a variável';
-                precoUnitarioHiddenInput.value = '0';
-                atualizarPrecoTotal(id);
-                atualizandoPreco[id] = false;
-                return;
-            }
+        parametros.grau_risco = grauRisco;
+        parametros.num_trabalhadores = numTrabalhadores;
+    } else {
+        // Para serviços não-PGR, verificar se a variável está selecionada
+        if (variavelContainer && variavelContainer.style.display !== 'none' && 
+            (!variavelSelect || !variavelSelect.value)) {
+            console.log(`Variável não selecionada para o serviço não-PGR ${id}`);
+            exibirPrecoUnitario(id, 'Selecione a variável', 0);
+            return null;
         }
         
-        // Obter número de GES/GHE
-        let numGesGhe = 1;
-        const gesContainer = document.getElementById(`ges-container-${id}`);
-        const numGesGheInput = document.getElementById(`ges-${id}`);
-        
-        if (gesContainer && gesContainer.style.display !== 'none' && numGesGheInput) {
-            numGesGhe = parseInt(numGesGheInput.value) || 1;
+        if (variavelSelect && variavelSelect.value) {
+            parametros.variavel = variavelSelect.value;
         }
-        
-        // Verificar se há avaliações adicionais
-        let numAvaliacoesAdicionais = 0;
-        const avaliacaoAdicionalSelect = document.getElementById(`avaliacao-adicional-${id}`);
-        const quantidadeAvaliacoesInput = document.getElementById(`quantidade-avaliacoes-${id}`);
-        
-        if (avaliacaoAdicionalSelect && avaliacaoAdicionalSelect.value === 'sim' && quantidadeAvaliacoesInput) {
-            numAvaliacoesAdicionais = parseInt(quantidadeAvaliacoesInput.value) || 0;
+    }
+    
+    // Obter número de GES/GHE
+    const gesContainer = document.getElementById(`ges-container-${id}`);
+    const numGesGheInput = document.getElementById(`ges-${id}`);
+    
+    if (gesContainer && gesContainer.style.display !== 'none' && numGesGheInput) {
+        const numGesGhe = parseInt(numGesGheInput.value) || 1;
+        if (numGesGhe > 1) {
+            parametros.num_ges_ghe = numGesGhe;
         }
-        
-        // Obter variável (se não for PGR)
-        let variavel = null;
-        if (!isPGR && variavelSelect) {
-            variavel = variavelSelect.value;
+    }
+    
+    // Verificar se há avaliações adicionais
+    const avaliacaoAdicionalSelect = document.getElementById(`avaliacao-adicional-${id}`);
+    const quantidadeAvaliacoesInput = document.getElementById(`quantidade-avaliacoes-${id}`);
+    
+    if (avaliacaoAdicionalSelect && avaliacaoAdicionalSelect.value === 'sim' && quantidadeAvaliacoesInput) {
+        const numAvaliacoesAdicionais = parseInt(quantidadeAvaliacoesInput.value) || 0;
+        if (numAvaliacoesAdicionais > 0) {
+            parametros.num_avaliacoes_adicionais = numAvaliacoesAdicionais;
         }
+    }
+    
+    return parametros;
+}
+
+// Função para exibir o preço unitário de um serviço e atualizar o preço total
+function exibirPrecoUnitario(id, texto, preco) {
+    const precoUnitarioElement = document.getElementById(`precoUnitario-${id}`);
+    const precoUnitarioHiddenInput = document.getElementById(`precoUnitarioHidden-${id}`);
+    
+    if (precoUnitarioElement) precoUnitarioElement.textContent = texto;
+    if (precoUnitarioHiddenInput) precoUnitarioHiddenInput.value = preco;
+    atualizarPrecoTotal(id);
+}
+
+// Função para atualizar o preço unitário com base nos parâmetros selecionados
+// As alterações são agrupadas e enviadas ao servidor em uma única requisição
+function atualizarPreco(id) {
+    console.log(`Agendando atualização de preço para o serviço ${id}`);
+    
+    precosPendentes.add(id);
+    
+    if (temporizadorPrecos) {
+        clearTimeout(temporizadorPrecos);
+    }
+    temporizadorPrecos = setTimeout(atualizarPrecosPendentes, 150);
+}
+
+// Função para calcular, em uma única requisição, os preços de todos os serviços alterados
+async function atualizarPrecosPendentes() {
+    temporizadorPrecos = null;
+    
+    const ids = Array.from(precosPendentes);
+    precosPendentes.clear();
+    
+    // Montar as linhas do orçamento que têm todos os campos preenchidos
+    const itens = [];
+    const versoes = new Map();
+    ids.forEach(id => {
+        const chave = String(id);
+        const versao = (versoesPreco.get(chave) || 0) + 1;
+        versoesPreco.set(chave, versao);
+        versoes.set(chave, versao);
         
-        // Mostrar indicador de carregamento
-        precoUnitarioElement.textContent = 'Calculando...';
-        
-        // Construir URL para a requisição
-        let url = `/calcular_preco?servico=${encodeURIComponent(servico)}&regiao=${encodeURIComponent(regiao)}`;
-        
-        if (isPGR) {
-            // Para serviços PGR, sempre incluir grau de risco e número de trabalhadores
-            if (grauRisco) {
-                url += `&grau_risco=${encodeURIComponent(grauRisco)}`;
+        const parametros = obterParametrosPreco(id);
+        if (parametros) {
+            // Pré-visualizar pelo catálogo em cache; o servidor recalcula ao enviar o formulário
+            const local = resolverPrecoLocal(parametros);
+            if (local) {
+                exibirPrecoUnitario(id, `R$ ${local.preco.toFixed(2).replace('.', ',')}`, local.preco);
+                if (local.regra !== 'exato') {
+                    console.warn(`Preço do serviço ${id} obtido por fallback (${local.regra})`);
+                }
+                return;
             }
             
-            if (numTrabalhadores) {
-                url += `&num_trabalhadores=${encodeURIComponent(numTrabalhadores)}`;
-            }
-        } else if (variavel) {
-            // Para serviços não-PGR, incluir variável
-            url += `&variavel=${encodeURIComponent(variavel)}`;
+            // Mostrar indicador de carregamento
+            const precoUnitarioElement = document.getElementById(`precoUnitario-${id}`);
+            if (precoUnitarioElement) precoUnitarioElement.textContent = 'Calculando...';
+            itens.push(parametros);
         }
+    });
+    
+    if (itens.length === 0) {
+        return;
+    }
+    
+    console.log(`Calculando preços de ${itens.length} serviço(s) em lote`);
+    
+    // Um serviço alterado de novo depois do envio deste lote já tem um cálculo mais novo
+    const atual = id => versoesPreco.get(String(id)) === versoes.get(String(id));
+    
+    try {
+        const csrfInput = document.querySelector('input[name="csrf_token"]');
+        const response = await fetch('/calcular_precos', {
+            method: 'POST',
+            headers: {
+                'Accept': 'application/json',
+                'Content-Type': 'application/json',
+                'X-CSRFToken': csrfInput ? csrfInput.value : ''
+            },
+            body: JSON.stringify({ itens: itens })
+        });
         
-        if (numGesGhe > 1) {
-            url += `&num_ges_ghe=${numGesGhe}`;
-        }
+        console.log(`Status da resposta: ${response.status} ${response.statusText}`);
         
-        if (numAvaliacoesAdicionais > 0) {
-            url += `&num_avaliacoes_adicionais=${numAvaliacoesAdicionais}`;
+        if (!response.ok) {
+            const errorText = await response.text();
+            console.error(`Erro HTTP: ${response.status} - ${response.statusText}. Detalhes: ${errorText}`);
+            throw new Error(`Erro HTTP: ${response.status} - ${response.statusText}`);
         }
         
-        console.log(`Fazendo requisição para: ${url}`);
+        const data = await response.json();
+        console.log(`Resposta recebida: ${JSON.stringify(data)}`);
         
-        try {
-            // Fazer requisição para obter o preço
-            const response = await fetch(url, {
-                method: 'GET',
-                headers: {
-                    'Accept': 'application/json',
-                    'Content-Type': 'application/json'
-                }
-            });
-            
-            console.log(`Status da resposta: ${response.status} ${response.statusText}`);
-            
-            if (!response.ok) {
-                const errorText = await response.text();
-                console.error(`Erro HTTP: ${response.status} - ${response.statusText}. Detalhes: ${errorText}`);
-                throw new Error(`Erro HTTP: ${response.status} - ${response.statusText}`);
-            }
-            
-            const contentType = response.headers.get('content-type');
-            console.log(`Tipo de conteúdo da resposta: ${contentType}`);
-            
-            if (!contentType || !contentType.includes('application/json')) {
-                console.error(`Resposta não é JSON: ${contentType}`);
-                const text = await response.text();
-                console.error(`Conteúdo da resposta: ${text}`);
-                throw new Error('Resposta não é JSON');
+        data.itens.forEach(item => {
+            if (!atual(item.id)) {
+                console.log(`Resposta desatualizada ignorada para o serviço ${item.id}`);
+                return;
             }
-            
-            const data = await response.json();
-            console.log(`Resposta recebida: ${JSON.stringify(data)}`);
-            
-            if (data.success) {
-                // Atualizar o preço unitário
-                const preco = data.preco;
-                const precoFormatado = data.preco_formatado || `R$ ${preco.toFixed(2).replace('.', ',')}`;
-                
-                precoUnitarioElement.textContent = precoFormatado;
-                precoUnitarioHiddenInput.value = preco;
-                
-                // Atualizar o preço total
-                atualizarPrecoTotal(id);
+            if (item.success) {
+                const precoFormatado = item.preco_formatado || `R$ ${item.preco.toFixed(2).replace('.', ',')}`;
+                exibirPrecoUnitario(item.id, precoFormatado, item.preco);
+                if (item.fallback) {
+                    console.warn(`Preço do serviço ${item.id} obtido por fallback (${item.regra_preco})`);
+                }
             } else {
-                // Exibir mensagem de erro
-                precoUnitarioElement.textContent = 'Erro ao calcular preço';
-                precoUnitarioHiddenInput.value = '0';
-                atualizarPrecoTotal(id);
-                console.error(`Erro retornado pelo servidor: ${data.erro}`);
+                console.error(`Erro retornado pelo servidor para o serviço ${item.id}: ${item.erro}`);
+                exibirPrecoUnitario(item.id, 'Erro ao calcular preço', 0);
             }
-        } catch (error) {
-            console.error(`Erro ao obter preço: ${error.message}`);
-            precoUnitarioElement.textContent = 'Erro ao calcular preço';
-            precoUnitarioHiddenInput.value = '0';
-            atualizarPrecoTotal(id);
-        } finally {
-            atualizandoPreco[id] = false;
-        }
+        });
     } catch (error) {
-        console.error(`Erro na função atualizarPreco: ${error.message}`);
-        atualizandoPreco[id] = false;
+        console.error(`Erro ao obter preços: ${error.message}`);
+        itens.filter(item => atual(item.id)).forEach(item => exibirPrecoUnitario(item.id, 'Erro ao calcular preço', 0));
     }
 }
 
@@ -0,0 +1,98 @@
+import json
+import threading
+import multiprocessing
+from datetime import datetime
+
+import pytest
+
+from services.numeracao import SequenciaOrcamentos
+
+
+DATA = datetime(2025, 3, 14)
+
+
+def _reservar_em_processo(caminho_db, reservas, quantidade):
+    """Executado em outro processo: faz `reservas` reservas de `quantidade` números"""
+    sequencia = SequenciaOrcamentos(caminho_db)
+    numeros = []
+    for _ in range(reservas):
+        numeros.extend(sequencia.reservar(quantidade, DATA))
+    return numeros
+
+
+@pytest.fixture
+def caminho_db(tmp_path):
+    return str(tmp_path / 'orcamentos.db')
+
+
+def test_reserva_faixa_continua(caminho_db):
+    sequencia = SequenciaOrcamentos(caminho_db)
+
+    assert sequencia.reservar(3, DATA) == ['14-03-2025-0001', '14-03-2025-0002', '14-03-2025-0003']
+    assert sequencia.proximo(DATA) == '14-03-2025-0004'
+
+
+def test_contador_por_dia(caminho_db):
+    sequencia = SequenciaOrcamentos(caminho_db)
+    sequencia.reservar(5, DATA)
+
+    assert sequencia.proximo(datetime(2025, 3, 15)) == '15-03-2025-0001'
+    assert sequencia.proximo(DATA) == '14-03-2025-0006'
+
+
+def test_quantidade_invalida(caminho_db):
+    with pytest.raises(ValueError):
+        SequenciaOrcamentos(caminho_db).reservar(0, DATA)
+
+
+def test_contador_compartilhado_pelo_arquivo(caminho_db):
+    SequenciaOrcamentos(caminho_db).reservar(2, DATA)
+
+    assert SequenciaOrcamentos(caminho_db).proximo(DATA) == '14-03-2025-0003'
+
+
+def test_threads_nao_repetem_numeros(caminho_db):
+    sequencia = SequenciaOrcamentos(caminho_db)
+    numeros = []
+    lock = threading.Lock()
+
+    def reservar():
+        for _ in range(20):
+            numero = sequencia.proximo(DATA)
+            with lock:
+                numeros.append(numero)
+
+    threads = [threading.Thread(target=reservar) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(numeros) == [f'14-03-2025-{i:04d}' for i in range(1, 161)]
+
+
+def test_processos_nao_repetem_numeros(caminho_db):
+    # Processos independentes (spawn), cada um com a sua conexão ao mesmo arquivo,
+    # como os workers do gunicorn
+    SequenciaOrcamentos(caminho_db)
+    contexto = multiprocessing.get_context('spawn')
+    with contexto.Pool(4) as pool:
+        resultados = pool.starmap(_reservar_em_processo, [(caminho_db, 25, 2)] * 4)
+
+    numeros = [numero for resultado in resultados for numero in resultado]
+    assert len(numeros) == len(set(numeros)) == 200
+    assert sorted(numeros) == [f'14-03-2025-{i:04d}' for i in range(1, 201)]
+    # Cada reserva de 2 números é uma faixa contínua
+    for resultado in resultados:
+        for primeiro, segundo in zip(resultado[::2], resultado[1::2]):
+            assert int(segundo[-4:]) == int(primeiro[-4:]) + 1
+
+
+def test_importar_contador_json(caminho_db, tmp_path):
+    caminho_json = tmp_path / 'contador_orcamento.json'
+    caminho_json.write_text(json.dumps({'data': '14-03-2025', 'contador': 41}))
+    sequencia = SequenciaOrcamentos(caminho_db)
+
+    assert sequencia.importar_contador_json(str(caminho_json))
+    assert sequencia.proximo(DATA) == '14-03-2025-0042'
+    assert not sequencia.importar_contador_json(str(tmp_path / 'inexistente.json'))
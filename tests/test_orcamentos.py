@@ -0,0 +1,75 @@
+import sqlite3
+
+import pytest
+
+from services.orcamentos import RepositorioOrcamentos
+
+
+SERVICOS = [{'nome': 'Laudo de Insalubridade', 'regiao': 'Central', 'quantidade': 1, 'preco_unitario': 800.0, 'preco_total': 800.0}]
+
+
+@pytest.fixture
+def caminho_db(tmp_path):
+    return str(tmp_path / 'orcamentos.db')
+
+
+def _salvar(repositorio, numero='14-03-2025-0001', token=None):
+    return repositorio.salvar(numero, 'ACME Ltda', 'contato@acme.com', '71 9999-0000', SERVICOS,
+                              800.0, 30.0, 240.0, 1040.0, token=token)
+
+
+def test_salvar_e_obter(caminho_db):
+    repositorio = RepositorioOrcamentos(caminho_db)
+    orcamento_id = _salvar(repositorio)
+
+    orcamento = repositorio.obter(orcamento_id)
+
+    assert orcamento['numero_orcamento'] == '14-03-2025-0001'
+    assert orcamento['empresa_cliente'] == 'ACME Ltda'
+    assert orcamento['servicos'] == SERVICOS
+    assert orcamento['total'] == 1040.0
+    assert repositorio.obter_por_numero('14-03-2025-0001')['id'] == orcamento_id
+
+
+def test_obter_exige_o_token_do_orcamento(caminho_db):
+    repositorio = RepositorioOrcamentos(caminho_db)
+    orcamento_id = _salvar(repositorio, token='token-do-cliente')
+
+    assert repositorio.obter(orcamento_id, 'token-do-cliente')['id'] == orcamento_id
+    assert repositorio.obter(orcamento_id, 'token-de-outro') is None
+    assert repositorio.token(orcamento_id) == 'token-do-cliente'
+
+
+def test_token_aleatorio_por_padrao(caminho_db):
+    repositorio = RepositorioOrcamentos(caminho_db)
+    primeiro = _salvar(repositorio, '14-03-2025-0001')
+    segundo = _salvar(repositorio, '14-03-2025-0002')
+
+    assert repositorio.token(primeiro) != repositorio.token(segundo)
+    assert repositorio.obter(primeiro, repositorio.token(segundo)) is None
+
+
+def test_base_sem_token_e_migrada(caminho_db):
+    # Tabela no formato anterior ao token
+    conexao = sqlite3.connect(caminho_db)
+    conexao.execute("""
+        CREATE TABLE orcamentos (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, numero TEXT NOT NULL UNIQUE, criado_em TEXT NOT NULL,
+            empresa TEXT NOT NULL, email TEXT NOT NULL, telefone TEXT, subtotal REAL NOT NULL,
+            percentual_sesi REAL NOT NULL, valor_sesi REAL NOT NULL, total REAL NOT NULL, servicos TEXT NOT NULL
+        )
+    """)
+    conexao.execute(
+        "INSERT INTO orcamentos (numero, criado_em, empresa, email, subtotal, percentual_sesi, valor_sesi, total, servicos) "
+        "VALUES ('13-03-2025-0001', '2025-03-13T10:00:00', 'Antiga', 'a@b.com', 100, 0, 0, 100, '[]')"
+    )
+    conexao.commit()
+    conexao.close()
+
+    repositorio = RepositorioOrcamentos(caminho_db)
+
+    # Sem token gravado, nenhum token informado é aceito até que um seja criado
+    assert repositorio.obter(1, 'qualquer') is None
+    token = repositorio.token(1)
+    assert token and repositorio.token(1) == token
+    assert repositorio.obter(1, token)['empresa_cliente'] == 'Antiga'
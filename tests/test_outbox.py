@@ -0,0 +1,150 @@
+import pytest
+
+import services.outbox as outbox
+from services.outbox import (
+    CaixaSaida, TrabalhadorCaixaSaida, STATUS_PENDENTE, STATUS_ENVIANDO, STATUS_ENVIADO, STATUS_FALHOU
+)
+
+
+class RelogioFalso:
+    """Substitui o módulo time em services.outbox, para avançar o tempo sem esperar"""
+
+    def __init__(self, agora=1000.0):
+        self.agora = agora
+
+    def time(self):
+        return self.agora
+
+    def avancar(self, segundos):
+        self.agora += segundos
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    relogio = RelogioFalso()
+    monkeypatch.setattr(outbox, 'time', relogio)
+    return relogio
+
+
+@pytest.fixture
+def caixa(tmp_path, relogio):
+    return CaixaSaida(str(tmp_path / 'orcamentos.db'), max_tentativas=3, backoff_segundos=30.0, reserva_segundos=300.0)
+
+
+def _enfileirar(caixa, destinatario='cliente@exemplo.com'):
+    return caixa.enfileirar(destinatario, b'%PDF-1.4', 'orcamento.pdf', orcamento_id=7, numero_orcamento='14-03-2025-0001')
+
+
+def test_reserva_mensagem_pendente(caixa):
+    mensagem_id = _enfileirar(caixa)
+
+    mensagem = caixa.reservar()
+
+    assert mensagem['id'] == mensagem_id
+    assert mensagem['destinatario'] == 'cliente@exemplo.com'
+    assert mensagem['pdf'] == b'%PDF-1.4'
+    assert mensagem['metadados'] == {'numero_orcamento': '14-03-2025-0001'}
+    assert mensagem['tentativas'] == 1
+    assert caixa.status(mensagem_id)['status'] == STATUS_ENVIANDO
+    # Reservada: não é entregue a outro worker
+    assert caixa.reservar() is None
+
+
+def test_reserva_expira(caixa, relogio):
+    mensagem_id = _enfileirar(caixa)
+    caixa.reservar()
+
+    relogio.avancar(299)
+    assert caixa.reservar() is None
+
+    # O worker morreu no meio do envio: depois do prazo a mensagem volta à fila
+    relogio.avancar(1)
+    mensagem = caixa.reservar()
+    assert mensagem['id'] == mensagem_id
+    assert mensagem['tentativas'] == 2
+
+
+def test_backoff_exponencial(caixa, relogio):
+    mensagem_id = _enfileirar(caixa)
+
+    mensagem = caixa.reservar()
+    assert caixa.registrar_falha(mensagem_id, mensagem['tentativas'], 'conexão recusada') == STATUS_PENDENTE
+    assert caixa.status(mensagem_id)['ultimo_erro'] == 'conexão recusada'
+
+    # Primeira espera: backoff_segundos
+    relogio.avancar(29)
+    assert caixa.reservar() is None
+    relogio.avancar(1)
+    mensagem = caixa.reservar()
+    assert mensagem['tentativas'] == 2
+
+    # Segunda espera: o dobro
+    caixa.registrar_falha(mensagem_id, mensagem['tentativas'], 'conexão recusada')
+    relogio.avancar(59)
+    assert caixa.reservar() is None
+    relogio.avancar(1)
+    mensagem = caixa.reservar()
+    assert mensagem['tentativas'] == 3
+
+    # Tentativas esgotadas
+    assert caixa.registrar_falha(mensagem_id, mensagem['tentativas'], 'conexão recusada') == STATUS_FALHOU
+    relogio.avancar(3600)
+    assert caixa.reservar() is None
+    assert caixa.status(mensagem_id)['status'] == STATUS_FALHOU
+
+
+def test_concluir_descarta_pdf(caixa):
+    mensagem_id = _enfileirar(caixa)
+    caixa.reservar()
+
+    caixa.concluir(mensagem_id)
+
+    status = caixa.status(mensagem_id)
+    assert status['status'] == STATUS_ENVIADO
+    assert status['enviado_em'] is not None
+    pdf = caixa.conexao().execute("SELECT pdf FROM caixa_saida WHERE id = ?", (mensagem_id,)).fetchone()['pdf']
+    assert pdf is None
+    assert caixa.reservar() is None
+
+
+def test_reserva_por_id(caixa):
+    primeira = _enfileirar(caixa, 'primeiro@exemplo.com')
+    segunda = _enfileirar(caixa, 'segundo@exemplo.com')
+
+    assert caixa.reservar(segunda)['id'] == segunda
+    assert caixa.reservar(segunda) is None
+    assert caixa.status(primeira)['status'] == STATUS_PENDENTE
+    assert caixa.reservar()['id'] == primeira
+
+
+def test_trabalhador_registra_sucessos_e_falhas(caixa):
+    enviados = []
+
+    def enviar(destinatario, pdf, nome_arquivo, **metadados):
+        enviados.append(destinatario)
+        if destinatario == 'falha@exemplo.com':
+            raise ConnectionError('servidor SMTP indisponível')
+        return True, 'E-mail enviado com sucesso!'
+
+    sucesso = _enfileirar(caixa, 'ok@exemplo.com')
+    falha = _enfileirar(caixa, 'falha@exemplo.com')
+    trabalhador = TrabalhadorCaixaSaida(caixa, enviar)
+
+    assert trabalhador.processar_pendentes() == 2
+    assert enviados == ['ok@exemplo.com', 'falha@exemplo.com']
+    assert caixa.status(sucesso)['status'] == STATUS_ENVIADO
+    assert caixa.status(falha)['status'] == STATUS_PENDENTE
+    assert caixa.status(falha)['ultimo_erro'] == 'servidor SMTP indisponível'
+    # A falha aguarda o backoff antes de nova tentativa
+    assert trabalhador.processar_pendentes() == 0
+
+
+def test_trabalhador_processa_apenas_a_mensagem_pedida(caixa):
+    outra = _enfileirar(caixa, 'outra@exemplo.com')
+    propria = _enfileirar(caixa, 'propria@exemplo.com')
+    trabalhador = TrabalhadorCaixaSaida(caixa, lambda *args, **kwargs: (True, 'ok'))
+
+    assert trabalhador.processar_mensagem(propria)
+    assert not trabalhador.processar_mensagem(propria)
+    assert caixa.status(propria)['status'] == STATUS_ENVIADO
+    assert caixa.status(outra)['status'] == STATUS_PENDENTE
@@ -1,11 +1,11 @@
 import os
-from app import app, verificar_precos_csv
+from app import app, aquecer_em_segundo_plano
 
 # Definir variável de ambiente para Vercel
 os.environ["VERCEL_ENV"] = "production"
 
-# Executar verificações necessárias
-verificar_precos_csv()
+# Carregar o catálogo e os módulos pesados sem atrasar a inicialização
+aquecer_em_segundo_plano()
 
 # Aplicação para a Vercel
 app.logger.info("Aplicação inicializada na Vercel") 
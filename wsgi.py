@@ -1,7 +1,9 @@
-from app import app, verificar_precos_csv
+from app import app, aquecer_em_segundo_plano
 
-# Executar verificações necessárias
-verificar_precos_csv()
+# Carregar o catálogo e os módulos pesados sem atrasar a inicialização. Importado pelo
+# gunicorn (no processo principal, com --preload), o pool de PDFs e a thread da caixa de
+# saída não são iniciados aqui: cada worker inicia os seus no post_fork (gunicorn.conf.py)
+aquecer_em_segundo_plano(servicos_do_processo=__name__ == "__main__")
 
 if __name__ == "__main__":
     app.run() 
\ No newline at end of file